@@ -0,0 +1,140 @@
+"""Deleting an airline with many flights: one transaction vs the chunked job.
+
+Seeds --flights flights over two airlines (with purchases, some of them put
+back to PENDING, and ratings) and deletes airline 1 twice, on a fresh
+database each time:
+
+- single: the same work as one transaction (a batch size larger than
+  anything it touches), like deleting everything in the request,
+- chunked: DELETE /airlines/1 as served now, 202 at once, then the job in
+  transactions of --batch-size rows with --pause seconds after each
+  (db/deletion.py).
+
+Meanwhile a probe thread keeps committing a one-row update to a flight of
+the other airline and records how long each takes: the longest wait is
+about how long the deletion held the write lock.
+
+    python benchmarks/airline_deletion.py --flights 20000 --batch-size 500
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import seed_let_service  # noqa: E402
+
+ADMIN = {"X-User-Id": "1", "X-User-Role": "ADMIN"}
+
+
+def _probe(app, stop: threading.Event, latencies: list[float], errors: list[str]) -> None:
+    from sqlalchemy.exc import OperationalError
+
+    from let_service.db import db
+
+    with app.app_context():
+        flight_id = db.session.execute(db.text("SELECT min(id) FROM flights WHERE airline_id = 2")).scalar()
+        db.session.rollback()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                db.session.execute(db.text("UPDATE flights SET price = price WHERE id = :id"), {"id": flight_id})
+                db.session.commit()
+                latencies.append(time.perf_counter() - t0)
+            except OperationalError as error:
+                db.session.rollback()
+                errors.append(str(error.orig))
+            time.sleep(0.005)
+        db.session.remove()
+
+
+def _run(args, mode: str) -> dict:
+    seed_let_service(args.let_db, airlines=2, flights=args.flights, purchases=args.purchases,
+                     ratings=args.ratings, users=200)
+
+    from let_service import create_app
+    from let_service.db import db, deletion
+
+    app = create_app(create_schema=True)
+    app.config["DELETION_BATCH_SIZE"] = args.batch_size
+    app.config["DELETION_PAUSE_SECONDS"] = args.pause
+    client = app.test_client()
+    with app.app_context():
+        db.session.execute(db.text("UPDATE purchases SET status = 'PENDING' WHERE id % 10 = 0"))
+        db.session.commit()
+
+    stop = threading.Event()
+    latencies: list[float] = []
+    errors: list[str] = []
+    probe = threading.Thread(target=_probe, args=(app, stop, latencies, errors))
+    probe.start()
+    time.sleep(0.5)
+
+    t0 = time.perf_counter()
+    if mode == "single":
+        with app.app_context():
+            job = deletion.queue(db.session, "airline", 1, deletion.airline_flights(db.session, 1))
+            db.session.commit()
+            job_id = job.id
+            accepted = time.perf_counter() - t0
+            deletion.claim(db.session, job_id, timedelta(seconds=60))
+            job = deletion.run(db.session, job_id, batch_size=10 ** 9).to_dict()
+            db.session.remove()
+    else:
+        res = client.delete("/airlines/1", headers=ADMIN)
+        accepted = time.perf_counter() - t0
+        assert res.status_code == 202, res.get_json()
+        job_id = res.get_json()["job"]["id"]
+        while True:
+            job = client.get(f"/deletions/{job_id}", headers=ADMIN).get_json()
+            if job["status"] in ("DONE", "FAILED"):
+                break
+            time.sleep(0.05)
+    seconds = time.perf_counter() - t0
+
+    time.sleep(0.3)
+    stop.set()
+    probe.join()
+    latencies.sort()
+    return {
+        "status": job["status"],
+        "flights": job["flights_deleted"],
+        "ratings": job["ratings_deleted"],
+        "purchases_failed": job["purchases_failed"],
+        "accepted_ms": round(accepted * 1000, 1),
+        "seconds": round(seconds, 2),
+        "probe_writes": len(latencies),
+        "probe_p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "probe_max_ms": round(latencies[-1] * 1000, 1) if latencies else None,
+        "probe_errors": len(errors),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-deletion-let.db")
+    parser.add_argument("--flights", type=int, default=20_000)
+    parser.add_argument("--purchases", type=int, default=40_000)
+    parser.add_argument("--ratings", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.02)
+    args = parser.parse_args()
+
+    os.environ["LET_LIFECYCLE_ENABLED"] = "false"
+    os.environ["LET_OUTBOX_ENABLED"] = "false"
+    report = {"flights": args.flights, "batch_size": args.batch_size, "pause": args.pause}
+    for mode in ("single", "chunked"):
+        report[mode] = _run(args, mode)
+        print(mode, report[mode], file=sys.stderr, flush=True)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Revenue per airline: naive ORM loop vs the vectorized /analytics engine.
+
+Seeds flights with seed.py, then bulk-inserts --purchases purchases spread
+over the last --days days (about 90% COMPLETED). Reports
+
+- the naive approach: iterate Purchase objects (with their joined flight)
+  and sum in Python,
+- the engine cold (every day streamed and aggregated) and warm (closed days
+  cached, only the open day recomputed), per group_by,
+- whether both agree on revenue per airline.
+
+    python benchmarks/analytics.py --purchases 10000000 --flights 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import seed_let_service  # noqa: E402
+
+CHUNK = 50_000
+
+
+def insert_purchases(db, count: int, flights: int, users: int, days: int, seed: int = 5) -> None:
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+    span = days * 86400
+    conn = db.engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        for start in range(0, count, CHUNK):
+            rows = []
+            for i in range(start + 1, min(start + CHUNK, count) + 1):
+                status = "COMPLETED" if rnd.random() < 0.9 else "FAILED"
+                created = now - timedelta(seconds=rnd.randrange(span))
+                rows.append((i, str(rnd.randint(1, users)), rnd.randint(1, flights), status,
+                             round(rnd.uniform(30, 900), 2), created if status == "COMPLETED" else None, created))
+            cursor.executemany(
+                "INSERT INTO purchases (id, user_id, flight_id, status, price_paid, purchased_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.commit()
+            print(f"purchases {min(start + CHUNK, count)}/{count}", file=sys.stderr, flush=True)
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-analytics-let.db")
+    parser.add_argument("--purchases", type=int, default=10_000_000)
+    parser.add_argument("--flights", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--skip-seed", action="store_true", help="reuse the database from a previous run")
+    parser.add_argument("--skip-naive", action="store_true", help="only measure the engine")
+    args = parser.parse_args()
+
+    if args.skip_seed:
+        import os
+        os.environ["LET_SQLALCHEMY_DATABASE_URI"] = args.let_db
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "let_service"))
+    else:
+        seed_let_service(args.let_db, airlines=20, flights=args.flights, purchases=0, ratings=0, users=5000)
+
+    from let_service import create_app
+    from let_service.db import db, versions
+    from let_service.db.analytics import GROUPS, RevenueEngine
+    from let_service.db.models import Purchase
+
+    app = create_app(create_schema=False)
+    with app.app_context():
+        if not args.skip_seed:
+            t0 = time.perf_counter()
+            insert_purchases(db, args.purchases, args.flights, 5000, args.days)
+            print(f"inserted in {time.perf_counter() - t0:.1f}s", file=sys.stderr, flush=True)
+
+        today = datetime.utcnow().date()
+        first_day = today - timedelta(days=args.days)
+        start = datetime.combine(first_day, datetime.min.time())
+        table_versions = versions.current("flights", "airlines")
+        report: dict = {"purchases": args.purchases, "flights": args.flights, "days": args.days + 1}
+
+        # Naive: ORM objects with the joined flight, summed in Python
+        naive: dict[int, float] = defaultdict(float)
+        rows = Purchase.query.filter(Purchase.status == "COMPLETED").filter(Purchase.purchased_at >= start).count()
+        if not args.skip_naive:
+            t0 = time.perf_counter()
+            query = (Purchase.query.filter(Purchase.status == "COMPLETED").filter(Purchase.purchased_at >= start)
+                     .yield_per(10_000))
+            for purchase in query:
+                naive[purchase.flight.airline_id] += purchase.price_paid
+            naive_seconds = time.perf_counter() - t0
+            db.session.expunge_all()
+            report["naive_orm"] = {"rows": rows, "seconds": round(naive_seconds, 2),
+                                   "rows_per_second": round(rows / naive_seconds)}
+            print("naive", report["naive_orm"], file=sys.stderr, flush=True)
+
+        engine = RevenueEngine()
+        t0 = time.perf_counter()
+        cold = engine.revenue("airline", first_day, today, table_versions, limit=10_000)
+        cold_seconds = time.perf_counter() - t0
+        report["engine_cold"] = {"seconds": round(cold_seconds, 2), "computed_days": cold["computed_days"],
+                                 "rows_per_second": round(rows / cold_seconds)}
+        print("cold", report["engine_cold"], file=sys.stderr, flush=True)
+
+        vectorized = {row["airline_id"]: row["revenue"] for row in cold["rows"]}
+        report["airline_totals_match"] = None if args.skip_naive else all(
+            abs(vectorized.get(airline, 0.0) - round(total, 2)) <= 0.01 + 1e-9 * total
+            for airline, total in naive.items()
+        ) and len(vectorized) == len(naive)
+
+        warm = {}
+        for group_by in GROUPS:
+            samples = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                result = engine.revenue(group_by, first_day, today, table_versions, limit=100)
+                samples.append(time.perf_counter() - t0)
+            warm[group_by] = {"best_ms": round(min(samples) * 1000, 1),
+                              "computed_days": result["computed_days"], "rows": len(result["rows"])}
+        report["engine_warm"] = warm
+        print("warm", warm, file=sys.stderr, flush=True)
+
+    client = app.test_client()
+    url = f"/analytics/revenue?group_by=airline&from={first_day}&to={today}"
+    client.get(url)
+    t0 = time.perf_counter()
+    client.get(url)
+    report["http_warm_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
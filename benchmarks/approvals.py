@@ -0,0 +1,87 @@
+"""Deciding the approval queue: one request per flight vs POST /flights/approvals/batch.
+
+Seeds --flights flights, puts --pending of them back to PENDING and times,
+in-process, approving --decide of them
+
+- single: POST /flights/<id>/approve per flight (get, check, commit and a
+  full flight response each),
+- batch: one POST /flights/approvals/batch with all the ids (chunks of
+  --batch-size), after the same flights are made PENDING again.
+
+Half the batch ids are repeated in a second call, to show they come back as
+skipped.
+
+    python benchmarks/approvals.py --pending 5000 --decide 2000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import seed_let_service  # noqa: E402
+
+ADMIN = {"X-User-Id": "1", "X-User-Role": "ADMIN"}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-approvals-let.db")
+    parser.add_argument("--flights", type=int, default=20_000)
+    parser.add_argument("--pending", type=int, default=5000)
+    parser.add_argument("--decide", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    os.environ["LET_LIFECYCLE_ENABLED"] = "false"
+    os.environ["LET_OUTBOX_ENABLED"] = "false"
+    seed_let_service(args.let_db, airlines=20, flights=args.flights, purchases=0, ratings=0, users=100)
+
+    from let_service import create_app
+    from let_service.db import db
+
+    app = create_app(create_schema=False)
+    client = app.test_client()
+    ids = list(range(1, args.pending + 1))
+
+    def reset() -> None:
+        with app.app_context():
+            db.session.execute(db.text(
+                "UPDATE flights SET approval_status = 'PENDING', rejection_reason = NULL, approved_by_user_id = NULL, "
+                "approved_at = NULL WHERE id <= :n"), {"n": args.pending})
+            db.session.commit()
+
+    report: dict = {"flights": args.flights, "pending": args.pending, "decided": args.decide}
+
+    reset()
+    t0 = time.perf_counter()
+    for flight_id in ids[:args.decide]:
+        assert client.post(f"/flights/{flight_id}/approve", headers=ADMIN).status_code == 200
+    seconds = time.perf_counter() - t0
+    report["single"] = {"seconds": round(seconds, 3), "flights_per_second": round(args.decide / seconds)}
+
+    reset()
+    t0 = time.perf_counter()
+    changed = 0
+    for start in range(0, args.decide, args.batch_size):
+        chunk = ids[start:min(start + args.batch_size, args.decide)]
+        res = client.post("/flights/approvals/batch", json={"action": "approve", "ids": chunk}, headers=ADMIN)
+        changed += res.get_json()["changed"]
+    seconds = time.perf_counter() - t0
+    report["batch"] = {"seconds": round(seconds, 3), "flights_per_second": round(args.decide / seconds),
+                       "changed": changed}
+
+    again = ids[args.decide // 2:args.decide + args.decide // 2]
+    res = client.post("/flights/approvals/batch",
+                      json={"action": "reject", "ids": again, "reason": "bench"}, headers=ADMIN).get_json()
+    report["overlapping"] = {"requested": len(again), "changed": res["changed"], "skipped": res["skipped"]}
+    report["speedup"] = round(report["single"]["seconds"] / report["batch"]["seconds"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
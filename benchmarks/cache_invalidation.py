@@ -0,0 +1,197 @@
+"""Stale reads and upstream load of the gateway micro-cache: TTL vs change events.
+
+let_service (one process, so its /metrics count every upstream GET) and a
+sync gateway with --workers workers serve --hot flights. For each variant,
+--readers threads loop on GET /flights/get/<id> through the gateway while a
+writer changes the price of a random hot flight directly on let_service
+every --write-interval seconds (another gateway, an admin script), then
+polls the gateway until the new price shows. Reported per variant:
+
+- gateway reads/s and p50 latency,
+- let_service GETs per 100 gateway reads,
+- staleness: seconds from the committed write until every poll sees it
+  (p50 / p95 / max).
+
+Variants: ttl-100ms and ttl-5s (INVALIDATION_ENABLED=false, the micro-cache
+only expires), events (outbox relay -> Redis pub/sub -> eviction in every
+gateway worker, INVALIDATION_CACHE_MS TTL). events needs a Redis server:
+--redis-host, skipped when it is not reachable.
+
+    python benchmarks/cache_invalidation.py --redis-host localhost
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import requests
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from gateway_concurrency import ROOT, _wait, gateway_command  # noqa: E402
+from loadtest import LET_RUNNER  # noqa: E402
+from seed import seed_let_service  # noqa: E402
+
+ADMIN = {"X-User-Id": "1", "X-User-Role": "ADMIN"}
+_GET_COUNT = re.compile(r'^let_http_request_duration_seconds_count\{[^}]*method="GET"[^}]*\} (\S+)$', re.M)
+
+
+def _let_gets(let_url: str) -> float:
+    return sum(float(v) for v in _GET_COUNT.findall(requests.get(f"{let_url}/metrics").text))
+
+
+def _redis_reachable(host: str | None) -> bool:
+    if not host:
+        return False
+    import redis
+
+    try:
+        return bool(redis.Redis(host, socket_connect_timeout=1).ping())
+    except redis.RedisError:
+        return False
+
+
+def run_variant(name: str, gateway_env: dict, let_env: dict, flights: list[int], args) -> dict:
+    let_url = f"http://127.0.0.1:{args.let_port}"
+    gateway_url = f"http://127.0.0.1:{args.gateway_port}"
+    env = dict(os.environ, **let_env)
+    let = subprocess.Popen([sys.executable, "-c", LET_RUNNER.format(port=args.let_port)], cwd=ROOT / "let_service",
+                           env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    gateway = None
+    try:
+        _wait(f"{let_url}/ping")
+        cmd, _ = gateway_command("sync", args.gateway_port, args.workers, args.threads)
+        gateway = subprocess.Popen(cmd, cwd=ROOT / "server", env=dict(os.environ, **gateway_env),
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _wait(f"{gateway_url}/ping-reachable")
+        # Every worker handles a request (and subscribes) before measuring
+        for flight in flights * 4:
+            requests.get(f"{gateway_url}/flights/get/{flight}")
+        time.sleep(2.0)
+
+        stop = threading.Event()
+        latencies: list[float] = []
+
+        def reader(seed: int) -> None:
+            rnd = random.Random(seed)
+            http = requests.Session()
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                http.get(f"{gateway_url}/flights/get/{rnd.choice(flights)}")
+                latencies.append(time.perf_counter() - t0)
+            # gthread waits for idle keep-alive connections on shutdown
+            http.close()
+
+        gets_before = _let_gets(let_url)
+        threads = [threading.Thread(target=reader, args=(i,), daemon=True) for i in range(args.readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        staleness: list[float] = []
+        rnd = random.Random(7)
+        http = requests.Session()
+        while time.perf_counter() - started < args.seconds:
+            flight = rnd.choice(flights)
+            price = round(rnd.uniform(30, 900), 2)
+            http.put(f"{let_url}/flights/{flight}", json={"price": price}, headers=ADMIN).raise_for_status()
+            written = time.perf_counter()
+            # Fresh once `workers` polls in a row (spread over the workers) see the new price
+            fresh_in_a_row = 0
+            while fresh_in_a_row < args.workers * 2 and time.perf_counter() - written < args.max_stale:
+                seen = http.get(f"{gateway_url}/flights/get/{flight}").json()["data"]["price"]
+                fresh_in_a_row = fresh_in_a_row + 1 if seen == price else 0
+                if fresh_in_a_row == 0:
+                    time.sleep(0.005)
+            staleness.append(time.perf_counter() - written)
+            time.sleep(args.write_interval)
+
+        http.close()
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        gets = _let_gets(let_url) - gets_before
+
+        staleness.sort()
+        latencies.sort()
+        row = {
+            "variant": name,
+            "reads_per_second": round(len(latencies) / elapsed),
+            "read_p50_ms": round(statistics.median(latencies) * 1000, 2),
+            "let_gets_per_100_reads": round(100 * gets / max(len(latencies), 1), 1),
+            "writes": len(staleness),
+            "stale_p50_ms": round(staleness[len(staleness) // 2] * 1000, 1),
+            "stale_p95_ms": round(staleness[int(len(staleness) * 0.95)] * 1000, 1),
+            "stale_max_ms": round(staleness[-1] * 1000, 1),
+        }
+        print(row, file=sys.stderr, flush=True)
+        return row
+    finally:
+        if gateway is not None:
+            gateway.terminate()
+            gateway.wait(timeout=15)
+        let.terminate()
+        let.wait(timeout=15)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-invalidation-let.db")
+    parser.add_argument("--hot", type=int, default=50, help="flights the readers and writer pick from")
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--write-interval", type=float, default=0.5)
+    parser.add_argument("--max-stale", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--redis-host", default=None)
+    parser.add_argument("--let-port", type=int, default=18841)
+    parser.add_argument("--gateway-port", type=int, default=18840)
+    args = parser.parse_args()
+
+    seed_let_service(args.let_db, airlines=5, flights=max(args.hot * 4, 500), purchases=0, ratings=0, users=10)
+
+    from let_service import create_app
+    from let_service.db.models import Flight
+
+    # Only flights that have not started can be edited
+    with create_app(create_schema=False).app_context():
+        flights = [f.id for f in Flight.query.filter(
+            Flight.canceled.is_(False), Flight.departure_time > datetime.utcnow() + timedelta(days=1)).limit(args.hot)]
+
+    let_env = {"LET_SQLALCHEMY_DATABASE_URI": args.let_db, "LET_AUTO_CREATE_SCHEMA": "false",
+               "LET_METRICS_ENABLED": "true", "LET_REDIS_URL": ""}
+    gateway_env = {"SQLALCHEMY_DATABASE_URI": "sqlite:////tmp/bench-invalidation-server.db", "SECRET_KEY": "bench",
+                   "LET_SERVICE_URL": f"http://127.0.0.1:{args.let_port}", "REDIS_DB": args.redis_host or "localhost",
+                   "COALESCE_ENABLED": "true"}
+    variants = {
+        "ttl-100ms": ({**gateway_env, "INVALIDATION_ENABLED": "false", "COALESCE_CACHE_MS": "100"}, let_env),
+        "ttl-5s": ({**gateway_env, "INVALIDATION_ENABLED": "false", "COALESCE_CACHE_MS": "5000"}, let_env),
+    }
+    if _redis_reachable(args.redis_host):
+        variants["events"] = (
+            {**gateway_env, "INVALIDATION_ENABLED": "true", "COALESCE_CACHE_MS": "0", "INVALIDATION_CACHE_MS": "30000"},
+            {**let_env, "LET_REDIS_URL": f"redis://{args.redis_host}:6379/0"},
+        )
+    else:
+        print("no Redis at --redis-host, skipping the events variant", file=sys.stderr)
+
+    results = [run_variant(name, g, l, flights, args) for name, (g, l) in variants.items()]
+    print(json.dumps({"hot_flights": args.hot, "readers": args.readers, "workers": args.workers,
+                      "write_interval": args.write_interval, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
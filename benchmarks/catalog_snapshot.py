@@ -0,0 +1,173 @@
+"""GET /flights from SQL vs from the in-memory catalog snapshot.
+
+Seeds let_service, then runs two apps on the same database: one with
+CATALOG_SNAPSHOT_ENABLED off, one with it on. Reports
+
+- latency of each listing query on both paths (and whether the bodies match),
+- the snapshot's memory footprint (its own estimate and tracemalloc's),
+- refresh cost and write-to-visible lag after batches of updates, inserts
+  and deletes made through a separate session (as another worker would).
+
+    python benchmarks/catalog_snapshot.py --flights 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import AIRPORTS, seed_let_service  # noqa: E402
+
+QUERIES = [
+    "/flights?tab=upcoming",
+    "/flights?tab=upcoming&q=beg",
+    "/flights?tab=in_progress",
+    "/flights?tab=archive",
+    "/flights?tab=pending",
+    "/flights?tab=all&airline_id=3",
+    "/flights?tab=all&approval_status=REJECTED",
+]
+
+
+def _body(client, url: str) -> list[dict]:
+    rows = client.get(url).get_json()
+    for row in rows:
+        # computed from the clock at serialization time
+        row.pop("remaining_seconds", None)
+    return rows
+
+
+def _timed(client, url: str, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        client.get(url)
+        samples.append(time.perf_counter() - t0)
+    return round(statistics.median(samples) * 1000, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-catalog-let.db")
+    parser.add_argument("--flights", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batches", type=int, nargs="+", default=[1, 100, 1000])
+    args = parser.parse_args()
+
+    seed_let_service(args.let_db, airlines=20, flights=args.flights, purchases=0, ratings=0, users=500)
+
+    from sqlalchemy import delete, insert, update
+
+    from let_service import create_app
+    from let_service.db import db, versions
+    from let_service.db.catalog import get_catalog, init_catalog
+    from let_service.db.models import Flight
+
+    sql_app = create_app(create_schema=False)
+    mem_app = create_app(create_schema=False)
+    mem_app.config["CATALOG_SNAPSHOT_ENABLED"] = True
+    init_catalog(mem_app)
+    sql_client, mem_client = sql_app.test_client(), mem_app.test_client()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    mem_client.get("/flights?tab=pending")
+    load_ms = round((time.perf_counter() - t0) * 1000, 1)
+    traced = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    with mem_app.app_context():
+        catalog = get_catalog()
+        stats = catalog.stats()
+        estimate = catalog.footprint()
+    memory = {
+        "rows": stats["rows"],
+        "initial_load_ms": load_ms,
+        "footprint_bytes": estimate,
+        "tracemalloc_bytes": traced,
+        "bytes_per_row": round(estimate / max(stats["rows"], 1), 1),
+    }
+    print(memory, file=sys.stderr, flush=True)
+
+    queries = []
+    for url in QUERIES:
+        row = {
+            "query": url,
+            "rows": len(_body(sql_client, url)),
+            "match": _body(sql_client, url) == _body(mem_client, url),
+            "sql_ms": _timed(sql_client, url, args.repeat),
+            "snapshot_ms": _timed(mem_client, url, args.repeat),
+        }
+        queries.append(row)
+        print(row, file=sys.stderr, flush=True)
+
+    rnd = random.Random(7)
+    next_id = args.flights + 1
+    refreshes = []
+    for size in args.batches:
+        with sql_app.app_context():
+            ids = rnd.sample(range(1, next_id), size)
+            db.session.execute(update(Flight).where(Flight.id.in_(ids)).values(price=Flight.price + 1))
+            versions.bump(db.session, "flights")
+            db.session.commit()
+            t_commit = time.perf_counter()
+        refreshes.append(_refresh_row("update", size, mem_client, t_commit))
+
+        with sql_app.app_context():
+            template = db.session.get(Flight, 1)
+            rows = []
+            for i in range(size):
+                origin, destination = rnd.sample(AIRPORTS, 2)
+                rows.append({
+                    "id": next_id + i, "name": f"{origin}-{destination} new", "airline_id": template.airline_id,
+                    "distance_km": template.distance_km, "duration_seconds": template.duration_seconds,
+                    "departure_time": template.departure_time, "origin_airport": origin,
+                    "destination_airport": destination, "created_by_user_id": "1", "price": 100.0,
+                    "approval_status": "APPROVED",
+                })
+            db.session.execute(insert(Flight), rows)
+            versions.bump(db.session, "flights")
+            db.session.commit()
+            t_commit = time.perf_counter()
+            next_id += size
+        refreshes.append(_refresh_row("insert", size, mem_client, t_commit))
+
+        with sql_app.app_context():
+            ids = rnd.sample(range(1, next_id), size)
+            db.session.execute(delete(Flight).where(Flight.id.in_(ids)))
+            versions.bump(db.session, "flights")
+            versions.tombstone(db.session, ids)
+            db.session.commit()
+            t_commit = time.perf_counter()
+        refreshes.append(_refresh_row("delete", size, mem_client, t_commit))
+
+    consistent = all(_body(sql_client, url) == _body(mem_client, url) for url in QUERIES)
+    print(json.dumps({"flights": args.flights, "memory": memory, "queries": queries, "refresh": refreshes,
+                      "consistent_after_writes": consistent}, indent=2))
+
+
+def _refresh_row(kind: str, size: int, client, t_commit: float) -> dict:
+    """First listing after the write pays for the incremental refresh."""
+    t0 = time.perf_counter()
+    client.get("/flights?tab=pending")
+    now = time.perf_counter()
+    row = {
+        "change": kind,
+        "rows": size,
+        "refresh_request_ms": round((now - t0) * 1000, 2),
+        "unchanged_request_ms": _timed(client, "/flights?tab=pending", 3),
+        "commit_to_visible_ms": round((now - t_commit) * 1000, 2),
+    }
+    print(row, file=sys.stderr, flush=True)
+    return row
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare two loadtest.py result files endpoint by endpoint.
+
+    python benchmarks/compare.py benchmarks/results/abc123.json benchmarks/results/def456.json
+
+Exits with status 1 when any endpoint's p95 regressed by more than
+--threshold percent (default 20), so it can gate CI.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+
+
+def _pct(old: float, new: float) -> float:
+    if not old:
+        return 0.0
+    return (new - old) / old * 100.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=20.0, help="allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+
+    print(f"baseline {old.get('commit')}  ->  candidate {new.get('commit')}")
+    print(f"{'endpoint':40} {'rps':>16} {'p50 ms':>18} {'p95 ms':>18} {'p99 ms':>18}")
+
+    regressed = []
+    for name in sorted(set(old["endpoints"]) | set(new["endpoints"])):
+        a = old["endpoints"].get(name)
+        b = new["endpoints"].get(name)
+        if a is None or b is None:
+            print(f"{name:40} {'only in ' + ('candidate' if a is None else 'baseline'):>16}")
+            continue
+        cols = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            cols.append(f"{a[key]:7.1f}->{b[key]:7.1f}")
+        delta = _pct(a["p95_ms"], b["p95_ms"])
+        flag = "  REGRESSION" if delta > args.threshold else ""
+        if flag:
+            regressed.append(name)
+        print(f"{name:40} {cols[0]:>16} {cols[1]:>18} {cols[2]:>18} {cols[3]:>18}{flag}")
+
+    old_sql = old.get("let_service_sql", {})
+    new_sql = new.get("let_service_sql", {})
+    if old_sql or new_sql:
+        print("\nSQL statements per request (let_service)")
+        for route in sorted(set(old_sql) | set(new_sql)):
+            a = (old_sql.get(route) or {}).get("statements_per_request")
+            b = (new_sql.get(route) or {}).get("statements_per_request")
+            print(f"  {route:38} {a!s:>8} -> {b!s:<8}")
+
+    if regressed:
+        print(f"\np95 regressed > {args.threshold}% on: {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
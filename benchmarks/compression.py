@@ -0,0 +1,85 @@
+"""Bytes saved and CPU cost of response compression on the benchmark data.
+
+Seeds the same synthetic data set as loadtest.py, renders the big payloads
+(flight listings per tab and the admin user dump) and compresses each one at
+several gzip levels / brotli qualities.
+
+    python benchmarks/compression.py --flights 20000 --users 5000
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import seed_let_service, seed_server_users  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _measure(data: bytes, fn, repeat: int) -> dict[str, float]:
+    out = fn(data)
+    t0 = time.process_time()
+    for _ in range(repeat):
+        fn(data)
+    cpu = (time.process_time() - t0) / repeat
+    return {
+        "bytes": len(out),
+        "ratio": round(len(out) / len(data), 4) if data else 0.0,
+        "saved_bytes": len(data) - len(out),
+        "cpu_ms": round(cpu * 1000, 3),
+        "mb_per_cpu_second": round(len(data) / cpu / 1e6, 1) if cpu else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-compress-let.db")
+    parser.add_argument("--server-db", default="sqlite:////tmp/bench-compress-server.db")
+    parser.add_argument("--flights", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed_let_service(args.let_db, airlines=20, flights=args.flights, purchases=0, ratings=0, users=args.users)
+    seed_server_users(args.server_db, args.users)
+
+    from let_service import create_app
+    from setup import app as server_app, db as server_db
+    from models import User
+
+    app = create_app(create_schema=False)
+    app.config["COMPRESSION_ENABLED"] = False
+    client = app.test_client()
+
+    payloads: dict[str, bytes] = {}
+    for tab in ("all", "upcoming", "archive"):
+        payloads[f"GET /flights?tab={tab}"] = client.get(f"/flights?tab={tab}").get_data()
+    with server_app.app_context():
+        users = [u.to_dto() for u in server_db.session.execute(server_db.select(User)).scalars()]
+    with server_app.test_request_context():
+        from flask import jsonify
+        payloads["admin user dump"] = jsonify({"message": "Successfully got user info", "user": users}).get_data()
+
+    codecs = {f"gzip-{lvl}": (lambda d, lvl=lvl: gzip.compress(d, compresslevel=lvl, mtime=0)) for lvl in (1, 6, 9)}
+    if brotli is not None:
+        codecs.update({f"br-{q}": (lambda d, q=q: brotli.compress(d, quality=q)) for q in (1, 5, 9)})
+
+    results = {}
+    for name, data in payloads.items():
+        results[name] = {"identity_bytes": len(data)}
+        for codec, fn in codecs.items():
+            results[name][codec] = _measure(data, fn, args.repeat)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
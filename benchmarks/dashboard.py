@@ -0,0 +1,90 @@
+"""Dashboard counts: four full tab lists vs GET /dashboard/summary.
+
+Seeds --flights flights and times, in-process, what a dashboard page needs
+(tab counts and the next few upcoming flights):
+
+- tabs: GET /flights?tab=upcoming|in_progress|pending|archive, counted on
+  the client,
+- summary cold: GET /dashboard/summary with its cache dropped first (the
+  grouped queries every DASHBOARD_TTL_SECONDS),
+- summary cached: the same request within the TTL.
+
+and checks that the summary's counts equal the list lengths (the lifecycle
+scheduler is off here, so a flight landing in between can make them differ
+by one).
+
+    python benchmarks/dashboard.py --flights 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import seed_let_service  # noqa: E402
+
+ADMIN = {"X-User-Id": "1", "X-User-Role": "ADMIN"}
+TABS = ("upcoming", "in_progress", "pending", "archive")
+
+
+def _time(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {"median_ms": round(statistics.median(samples) * 1000, 2), "max_ms": round(max(samples) * 1000, 2)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-dashboard-let.db")
+    parser.add_argument("--flights", type=int, default=100_000)
+    parser.add_argument("--purchases", type=int, default=50_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["LET_LIFECYCLE_ENABLED"] = "false"
+    os.environ["LET_OUTBOX_ENABLED"] = "false"
+    seed_let_service(args.let_db, airlines=20, flights=args.flights, purchases=args.purchases, ratings=0, users=500)
+
+    from let_service import create_app
+
+    app = create_app(create_schema=True)
+    client = app.test_client()
+
+    lengths = {}
+
+    def tabs() -> None:
+        for tab in TABS:
+            lengths[tab] = len(client.get(f"/flights?tab={tab}").get_json())
+
+    def summary_cold() -> None:
+        app.extensions.pop("dashboard", None)
+        assert client.get("/dashboard/summary", headers=ADMIN).status_code == 200
+
+    def summary_cached() -> None:
+        assert client.get("/dashboard/summary", headers=ADMIN).status_code == 200
+
+    report: dict = {"flights": args.flights}
+    report["tabs"] = _time(tabs, args.repeat)
+    report["summary_cold"] = _time(summary_cold, args.repeat)
+    report["summary_cached"] = _time(summary_cached, args.repeat * 20)
+    # Back to back, so the clock moves as little as possible between the two
+    tabs()
+    app.extensions.pop("dashboard", None)
+    counts = client.get("/dashboard/summary", headers=ADMIN).get_json()["tabs"]
+    report["counts"] = {tab: counts[tab] for tab in TABS}
+    report["list_lengths"] = dict(lengths)
+    report["counts_match"] = all(counts[tab] == lengths[tab] for tab in TABS)
+    report["speedup_cold"] = round(report["tabs"]["median_ms"] / report["summary_cold"]["median_ms"], 1)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""GET /flights latency as flight history grows, with and without archival.
+
+For each --history size: seeds the live set (flights around now), adds that
+many flights that ended long ago, then
+
+- times the hot tabs (upcoming, upcoming on one route, in_progress, pending)
+  and an archive-tab query (one route, one week a year ago) with all of it
+  in `flights`,
+- runs the archival job (`python -m let_service archive`) and reports how
+  fast it moved the history,
+- times the same requests again with the history in `flights_archive`.
+
+    python benchmarks/flight_archive.py --history 100000 1000000 10000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import AIRPORTS, seed_let_service  # noqa: E402
+
+_HISTORY_SQL = (
+    "INSERT INTO flights (id, name, airline_id, distance_km, duration_seconds, departure_time, origin_airport, "
+    "destination_airport, created_by_user_id, price, approval_status, rejection_reason, canceled, created_at, "
+    "updated_at, lifecycle_status) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'FINISHED')"
+)
+
+
+def _add_history(engine, first_id: int, count: int, airlines: int, now: datetime, years: int) -> None:
+    """`count` finished flights departing 90 days to `years` years ago."""
+    rnd = random.Random(first_id)
+    span = years * 365 * 24 * 60 - 90 * 24 * 60
+    with engine.begin() as conn:
+        for start in range(0, count, 100_000):
+            rows = []
+            for i in range(first_id + start, first_id + min(start + 100_000, count)):
+                origin, destination = rnd.sample(AIRPORTS, 2)
+                departure = now - timedelta(days=90, minutes=rnd.randrange(span))
+                approval = "APPROVED" if rnd.random() < 0.95 else "REJECTED"
+                stamp = (departure - timedelta(days=30)).isoformat(sep=" ")
+                rows.append((
+                    i, f"{origin}-{destination} {i}", rnd.randint(1, airlines), float(rnd.randint(150, 3500)),
+                    rnd.randint(45, 12 * 60) * 60, departure.isoformat(sep=" "), origin, destination,
+                    str(rnd.randint(1, 500)), round(rnd.uniform(30, 900), 2), approval,
+                    "bench" if approval == "REJECTED" else None, rnd.random() < 0.03, stamp, stamp,
+                ))
+            conn.exec_driver_sql(_HISTORY_SQL, rows)
+            print(f"history {start + len(rows)}/{count}", file=sys.stderr, flush=True)
+
+
+def _timed(client, url: str, repeat: int) -> dict:
+    samples, rows = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = client.get(url)
+        samples.append(time.perf_counter() - t0)
+        rows = len(res.get_json())
+    return {"ms": round(statistics.median(samples) * 1000, 1), "rows": rows}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-archive-let.db")
+    parser.add_argument("--live-flights", type=int, default=20_000)
+    parser.add_argument("--history", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    report = {"live_flights": args.live_flights, "runs": []}
+    for history in args.history:
+        seed_let_service(args.let_db, airlines=20, flights=args.live_flights, purchases=0, ratings=0, users=500)
+
+        from let_service import create_app
+        from let_service.app import archive
+        from let_service.db import db
+        from let_service.db.models import ArchivedFlight, Flight
+
+        app = create_app(create_schema=False)
+        now = datetime.utcnow()
+        with app.app_context():
+            engine = db.engine
+        t0 = time.perf_counter()
+        _add_history(engine, args.live_flights + 1, history, 20, now, args.years)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        seeded = time.perf_counter() - t0
+
+        year_ago = now - timedelta(days=365)
+        urls = {
+            "upcoming": "/flights?tab=upcoming",
+            "upcoming_route": "/flights?tab=upcoming&origin=BEG&destination=LHR",
+            "in_progress": "/flights?tab=in_progress",
+            "pending": "/flights?tab=pending",
+            "archive_route_week": f"/flights?tab=archive&origin=BEG&destination=LHR"
+                                  f"&departs_after={year_ago:%Y-%m-%dT%H:%M:%S}"
+                                  f"&departs_before={year_ago + timedelta(days=7):%Y-%m-%dT%H:%M:%S}",
+        }
+        client = app.test_client()
+        run = {"history": history, "seed_seconds": round(seeded, 1), "unarchived": {}, "archived": {}}
+        for name, url in urls.items():
+            run["unarchived"][name] = _timed(client, url, args.repeat)
+        print(run, file=sys.stderr, flush=True)
+
+        t0 = time.perf_counter()
+        moved = archive(app)
+        seconds = time.perf_counter() - t0
+        with app.app_context():
+            run["archive_job"] = {
+                "moved": moved, "seconds": round(seconds, 1), "rows_per_second": round(moved / seconds),
+                "live": Flight.query.count(), "archived": ArchivedFlight.query.count(),
+            }
+            db.session.remove()
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+
+        for name, url in urls.items():
+            run["archived"][name] = _timed(client, url, args.repeat)
+        report["runs"].append(run)
+        print(run, file=sys.stderr, flush=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
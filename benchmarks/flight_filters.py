@@ -0,0 +1,191 @@
+"""GET /flights range filters: query plans and latency.
+
+Seeds let_service, then for a set of filtered listings
+
+- captures the SQL the route actually runs and checks with EXPLAIN that
+  flights is read through one of the expected indexes, never scanned,
+- checks that it returns the rows the client-side filter would, and that
+  the catalog snapshot path returns the same body,
+- times the filtered request against the old way of getting the same rows:
+  fetching the whole tab and filtering on the client.
+
+Exit status 1 if any check fails. `--check` runs only the checks, on a
+small database; it is the verification step for the filter indexes:
+
+    python benchmarks/flight_filters.py --check
+    python benchmarks/flight_filters.py --flights 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import seed_let_service  # noqa: E402
+
+
+# The upcoming tab also bounds departure_time from below, so SQLite may
+# prefer the partial index on unfinished flights to ix_flights_departure_price
+UPCOMING_RANGE = ("ix_flights_departure_price", "ix_flights_unfinished_departure")
+
+
+def _queries(now: datetime) -> list[tuple[str, tuple[str, ...], dict]]:
+    """(url, indexes the flights read may use, client-side equivalent filter)."""
+    week = now + timedelta(days=7)
+    return [
+        ("/flights?tab=upcoming&origin=BEG&destination=LHR",
+         ("ix_flights_route_departure",), {"origin": "BEG", "destination": "LHR"}),
+        ("/flights?tab=all&origin=BEG&destination=LHR&sort=price",
+         ("ix_flights_route_departure",), {"origin": "BEG", "destination": "LHR"}),
+        (f"/flights?tab=upcoming&departs_before={week:%Y-%m-%dT%H:%M:%S}&max_price=150",
+         UPCOMING_RANGE, {"before": week, "max_price": 150.0}),
+        (f"/flights?tab=all&departs_after={now:%Y-%m-%dT%H:%M:%S}&departs_before={week:%Y-%m-%dT%H:%M:%S}"
+         "&min_price=100&max_price=300&sort=duration&order=desc",
+         ("ix_flights_departure_price",), {"after": now, "before": week, "min_price": 100.0, "max_price": 300.0}),
+        ("/flights?tab=upcoming&min_price=800&sort=price&order=desc",
+         UPCOMING_RANGE, {"min_price": 800.0}),
+    ]
+
+
+def _client_side(rows: list[dict], f: dict) -> list[dict]:
+    out = []
+    for row in rows:
+        departure = datetime.fromisoformat(row["departure_time"])
+        if "origin" in f and row["origin_airport"] != f["origin"]:
+            continue
+        if "destination" in f and row["destination_airport"] != f["destination"]:
+            continue
+        if "after" in f and departure < f["after"]:
+            continue
+        if "before" in f and departure >= f["before"]:
+            continue
+        if "min_price" in f and row["price"] < f["min_price"]:
+            continue
+        if "max_price" in f and row["price"] > f["max_price"]:
+            continue
+        out.append(row)
+    return out
+
+
+def _body(client, url: str) -> list[dict]:
+    rows = client.get(url).get_json()
+    for row in rows:
+        row.pop("remaining_seconds", None)
+    return rows
+
+
+def _timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return round(statistics.median(samples) * 1000, 2)
+
+
+def explain(conn, statement: str, parameters) -> list[str]:
+    """
+    Plan lines for `statement`: SQLite EXPLAIN QUERY PLAN as is, MySQL EXPLAIN
+    rows in the same shape ("SEARCH <table> USING INDEX <key> ..." or
+    "SCAN <table>").
+    """
+    cursor = conn.connection.cursor()
+    try:
+        if conn.dialect.name == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute("EXPLAIN " + statement, parameters)
+        names = [col[0] for col in cursor.description]
+        lines = []
+        for row in cursor.fetchall():
+            row = dict(zip(names, row))
+            if row["key"]:
+                lines.append(f"SEARCH {row['table']} USING INDEX {row['key']} ({row['type']})")
+            else:
+                lines.append(f"SCAN {row['table']}")
+        return lines
+    finally:
+        cursor.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-filters-let.db")
+    parser.add_argument("--flights", type=int, default=None, help="default 100000, 5000 with --check")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="only check plans and results, no timings")
+    args = parser.parse_args()
+    if args.flights is None:
+        args.flights = 5000 if args.check else 100_000
+
+    seed_let_service(args.let_db, airlines=20, flights=args.flights, purchases=0, ratings=0, users=500)
+
+    from sqlalchemy import event
+
+    from let_service import create_app
+    from let_service.db import db
+    from let_service.db.catalog import init_catalog
+
+    sql_app = create_app(create_schema=False)
+    mem_app = create_app(create_schema=False)
+    mem_app.config["CATALOG_SNAPSHOT_ENABLED"] = True
+    init_catalog(mem_app)
+    sql_client, mem_client = sql_app.test_client(), mem_app.test_client()
+
+    captured: list[tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # The listing itself; the lifecycle sweep's batched reads (LIMIT) are not checked
+        if "FROM flights" in statement and "ORDER BY" in statement and "LIMIT" not in statement:
+            captured.append((statement, parameters))
+
+    rows = []
+    failed = 0
+    with sql_app.app_context():
+        engine = db.engine
+    for url, indexes, client_filter in _queries(datetime.utcnow()):
+        captured.clear()
+        event.listen(engine, "before_cursor_execute", capture)
+        try:
+            body = _body(sql_client, url)
+        finally:
+            event.remove(engine, "before_cursor_execute", capture)
+        with engine.connect() as conn:
+            plan = [line for statement, parameters in captured for line in explain(conn, statement, parameters)]
+        flights_reads = [line for line in plan if line.split(" ")[1:2] == ["flights"]]
+        uses_index = bool(flights_reads) and all(
+            any(f"USING INDEX {index} " in line for index in indexes) for line in flights_reads)
+
+        tab = url.split("tab=")[1].split("&")[0]
+        client_url = f"/flights?tab={tab}"
+        fetched = _body(sql_client, client_url)
+        row = {
+            "query": url,
+            "rows": len(body),
+            "indexes": indexes,
+            "uses_index": uses_index,
+            "plan": plan,
+            "same_rows_as_client_filter": sorted(r["id"] for r in body)
+                                          == sorted(r["id"] for r in _client_side(fetched, client_filter)),
+            "snapshot_match": body == _body(mem_client, url),
+        }
+        failed += not (row["uses_index"] and row["same_rows_as_client_filter"] and row["snapshot_match"])
+        if not args.check:
+            row["filtered_ms"] = _timed(lambda: sql_client.get(url), args.repeat)
+            row["fetch_all_then_filter_ms"] = _timed(
+                lambda: _client_side(sql_client.get(client_url).get_json(), client_filter), args.repeat)
+            row["snapshot_ms"] = _timed(lambda: mem_client.get(url), args.repeat)
+        rows.append(row)
+        print(row, file=sys.stderr, flush=True)
+
+    print(json.dumps({"flights": args.flights, "failed": failed, "queries": rows}, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
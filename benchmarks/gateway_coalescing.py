@@ -0,0 +1,99 @@
+"""Upstream QPS during a hot-key spike, with and without request coalescing.
+
+Many clients load the same flight page at once: every client connection
+loops on one gateway route (default /flights/get/1) against the stub
+let_service. Each gateway (sync and async) is run with coalescing off, on,
+and on with a short micro-cache; the stub's request counter gives the
+upstream QPS the gateway actually produced.
+
+    python benchmarks/gateway_coalescing.py --concurrency 200 --delay-ms 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import requests
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from gateway_concurrency import ROOT, _wait, drive, gateway_command  # noqa: E402
+
+VARIANTS = {
+    "off": {"COALESCE_ENABLED": "false"},
+    "single-flight": {"COALESCE_ENABLED": "true", "COALESCE_CACHE_MS": "0"},
+    "micro-cache": {"COALESCE_ENABLED": "true", "COALESCE_CACHE_MS": "100"},
+}
+
+
+def run_variant(mode: str, variant: str, args) -> dict:
+    stub = subprocess.Popen([sys.executable, str(HERE / "stub_let_service.py"), "--port", str(args.stub_port),
+                             "--delay-ms", str(args.delay_ms), "--listing-mb", "0.01"], stdout=subprocess.DEVNULL)
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    env = dict(os.environ)
+    env.update({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:////tmp/bench-coalescing-server.db",
+        "SECRET_KEY": "bench",
+        "LET_SERVICE_URL": stub_url,
+        "REDIS_DB": "localhost",
+        **VARIANTS[variant],
+    })
+    cmd, label = gateway_command(mode, args.gateway_port, args.workers, args.threads)
+    gateway = None
+    try:
+        _wait(f"{stub_url}/airlines")
+        gateway = subprocess.Popen(cmd, cwd=ROOT / "server", env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _wait(f"http://127.0.0.1:{args.gateway_port}/ping-reachable")
+
+        before = requests.get(f"{stub_url}/__stats").json()["requests"]
+        row = asyncio.run(drive("127.0.0.1", args.gateway_port, args.path, args.concurrency, args.seconds,
+                                args.timeout))
+        upstream = requests.get(f"{stub_url}/__stats").json()["requests"] - before
+
+        row.update({
+            "mode": mode,
+            "server": label,
+            "coalescing": variant,
+            "upstream_requests": upstream,
+            "upstream_qps": round(upstream / args.seconds, 1),
+            "client_requests_per_upstream": round(row["ok"] / upstream, 1) if upstream else None,
+        })
+        print(row, file=sys.stderr, flush=True)
+        return row
+    finally:
+        if gateway is not None:
+            gateway.terminate()
+            gateway.wait(timeout=15)
+        stub.terminate()
+        stub.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--delay-ms", type=float, default=50.0, help="stub latency per request")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--path", default="/flights/get/1")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument("--stub-port", type=int, default=18831)
+    parser.add_argument("--gateway-port", type=int, default=18830)
+    args = parser.parse_args()
+
+    results = [run_variant(mode, variant, args) for mode in args.modes for variant in args.variants]
+    print(json.dumps({"path": args.path, "concurrency": args.concurrency, "delay_ms": args.delay_ms,
+                      "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
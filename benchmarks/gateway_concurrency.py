@@ -0,0 +1,184 @@
+"""Concurrent-connection capacity of the sync (Flask) vs async (ASGI) gateway.
+
+Starts the stub let_service with a fixed --delay-ms per request, then runs
+the gateway twice: the Flask app under gunicorn gthread (or werkzeug's
+threaded server when gunicorn is not installed) and `uvicorn asgi:app`. For
+each level of concurrent client connections it hammers a proxy route for
+--seconds and reports throughput, p50/p99 latency, errors and how many
+requests the stub saw in flight at once (the real upstream concurrency).
+
+    python benchmarks/gateway_concurrency.py --delay-ms 100 --levels 50 200 500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from loadtest import percentile  # noqa: E402
+
+WERKZEUG_RUNNER = "import app; app.app.run(host='127.0.0.1', port={port}, threaded=True, debug=False)"
+
+
+def _wait(url: str, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def gateway_command(mode: str, port: int, workers: int, threads: int) -> tuple[list[str], str]:
+    if mode == "async":
+        return [sys.executable, "-m", "uvicorn", "asgi:app", "--host", "127.0.0.1", "--port", str(port),
+                "--workers", str(workers), "--no-access-log", "--log-level", "warning",
+                "--backlog", "4096"], f"uvicorn x{workers}"
+    if importlib.util.find_spec("gunicorn") is not None:
+        return [sys.executable, "-m", "gunicorn", "app:app", "-b", f"127.0.0.1:{port}", "-k", "gthread",
+                "-w", str(workers), "--threads", str(threads), "--backlog", "4096",
+                "--log-level", "warning"], f"gunicorn gthread {workers}x{threads}"
+    return [sys.executable, "-c", WERKZEUG_RUNNER.format(port=port)], "werkzeug threaded"
+
+
+async def _read_response(reader: asyncio.StreamReader) -> tuple[int, bool, dict[str, str]]:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split()[1])
+    headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+    if "content-length" in headers:
+        await reader.readexactly(int(headers["content-length"]))
+    elif headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers.get("connection", "").lower() != "close", headers
+
+
+async def drive(host: str, port: int, path: str, concurrency: int, seconds: float, timeout: float) -> dict:
+    """One keep-alive connection per simulated client.
+
+    Plain asyncio streams instead of an HTTP client library: at a few hundred
+    connections on one core the client library, not the gateway, became the
+    bottleneck.
+    """
+    latencies: list[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\nAccept-Encoding: identity\r\n\r\n".encode()
+
+    async def worker():
+        nonlocal errors
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+                writer.write(request)
+                status, keep_alive, _ = await asyncio.wait_for(_read_response(reader), timeout)
+                ok = status == 200
+                if not keep_alive:
+                    writer.close()
+                    reader = writer = None
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                ok = False
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+            if ok:
+                latencies.append(time.perf_counter() - t0)
+            else:
+                errors += 1
+        if writer is not None:
+            writer.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "ok": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+
+def run_mode(mode: str, args, stub_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:////tmp/bench-concurrency-server.db",
+        "SECRET_KEY": "bench",
+        "LET_SERVICE_URL": stub_url,
+        "REDIS_DB": "localhost",
+    })
+    cmd, label = gateway_command(mode, args.gateway_port, args.workers, args.threads)
+    proc = subprocess.Popen(cmd, cwd=ROOT / "server", env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base = f"http://127.0.0.1:{args.gateway_port}"
+        _wait(f"{base}/ping-reachable")
+        levels = []
+        for concurrency in args.levels:
+            row = asyncio.run(drive("127.0.0.1", args.gateway_port, args.path, concurrency, args.seconds, args.timeout))
+            row["stub_max_in_flight"] = requests.get(f"{stub_url}/__stats").json()["max_in_flight"]
+            levels.append(row)
+            print(mode, row, file=sys.stderr, flush=True)
+        return {"mode": mode, "server": label, "levels": levels}
+    finally:
+        proc.terminate()
+        proc.wait(timeout=15)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay-ms", type=float, default=100.0, help="stub latency per request")
+    parser.add_argument("--levels", type=int, nargs="+", default=[50, 200, 500])
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each level")
+    parser.add_argument("--timeout", type=float, default=10.0, help="client timeout; slower counts as error")
+    parser.add_argument("--path", default="/flights/get/1")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=16, help="gthread threads per sync worker")
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    parser.add_argument("--stub-port", type=int, default=18821)
+    parser.add_argument("--gateway-port", type=int, default=18820)
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        # Fresh stub per mode so max_in_flight is not carried over
+        stub = subprocess.Popen([sys.executable, str(HERE / "stub_let_service.py"), "--port", str(args.stub_port),
+                                 "--delay-ms", str(args.delay_ms), "--listing-mb", "0.01"],
+                                stdout=subprocess.DEVNULL)
+        try:
+            stub_url = f"http://127.0.0.1:{args.stub_port}"
+            _wait(f"{stub_url}/airlines")
+            results.append(run_mode(mode, args, stub_url))
+        finally:
+            stub.terminate()
+            stub.wait(timeout=10)
+
+    print(json.dumps({"delay_ms": args.delay_ms, "path": args.path, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Gateway behaviour while one let_service route fails or hangs.
+
+Half of the client connections loop on /flights/get/1, the other half on
+/airlines/get. The stub let_service is then driven through four phases,
+faulting only /flights paths:
+
+    healthy -> outage (every /flights call 503s) -> hang (every /flights call
+    stalls) -> recovered
+
+and each phase reports, per route, successful rps, gateway refusals (503
+with Retry-After: breaker open or shed), other failures (upstream 5xx
+relayed, 502/504, client timeouts), latency and the /flights breaker
+state. Run once with the breakers on and once off to see whether a sick
+route takes the healthy one down with it.
+
+    python benchmarks/gateway_faults.py --phase-seconds 8 --concurrency 100
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import requests
+
+HERE = Path(__file__).resolve().parent
+sys.path.insert(0, str(HERE))
+
+from gateway_concurrency import ROOT, _read_response, _wait, gateway_command  # noqa: E402
+from loadtest import percentile  # noqa: E402
+
+PATHS = ["/flights/get/1", "/airlines/get"]
+PHASES = [
+    ("healthy", "error_rate=0&hang_rate=0&prefix=/flights"),
+    ("outage", "error_rate=1&hang_rate=0&prefix=/flights"),
+    ("hang", "error_rate=0&hang_rate=1&hang_seconds=30&prefix=/flights"),
+    ("recovered", "error_rate=0&hang_rate=0&prefix=/flights"),
+]
+_STATE = re.compile(r'gateway_breaker_state\{route="GET /flights/<id>"\} (\S+)')
+
+
+async def run_load(port: int, concurrency: int, phases: list[tuple[str, str]], phase_seconds: float,
+                   timeout: float, stub_url: str, gateway_url: str) -> dict:
+    current = {"phase": phases[0][0]}
+    outcomes: dict[tuple[str, str], dict] = defaultdict(lambda: {"ok": 0, "refused": 0, "failed": 0, "lat": []})
+    deadline = time.perf_counter() + phase_seconds * len(phases)
+    loop = asyncio.get_running_loop()
+
+    async def worker(path: str):
+        request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1:{port}\r\n\r\n".encode()
+        reader = writer = None
+        while time.perf_counter() < deadline:
+            phase = current["phase"]
+            t0 = time.perf_counter()
+            status = None
+            headers = {}
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+                writer.write(request)
+                status, keep_alive, headers = await asyncio.wait_for(_read_response(reader), timeout)
+                if not keep_alive:
+                    writer.close()
+                    reader = writer = None
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+            row = outcomes[(phase, path)]
+            if status == 200:
+                row["ok"] += 1
+                row["lat"].append(time.perf_counter() - t0)
+            elif status == 503 and "retry-after" in headers:
+                row["refused"] += 1
+                await asyncio.sleep(0.05)
+            else:
+                row["failed"] += 1
+                row.setdefault("statuses", defaultdict(int))[status] += 1
+                if status is None or status >= 500:
+                    # don't spin on a broken route
+                    await asyncio.sleep(0.05)
+
+    async def conductor():
+        states = {}
+        for name, query in phases:
+            current["phase"] = name
+            await loop.run_in_executor(None, lambda q=query: requests.post(f"{stub_url}/__faults?{q}"))
+            await asyncio.sleep(phase_seconds)
+            metrics = await loop.run_in_executor(None, lambda: requests.get(f"{gateway_url}/metrics").text)
+            match = _STATE.search(metrics)
+            states[name] = {0: "closed", 1: "half_open", 2: "open"}.get(int(float(match.group(1))), "?") \
+                if match else "n/a"
+        return states
+
+    workers = [worker(PATHS[i % len(PATHS)]) for i in range(concurrency)]
+    states, *_ = await asyncio.gather(conductor(), *workers)
+
+    report = []
+    for name, _ in phases:
+        for path in PATHS:
+            row = outcomes[(name, path)]
+            lat = sorted(row.pop("lat"))
+            report.append({
+                "phase": name,
+                "path": path,
+                "ok_rps": round(row["ok"] / phase_seconds, 1),
+                "refused_503": row["refused"],
+                "failed": row["failed"],
+                "p50_ms": round(percentile(lat, 0.5) * 1000, 1),
+                "p99_ms": round(percentile(lat, 0.99) * 1000, 1),
+                "flights_breaker": states.get(name),
+                "fail_statuses": dict(row.get("statuses", {})),
+            })
+    return {"rows": report}
+
+
+def run(mode: str, breaker: bool, args) -> dict:
+    stub = subprocess.Popen([sys.executable, str(HERE / "stub_let_service.py"), "--port", str(args.stub_port),
+                             "--delay-ms", str(args.delay_ms), "--listing-mb", "0.01"], stdout=subprocess.DEVNULL)
+    stub_url = f"http://127.0.0.1:{args.stub_port}"
+    gateway_url = f"http://127.0.0.1:{args.gateway_port}"
+    env = dict(os.environ)
+    env.update({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:////tmp/bench-faults-server.db",
+        "SECRET_KEY": "bench",
+        "LET_SERVICE_URL": stub_url,
+        "REDIS_DB": "localhost",
+        "METRICS_ENABLED": "true",
+        # every request should reach the breaker, not a shared call
+        "COALESCE_ENABLED": "false",
+        "BREAKER_ENABLED": "true" if breaker else "false",
+        "UPSTREAM_TIMEOUT_SECONDS": str(args.upstream_timeout),
+        "BREAKER_SLOW_CALL_MS": str(args.slow_call_ms),
+        "BREAKER_OPEN_SECONDS": str(args.open_seconds),
+        "UPSTREAM_MAX_IN_FLIGHT": str(args.max_in_flight),
+    })
+    # one worker so /metrics shows the breaker that handled the traffic
+    cmd, label = gateway_command(mode, args.gateway_port, 1, args.threads)
+    gateway = None
+    try:
+        _wait(f"{stub_url}/airlines")
+        # own process group: gunicorn workers must die with the master, not keep the port
+        gateway = subprocess.Popen(cmd, cwd=ROOT / "server", env=env, start_new_session=True,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        _wait(f"{gateway_url}/ping-reachable")
+        result = asyncio.run(run_load(args.gateway_port, args.concurrency, PHASES, args.phase_seconds,
+                                      args.timeout, stub_url, gateway_url))
+        for row in result["rows"]:
+            print(mode, "breaker" if breaker else "no-breaker", row, file=sys.stderr, flush=True)
+        return {"mode": mode, "server": label, "breaker": breaker, **result}
+    finally:
+        if gateway is not None:
+            # threads stuck on the hanging route would hold up a graceful stop
+            os.killpg(gateway.pid, signal.SIGKILL)
+            gateway.wait(timeout=15)
+        stub.kill()
+        stub.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--phase-seconds", type=float, default=8.0)
+    parser.add_argument("--delay-ms", type=float, default=20.0, help="baseline stub latency on /flights")
+    parser.add_argument("--timeout", type=float, default=5.0, help="client timeout")
+    parser.add_argument("--upstream-timeout", type=float, default=2.0, help="UPSTREAM_TIMEOUT_SECONDS")
+    parser.add_argument("--slow-call-ms", type=float, default=500.0, help="BREAKER_SLOW_CALL_MS")
+    parser.add_argument("--max-in-flight", type=int, default=16, help="UPSTREAM_MAX_IN_FLIGHT (per route)")
+    parser.add_argument("--open-seconds", type=float, default=2.0, help="BREAKER_OPEN_SECONDS")
+    parser.add_argument("--threads", type=int, default=32, help="gthread threads for the sync gateway")
+    parser.add_argument("--modes", nargs="+", default=["sync"], choices=["sync", "async"])
+    parser.add_argument("--stub-port", type=int, default=18841)
+    parser.add_argument("--gateway-port", type=int, default=18840)
+    args = parser.parse_args()
+
+    results = [run(mode, breaker, args) for mode in args.modes for breaker in (False, True)]
+    print(json.dumps({"phases": [name for name, _ in PHASES], "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Gateway memory and latency on a large listing: buffered vs streamed relay.
+
+Starts the stub let_service with a --listing-mb JSON array, then runs the
+gateway once with STREAM_PASSTHROUGH=false (res.json() -> jsonify) and once
+with it on, fetching /flights/get-all-that a few times per mode. Reports time
+to first byte, total time and the gateway's peak RSS (VmHWM, Linux only).
+
+    python benchmarks/gateway_stream.py --listing-mb 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+ROOT = Path(__file__).resolve().parent.parent
+HERE = Path(__file__).resolve().parent
+GATEWAY_RUNNER = "import app; app.app.run(host='127.0.0.1', port={port}, threaded=True, debug=False)"
+
+
+def _wait(url: str, timeout: float = 120.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def peak_rss_mb(pid: int) -> float | None:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+def run_mode(stream: bool, accept: str, stub_url: str, port: int, runs: int) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "SQLALCHEMY_DATABASE_URI": "sqlite:////tmp/bench-stream-server.db",
+        "SECRET_KEY": "bench",
+        "LET_SERVICE_URL": stub_url,
+        "REDIS_DB": "localhost",
+        "STREAM_PASSTHROUGH": "true" if stream else "false",
+    })
+    proc = subprocess.Popen([sys.executable, "-c", GATEWAY_RUNNER.format(port=port)], cwd=ROOT / "server",
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}"
+        _wait(f"{url}/ping-reachable")
+        base_rss = peak_rss_mb(proc.pid)
+        ttfb, total, sizes = [], [], []
+        for _ in range(runs):
+            t0 = time.perf_counter()
+            with requests.get(f"{url}/flights/get-all-that", headers={"Accept-Encoding": accept}, stream=True) as res:
+                first = True
+                size = 0
+                for chunk in res.raw.stream(64 * 1024, decode_content=False):
+                    if first:
+                        ttfb.append(time.perf_counter() - t0)
+                        first = False
+                    size += len(chunk)
+            total.append(time.perf_counter() - t0)
+            sizes.append(size)
+        return {
+            "stream_passthrough": stream,
+            "accept_encoding": accept,
+            "wire_bytes": sizes[-1],
+            "ttfb_ms_median": round(statistics.median(ttfb) * 1000, 1),
+            "total_ms_median": round(statistics.median(total) * 1000, 1),
+            "gateway_rss_idle_mb": round(base_rss or 0, 1),
+            "gateway_rss_peak_mb": round(peak_rss_mb(proc.pid) or 0, 1),
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--listing-mb", type=float, default=50.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--stub-port", type=int, default=18811)
+    parser.add_argument("--gateway-port", type=int, default=18810)
+    args = parser.parse_args()
+
+    stub = subprocess.Popen([sys.executable, str(HERE / "stub_let_service.py"), "--port", str(args.stub_port),
+                             "--listing-mb", str(args.listing_mb), "--gzip"], stdout=subprocess.DEVNULL)
+    try:
+        stub_url = f"http://127.0.0.1:{args.stub_port}"
+        _wait(f"{stub_url}/airlines")
+        results = []
+        for stream in (False, True):
+            for accept in ("identity", "gzip"):
+                results.append(run_mode(stream, accept, stub_url, args.gateway_port, args.runs))
+    finally:
+        stub.terminate()
+        stub.wait(timeout=10)
+
+    print(json.dumps({"listing_mb": args.listing_mb, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
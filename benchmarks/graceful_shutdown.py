@@ -0,0 +1,129 @@
+"""Purchases lost on SIGTERM: dev server vs `python -m let_service serve`.
+
+For each mode: start let_service, submit --purchases purchases (each takes
+LET_PURCHASE_PROCESSING_SECONDS to decide), send SIGTERM while they are in
+flight and record
+
+- how long the process took to exit,
+- what GET /ready and POST /purchases answered meanwhile,
+- how many of the purchases were still PENDING afterwards,
+- how many of those the next `serve` start decided (resume_pending_purchases).
+
+    python benchmarks/graceful_shutdown.py --purchases 50
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from loadtest import LET_RUNNER, ROOT, _wait_ready  # noqa: E402
+from seed import seed_let_service  # noqa: E402
+
+
+def _spawn(mode: str, env: dict, port: int) -> subprocess.Popen:
+    if mode == "dev":
+        cmd = [sys.executable, "-c", LET_RUNNER.format(port=port)]
+    else:
+        cmd = [sys.executable, "-m", "let_service", "serve"]
+    return subprocess.Popen(cmd, cwd=ROOT / "let_service", env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _pending(app, ids: list[int]) -> int:
+    from let_service.db import db
+    from let_service.db.models import Purchase
+
+    with app.app_context():
+        count = Purchase.query.filter(Purchase.id.in_(ids), Purchase.status == "PENDING").count()
+        db.session.remove()
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-shutdown-let.db")
+    parser.add_argument("--purchases", type=int, default=50)
+    parser.add_argument("--processing-seconds", type=int, default=5)
+    parser.add_argument("--drain-delay", type=float, default=1.0)
+    parser.add_argument("--let-port", type=int, default=8812)
+    args = parser.parse_args()
+
+    seed_let_service(args.let_db, airlines=5, flights=500, purchases=0, ratings=0, users=100)
+    env = dict(os.environ, LET_SQLALCHEMY_DATABASE_URI=args.let_db, LET_AUTO_CREATE_SCHEMA="false",
+               LET_PURCHASE_PROCESSING_SECONDS=str(args.processing_seconds),
+               LET_BIND=f"127.0.0.1:{args.let_port}", LET_WORKERS="2", LET_THREADS="8",
+               LET_DRAIN_DELAY_SECONDS=str(args.drain_delay))
+
+    from let_service import create_app
+    from let_service.db.models import Flight
+
+    app = create_app(create_schema=False)
+    with app.app_context():
+        flights = [f.id for f in Flight.query.filter(
+            Flight.approval_status == "APPROVED", Flight.canceled.is_(False),
+            Flight.departure_time > datetime.utcnow()).limit(args.purchases)]
+
+    let = f"http://127.0.0.1:{args.let_port}"
+    report = {"purchases": args.purchases, "processing_seconds": args.processing_seconds, "runs": []}
+    for mode in ("dev", "serve"):
+        proc = _spawn(mode, env, args.let_port)
+        _wait_ready(f"{let}/ping")
+
+        def buy(i: int) -> int:
+            res = requests.post(f"{let}/purchases", json={"flight_id": flights[i % len(flights)]},
+                                headers={"X-User-Id": str(i % 100 + 1)})
+            return res.json()["purchase_id"]
+
+        submitted = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            ids = list(pool.map(buy, range(args.purchases)))
+
+        t0 = time.perf_counter()
+        proc.send_signal(signal.SIGTERM)
+        seen = {"ready": set(), "purchase": set()}
+        while proc.poll() is None:
+            try:
+                seen["ready"].add(requests.get(f"{let}/ready", timeout=1).status_code)
+                seen["purchase"].add(requests.post(f"{let}/purchases", json={"flight_id": flights[0]},
+                                                   headers={"X-User-Id": "1"}, timeout=1).status_code)
+            except requests.RequestException:
+                seen["ready"].add("refused")
+            time.sleep(0.1)
+        exit_seconds = round(time.perf_counter() - t0, 2)
+        pending = _pending(app, ids)
+
+        # What the next production start does with them; it only takes
+        # purchases older than the processing delay
+        time.sleep(max(args.processing_seconds + 1 - (time.perf_counter() - submitted), 0))
+        restart = _spawn("serve", env, args.let_port)
+        _wait_ready(f"{let}/ping")
+        pending_after_restart = _pending(app, ids)
+        restart.send_signal(signal.SIGTERM)
+        restart.wait()
+
+        run = {
+            "mode": mode,
+            "exit_seconds": exit_seconds,
+            "during_shutdown": {k: sorted(map(str, v)) for k, v in seen.items()},
+            "pending_after_sigterm": pending,
+            "pending_after_restart": pending_after_restart,
+        }
+        report["runs"].append(run)
+        print(run, file=sys.stderr, flush=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Multi-leg itinerary search on a synthetic flight network.
+
+Seeds let_service (default 100k flights over 30 airports and +-60 days),
+then for random (from, to, day) queries with 1..--max-legs legs measures
+
+- cold index build per day (query + grouping) and its size,
+- search latency with the k-best bound vs exhaustive path enumeration over
+  the same index, and whether both agree on the earliest arrival,
+- end-to-end GET /itineraries latency (warm index) through the Flask app.
+
+    python benchmarks/itineraries.py --flights 100000 --queries 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from loadtest import percentile  # noqa: E402
+from seed import AIRPORTS, seed_let_service  # noqa: E402
+
+
+def exhaustive(index, origin: str, destination: str, start_us: int, end_us: int, max_legs: int,
+               min_layover_us: int, max_layover_us: int, max_trip_us: int) -> list[tuple]:
+    """Every valid itinerary (depth-first), as the baseline."""
+    found = []
+
+    def walk(legs):
+        last = legs[-1]
+        if last.destination == destination:
+            found.append(tuple(legs))
+            return
+        if len(legs) == max_legs:
+            return
+        visited = {origin, *(leg.destination for leg in legs)}
+        for leg in index.leaving(last.destination, last.arrival_us + min_layover_us,
+                                 last.arrival_us + max_layover_us + 1):
+            if leg.destination in visited or leg.arrival_us - legs[0].departure_us > max_trip_us:
+                continue
+            walk(legs + [leg])
+
+    for leg in index.leaving(origin, start_us, end_us):
+        walk([leg])
+    found.sort(key=lambda legs: (legs[-1].arrival_us, len(legs), sum(leg.price for leg in legs)))
+    return found
+
+
+def _ms(samples: list[float]) -> dict:
+    samples = sorted(samples)
+    return {"p50_ms": round(percentile(samples, 0.5) * 1000, 3), "p99_ms": round(percentile(samples, 0.99) * 1000, 3)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-itineraries-let.db")
+    parser.add_argument("--flights", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--max-legs", type=int, default=3)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    if not args.skip_seed:
+        seed_let_service(args.let_db, airlines=20, flights=args.flights, purchases=0, ratings=0, users=500)
+    else:
+        import os
+        os.environ["LET_SQLALCHEMY_DATABASE_URI"] = args.let_db
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "let_service"))
+
+    from let_service import create_app
+    from let_service.db.network import airport_key, epoch_us, load_index, search
+
+    app = create_app(create_schema=False)
+    client = app.test_client()
+    cfg = app.config
+    min_layover = cfg["ITINERARY_MIN_LAYOVER_MINUTES"] * 60 * 1_000_000
+    max_layover = cfg["ITINERARY_MAX_LAYOVER_MINUTES"] * 60 * 1_000_000
+    max_trip = timedelta(hours=cfg["ITINERARY_MAX_TRIP_HOURS"])
+
+    rnd = random.Random(11)
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    days = [today + timedelta(days=d) for d in range(1, 41)]
+
+    indexes = {}
+    builds = []
+    with app.app_context():
+        for day in days:
+            t0 = time.perf_counter()
+            indexes[day] = load_index(day, max_trip)
+            builds.append(time.perf_counter() - t0)
+    index_report = {"days": len(days), "legs_per_index": round(sum(i.size for i in indexes.values()) / len(days)),
+                    **_ms(builds)}
+    print("index", index_report, file=sys.stderr, flush=True)
+
+    report = {"flights": args.flights, "airports": len(AIRPORTS), "index": index_report, "search": []}
+    for legs in range(1, args.max_legs + 1):
+        bounded, full, http = [], [], []
+        expanded = pushed = paths = agree = with_results = 0
+        for _ in range(args.queries):
+            day = rnd.choice(days)
+            origin, destination = rnd.sample(AIRPORTS, 2)
+            start, end = epoch_us(day), epoch_us(day + timedelta(days=1))
+            index = indexes[day]
+            query = (index, airport_key(origin), airport_key(destination), start, end, legs,
+                     min_layover, max_layover, int(max_trip.total_seconds()) * 1_000_000)
+
+            t0 = time.perf_counter()
+            found, stats = search(*query, args.limit)
+            bounded.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            every = exhaustive(*query)
+            full.append(time.perf_counter() - t0)
+
+            expanded += stats.expanded
+            pushed += stats.pushed
+            paths += len(every)
+            with_results += bool(found)
+            agree += (not found and not every) or (bool(found) and bool(every)
+                                                   and found[0].arrival_us == every[0][-1].arrival_us)
+
+            url = f"/itineraries?from={origin}&to={destination}&date={day:%Y-%m-%d}&max_legs={legs}&limit={args.limit}"
+            client.get(url)  # warm the per-process index for this day
+            t0 = time.perf_counter()
+            client.get(url)
+            http.append(time.perf_counter() - t0)
+
+        row = {
+            "max_legs": legs,
+            "queries": args.queries,
+            "with_results": with_results,
+            "earliest_arrival_agrees": agree,
+            "k_best": {**_ms(bounded), "avg_expanded": round(expanded / args.queries, 1),
+                       "avg_labels": round(pushed / args.queries, 1)},
+            "exhaustive": {**_ms(full), "avg_paths": round(paths / args.queries, 1)},
+            "http_warm": _ms(http),
+        }
+        report["search"].append(row)
+        print(row, file=sys.stderr, flush=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
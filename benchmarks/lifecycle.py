@@ -0,0 +1,166 @@
+"""Stored flight lifecycle status: listing latency and transition lag.
+
+Listings: for each --history size, seeds the live set (flights around now)
+plus that many flights that ended long ago, all still in `flights` (no
+archival), and times the upcoming and in_progress tabs
+
+- date: every row UPCOMING, i.e. what the tabs did before the column (the
+  in_progress candidates are every flight that has departed),
+- status: after `python -m let_service lifecycle` stored the real statuses.
+
+Scheduler: --timed flights depart over the next --spread seconds (one PENDING
+purchase each) and land a few seconds later. With the scheduler thread
+running, the database is polled every 10 ms; reported per transition is the
+lag from the boundary to the stored status (p50 / p95 / max), plus how many
+purchases were failed and events written.
+
+    python benchmarks/lifecycle.py --history 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from flight_archive import _add_history, _timed  # noqa: E402
+from seed import AIRPORTS, seed_let_service  # noqa: E402
+
+URLS = {
+    "upcoming": "/flights?tab=upcoming",
+    "upcoming_route": "/flights?tab=upcoming&origin=BEG&destination=LHR",
+    "in_progress": "/flights?tab=in_progress",
+}
+
+
+def listings(args) -> list[dict]:
+    runs = []
+    for history in args.history:
+        seed_let_service(args.let_db, airlines=20, flights=args.live_flights, purchases=0, ratings=0, users=500)
+
+        from let_service import create_app
+        from let_service.app import lifecycle
+        from let_service.db import db
+
+        app = create_app(create_schema=False)
+        with app.app_context():
+            engine = db.engine
+        _add_history(engine, args.live_flights + 1, history, 20, datetime.utcnow(), args.years)
+        with engine.begin() as conn:
+            conn.exec_driver_sql("UPDATE flights SET lifecycle_status = 'UPCOMING'")
+            conn.exec_driver_sql("ANALYZE")
+
+        client = app.test_client()
+        run = {"history": history, "date": {}, "status": {}}
+        for name, url in URLS.items():
+            run["date"][name] = _timed(client, url, args.repeat)
+
+        t0 = time.perf_counter()
+        departed, landed = lifecycle(app)
+        run["sweep"] = {"departed": departed, "landed": landed, "seconds": round(time.perf_counter() - t0, 1)}
+        # Statistics from when nothing was FINISHED would keep the planner off
+        # the partial index; SQLite connections only load them when opened
+        with engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+        engine.dispose()
+        t0 = time.perf_counter()
+        lifecycle(app)
+        run["sweep"]["idle_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+        for name, url in URLS.items():
+            run["status"][name] = _timed(client, url, args.repeat)
+        runs.append(run)
+        print(run, file=sys.stderr, flush=True)
+    return runs
+
+
+def _percentiles(values: list[float]) -> dict:
+    values = sorted(values)
+    return {"p50_ms": round(values[len(values) // 2] * 1000, 1),
+            "p95_ms": round(values[int(len(values) * 0.95)] * 1000, 1),
+            "max_ms": round(values[-1] * 1000, 1)}
+
+
+def scheduler(args) -> dict:
+    seed_let_service(args.let_db, airlines=20, flights=args.live_flights, purchases=0, ratings=0, users=500)
+
+    from let_service import create_app
+    from let_service.db import db
+    from let_service.db.lifecycle import LifecycleScheduler
+    from let_service.db.models import Flight, OutboxEvent, Purchase
+
+    app = create_app(create_schema=False)
+    # Events are counted from outbox_events, no relay needed
+    app.config["OUTBOX_ENABLED"] = True
+    rnd = random.Random(3)
+    start = datetime.utcnow() + timedelta(seconds=3)
+    boundaries: dict[int, tuple[datetime, datetime]] = {}
+    with app.app_context():
+        for i in range(args.timed):
+            origin, destination = rnd.sample(AIRPORTS, 2)
+            departure = start + timedelta(seconds=rnd.uniform(0, args.spread))
+            flight = Flight(name=f"timed {i}", airline_id=1, distance_km=500.0, duration_seconds=rnd.randint(2, 10),
+                            departure_time=departure, origin_airport=origin, destination_airport=destination,
+                            created_by_user_id="1", price=100.0, approval_status="APPROVED")
+            db.session.add(flight)
+            db.session.flush()
+            db.session.add(Purchase(user_id="2", flight_id=flight.id, status="PENDING", price_paid=100.0))
+            boundaries[flight.id] = (departure, departure + timedelta(seconds=flight.duration_seconds))
+        db.session.commit()
+
+    app.extensions["lifecycle"] = LifecycleScheduler(app)
+    app.extensions["lifecycle"].ensure_started()
+    seen: dict[str, dict[int, datetime]] = {"IN_PROGRESS": {}, "FINISHED": {}}
+    deadline = time.monotonic() + args.spread + 30
+    ids = list(boundaries)
+    with app.app_context():
+        while len(seen["FINISHED"]) < len(ids) and time.monotonic() < deadline:
+            now = datetime.utcnow()
+            rows = db.session.execute(
+                db.select(Flight.id, Flight.lifecycle_status).where(Flight.id.in_(ids))).all()
+            db.session.rollback()
+            for flight_id, status in rows:
+                if status in seen:
+                    seen[status].setdefault(flight_id, now)
+                if status == "FINISHED":
+                    # Departed and landed between two polls
+                    seen["IN_PROGRESS"].setdefault(flight_id, now)
+            time.sleep(0.01)
+
+        failed = Purchase.query.filter(Purchase.flight_id.in_(ids), Purchase.status == "FAILED").count()
+        events = {action: OutboxEvent.query.filter(OutboxEvent.entity_id.in_(ids), OutboxEvent.action == action).count()
+                  for action in ("departed", "landed")}
+
+    departed = [(seen["IN_PROGRESS"][i] - boundaries[i][0]).total_seconds() for i in seen["IN_PROGRESS"]]
+    landed = [(seen["FINISHED"][i] - boundaries[i][1]).total_seconds() for i in seen["FINISHED"]]
+    return {"flights": len(ids), "departed": len(departed), "landed": len(landed),
+            "departure_lag": _percentiles(departed), "landing_lag": _percentiles(landed),
+            "purchases_failed": failed, "events": events}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-lifecycle-let.db")
+    parser.add_argument("--live-flights", type=int, default=20_000)
+    parser.add_argument("--history", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--timed", type=int, default=200)
+    parser.add_argument("--spread", type=float, default=20.0)
+    args = parser.parse_args()
+
+    # Only the scheduler section runs one, started explicitly; no relay
+    # threads publishing the listing sweeps' events while requests are timed
+    os.environ["LET_LIFECYCLE_ENABLED"] = "false"
+    os.environ["LET_OUTBOX_ENABLED"] = "false"
+    report = {"live_flights": args.live_flights, "listings": listings(args), "scheduler": scheduler(args)}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""Drive let_service and the gateway with a realistic request mix.
+
+By default both services are started locally on SQLite after seeding them
+(see seed.py), with metrics enabled so per-endpoint SQL statement counts can
+be read back from /metrics. Results are written as JSON, keyed by the current
+git commit, so two runs can be compared with compare.py.
+
+    python benchmarks/loadtest.py --flights 5000 --concurrency 16 --duration 30
+    python benchmarks/loadtest.py --no-spawn --let-url http://127.0.0.1:8801 --gateway-url http://127.0.0.1:8800
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import AIRPORTS, BENCH_PASSWORD, seed_let_service, seed_server_users, user_email  # noqa: E402
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+LET_RUNNER = (
+    "from let_service import create_app; "
+    "create_app().run(host='127.0.0.1', port={port}, threaded=True, debug=False)"
+)
+SERVER_RUNNER = "import app; app.app.run(host='127.0.0.1', port={port}, threaded=True, debug=False)"
+
+# (weight, name) - the name doubles as the report key
+LET_MIX = [
+    (30, "let GET /flights?tab=upcoming&q"),
+    (10, "let GET /flights?tab=in_progress"),
+    (8, "let GET /flights?tab=archive"),
+    (4, "let GET /flights?tab=pending"),
+    (8, "let GET /flights/<id>"),
+    (8, "let GET /airlines"),
+    (8, "let GET /users/<id>/purchases"),
+    (8, "let POST /purchases"),
+    (6, "let POST /ratings"),
+    (4, "let GET /ratings?flight_id"),
+]
+GATEWAY_MIX = [
+    (5, "gw POST /auth/login"),
+    (10, "gw GET /flights/get-all-that"),
+    (5, "gw GET /flights/get/<id>"),
+    (5, "gw GET /airlines/get"),
+    (3, "gw POST /purchases/buy"),
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float, status: int | str) -> None:
+        with self._lock:
+            self.latencies[name].append(seconds)
+            self.statuses[name][str(status)] += 1
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def scrape_sql_counts(let_url: str) -> dict[str, tuple[float, float]]:
+    """route -> (statements, requests) from let_service /metrics."""
+    try:
+        text = requests.get(f"{let_url}/metrics", timeout=5).text
+    except requests.RequestException:
+        return {}
+    statements: dict[str, float] = defaultdict(float)
+    reqs: dict[str, float] = defaultdict(float)
+    for line in text.splitlines():
+        m = re.match(r'let_sql_statements_total\{route="([^"]*)"\} ([0-9.e+]+)', line)
+        if m:
+            statements[m.group(1)] += float(m.group(2))
+            continue
+        m = re.match(r'let_http_request_duration_seconds_count\{method="[^"]*",route="([^"]*)",status="[^"]*"\} ([0-9.e+]+)', line)
+        if m:
+            reqs[m.group(1)] += float(m.group(2))
+    return {r: (statements.get(r, 0.0), reqs.get(r, 0.0)) for r in set(statements) | set(reqs)}
+
+
+class Workload:
+    def __init__(self, let_url: str, gateway_url: str | None, flights: int, users: int, seed: int):
+        self.let_url = let_url
+        self.gateway_url = gateway_url
+        self.flights = flights
+        self.users = users
+        self.rnd = random.Random(seed)
+        self._local = threading.local()
+        self.tokens: dict[int, str] = {}
+
+    @property
+    def http(self) -> requests.Session:
+        s = getattr(self._local, "session", None)
+        if s is None:
+            s = self._local.session = requests.Session()
+        return s
+
+    def pick(self, mix):
+        return self.rnd.choices([n for _, n in mix], weights=[w for w, _ in mix])[0]
+
+    def run_one(self, name: str):
+        rnd = self.rnd
+        flight_id = rnd.randint(1, max(self.flights, 1))
+        user_id = rnd.randint(1, max(self.users, 1))
+        headers = {"X-User-Id": str(user_id), "X-User-Role": "USER"}
+        let = self.let_url
+        gw = self.gateway_url
+
+        if name == "let GET /flights?tab=upcoming&q":
+            q = rnd.choice(AIRPORTS).lower() if rnd.random() < 0.6 else ""
+            return self.http.get(f"{let}/flights", params={"tab": "upcoming", "q": q})
+        if name == "let GET /flights?tab=in_progress":
+            return self.http.get(f"{let}/flights", params={"tab": "in_progress"})
+        if name == "let GET /flights?tab=archive":
+            return self.http.get(f"{let}/flights", params={"tab": "archive"})
+        if name == "let GET /flights?tab=pending":
+            return self.http.get(f"{let}/flights", params={"tab": "pending"})
+        if name == "let GET /flights/<id>":
+            return self.http.get(f"{let}/flights/{flight_id}")
+        if name == "let GET /airlines":
+            return self.http.get(f"{let}/airlines")
+        if name == "let GET /users/<id>/purchases":
+            return self.http.get(f"{let}/users/{user_id}/purchases")
+        if name == "let POST /purchases":
+            return self.http.post(f"{let}/purchases", json={"flight_id": flight_id}, headers=headers)
+        if name == "let POST /ratings":
+            return self.http.post(f"{let}/ratings", json={"flight_id": flight_id, "rating": rnd.randint(1, 5)},
+                                  headers=headers)
+        if name == "let GET /ratings?flight_id":
+            return self.http.get(f"{let}/ratings", params={"flight_id": flight_id})
+
+        if name == "gw POST /auth/login":
+            res = self.http.post(f"{gw}/auth/login", json={"email": user_email(user_id), "password": BENCH_PASSWORD})
+            if res.status_code == 200:
+                self.tokens[user_id] = res.json().get("token")
+            return res
+        if name == "gw GET /flights/get-all-that":
+            return self.http.get(f"{gw}/flights/get-all-that", data={"tab": "upcoming"})
+        if name == "gw GET /flights/get/<id>":
+            return self.http.get(f"{gw}/flights/get/{flight_id}")
+        if name == "gw GET /airlines/get":
+            return self.http.get(f"{gw}/airlines/get")
+        if name == "gw POST /purchases/buy":
+            token = self.tokens.get(user_id) or "anonymous"
+            return self.http.post(f"{gw}/purchases/buy", json={"token": token, "flight_id": flight_id})
+        raise ValueError(name)
+
+
+def drive(workload: Workload, mix, concurrency: int, duration: float, recorder: Recorder) -> float:
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            name = workload.pick(mix)
+            t0 = time.perf_counter()
+            try:
+                res = workload.run_one(name)
+                status: int | str = res.status_code
+                _ = res.content
+            except requests.RequestException as error:
+                status = type(error).__name__
+            recorder.add(name, time.perf_counter() - t0, status)
+
+    t_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return time.perf_counter() - t_start
+
+
+def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def spawn_services(let_db: str, server_db: str, let_port: int, gateway_port: int) -> list[subprocess.Popen]:
+    env = dict(os.environ)
+    env.update(
+        {
+            "LET_SQLALCHEMY_DATABASE_URI": let_db,
+            "LET_AUTO_CREATE_SCHEMA": "false",
+            "LET_METRICS_ENABLED": "true",
+            "LET_PURCHASE_PROCESSING_SECONDS": "0",
+            "SQLALCHEMY_DATABASE_URI": server_db,
+            "SECRET_KEY": env.get("SECRET_KEY", "bench"),
+            "LET_SERVICE_URL": f"http://127.0.0.1:{let_port}",
+            "REDIS_DB": env.get("REDIS_DB", "localhost"),
+            "METRICS_ENABLED": "true",
+            "AUTO_CREATE_SCHEMA": "false",
+        }
+    )
+    procs = [
+        subprocess.Popen([sys.executable, "-c", LET_RUNNER.format(port=let_port)], cwd=ROOT / "let_service",
+                         env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        subprocess.Popen([sys.executable, "-c", SERVER_RUNNER.format(port=gateway_port)], cwd=ROOT / "server",
+                         env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+    ]
+    _wait_ready(f"http://127.0.0.1:{let_port}/ping")
+    _wait_ready(f"http://127.0.0.1:{gateway_port}/ping-reachable")
+    return procs
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def build_report(recorder: Recorder, phases: dict[str, float], sql_before, sql_after) -> dict:
+    """phases maps an endpoint-name prefix ("let", "gw") to the seconds it was driven."""
+    elapsed = sum(phases.values())
+    endpoints = {}
+    for name, lat in sorted(recorder.latencies.items()):
+        lat = sorted(lat)
+        phase_elapsed = phases.get(name.split(" ", 1)[0], elapsed)
+        endpoints[name] = {
+            "requests": len(lat),
+            "throughput_rps": round(len(lat) / phase_elapsed, 2) if phase_elapsed else 0.0,
+            "p50_ms": round(percentile(lat, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(lat, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(lat, 0.99) * 1000, 2),
+            "statuses": dict(recorder.statuses[name]),
+        }
+
+    sql = {}
+    for route, (stmts, reqs) in sql_after.items():
+        b_stmts, b_reqs = sql_before.get(route, (0.0, 0.0))
+        d_stmts, d_reqs = stmts - b_stmts, reqs - b_reqs
+        if d_stmts or d_reqs:
+            sql[route] = {
+                "statements": int(d_stmts),
+                "requests": int(d_reqs),
+                "statements_per_request": round(d_stmts / d_reqs, 2) if d_reqs else None,
+            }
+
+    total = sum(len(v) for v in recorder.latencies.values())
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "total_requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "endpoints": endpoints,
+        "let_service_sql": sql,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-url", default=None)
+    parser.add_argument("--gateway-url", default=None)
+    parser.add_argument("--no-spawn", action="store_true", help="use already running services")
+    parser.add_argument("--no-seed", action="store_true")
+    parser.add_argument("--no-gateway", action="store_true", help="drive let_service only")
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-let.db")
+    parser.add_argument("--server-db", default="sqlite:////tmp/bench-server.db")
+    parser.add_argument("--airlines", type=int, default=20)
+    parser.add_argument("--flights", type=int, default=5000)
+    parser.add_argument("--purchases", type=int, default=20000)
+    parser.add_argument("--ratings", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per service")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", default=None, help=f"defaults to {RESULTS_DIR}/<commit>.json")
+    args = parser.parse_args()
+
+    let_url = args.let_url or "http://127.0.0.1:18801"
+    gateway_url = args.gateway_url or "http://127.0.0.1:18800"
+
+    seeded = None
+    procs: list[subprocess.Popen] = []
+    if not args.no_spawn:
+        if not args.no_seed:
+            seeded = seed_let_service(args.let_db, args.airlines, args.flights, args.purchases, args.ratings,
+                                      args.users, args.seed)
+            seeded["users"] = seed_server_users(args.server_db, args.users)
+        procs = spawn_services(args.let_db, args.server_db, int(let_url.rsplit(":", 1)[1]),
+                               int(gateway_url.rsplit(":", 1)[1]))
+
+    try:
+        workload = Workload(let_url, gateway_url, args.flights, args.users, args.seed)
+        recorder = Recorder()
+        sql_before = scrape_sql_counts(let_url)
+        phases = {"let": drive(workload, LET_MIX, args.concurrency, args.duration, recorder)}
+        if not args.no_gateway:
+            phases["gw"] = drive(workload, GATEWAY_MIX, args.concurrency, args.duration, recorder)
+        sql_after = scrape_sql_counts(let_url)
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait(timeout=10)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "params": {
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "airlines": args.airlines,
+            "flights": args.flights,
+            "purchases": args.purchases,
+            "ratings": args.ratings,
+            "users": args.users,
+            "seed": args.seed,
+        },
+        "seeded": seeded,
+        **build_report(recorder, phases, sql_before, sql_after),
+    }
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+
+    print(f"{'endpoint':40} {'reqs':>7} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for name, e in report["endpoints"].items():
+        print(f"{name:40} {e['requests']:7d} {e['throughput_rps']:8.1f} {e['p50_ms']:8.1f} {e['p95_ms']:8.1f} {e['p99_ms']:8.1f}")
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""GET /users/<id>/purchases: whole history vs keyset pages.
+
+Seeds let_service, then gives one frequent flyer --history purchases (plus
+--purchases spread over everyone else). Reports, per history size,
+
+- the previous behaviour: every purchase with its joined flight and airline,
+- the first page and a page deep in the history (slim and expand=flight),
+- whether walking every page returns the whole history exactly once, in order,
+- the EXPLAIN plan of the page query.
+
+    python benchmarks/purchase_history.py --history 1000 10000 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from flight_filters import explain  # noqa: E402
+from seed import seed_let_service  # noqa: E402
+
+FLYER = 999_999
+
+
+def _timed(fn, repeat: int) -> tuple[float, int]:
+    samples, size = [], 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        size = fn()
+        samples.append(time.perf_counter() - t0)
+    return round(statistics.median(samples) * 1000, 2), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-history-let.db")
+    parser.add_argument("--flights", type=int, default=20_000)
+    parser.add_argument("--purchases", type=int, default=200_000)
+    parser.add_argument("--history", type=int, nargs="+", default=[1000, 10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    seed_let_service(args.let_db, airlines=20, flights=args.flights, purchases=args.purchases, ratings=0, users=5000)
+
+    from sqlalchemy import event, insert
+
+    from let_service import create_app
+    from let_service.db import db
+    from let_service.db.models import Purchase
+
+    app = create_app(create_schema=False)
+    client = app.test_client()
+    rnd = random.Random(3)
+    now = datetime.utcnow()
+    report = {"flights": args.flights, "other_purchases": args.purchases, "runs": []}
+
+    inserted = 0
+    for history in sorted(args.history):
+        with app.app_context():
+            rows = [{
+                "user_id": str(FLYER), "flight_id": rnd.randint(1, args.flights), "status": "COMPLETED",
+                "price_paid": 100.0, "purchased_at": now, "created_at": now - timedelta(seconds=rnd.randrange(10**8)),
+            } for _ in range(history - inserted)]
+            for start in range(0, len(rows), 5000):
+                db.session.execute(insert(Purchase), rows[start:start + 5000])
+            db.session.commit()
+            inserted = history
+
+        def everything() -> int:
+            # What the route returned before pagination
+            with app.app_context():
+                purchases = Purchase.query.filter_by(user_id=FLYER).order_by(Purchase.created_at.desc()).all()
+                size = len(json.dumps([p.to_dict() for p in purchases]))
+                db.session.remove()
+            return size
+
+        def page(query: str) -> int:
+            return len(client.get(f"/users/{FLYER}/purchases?{query}").data)
+
+        # Walk the whole history page by page; keep a cursor from the middle
+        ids, cursor, cursors = [], "", []
+        while True:
+            res = client.get(f"/users/{FLYER}/purchases?limit=200&cursor={cursor}")
+            ids.extend(row["id"] for row in res.get_json())
+            cursor = res.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+            cursors.append(cursor)
+        pages = len(cursors) + 1
+        deep_cursor = cursors[len(cursors) // 2] if cursors else ""
+        with app.app_context():
+            expected = [p.id for p in Purchase.query.filter(Purchase.user_id == str(FLYER))
+                        .order_by(Purchase.created_at.desc(), Purchase.id.desc())]
+            db.session.remove()
+
+        captured = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if "FROM purchases" in statement:
+                captured.append((statement, parameters))
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, "before_cursor_execute", capture)
+        client.get(f"/users/{FLYER}/purchases?cursor={deep_cursor}")
+        event.remove(engine, "before_cursor_execute", capture)
+        with engine.connect() as conn:
+            plan = [line for statement, parameters in captured for line in explain(conn, statement, parameters)]
+
+        run = {"history": history, "walk": {"pages": pages, "complete_and_ordered": ids == expected}, "plan": plan}
+        for name, fn in (
+            ("whole_history", everything),
+            ("first_page", lambda: page("")),
+            ("first_page_expand", lambda: page("expand=flight")),
+            ("deep_page", lambda: page(f"cursor={deep_cursor}")),
+            ("deep_page_completed", lambda: page(f"cursor={deep_cursor}&status=COMPLETED")),
+        ):
+            ms, size = _timed(fn, args.repeat)
+            run[name] = {"ms": ms, "bytes": size}
+        report["runs"].append(run)
+        print(run, file=sys.stderr, flush=True)
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
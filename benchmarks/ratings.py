@@ -0,0 +1,162 @@
+"""Rating writes per second under concurrency.
+
+Seeds let_service (purchases lean towards finished flights, so most
+(user, flight) pairs may be rated), then for each --concurrency level runs
+--seconds of
+
+- legacy: the previous handler's queries (flight, purchase and rating
+  lookups, then an update or insert and a commit) straight on the database,
+- upsert: `db.ratings.upsert_rating` (one statement) and a commit, same way,
+- http_single: POST /ratings against a spawned let_service,
+- http_batch: POST /ratings/batch with --batch ratings per request.
+
+Every mode re-rates the same eligible pairs, so the table mixes inserts and
+updates the same way for all of them. For the whole service before/after,
+loadtest.py's `let POST /ratings` plus compare.py remain the reference.
+
+    python benchmarks/ratings.py --concurrency 1 4 16 --batch 100
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from loadtest import LET_RUNNER, ROOT, _wait_ready  # noqa: E402
+from seed import seed_let_service  # noqa: E402
+
+
+def run(concurrency: int, seconds: float, work) -> dict:
+    """Call work(rnd) -> (ratings written, errors) from `concurrency` threads."""
+    deadline = time.perf_counter() + seconds
+    lock = threading.Lock()
+    totals = {"ratings": 0, "errors": 0}
+
+    def worker(seed: int):
+        rnd = random.Random(seed)
+        while time.perf_counter() < deadline:
+            done, errors = work(rnd)
+            with lock:
+                totals["ratings"] += done
+                totals["errors"] += errors
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i in range(concurrency):
+            pool.submit(worker, i)
+    elapsed = time.perf_counter() - t0
+    return {"ratings_per_second": round(totals["ratings"] / elapsed, 1), **totals}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-ratings-let.db")
+    parser.add_argument("--flights", type=int, default=20_000)
+    parser.add_argument("--purchases", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--let-port", type=int, default=8811)
+    args = parser.parse_args()
+
+    seed_let_service(args.let_db, airlines=20, flights=args.flights, purchases=args.purchases, ratings=0, users=500)
+
+    from sqlalchemy import select
+
+    from let_service import create_app
+    from let_service.api.flights import compute_runtime_state, utcnow
+    from let_service.db import db
+    from let_service.db.models import Flight, Purchase, Rating
+    from let_service.db.ratings import upsert_rating
+
+    app = create_app(create_schema=False)
+    now = datetime.utcnow()
+    with app.app_context():
+        rows = db.session.execute(
+            select(Purchase.user_id, Purchase.flight_id, Flight.departure_time, Flight.duration_seconds)
+            .join(Flight, Flight.id == Purchase.flight_id)
+            .where(Purchase.status == "COMPLETED", Flight.canceled.is_(False))
+        ).all()
+    pairs = sorted({(u, f) for u, f, departure, duration in rows
+                    if (now - departure).total_seconds() > duration})
+    print(f"{len(pairs)} eligible pairs", file=sys.stderr, flush=True)
+
+    def legacy(rnd):
+        user_id, flight_id = rnd.choice(pairs)
+        with app.app_context():
+            flight = Flight.query.get(flight_id)
+            if flight is None or compute_runtime_state(flight)[0] != "FINISHED":
+                return 0, 1
+            if Purchase.query.filter_by(user_id=user_id, flight_id=flight_id, status="COMPLETED").first() is None:
+                return 0, 1
+            existing = Rating.query.filter_by(user_id=user_id, flight_id=flight_id).first()
+            if existing:
+                existing.rating = rnd.randint(1, 5)
+            else:
+                db.session.add(Rating(user_id=user_id, flight_id=flight_id, rating=rnd.randint(1, 5)))
+            db.session.commit()
+        return 1, 0
+
+    def upsert(rnd):
+        user_id, flight_id = rnd.choice(pairs)
+        with app.app_context():
+            written = upsert_rating(db.session, user_id, flight_id, rnd.randint(1, 5), utcnow())
+            db.session.commit()
+        return (1, 0) if written is not None else (0, 1)
+
+    env = dict(os.environ, LET_SQLALCHEMY_DATABASE_URI=args.let_db, LET_AUTO_CREATE_SCHEMA="false")
+    proc = subprocess.Popen([sys.executable, "-c", LET_RUNNER.format(port=args.let_port)], cwd=ROOT / "let_service",
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    let = f"http://127.0.0.1:{args.let_port}"
+    _wait_ready(f"{let}/ping")
+    local = threading.local()
+
+    def http() -> requests.Session:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        return local.session
+
+    def http_single(rnd):
+        user_id, flight_id = rnd.choice(pairs)
+        res = http().post(f"{let}/ratings", json={"flight_id": flight_id, "rating": rnd.randint(1, 5)},
+                          headers={"X-User-Id": user_id, "X-User-Role": "USER"})
+        return (1, 0) if res.status_code in (200, 201) else (0, 1)
+
+    def http_batch(rnd):
+        chosen = rnd.sample(pairs, args.batch)
+        res = http().post(f"{let}/ratings/batch", json={"ratings": [
+            {"user_id": u, "flight_id": f, "rating": rnd.randint(1, 5)} for u, f in chosen
+        ]}, headers={"X-User-Id": "1", "X-User-Role": "ADMIN"})
+        if res.status_code != 200:
+            return 0, args.batch
+        body = res.json()
+        return body["created"] + body["updated"], body["rejected"]
+
+    report = {"flights": args.flights, "eligible_pairs": len(pairs), "batch": args.batch, "runs": []}
+    try:
+        for concurrency in args.concurrency:
+            row = {"concurrency": concurrency}
+            for name, work in (("legacy", legacy), ("upsert", upsert),
+                               ("http_single", http_single), ("http_batch", http_batch)):
+                row[name] = run(concurrency, args.seconds, work)
+            report["runs"].append(row)
+            print(row, file=sys.stderr, flush=True)
+    finally:
+        proc.terminate()
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Recurring flights: schedules expanded on demand vs a year of pre-expanded rows.
+
+Seeds --schedules daily routes two ways, each in its own SQLite database
+and process (the let_service config is read at import time):
+
+- lazy: one `flight_schedules` row per route; GET /flights generates the
+  occurrences in the requested window (db/schedules.py),
+- expanded: one `flights` row per departure for the next --days days.
+
+and times, in-process, a year of the upcoming tab
+(`departs_before=+365d`), the default upcoming tab (SCHEDULE_HORIZON_DAYS
+for schedules) and one route over the year, checking that both ways list
+the same number of flights. Also reports the rows written and the time to
+write them.
+
+    python benchmarks/schedules.py --schedules 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import AIRPORTS, _chunks, seed_let_service  # noqa: E402
+
+
+def _time(fn, repeat: int) -> dict:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {"median_ms": round(statistics.median(samples) * 1000, 2), "max_ms": round(max(samples) * 1000, 2)}
+
+
+def _routes(count: int, now: datetime) -> list[dict]:
+    rnd = random.Random(7)
+    routes = []
+    for i in range(1, count + 1):
+        origin, destination = rnd.sample(AIRPORTS, 2)
+        routes.append({
+            "name": f"{origin}-{destination} daily {i}",
+            "airline_id": rnd.randint(1, 20),
+            "distance_km": float(rnd.randint(150, 3500)),
+            "duration_seconds": rnd.randint(45, 6 * 60) * 60,
+            "origin_airport": origin,
+            "destination_airport": destination,
+            "created_by_user_id": "1",
+            "price": round(rnd.uniform(30, 900), 2),
+            "approval_status": "APPROVED",
+            "approved_by_user_id": "1",
+            "approved_at": now,
+            # First departure tomorrow, at a random minute of the day
+            "first": (now + timedelta(days=1)).replace(hour=0, minute=0) + timedelta(minutes=rnd.randint(0, 24 * 60 - 1)),
+        })
+    return routes
+
+
+def run_mode(mode: str, db_uri: str, count: int, days: int, repeat: int) -> dict:
+    os.environ["LET_LIFECYCLE_ENABLED"] = "false"
+    os.environ["LET_OUTBOX_ENABLED"] = "false"
+    os.environ["LET_SCHEDULE_MAX_WINDOW_DAYS"] = str(days + 35)
+    seed_let_service(db_uri, airlines=20, flights=0, purchases=0, ratings=0, users=10)
+
+    from sqlalchemy import func, insert, select
+
+    from let_service import create_app
+    from let_service.db import db
+    from let_service.db.models import Flight, FlightSchedule
+
+    app = create_app(create_schema=True)
+    now = datetime.utcnow().replace(second=0, microsecond=0)
+    routes = _routes(count, now)
+
+    t0 = time.perf_counter()
+    with app.app_context():
+        if mode == "lazy":
+            rows = [dict({k: v for k, v in r.items() if k != "first"}, starts_at=r["first"],
+                         ends_at=r["first"] + timedelta(days=days - 1), frequency="DAILY", every=1) for r in routes]
+            db.session.execute(insert(FlightSchedule), rows)
+        else:
+            rows = [
+                dict({k: v for k, v in r.items() if k != "first"}, departure_time=r["first"] + timedelta(days=d),
+                     lifecycle_status="UPCOMING", created_at=now, updated_at=now)
+                for r in routes for d in range(days)
+            ]
+            for chunk in _chunks(rows):
+                db.session.execute(insert(Flight), chunk)
+        db.session.commit()
+        written = len(rows)
+        table_rows = {
+            "flights": db.session.execute(select(func.count()).select_from(Flight)).scalar(),
+            "flight_schedules": db.session.execute(select(func.count()).select_from(FlightSchedule)).scalar(),
+        }
+    write_seconds = time.perf_counter() - t0
+
+    client = app.test_client()
+    year = (now + timedelta(days=365)).isoformat()
+    route = routes[0]
+    urls = {
+        "year": f"/flights?tab=upcoming&departs_before={year}",
+        "default": "/flights?tab=upcoming",
+        "route_year": (f"/flights?tab=upcoming&origin={route['origin_airport']}"
+                       f"&destination={route['destination_airport']}&departs_before={year}"),
+    }
+    report: dict = {"rows_written": written, "write_ms": round(write_seconds * 1000, 1), "table_rows": table_rows}
+    for name, url in urls.items():
+        report[name] = _time(lambda: client.get(url), repeat)
+        report[name]["count"] = len(client.get(url).get_json())
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schedules", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mode", choices=("lazy", "expanded"), help=argparse.SUPPRESS)
+    parser.add_argument("--db", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.db, args.schedules, args.days, args.repeat)))
+        return
+
+    report: dict = {"schedules": args.schedules, "days": args.days}
+    for mode in ("lazy", "expanded"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--db", f"sqlite:////tmp/bench-schedules-{mode}.db",
+             "--schedules", str(args.schedules), "--days", str(args.days), "--repeat", str(args.repeat)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        report[mode] = json.loads(out.strip().splitlines()[-1])
+    report["same_counts"] = all(report["lazy"][k]["count"] == report["expanded"][k]["count"]
+                                for k in ("year", "route_year"))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
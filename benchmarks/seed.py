@@ -0,0 +1,210 @@
+"""Seed let_service and the gateway user table with synthetic data.
+
+Works against SQLite (default) or any URI SQLAlchemy understands, e.g. a
+local MySQL:
+
+    python benchmarks/seed.py --let-db sqlite:////tmp/let.db --server-db sqlite:////tmp/server.db \
+        --airlines 20 --flights 5000 --purchases 20000 --ratings 5000 --users 500
+
+The generator is seeded, so the same arguments always produce the same rows.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+AIRPORTS = [
+    "BEG", "ZRH", "VIE", "FRA", "MUC", "CDG", "AMS", "LHR", "FCO", "MAD",
+    "BCN", "IST", "ATH", "CPH", "ARN", "OSL", "HEL", "WAW", "PRG", "BUD",
+    "OTP", "SOF", "ZAG", "LJU", "SKP", "TGD", "DBV", "SPU", "INI", "KVO",
+]
+BENCH_PASSWORD = "Benchmark123!"
+# Every user can afford any number of purchases during a load test
+BENCH_BALANCE_CENTS = 1_000_000_00
+CHUNK = 5000
+
+
+def user_email(i: int) -> str:
+    # input_validator only allows a restricted alphabet in emails
+    return f"user{i}@bench.com"
+
+
+def _chunks(rows: list[dict], size: int = CHUNK):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def seed_let_service(db_uri: str, airlines: int, flights: int, purchases: int, ratings: int,
+                     users: int, seed: int = 42) -> dict[str, int]:
+    os.environ["LET_SQLALCHEMY_DATABASE_URI"] = db_uri
+    os.environ.setdefault("LET_AUTO_CREATE_SCHEMA", "false")
+    sys.path.insert(0, str(ROOT / "let_service"))
+
+    from sqlalchemy import insert
+
+    from let_service import create_app
+    from let_service.db import db
+    from let_service.db.lifecycle import status_at
+    from let_service.db.models import Airline, Flight, Purchase, Rating, Wallet
+
+    rnd = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    app = create_app(create_schema=False)
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+
+        db.session.execute(insert(Airline), [{"id": i, "name": f"Airline {i:04d}"} for i in range(1, airlines + 1)])
+
+        flight_rows = []
+        finished: list[int] = []
+        for i in range(1, flights + 1):
+            origin, destination = rnd.sample(AIRPORTS, 2)
+            departure = now + timedelta(minutes=rnd.randint(-60 * 24 * 60, 60 * 24 * 60))
+            duration = rnd.randint(45, 12 * 60) * 60
+            approval = rnd.choices(["APPROVED", "PENDING", "REJECTED"], weights=[80, 12, 8])[0]
+            canceled = rnd.random() < 0.03
+            flight_rows.append(
+                {
+                    "id": i,
+                    "name": f"{origin}-{destination} {i}",
+                    "airline_id": rnd.randint(1, airlines),
+                    "distance_km": float(rnd.randint(150, 3500)),
+                    "duration_seconds": duration,
+                    "departure_time": departure,
+                    "lifecycle_status": status_at(departure, duration, now),
+                    "origin_airport": origin,
+                    "destination_airport": destination,
+                    "created_by_user_id": str(rnd.randint(1, users)),
+                    "price": round(rnd.uniform(30, 900), 2),
+                    "approval_status": approval,
+                    "rejection_reason": "bench" if approval == "REJECTED" else None,
+                    "canceled": canceled,
+                    # Never in the future: catalog snapshots poll on updated_at
+                    "created_at": min(departure - timedelta(days=30), now),
+                    "updated_at": min(departure - timedelta(days=30), now),
+                }
+            )
+            if approval == "APPROVED" and not canceled and departure + timedelta(seconds=duration) < now:
+                finished.append(i)
+        for chunk in _chunks(flight_rows):
+            db.session.execute(insert(Flight), chunk)
+
+        purchase_rows = []
+        completed: list[tuple[str, int]] = []
+        for i in range(1, purchases + 1):
+            flight = flight_rows[rnd.randrange(len(flight_rows))]
+            # Bias purchases towards finished flights so ratings have something to hit
+            if finished and rnd.random() < 0.5:
+                flight = flight_rows[rnd.choice(finished) - 1]
+            user_id = str(rnd.randint(1, users))
+            status = rnd.choices(["COMPLETED", "FAILED", "PENDING"], weights=[90, 8, 2])[0]
+            created = flight["departure_time"] - timedelta(days=rnd.randint(1, 20))
+            purchase_rows.append(
+                {
+                    "id": i,
+                    "user_id": user_id,
+                    "flight_id": flight["id"],
+                    "status": status,
+                    "failure_reason": "bench" if status == "FAILED" else None,
+                    "price_paid": flight["price"],
+                    "purchased_at": created if status == "COMPLETED" else None,
+                    "created_at": created,
+                }
+            )
+            if status == "COMPLETED" and flight["id"] in finished:
+                completed.append((user_id, flight["id"]))
+        for chunk in _chunks(purchase_rows):
+            db.session.execute(insert(Purchase), chunk)
+
+        rnd.shuffle(completed)
+        seen: set[tuple[str, int]] = set()
+        rating_rows = []
+        for user_id, flight_id in completed:
+            if len(rating_rows) >= ratings:
+                break
+            if (user_id, flight_id) in seen:
+                continue
+            seen.add((user_id, flight_id))
+            rating_rows.append({"user_id": user_id, "flight_id": flight_id, "rating": rnd.randint(1, 5),
+                                "created_at": now})
+        for chunk in _chunks(rating_rows):
+            db.session.execute(insert(Rating), chunk)
+
+        # The seeded purchases predate wallets (no ledger entries to settle)
+        wallet_rows = [{"user_id": str(i), "balance_cents": BENCH_BALANCE_CENTS, "held_cents": 0, "updated_at": now}
+                       for i in range(1, users + 1)]
+        for chunk in _chunks(wallet_rows):
+            db.session.execute(insert(Wallet), chunk)
+
+        db.session.commit()
+
+    return {
+        "airlines": airlines,
+        "flights": len(flight_rows),
+        "purchases": len(purchase_rows),
+        "ratings": len(rating_rows),
+        "finished_flights": len(finished),
+    }
+
+
+def seed_server_users(db_uri: str, users: int) -> int:
+    os.environ["SQLALCHEMY_DATABASE_URI"] = db_uri
+    os.environ.setdefault("SECRET_KEY", "bench")
+    os.environ.setdefault("LET_SERVICE_URL", "http://127.0.0.1:8801")
+    os.environ.setdefault("REDIS_DB", "localhost")
+    sys.path.insert(0, str(ROOT / "server"))
+
+    import bcrypt
+    from sqlalchemy import insert
+
+    from setup import app, db
+    from models import User
+
+    # One hash for everyone: bcrypt cost would otherwise dominate seeding time
+    hashed = "\\x" + bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt()).hex()
+    rows = [
+        {"id": i, "email": user_email(i), "password": hashed, "role": "USER", "balance": 0.0}
+        for i in range(1, users + 1)
+    ]
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for chunk in _chunks(rows):
+            db.session.execute(insert(User), chunk)
+        db.session.commit()
+    return len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-let.db")
+    parser.add_argument("--server-db", default="sqlite:////tmp/bench-server.db")
+    parser.add_argument("--airlines", type=int, default=20)
+    parser.add_argument("--flights", type=int, default=5000)
+    parser.add_argument("--purchases", type=int, default=20000)
+    parser.add_argument("--ratings", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--skip-server", action="store_true", help="only seed let_service")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    counts = seed_let_service(args.let_db, args.airlines, args.flights, args.purchases, args.ratings,
+                              args.users, args.seed)
+    if not args.skip_server:
+        counts["users"] = seed_server_users(args.server_db, args.users)
+    counts["seconds"] = round(time.perf_counter() - t0, 2)
+    print(counts)
+
+
+if __name__ == "__main__":
+    main()
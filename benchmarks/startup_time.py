@@ -0,0 +1,117 @@
+"""Measure cold-start time of both services.
+
+Each sample is a fresh interpreter that imports the service and builds the
+Flask app, so the numbers include import cost, config loading and (for the
+"legacy" mode) schema creation.
+
+    python benchmarks/startup_time.py --runs 10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+LET_SNIPPET = """
+import time
+t0 = time.perf_counter()
+from let_service import create_app, warm_up
+app = create_app()
+if {warm}:
+    warm_up(app)
+print(time.perf_counter() - t0)
+"""
+
+SERVER_SNIPPET = """
+import time
+t0 = time.perf_counter()
+import app as server_app
+if server_app.AUTO_CREATE_SCHEMA:
+    with server_app.app.app_context():
+        server_app.db.create_all()
+if {warm}:
+    server_app.warm_up()
+print(time.perf_counter() - t0)
+"""
+
+
+def _sample(snippet: str, cwd: Path, env: dict[str, str]) -> tuple[float, float]:
+    """Return (wall seconds incl. interpreter start, in-process seconds)."""
+    t0 = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - t0
+    return wall, float(out.stdout.strip().splitlines()[-1])
+
+
+def _summary(samples: list[tuple[float, float]]) -> dict[str, float]:
+    walls = [w for w, _ in samples]
+    inner = [i for _, i in samples]
+    return {
+        "wall_median_ms": round(statistics.median(walls) * 1000, 1),
+        "wall_max_ms": round(max(walls) * 1000, 1),
+        "app_median_ms": round(statistics.median(inner) * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--db-uri", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="startup-bench-")
+    let_uri = args.db_uri or f"sqlite:///{tmp}/let.db"
+    server_uri = args.db_uri or f"sqlite:///{tmp}/server.db"
+
+    base_env = dict(os.environ)
+    base_env.update(
+        {
+            "LET_SQLALCHEMY_DATABASE_URI": let_uri,
+            "SQLALCHEMY_DATABASE_URI": server_uri,
+            "SECRET_KEY": base_env.get("SECRET_KEY", "bench"),
+            "LET_SERVICE_URL": base_env.get("LET_SERVICE_URL", "http://127.0.0.1:8801"),
+            "REDIS_DB": base_env.get("REDIS_DB", "localhost"),
+        }
+    )
+
+    modes = {
+        "legacy": {"LET_AUTO_CREATE_SCHEMA": "true", "AUTO_CREATE_SCHEMA": "true"},
+        "fast": {"LET_AUTO_CREATE_SCHEMA": "false", "AUTO_CREATE_SCHEMA": "false"},
+        "fast+warm": {"LET_AUTO_CREATE_SCHEMA": "false", "AUTO_CREATE_SCHEMA": "false"},
+    }
+
+    results: dict[str, dict[str, dict[str, float]]] = {"let_service": {}, "server": {}}
+    for mode, extra in modes.items():
+        env = {**base_env, **extra}
+        warm = "True" if mode.endswith("+warm") else "False"
+
+        let_samples = [
+            _sample(LET_SNIPPET.format(warm=warm), ROOT / "let_service", env) for _ in range(args.runs)
+        ]
+        results["let_service"][mode] = _summary(let_samples)
+
+        server_samples = [
+            _sample(SERVER_SNIPPET.format(warm=warm), ROOT / "server", env) for _ in range(args.runs)
+        ]
+        results["server"][mode] = _summary(server_samples)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Minimal stand-in for let_service used by the gateway benchmarks.
+
+Serves canned JSON on the routes the gateway proxies, with knobs for payload
+size, latency and injected failures, so gateway behaviour can be measured
+without MySQL or the real service:
+
+    python benchmarks/stub_let_service.py --port 18811 --listing-mb 50 --gzip
+    python benchmarks/stub_let_service.py --port 18811 --delay-ms 50 --error-rate 0.2
+
+Faults can be changed while it runs, optionally only for paths under a prefix:
+
+    curl -X POST 'http://127.0.0.1:18811/__faults?error_rate=1&prefix=/flights'
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def make_flight(i: int) -> dict:
+    return {
+        "id": i,
+        "name": f"BEG-ZRH {i}",
+        "airline": {"id": i % 20 + 1, "name": f"Airline {i % 20 + 1:04d}"},
+        "distance_km": 950.0,
+        "duration_seconds": 7200,
+        "departure_time": "2030-01-01T10:00:00",
+        "origin_airport": "BEG",
+        "destination_airport": "ZRH",
+        "created_by_user_id": "10",
+        "price": 199.99,
+        "approval_status": "APPROVED",
+        "rejection_reason": None,
+        "approved_by_user_id": "1",
+        "approved_at": "2029-12-01T10:00:00",
+        "canceled": False,
+        "canceled_by_user_id": None,
+        "canceled_at": None,
+        "created_at": "2029-11-01T10:00:00",
+        "updated_at": "2029-11-01T10:00:00",
+        "runtime_status": "UPCOMING",
+        "remaining_seconds": 100000,
+        "end_time": "2030-01-01T12:00:00",
+    }
+
+
+def make_listing(size_mb: float) -> bytes:
+    one = len(json.dumps(make_flight(1))) + 2
+    count = max(int(size_mb * 1024 * 1024 / one), 1)
+    return json.dumps([make_flight(i) for i in range(1, count + 1)]).encode("utf-8")
+
+
+class Stub:
+    def __init__(self, listing_mb: float, use_gzip: bool, delay_ms: float, error_rate: float, hang_rate: float):
+        self.listing = make_listing(listing_mb)
+        self.listing_gz = gzip.compress(self.listing, compresslevel=6) if use_gzip else None
+        self.delay = delay_ms / 1000.0
+        self.error_rate = error_rate
+        self.hang_rate = hang_rate
+        self.fault_prefix = ""
+        self.hang_seconds = 30.0
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._rnd = random.Random(7)
+
+    def set_faults(self, query: dict[str, list[str]]) -> dict:
+        with self._lock:
+            if "delay_ms" in query:
+                self.delay = float(query["delay_ms"][0]) / 1000.0
+            if "error_rate" in query:
+                self.error_rate = float(query["error_rate"][0])
+            if "hang_rate" in query:
+                self.hang_rate = float(query["hang_rate"][0])
+            if "hang_seconds" in query:
+                self.hang_seconds = float(query["hang_seconds"][0])
+            if "prefix" in query:
+                self.fault_prefix = query["prefix"][0]
+            return {"delay_ms": self.delay * 1000, "error_rate": self.error_rate, "hang_rate": self.hang_rate,
+                    "hang_seconds": self.hang_seconds, "prefix": self.fault_prefix}
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body go out as separate writes; Nagle would hold the body for the ACK
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, encoding: str | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if encoding:
+                    self.send_header("Content-Encoding", encoding)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                url = urlsplit(self.path)
+                path = url.path
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    self.rfile.read(length)
+
+                # Control endpoints: not counted, never faulted
+                if path == "/__stats":
+                    return self._send(200, json.dumps(
+                        {"requests": stub.requests, "max_in_flight": stub.max_in_flight}).encode())
+                if path == "/__faults":
+                    return self._send(200, json.dumps(stub.set_faults(parse_qs(url.query))).encode())
+
+                with stub._lock:
+                    stub.requests += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    roll = stub._rnd.random()
+                    faulted = path.startswith(stub.fault_prefix)
+                    delay, hang_rate, error_rate = stub.delay, stub.hang_rate, stub.error_rate
+                try:
+                    if faulted and delay:
+                        time.sleep(delay)
+                    if faulted and roll < hang_rate:
+                        time.sleep(stub.hang_seconds)
+                    if faulted and roll < hang_rate + error_rate:
+                        return self._send(503, b'{"error": "STUB", "message": "injected failure"}')
+
+                    if path == "/flights" and self.command == "GET":
+                        accepts_gzip = "gzip" in (self.headers.get("Accept-Encoding") or "")
+                        if stub.listing_gz is not None and accepts_gzip:
+                            return self._send(200, stub.listing_gz, "gzip")
+                        return self._send(200, stub.listing)
+                    m = re.fullmatch(r"/flights/(\d+)", path)
+                    if m:
+                        return self._send(200, json.dumps(make_flight(int(m.group(1)))).encode())
+                    if path == "/airlines":
+                        return self._send(200, json.dumps(
+                            [{"id": i, "name": f"Airline {i:04d}"} for i in range(1, 21)]).encode())
+                    return self._send(200, b'{"ok": true}')
+                finally:
+                    with stub._lock:
+                        stub.in_flight -= 1
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        return Handler
+
+
+class StubServer(ThreadingHTTPServer):
+    # listen() runs in __init__, so the backlog has to be set on the class
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def serve(port: int, **kwargs) -> ThreadingHTTPServer:
+    stub = Stub(**kwargs)
+    return StubServer(("127.0.0.1", port), stub.handler())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=18811)
+    parser.add_argument("--listing-mb", type=float, default=1.0)
+    parser.add_argument("--gzip", action="store_true", help="serve /flights gzip-encoded when accepted")
+    parser.add_argument("--delay-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="fraction of requests that stall for 30 s")
+    args = parser.parse_args()
+
+    server = serve(args.port, listing_mb=args.listing_mb, use_gzip=args.gzip, delay_ms=args.delay_ms,
+                   error_rate=args.error_rate, hang_rate=args.hang_rate)
+    print(f"stub let_service on http://127.0.0.1:{args.port}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Registering many users: /auth/register one by one vs POST /admin/import-users.
+
+Generates --users NDJSON users (plus a few bad rows: invalid email, short
+password, a duplicate in the file, an email that already exists) and
+reports users/s for
+
+- register: --register of them through POST /auth/register, one request
+  each (serial bcrypt, email query and commit per user),
+- import, for each --workers: the whole file in one POST /admin/import-users
+  (a fresh table per run), with the per-row errors it returned.
+
+bcrypt is CPU-bound, so the import scales with the cores the hashing pool
+gets; on one core it is about as fast as registering.
+
+    python benchmarks/user_import.py --users 400 --workers 1 4
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from seed import BENCH_PASSWORD, ROOT, seed_server_users, user_email  # noqa: E402
+
+
+def _rows(users: int) -> list[dict]:
+    rows = [{"email": f"import{i}@corp.com", "password": BENCH_PASSWORD, "firstName": "Bench", "lastName": str(i),
+             "dateOfBirth": "1990-01-01", "gender": "_", "country": "Serbia", "street": f"Knez Mihailova {i}"}
+            for i in range(users)]
+    rows += [
+        {"email": "not-an-email", "password": BENCH_PASSWORD},
+        {"email": "short@corp.com", "password": "short"},
+        {"email": "import0@corp.com", "password": BENCH_PASSWORD},
+        {"email": user_email(1), "password": BENCH_PASSWORD},
+    ]
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server-db", default="sqlite:////tmp/bench-import-server.db")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--register", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    # Also points the gateway at the database and sets its required environment
+    seed_server_users(args.server_db, 10)
+    import jwt
+
+    from setup import app, SECRET_KEY
+    import routes  # noqa: F401
+
+    client = app.test_client()
+    token = jwt.encode({"id": 1, "role": "ADMIN"}, SECRET_KEY)
+    report: dict = {"cpus": os.cpu_count(), "users": args.users}
+
+    t0 = time.perf_counter()
+    for i in range(args.register):
+        res = client.post("/auth/register", json={"email": f"register{i}@corp.com", "password": BENCH_PASSWORD,
+                                                  "confirmPassword": BENCH_PASSWORD})
+        assert res.status_code == 200, res.get_json()
+    seconds = time.perf_counter() - t0
+    report["register"] = {"users": args.register, "seconds": round(seconds, 2),
+                          "users_per_second": round(args.register / seconds, 1)}
+    print(report["register"], file=sys.stderr, flush=True)
+
+    body = "\n".join(json.dumps(row) for row in _rows(args.users))
+    report["import"] = []
+    for workers in args.workers:
+        seed_server_users(args.server_db, 10)
+        app.config["IMPORT_HASH_WORKERS"] = workers
+        t0 = time.perf_counter()
+        res = client.post(f"/admin/import-users?token={token}", data=body, content_type="application/x-ndjson")
+        seconds = time.perf_counter() - t0
+        result = res.get_json()
+        run = {"workers": workers, "status": res.status_code, "imported": result.get("imported"),
+               "failed": result.get("failed"), "seconds": round(seconds, 2),
+               "users_per_second": round(result.get("imported", 0) / seconds, 1),
+               "errors": [f"line {e['line']}: {e['message']}" for e in result.get("errors", [])]}
+        report["import"].append(run)
+        print(run, file=sys.stderr, flush=True)
+
+    # The imported hashes log in like registered ones
+    res = client.post("/auth/login", json={"email": "import0@corp.com", "password": BENCH_PASSWORD})
+    report["imported_user_login"] = res.status_code
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(ROOT / "server"))
+    main()
@@ -0,0 +1,183 @@
+"""Wallet payments under concurrent purchases by one user.
+
+Starts `python -m let_service serve` (purchases decided at once), funds one
+user's wallet with exactly --affordable times a flight's price and fires
+--purchases concurrent POST /purchases for that flight from --clients
+threads. Recorded:
+
+- how many were accepted (202) and refused (402); exactly --affordable may
+  be accepted,
+- the wallet after every purchase was decided and after `settle`: nothing
+  may be held any more and the balance must be what the ledger says,
+- purchases/s with wallets on and off (LET_WALLET_ENABLED), the same
+  concurrent load spread over --users funded users,
+- how fast `settle` folds the captures of that load into balances.
+
+    python benchmarks/wallet.py --purchases 2000 --affordable 1000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from loadtest import ROOT, _wait_ready  # noqa: E402
+from seed import seed_let_service  # noqa: E402
+
+ADMIN = {"X-User-Id": "1", "X-User-Role": "ADMIN"}
+
+
+def _serve(env: dict) -> subprocess.Popen:
+    proc = subprocess.Popen([sys.executable, "-m", "let_service", "serve"], cwd=ROOT / "let_service", env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _wait_ready(f"http://{env['LET_BIND']}/ping")
+    return proc
+
+
+def _stop(proc: subprocess.Popen) -> None:
+    proc.terminate()
+    proc.wait(timeout=60)
+
+
+def _buy(let: str, jobs: list[tuple[str, int]], clients: int) -> tuple[dict[int, int], float]:
+    http = requests.Session()
+    http.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=clients))
+
+    def one(job):
+        user_id, flight_id = job
+        return http.post(f"{let}/purchases", json={"flight_id": flight_id},
+                         headers={"X-User-Id": user_id, "X-User-Role": "USER"}).status_code
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        codes = list(pool.map(one, jobs))
+    elapsed = time.perf_counter() - t0
+    counts: dict[int, int] = {}
+    for code in codes:
+        counts[code] = counts.get(code, 0) + 1
+    return counts, elapsed
+
+
+def _wait_decided(app, timeout: float = 60.0) -> int:
+    from let_service.db import db
+    from let_service.db.models import Purchase
+
+    deadline = time.monotonic() + timeout
+    with app.app_context():
+        while True:
+            pending = Purchase.query.filter(Purchase.status == "PENDING").count()
+            db.session.remove()
+            if not pending or time.monotonic() > deadline:
+                return pending
+            time.sleep(0.2)
+
+
+def _audit(app, user_id: str) -> dict:
+    """The wallet, and whether it matches its ledger."""
+    from sqlalchemy import func, select
+
+    from let_service.db import db
+    from let_service.db.models import LedgerEntry, Purchase, Wallet
+
+    with app.app_context():
+        wallet = Wallet.query.get(user_id)
+        sums = dict(db.session.execute(
+            select(LedgerEntry.kind, func.sum(LedgerEntry.amount_cents))
+            .where(LedgerEntry.user_id == user_id).group_by(LedgerEntry.kind)).all())
+        unsettled = db.session.execute(
+            select(func.coalesce(func.sum(LedgerEntry.amount_cents), 0))
+            .where(LedgerEntry.user_id == user_id, LedgerEntry.kind == "CAPTURE",
+                   LedgerEntry.settled_at.is_(None))).scalar()
+        completed = Purchase.query.filter(Purchase.user_id == user_id, Purchase.status == "COMPLETED").count()
+        db.session.remove()
+    deposits, captures = sums.get("DEPOSIT", 0), sums.get("CAPTURE", 0)
+    reserved, released = sums.get("RESERVE", 0), sums.get("RELEASE", 0)
+    return {
+        "balance": wallet.balance_cents / 100, "held": wallet.held_cents / 100,
+        "completed": completed,
+        # balance = deposits - settled captures; held = reserved - released - settled captures
+        "balance_matches_ledger": wallet.balance_cents == deposits - (captures - unsettled),
+        "held_matches_ledger": wallet.held_cents == reserved - released - (captures - unsettled),
+        "overdrawn": wallet.balance_cents - wallet.held_cents < 0 or wallet.balance_cents < 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--let-db", default="sqlite:////tmp/bench-wallet-let.db")
+    parser.add_argument("--purchases", type=int, default=2000)
+    parser.add_argument("--affordable", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--let-port", type=int, default=8813)
+    args = parser.parse_args()
+
+    seed_let_service(args.let_db, airlines=5, flights=500, purchases=0, ratings=0, users=args.users)
+    env = dict(os.environ, LET_SQLALCHEMY_DATABASE_URI=args.let_db, LET_AUTO_CREATE_SCHEMA="false",
+               LET_PURCHASE_PROCESSING_SECONDS="0", LET_BIND=f"127.0.0.1:{args.let_port}",
+               LET_WORKERS="2", LET_THREADS="16", LET_LIFECYCLE_ENABLED="false", LET_OUTBOX_ENABLED="false",
+               LET_WALLET_ENABLED="true")
+    os.environ.update(LET_LIFECYCLE_ENABLED="false", LET_OUTBOX_ENABLED="false")
+
+    from let_service import create_app
+    from let_service.app import settle_wallets
+    from let_service.db.models import Flight
+
+    app = create_app(create_schema=False)
+    with app.app_context():
+        flight = Flight.query.filter(Flight.approval_status == "APPROVED", Flight.canceled.is_(False),
+                                     Flight.departure_time > datetime.utcnow()).order_by(Flight.id).first()
+        flight_id, price = flight.id, flight.price
+    let = f"http://127.0.0.1:{args.let_port}"
+    report: dict = {"flight_price": price}
+
+    # One user, more purchases than they can pay for
+    proc = _serve(env)
+    try:
+        buyer = str(args.users + 1)
+        requests.put(f"{let}/wallets/{buyer}", json={"balance": round(price * args.affordable, 2)}, headers=ADMIN)
+        counts, elapsed = _buy(let, [(buyer, flight_id)] * args.purchases, args.clients)
+        pending = _wait_decided(app)
+        before = _audit(app, buyer)
+        settled = settle_wallets(app)
+        report["one_user"] = {
+            "purchases": args.purchases, "affordable": args.affordable, "statuses": counts,
+            "purchases_per_second": round(args.purchases / elapsed), "still_pending": pending,
+            "before_settle": before, "settled": settled, "after_settle": _audit(app, buyer),
+        }
+        print(report["one_user"], file=sys.stderr, flush=True)
+    finally:
+        _stop(proc)
+
+    # Throughput with and without wallets, seeded users all funded
+    jobs = [(str(i % args.users + 1), flight_id) for i in range(args.purchases)]
+    report["throughput"] = {}
+    for enabled in ("false", "true"):
+        proc = _serve(dict(env, LET_WALLET_ENABLED=enabled))
+        try:
+            counts, elapsed = _buy(let, jobs, args.clients)
+            _wait_decided(app)
+        finally:
+            _stop(proc)
+        report["throughput"]["wallet" if enabled == "true" else "no_wallet"] = {
+            "statuses": counts, "purchases_per_second": round(args.purchases / elapsed)}
+
+    t0 = time.perf_counter()
+    settled = settle_wallets(app)
+    seconds = time.perf_counter() - t0
+    report["settle"] = {"captures": settled, "seconds": round(seconds, 3),
+                        "captures_per_second": round(settled / seconds) if seconds else None}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,10 @@
-from .app import create_app
+__all__ = ["create_app", "warm_up"]
 
-__all__ = ["create_app"]
+
+def __getattr__(name: str):
+    # Deferred so `import let_service` doesn't pull in Flask/SQLAlchemy
+    if name in __all__:
+        from . import app
+
+        return getattr(app, name)
+    raise AttributeError(name)
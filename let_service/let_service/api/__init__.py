@@ -2,4 +2,4 @@ from flask import Blueprint
 
 api = Blueprint("api", __name__)
 
-from . import airlines, flights, purchases, ratings  # noqa: E402,F401
+from . import airlines, analytics, dashboard, flights, itineraries, purchases, ratings, schedules, wallets  # noqa: E402,F401
@@ -1,24 +1,34 @@
 from __future__ import annotations
 
-from flask import jsonify, request
+from datetime import datetime
+
+from flask import current_app, jsonify, request
 
 from ..db import db
-from ..db.models import Airline
+from ..db import deletion, versions
+from ..db.models import Airline, DeletionJob
 from ..utils.auth import require_roles
+from ..utils.etag import is_not_modified, not_modified, weak_etag, with_etag
 from ..utils.http import get_json_or_form
 from . import api
 
 
 @api.get("/airlines")
 def list_airlines():
-    airlines = Airline.query.order_by(Airline.name.asc()).all()
-    return jsonify([a.to_dict() for a in airlines])
+    etag = weak_etag("airlines", versions.current("airlines"))
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    airlines = Airline.query.filter(Airline.deleted_at.is_(None)).order_by(Airline.name.asc()).all()
+    return with_etag(jsonify([a.to_dict() for a in airlines]), etag)
 
 
 @api.get("/airlines/<int:airline_id>")
 def get_airline_by_id(airline_id: int):
-    airline = Airline.query.filter_by(id = airline_id).order_by(Airline.name.asc()).first()
-    return jsonify(airline)
+    airline = Airline.query.get(airline_id)
+    if airline is None or airline.deleted_at is not None:
+        return jsonify({"error": "NOT_FOUND", "message": "Airline not found"}), 404
+    return jsonify(airline.to_dict())
 
 
 @api.post("/airlines")
@@ -30,6 +40,8 @@ def create_airline():
         return jsonify({"error": "VALIDATION", "message": "name is required"}), 400
 
     existing = Airline.query.filter_by(name=name).first()
+    if existing and existing.deleted_at is not None:
+        return jsonify({"error": "CONFLICT", "message": "An airline with that name is being deleted"}), 409
     if existing:
         return jsonify(existing.to_dict()), 200
 
@@ -42,10 +54,33 @@ def create_airline():
 @api.delete("/airlines/<int:airline_id>")
 @require_roles(["ADMIN", "MANAGER"])
 def remove_airline(airline_id: int):
+    """
+    Hide the airline now and delete it, its flights and their ratings on a
+    background job (db/deletion.py). 202 with the job; poll
+    GET /deletions/<id>. Deleting it again returns the job in progress.
+    """
     existing = Airline.query.filter_by(id = airline_id).first()
     if not existing:
         return jsonify({"message": "Airline does not exist"}), 404
 
-    db.session.delete(existing)
+    if existing.deleted_at is not None:
+        job = (DeletionJob.query.filter_by(entity="airline", entity_id=airline_id)
+               .order_by(DeletionJob.id.desc()).first())
+        if job is not None and job.status != "FAILED":
+            return jsonify({"message": "Airline deletion in progress", "job": job.to_dict()}), 202
+
+    existing.deleted_at = datetime.utcnow()
+    job = deletion.queue(db.session, "airline", airline_id, deletion.airline_flights(db.session, airline_id))
     db.session.commit()
-    return jsonify({"message": "Airline successfully removed"}), 201
+
+    deletion.start(current_app._get_current_object(), job.id)
+    return jsonify({"message": "Airline deletion started", "job": job.to_dict()}), 202
+
+
+@api.get("/deletions/<int:job_id>")
+@require_roles(["ADMIN", "MANAGER"])
+def get_deletion(job_id: int):
+    job = DeletionJob.query.get(job_id)
+    if job is None:
+        return jsonify({"error": "NOT_FOUND", "message": "Deletion job not found"}), 404
+    return jsonify(job.to_dict())
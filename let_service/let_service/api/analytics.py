@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from flask import current_app, jsonify, request
+
+from ..db import versions
+from ..db.analytics import GROUPS, get_revenue_engine
+from ..utils.auth import require_roles
+from ..utils.metrics import phase
+from . import api
+
+
+def _parse_day(value: str | None, default):
+    if value is None or value.strip() == "":
+        return default, None
+    try:
+        return datetime.strptime(value.strip(), "%Y-%m-%d").date(), None
+    except ValueError:
+        return None, "dates must be YYYY-MM-DD"
+
+
+@api.get("/analytics/revenue")
+@require_roles(["ADMIN"])
+def revenue_report():
+    """Revenue and completed purchase counts.
+
+    Query params:
+      - group_by: day | flight | airline | route (default day)
+      - from / to: YYYY-MM-DD, inclusive UTC days of `purchased_at`
+        (default: the last 30 days, today included)
+      - airline_id: only flights of this airline
+      - limit: rows for flight/airline/route, by revenue (default 100)
+    """
+    group_by = (request.args.get("group_by") or "day").strip().lower()
+    if group_by not in GROUPS:
+        return jsonify({"error": "VALIDATION", "message": f"group_by must be one of {', '.join(GROUPS)}"}), 400
+
+    today = datetime.utcnow().date()
+    last_day, err = _parse_day(request.args.get("to"), today)
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    first_day, err = _parse_day(request.args.get("from"), last_day - timedelta(days=29))
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    if first_day > last_day:
+        return jsonify({"error": "VALIDATION", "message": "from must not be after to"}), 400
+    max_days = int(current_app.config.get("ANALYTICS_MAX_RANGE_DAYS", 731))
+    if (last_day - first_day).days + 1 > max_days:
+        return jsonify({"error": "VALIDATION", "message": f"range is limited to {max_days} days"}), 400
+
+    airline_id = request.args.get("airline_id") or request.args.get("airlineId")
+    if airline_id:
+        try:
+            airline_id = int(airline_id)
+        except ValueError:
+            return jsonify({"error": "VALIDATION", "message": "airline_id must be int"}), 400
+    else:
+        airline_id = None
+
+    try:
+        limit = int(request.args.get("limit") or 100)
+    except ValueError:
+        return jsonify({"error": "VALIDATION", "message": "limit must be int"}), 400
+    limit = max(1, min(limit, 10_000))
+
+    engine = get_revenue_engine()
+    report = engine.revenue(group_by, first_day, last_day, versions.current("flights", "airlines"),
+                            airline_id=airline_id, limit=limit)
+    with phase("serialize"):
+        return jsonify(report)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from flask import jsonify, request
+
+from ..db import db
+from ..db.dashboard import get_dashboard
+from ..utils.auth import current_user_role
+from ..utils.etag import is_not_modified, not_modified, weak_etag, with_etag
+from .flights import flight_response
+from . import api
+
+# Roles that also get approval and sales figures
+KPI_ROLES = ("ADMIN", "MANAGER")
+
+
+@api.get("/dashboard/summary")
+def dashboard_summary():
+    """Tab counts and the next upcoming flights, for dashboards that poll.
+
+    Query params:
+      - limit: upcoming flights to include (default 5, at most DASHBOARD_UPCOMING_MAX)
+
+    With X-User-Role ADMIN or MANAGER the response also has `kpis`: pending
+    approvals and today's purchases and revenue. Computed at most once per
+    DASHBOARD_TTL_SECONDS per process (db/dashboard.py).
+    """
+    dashboard = get_dashboard()
+    raw = (request.args.get("limit") or "5").strip()
+    try:
+        limit = int(raw)
+    except ValueError:
+        return jsonify({"error": "VALIDATION", "message": "limit must be int"}), 400
+    if not 0 <= limit <= dashboard.upcoming_max:
+        return jsonify({"error": "VALIDATION",
+                        "message": f"limit must be between 0 and {dashboard.upcoming_max}"}), 400
+
+    summary = dashboard.summary(db.session, flight_response)
+    with_kpis = current_user_role() in KPI_ROLES
+    etag = weak_etag("dashboard", summary["generated_at"], limit, with_kpis)
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    out = {
+        "generated_at": summary["generated_at"],
+        "tabs": summary["tabs"],
+        "upcoming": summary["upcoming"][:limit],
+    }
+    if with_kpis:
+        out["kpis"] = {
+            "pending_approvals": summary["tabs"]["pending"],
+            "purchases_today": summary["purchases_today"],
+        }
+    return with_etag(jsonify(out), etag)
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+import math
 from datetime import datetime, timedelta
 
-from flask import jsonify, request
+from flask import current_app, jsonify, request
 
 from ..db import db
-from ..db.models import Airline, Flight, Purchase
+from ..db import deletion, outbox, schedules, versions
+from ..db.catalog import TABS, get_catalog
+from ..db.approvals import decide_pending, skip_reasons
+from ..db.archive import find_flight
+from ..db.lifecycle import status_at, unfinished
+from ..db.models import Airline, ArchivedFlight, Flight, Purchase
 from ..utils.auth import current_user_id, require_roles
+from ..utils.etag import is_not_modified, not_modified, query_key, time_bucket, weak_etag, with_etag
 from ..utils.http import get_json_or_form, parse_iso_datetime
+from ..utils.metrics import phase
 from . import api
 
 
@@ -65,6 +73,42 @@ def _validate_required(data: dict, fields: list[str]):
     return True, []
 
 
+# sort param -> column; ties keep departure order
+SORTS = {
+    "departure_time": "departure_time",
+    "price": "price",
+    "duration": "duration_seconds",
+}
+
+# Tabs that also list flights moved to flights_archive (db/archive.py)
+ARCHIVE_TABS = ("archive", "archived", "all")
+# Tabs that also list occurrences of flight schedules (db/schedules.py)
+SCHEDULE_TABS = ("upcoming", "in_progress", "pending", "all")
+
+
+def _float_arg(name: str):
+    raw = (request.args.get(name) or "").strip()
+    if not raw:
+        return None, None
+    try:
+        value = float(raw)
+    except ValueError:
+        return None, f"{name} must be a number"
+    if not math.isfinite(value) or value < 0:
+        return None, f"{name} must be >= 0"
+    return value, None
+
+
+def _datetime_arg(name: str):
+    raw = (request.args.get(name) or "").strip()
+    if not raw:
+        return None, None
+    try:
+        return parse_iso_datetime(raw), None
+    except ValueError:
+        return None, f"{name} must be ISO datetime"
+
+
 @api.get("/flights")
 def list_flights():
     """List flights by tab.
@@ -74,61 +118,250 @@ def list_flights():
       - q: free text
       - airline_id / airlineId
       - approval_status: PENDING|APPROVED|REJECTED
+      - origin, destination: exact airport name
+      - min_price, max_price: inclusive price range
+      - departs_after (inclusive), departs_before (exclusive): ISO datetimes
+      - sort: departure_time (default) | price | duration; order: asc (default) | desc
+
+    Route, price and departure filters are applied in SQL, where
+    ix_flights_route_departure and ix_flights_departure_price serve them.
+    upcoming, in_progress and pending only read the live `flights` table;
+    archive and all add the matching rows of `flights_archive`.
+    upcoming, in_progress, pending and all also list the occurrences of
+    flight schedules departing before `departs_before` (default: within
+    SCHEDULE_HORIZON_DAYS), with "id": null and "virtual": true.
+
+    Answers `If-None-Match` with 304 before touching the flights table, and
+    from the in-memory catalog snapshot when CATALOG_SNAPSHOT_ENABLED is set.
     """
+    table_versions = versions.current("flights", "airlines", "schedules")
+    etag = weak_etag("flights", table_versions, time_bucket(), query_key())
+    if is_not_modified(etag):
+        return not_modified(etag)
+
     tab = (request.args.get("tab") or "upcoming").lower()
     q = (request.args.get("q") or request.args.get("query") or "").strip().lower()
     airline_id = request.args.get("airline_id") or request.args.get("airlineId")
     approval = (request.args.get("approval_status") or "").strip().upper()
+    origin = (request.args.get("origin") or "").strip() or None
+    destination = (request.args.get("destination") or "").strip() or None
 
-    query = Flight.query
     if airline_id:
         try:
-            query = query.filter(Flight.airline_id == int(airline_id))
+            airline_id = int(airline_id)
         except ValueError:
             return jsonify({"error": "VALIDATION", "message": "airline_id must be int"}), 400
+    else:
+        airline_id = None
+
+    min_price, err = _float_arg("min_price")
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    max_price, err = _float_arg("max_price")
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    if min_price is not None and max_price is not None and max_price < min_price:
+        return jsonify({"error": "VALIDATION", "message": "max_price must be >= min_price"}), 400
+
+    departs_after, err = _datetime_arg("departs_after")
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    departs_before, err = _datetime_arg("departs_before")
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+
+    sort = (request.args.get("sort") or "departure_time").strip().lower()
+    if sort not in SORTS:
+        return jsonify({"error": "VALIDATION", "message": f"sort must be one of: {', '.join(SORTS)}"}), 400
+    order = (request.args.get("order") or "asc").strip().lower()
+    if order not in ("asc", "desc"):
+        return jsonify({"error": "VALIDATION", "message": "order must be asc or desc"}), 400
+    descending = order == "desc"
+
+    if tab not in TABS:
+        return jsonify({"error": "VALIDATION", "message": "unknown tab"}), 400
+    filters = dict(
+        origin=origin, destination=destination, min_price=min_price, max_price=max_price,
+        departs_after=departs_after, departs_before=departs_before, sort=sort, descending=descending,
+    )
 
-    if approval:
-        query = query.filter(Flight.approval_status == approval)
+    catalog = get_catalog()
+    if catalog is not None:
+        catalog.sync(table_versions[:2])
+        # Filtering, sorting and building the dicts happen in one pass here
+        with phase("catalog"):
+            out = catalog.list_flights(tab, q, airline_id, approval, **filters)
+    else:
+        out = _sql_flights(Flight, tab, q, airline_id, approval, **filters)
+
+    if tab in SCHEDULE_TABS:
+        occurrences = _schedule_flights(tab, q, airline_id, approval, **filters)
+        if occurrences:
+            out = _merge_sorted(out, occurrences, sort, descending)
+
+    if tab in ARCHIVE_TABS:
+        archived = _sql_flights(ArchivedFlight, tab, q, airline_id, approval, **filters)
+        if archived:
+            out = _merge_sorted(out, archived, sort, descending)
+
+    return with_etag(jsonify(out), etag)
+
+
+def _sql_flights(
+    model,
+    tab: str,
+    q: str,
+    airline_id: int | None,
+    approval: str,
+    *,
+    origin: str | None,
+    destination: str | None,
+    min_price: float | None,
+    max_price: float | None,
+    departs_after: datetime | None,
+    departs_before: datetime | None,
+    sort: str,
+    descending: bool,
+) -> list[dict]:
+    """SQL path of `GET /flights` over `flights` or `flights_archive`."""
+    query = model.query.filter(deletion.airline_live(model))
+    if airline_id is not None:
+        query = query.filter(model.airline_id == airline_id)
 
-    flights = query.order_by(Flight.departure_time.asc()).all()
+    if approval:
+        query = query.filter(model.approval_status == approval)
+
+    if origin is not None:
+        query = query.filter(model.origin_airport == origin)
+    if destination is not None:
+        query = query.filter(model.destination_airport == destination)
+    if departs_after is not None:
+        query = query.filter(model.departure_time >= departs_after)
+    if departs_before is not None:
+        query = query.filter(model.departure_time < departs_before)
+    if min_price is not None:
+        query = query.filter(model.price >= min_price)
+    if max_price is not None:
+        query = query.filter(model.price <= max_price)
+
+    # Both tabs only read flights that have not landed, a departure range on
+    # ix_flights_unfinished_departure (db/lifecycle.py); flights the scheduler
+    # has not moved on yet are among them, and the loop below still decides
+    # the exact runtime state
+    now = utcnow()
+    if tab == "upcoming":
+        query = query.filter(model.approval_status == "APPROVED", model.canceled.is_(False), unfinished(model),
+                             model.lifecycle_status == "UPCOMING", model.departure_time > now)
+    elif tab == "in_progress":
+        query = query.filter(model.approval_status == "APPROVED", model.canceled.is_(False), unfinished(model),
+                             model.departure_time <= now)
+    elif tab == "pending":
+        query = query.filter(model.approval_status == "PENDING")
+
+    column = getattr(model, SORTS[sort])
+    ordering = [column.desc() if descending else column.asc()]
+    if sort != "departure_time":
+        ordering.append(model.departure_time.asc())
+    flights = query.order_by(*ordering, model.id.asc()).all()
 
     out: list[dict] = []
-    for f in flights:
-        if not _match_query(f, q):
-            continue
-        state, _ = compute_runtime_state(f)
-
-        if tab == "upcoming":
-            if f.approval_status != "APPROVED" or state != "UPCOMING":
-                continue
-        elif tab == "in_progress":
-            if f.approval_status != "APPROVED" or state != "IN_PROGRESS":
+    with phase("serialize"):
+        for f in flights:
+            if not _match_query(f, q):
                 continue
-        elif tab in ("archive", "archived"):
-            if state not in ("FINISHED", "CANCELED"):
-                continue
-        elif tab == "pending":
-            if f.approval_status != "PENDING":
-                continue
-        elif tab == "all":
-            pass
-        else:
-            return jsonify({"error": "VALIDATION", "message": "unknown tab"}), 400
-
-        out.append(flight_response(f))
-
-    return jsonify(out)
+            state, _ = compute_runtime_state(f)
+
+            if tab == "upcoming":
+                if f.approval_status != "APPROVED" or state != "UPCOMING":
+                    continue
+            elif tab == "in_progress":
+                if f.approval_status != "APPROVED" or state != "IN_PROGRESS":
+                    continue
+            elif tab in ("archive", "archived"):
+                if state not in ("FINISHED", "CANCELED"):
+                    continue
+            elif tab == "pending":
+                if f.approval_status != "PENDING":
+                    continue
+
+            out.append(flight_response(f))
+    return out
+
+
+def _schedule_flights(
+    tab: str,
+    q: str,
+    airline_id: int | None,
+    approval: str,
+    *,
+    origin: str | None,
+    destination: str | None,
+    min_price: float | None,
+    max_price: float | None,
+    departs_after: datetime | None,
+    departs_before: datetime | None,
+    sort: str,
+    descending: bool,
+) -> list[dict]:
+    """Not yet materialized schedule occurrences for `GET /flights`, unsorted."""
+    cfg = current_app.config
+    now = utcnow()
+    end = now + timedelta(days=float(cfg.get("SCHEDULE_HORIZON_DAYS", 30)))
+    if departs_before is not None:
+        end = min(departs_before, now + timedelta(days=float(cfg.get("SCHEDULE_MAX_WINDOW_DAYS", 400))))
 
+    found = schedules.candidates(
+        db.session, departs_after or schedules.default_start(now), end, airline_id=airline_id, approval=approval,
+        origin=origin, destination=destination, min_price=min_price, max_price=max_price,
+    )
+    found = [s for s in found if _match_query(s, q)]
 
-@api.get("/flights/<int:fligth_id>")
+    out: list[dict] = []
+    airlines: dict[int, dict | None] = {}
+    with phase("serialize"):
+        for schedule, departure in schedules.expand(db.session, found, departs_after, end, now):
+            state = status_at(departure, schedule.duration_seconds, now)
+            if tab == "upcoming":
+                if schedule.approval_status != "APPROVED" or state != "UPCOMING":
+                    continue
+            elif tab == "in_progress":
+                if schedule.approval_status != "APPROVED" or state != "IN_PROGRESS":
+                    continue
+            elif tab == "pending":
+                if schedule.approval_status != "PENDING":
+                    continue
+
+            if schedule.airline_id not in airlines:
+                airlines[schedule.airline_id] = schedule.airline.to_dict() if schedule.airline else None
+            out.append(schedules.occurrence_response(schedule, departure, now, airlines[schedule.airline_id]))
+    return out
+
+
+def _merge_sorted(live: list[dict], archived: list[dict], sort: str, descending: bool) -> list[dict]:
+    """Both lists in `GET /flights` order: sort key, then departure, then id."""
+    key = "duration_seconds" if sort == "duration" else sort
+    out = live + archived
+    # Stable sorts, least significant key first; ISO timestamps sort as text
+    # Schedule occurrences have no id yet; they follow flights departing with them
+    out.sort(key=lambda f: (f["id"] is None, f["id"] or 0))
+    out.sort(key=lambda f: f["departure_time"])
+    if sort != "departure_time" or descending:
+        out.sort(key=lambda f: f[key], reverse=descending)
+    return out
+
+
+@api.get("/flights/<int:flight_id>")
 def get_flight_by_id(flight_id: int):
-        
-    query = Flight.query.filter_by(id = flight_id).first()
+    etag = weak_etag("flight", flight_id, versions.current("flights", "airlines"), time_bucket())
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    query = find_flight(flight_id)
     
     if query is None:
         return jsonify({"error": "SELECT", "message": "Not found"}), 404
 
-    return jsonify({"data": query})
+    return with_etag(jsonify(flight_response(query)), etag)
 
 
 @api.post("/flights")
@@ -157,7 +390,7 @@ def create_flight():
         return jsonify({"error": "VALIDATION", "message": "airline_id must be int"}), 400
 
     airline = Airline.query.get(airline_id)
-    if not airline:
+    if not airline or airline.deleted_at is not None:
         return jsonify({"error": "NOT_FOUND", "message": "Airline not found"}), 404
 
     try:
@@ -217,7 +450,7 @@ def update_flight(flight_id: int):
         except ValueError:
             return jsonify({"error": "VALIDATION", "message": "airline_id must be int"}), 400
         airline = Airline.query.get(aid)
-        if not airline:
+        if not airline or airline.deleted_at is not None:
             return jsonify({"error": "NOT_FOUND", "message": "Airline not found"}), 404
         flight.airline_id = aid
     if "distance_km" in data:
@@ -243,12 +476,27 @@ def update_flight(flight_id: int):
 @api.delete("/flights/<int:flight_id>")
 @require_roles(["ADMIN"])
 def delete_flight(flight_id: int):
-    flight = Flight.query.get(flight_id)
-    if not flight:
+    """
+    Delete a flight, live or archived. 202 with the deletion job.
+
+    Unlike an airline, a flight is one row, so it is deleted in the request
+    (gone from listings and GET /flights/<id> at once) instead of being
+    soft-deleted; what refers to it, possibly many rows, goes to the job.
+    """
+    flight = find_flight(flight_id)
+    if not flight or flight.airline.deleted_at is not None:
         return jsonify({"error": "NOT_FOUND", "message": "Flight not found"}), 404
+    schedules.skip(db.session, flight)
     db.session.delete(flight)
+    if isinstance(flight, ArchivedFlight):
+        # Only `flights` writes are tracked automatically (db/versions.py, db/outbox.py)
+        versions.bump(db.session, "flights")
+        outbox.record(db.session, "flight", "deleted", [flight_id])
+    # Its ratings and PENDING purchases go on a background job (db/deletion.py)
+    job = deletion.queue(db.session, "flight", flight_id, flights_total=1, flights_deleted=1)
     db.session.commit()
-    return jsonify({"ok": True})
+    deletion.start(current_app._get_current_object(), job.id)
+    return jsonify({"ok": True, "job": job.to_dict()}), 202
 
 
 @api.post("/flights/<int:flight_id>/approve")
@@ -290,6 +538,80 @@ def reject_flight(flight_id: int):
     return jsonify(flight_response(flight))
 
 
+# action -> approval_status it sets
+APPROVAL_ACTIONS = {"approve": "APPROVED", "reject": "REJECTED"}
+
+
+def _parse_decision(item) -> tuple[tuple[str, list[int], str | None] | None, str | None]:
+    """(action, ids, reason), or an error message."""
+    if not isinstance(item, dict):
+        return None, "must be an object"
+    action = str(item.get("action") or "").strip().lower()
+    if action not in APPROVAL_ACTIONS:
+        return None, f"action must be one of: {', '.join(APPROVAL_ACTIONS)}"
+    ids = item.get("ids")
+    if not isinstance(ids, list) or not ids:
+        return None, "ids must be a non-empty list"
+    try:
+        ids = [int(i) for i in ids]
+    except (TypeError, ValueError):
+        return None, "ids must be integers"
+    reason = str(item.get("reason") or item.get("rejection_reason") or "").strip() or None
+    if action == "reject" and not reason:
+        return None, "reason is required"
+    return (action, ids, reason if action == "reject" else None), None
+
+
+@api.post("/flights/approvals/batch")
+@require_roles(["ADMIN"])
+def decide_flights_batch():
+    """Approve or reject many PENDING flights at once.
+
+    Expected JSON: {"action": "approve"|"reject", "ids": [...], "reason"}
+    (reason required to reject), or {"decisions": [such objects, ...]}, at
+    most APPROVALS_BATCH_MAX ids in all. One conditional UPDATE per decision
+    (db/approvals.py), all in one transaction; each result lists the ids it
+    changed and, for the others, whether the flight was NOT_FOUND or
+    NOT_PENDING (with its current status). An id in two decisions is
+    changed by the first.
+    """
+    data = get_json_or_form(request)
+    items = data.get("decisions") if "decisions" in data else [data]
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "VALIDATION", "message": "decisions must be a non-empty list"}), 400
+
+    decisions = []
+    for index, item in enumerate(items):
+        decision, err = _parse_decision(item)
+        if err:
+            where = f"decisions[{index}]: " if "decisions" in data else ""
+            return jsonify({"error": "VALIDATION", "message": f"{where}{err}"}), 400
+        decisions.append(decision)
+
+    max_ids = int(current_app.config.get("APPROVALS_BATCH_MAX", 5000))
+    if sum(len(ids) for _action, ids, _reason in decisions) > max_ids:
+        return jsonify({"error": "VALIDATION", "message": f"at most {max_ids} ids per batch"}), 400
+
+    now = utcnow()
+    by = current_user_id()
+    changed = [decide_pending(db.session, ids, APPROVAL_ACTIONS[action], reason, by, now)
+               for action, ids, reason in decisions]
+    skipped = [sorted(set(ids) - set(done)) for (_action, ids, _reason), done in zip(decisions, changed)]
+    reasons = skip_reasons(db.session, {i for ids in skipped for i in ids})
+    db.session.commit()
+
+    results = [
+        {"action": action, "changed": done,
+         "skipped": [{"id": i, "error": reasons[i][0], "approval_status": reasons[i][1]} for i in not_done]}
+        for (action, _ids, _reason), done, not_done in zip(decisions, changed, skipped)
+    ]
+    return jsonify({
+        "changed": sum(len(r["changed"]) for r in results),
+        "skipped": sum(len(r["skipped"]) for r in results),
+        "results": results,
+    })
+
+
 @api.post("/flights/<int:flight_id>/cancel")
 @require_roles(["ADMIN"])
 def cancel_flight(flight_id: int):
@@ -318,7 +640,7 @@ def flight_buyers(flight_id: int):
 
     Used by Server to send cancellation emails.
     """
-    flight = Flight.query.get(flight_id)
+    flight = find_flight(flight_id)
     if not flight:
         return jsonify({"error": "NOT_FOUND", "message": "Flight not found"}), 404
 
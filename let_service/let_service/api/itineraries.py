@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from flask import current_app, jsonify, request
+
+from ..db import schedules, versions
+from ..db.lifecycle import status_at
+from ..db.models import Flight, FlightSchedule
+from ..db.network import Leg, airport_key, epoch_us, from_epoch_us, get_network, search
+from ..utils.etag import is_not_modified, not_modified, query_key, time_bucket, weak_etag, with_etag
+from ..utils.metrics import phase
+from . import api
+from .flights import compute_runtime_state, flight_response, utcnow
+
+
+def _int_arg(name: str, default: int, low: int, high: int):
+    raw = request.args.get(name)
+    if raw is None or raw.strip() == "":
+        return default, None
+    try:
+        value = int(raw)
+    except ValueError:
+        return None, f"{name} must be int"
+    if value < low or value > high:
+        return None, f"{name} must be between {low} and {high}"
+    return value, None
+
+
+def _leg_response(leg: Leg, flights: dict, found_schedules: dict, now: datetime) -> dict | None:
+    """The leg as `GET /flights` renders it; None if it is no longer bookable.
+
+    Re-checked: another worker may have changed it after the index was built.
+    """
+    if leg.flight_id is not None:
+        f = flights.get(leg.flight_id)
+        if f is None or f.canceled or f.approval_status != "APPROVED" or compute_runtime_state(f)[0] != "UPCOMING":
+            return None
+        return flight_response(f)
+
+    schedule = found_schedules.get(leg.schedule_id)
+    departure = from_epoch_us(leg.departure_us)
+    if schedule is None or schedule.approval_status != "APPROVED" or schedule.airline.deleted_at is not None \
+            or not schedules.occurs_at(schedule, departure) \
+            or status_at(departure, schedule.duration_seconds, now) != "UPCOMING":
+        return None
+    return schedules.occurrence_response(schedule, departure, now)
+
+
+@api.get("/itineraries")
+def list_itineraries():
+    """Connections between two airports, earliest arrival first.
+
+    Query params:
+      - from, to: airport names (case-insensitive)
+      - date: YYYY-MM-DD, day of the first departure (UTC)
+      - max_legs: 1..ITINERARY_MAX_LEGS (default 2)
+      - min_layover_minutes / max_layover_minutes: layover window
+        (defaults ITINERARY_MIN_LAYOVER_MINUTES / ITINERARY_MAX_LAYOVER_MINUTES)
+      - limit: number of itineraries (default 5, max 20)
+
+    Every leg is APPROVED, not canceled and still UPCOMING. Legs may be
+    flight schedule occurrences not materialized yet (`"id": null`,
+    `"virtual": true`), as in `GET /flights`.
+    """
+    origin = (request.args.get("from") or "").strip()
+    destination = (request.args.get("to") or "").strip()
+    if not origin or not destination:
+        return jsonify({"error": "VALIDATION", "message": "from and to are required"}), 400
+
+    try:
+        day_start = datetime.strptime((request.args.get("date") or "").strip(), "%Y-%m-%d")
+    except ValueError:
+        return jsonify({"error": "VALIDATION", "message": "date must be YYYY-MM-DD"}), 400
+
+    cfg = current_app.config
+    max_legs, err = _int_arg("max_legs", 2, 1, int(cfg.get("ITINERARY_MAX_LEGS", 4)))
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    min_layover, err = _int_arg("min_layover_minutes", int(cfg.get("ITINERARY_MIN_LAYOVER_MINUTES", 45)), 0, 24 * 60)
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    max_layover, err = _int_arg("max_layover_minutes", int(cfg.get("ITINERARY_MAX_LAYOVER_MINUTES", 720)), 0, 48 * 60)
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    if max_layover < min_layover:
+        return jsonify({"error": "VALIDATION", "message": "max_layover_minutes must be >= min_layover_minutes"}), 400
+    limit, err = _int_arg("limit", 5, 1, 20)
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+
+    table_versions = versions.current("flights", "airlines", "schedules")
+    etag = weak_etag("itineraries", table_versions, time_bucket(), query_key())
+    if is_not_modified(etag):
+        return not_modified(etag)
+
+    max_trip = timedelta(hours=float(cfg.get("ITINERARY_MAX_TRIP_HOURS", 48)))
+    index = get_network().get(day_start, table_versions, max_trip)
+
+    # UPCOMING only: the first leg departs after now, later legs after it
+    now_us = epoch_us(utcnow())
+    found, _ = search(
+        index,
+        airport_key(origin),
+        airport_key(destination),
+        max(epoch_us(day_start), now_us + 1),
+        epoch_us(day_start + timedelta(days=1)),
+        max_legs,
+        min_layover * 60 * 1_000_000,
+        max_layover * 60 * 1_000_000,
+        int(max_trip.total_seconds()) * 1_000_000,
+        limit,
+    )
+
+    all_legs = [leg for itinerary in found for leg in itinerary.legs]
+    ids = {leg.flight_id for leg in all_legs if leg.flight_id is not None}
+    schedule_ids = {leg.schedule_id for leg in all_legs if leg.flight_id is None}
+    flights = {f.id: f for f in Flight.query.filter(Flight.id.in_(ids)).all()} if ids else {}
+    found_schedules = ({s.id: s for s in FlightSchedule.query.filter(FlightSchedule.id.in_(schedule_ids)).all()}
+                       if schedule_ids else {})
+
+    now = utcnow()
+    out = []
+    with phase("serialize"):
+        for itinerary in found:
+            legs = [_leg_response(leg, flights, found_schedules, now) for leg in itinerary.legs]
+            if any(leg is None for leg in legs):
+                continue
+            departure = datetime.fromisoformat(legs[0]["departure_time"])
+            arrival = datetime.fromisoformat(legs[-1]["end_time"])
+            out.append({
+                "legs": legs,
+                "stops": len(legs) - 1,
+                "layovers_seconds": [
+                    int((datetime.fromisoformat(b["departure_time"]) - datetime.fromisoformat(a["end_time"]))
+                        .total_seconds())
+                    for a, b in zip(legs, legs[1:])
+                ],
+                "departure_time": departure.isoformat(),
+                "arrival_time": arrival.isoformat(),
+                "duration_seconds": int((arrival - departure).total_seconds()),
+                "total_price": round(sum(leg["price"] for leg in legs), 2),
+            })
+
+    return with_etag(jsonify(out), etag)
@@ -1,16 +1,27 @@
 from __future__ import annotations
 
+import base64
+import logging
 import os
-import time
-from threading import Thread
+from datetime import datetime, timedelta
 from typing import Any, Dict, Optional, Tuple
 
 from flask import current_app, jsonify, request
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.exc import OperationalError
 
 from let_service.db import db
-from let_service.db.models import Flight, Purchase
+from let_service.db import schedules, wallet
+from let_service.db.deletion import FLIGHT_DELETED
+from let_service.db.lifecycle import SALES_CLOSED
+from let_service.db.models import ArchivedFlight, Flight, FlightSchedule, Purchase
+from let_service.utils.http import parse_iso_datetime
 from let_service.api import api
+from let_service.utils.draining import get_drain
 
+logger = logging.getLogger("let_service.purchases")
+
+_SETTLE_ATTEMPTS = 5
 
 
 def _get_processing_seconds() -> int:
@@ -38,54 +49,93 @@ def _get_user_headers() -> Tuple[Optional[int], str]:
     return user_id, role
 
 
-def _process_purchase(app, purchase_id: int) -> None:
- 
-    processing_seconds = _get_processing_seconds()
+def _outcome(purchase: Purchase) -> Tuple[str, Optional[str]]:
+    flight = Flight.query.get(purchase.flight_id)
+    if flight is None:
+        return "FAILED", "Flight not found"
 
-    with app.app_context():
-        # simulate slow processing
-        time.sleep(processing_seconds)
+    # Its airline is being deleted (db/deletion.py); the job may not have reached it yet
+    if flight.airline.deleted_at is not None:
+        return "FAILED", FLIGHT_DELETED
 
-        purchase = Purchase.query.get(purchase_id)
-        if purchase is None:
-            return
+    # Must be approved, not canceled, and not started yet
+    if getattr(flight, "approval_status", None) != "APPROVED":
+        return "FAILED", "Flight is not approved"
 
-        flight = Flight.query.get(purchase.flight_id)
-        if flight is None:
-            purchase.status = "FAILED"
-            purchase.failure_reason = "Flight not found"
-            db.session.commit()
-            return
-
-        # Must be approved, not canceled, and not started yet
-        if getattr(flight, "approval_status", None) != "APPROVED":
-            purchase.status = "FAILED"
-            purchase.failure_reason = "Flight is not approved"
-            db.session.commit()
-            return
-
-        if getattr(flight, "canceled", False):
-            purchase.status = "FAILED"
-            purchase.failure_reason = "Flight is canceled"
-            db.session.commit()
-            return
-
-        # runtime status should be UPCOMING for purchase to be allowed
-        if hasattr(flight, "compute_runtime_status"):
-            runtime_status = flight.compute_runtime_status()
+    if getattr(flight, "canceled", False):
+        return "FAILED", "Flight is canceled"
+
+    # Sales close at departure; the clock decides if the scheduler is behind
+    if flight.lifecycle_status != "UPCOMING" or flight.departure_time <= datetime.utcnow():
+        return "FAILED", SALES_CLOSED
+
+    return "COMPLETED", None
+
+
+def _settle(purchase_id: int) -> bool:
+    """Decide a PENDING purchase; False if it was already decided (e.g. by a
+    previous process before it was stopped)."""
+    purchase = Purchase.query.get(purchase_id)
+    if purchase is None or purchase.status != "PENDING":
+        return False
+
+    status, reason = _outcome(purchase)
+    values: Dict[str, Any] = {"status": status, "failure_reason": reason}
+    if status == "COMPLETED":
+        values["purchased_at"] = datetime.utcnow()
+    # Conditional on PENDING, so a purchase resumed by two processes is decided once
+    res = db.session.execute(
+        update(Purchase).where(Purchase.id == purchase_id, Purchase.status == "PENDING").values(**values)
+    )
+    decided = res.rowcount == 1
+    if decided:
+        # Paid or refunded in the transaction that decided it, so exactly once
+        if status == "COMPLETED":
+            wallet.capture(db.session, purchase_id)
         else:
-            # fallback: if method doesn't exist, allow purchase only if not clearly started.
-            runtime_status = "UPCOMING"
+            wallet.release(db.session, [purchase_id])
+    db.session.commit()
+    return decided
 
-        if runtime_status != "UPCOMING":
-            purchase.status = "FAILED"
-            purchase.failure_reason = "Flight already started or finished"
-            db.session.commit()
-            return
 
-        purchase.status = "COMPLETED"
-        purchase.failure_reason = None
-        db.session.commit()
+def _process_purchase(app, purchase_id: int) -> None:
+    # simulate slow processing; a draining worker stops waiting and decides now
+    app.extensions["draining"].stopping.wait(_get_processing_seconds())
+
+    backoff = 0.1
+    with app.app_context():
+        try:
+            # A busy database must not strand the purchase (and the money it
+            # holds) until the next start; _settle is safe to repeat
+            for attempt in range(_SETTLE_ATTEMPTS):
+                try:
+                    _settle(purchase_id)
+                    return
+                except OperationalError as error:
+                    db.session.rollback()
+                    if attempt == _SETTLE_ATTEMPTS - 1:
+                        raise
+                    logger.warning("deciding purchase %s failed (%s), retrying in %.1f s", purchase_id, error, backoff)
+                    app.extensions["draining"].stopping.wait(backoff)
+                    backoff *= 2
+        finally:
+            db.session.remove()
+
+
+def resume_pending_purchases(app) -> int:
+    """Decide purchases left PENDING by a process that stopped before their
+    thread finished. Runs once at startup (before gunicorn forks); only
+    purchases older than the processing delay are touched, so those still
+    being processed by a live process are left to it.
+    """
+    with app.app_context():
+        cutoff = datetime.utcnow() - timedelta(seconds=_get_processing_seconds())
+        ids = db.session.execute(
+            select(Purchase.id).where(Purchase.status == "PENDING", Purchase.created_at < cutoff).order_by(Purchase.id)
+        ).scalars().all()
+        settled = sum(_settle(purchase_id) for purchase_id in ids)
+        db.session.remove()
+    return settled
 
 
 @api.route("/purchases", methods=["POST"])
@@ -93,6 +143,10 @@ def create_purchase():
     """
     Start async purchase processing.
     Returns immediately with purchase in PENDING state (202 Accepted).
+    Instead of `flight_id`, `schedule_id` and `departure_time` buy an
+    occurrence of a flight schedule, which becomes a flight first.
+    With LET_WALLET_ENABLED the price is held from the user's wallet first
+    (db/wallet.py): 402 INSUFFICIENT_FUNDS when it does not cover it.
     """
     payload: Dict[str, Any]
     if request.is_json:
@@ -101,21 +155,54 @@ def create_purchase():
         # allow form-data too
         payload = dict(request.form or {})
 
+    if get_drain().draining:
+        response = jsonify({"error": "UNAVAILABLE", "message": "Service is shutting down, retry shortly"})
+        response.headers["Retry-After"] = "1"
+        return response, 503
+
     flight_id_raw = payload.get("flight_id")
-    if flight_id_raw is None or str(flight_id_raw).strip() == "":
-        return jsonify({"error": "VALIDATION", "message": "flight_id is required"}), 400
+    schedule_id_raw = payload.get("schedule_id")
+    by_schedule = (flight_id_raw is None or str(flight_id_raw).strip() == "") and schedule_id_raw is not None
+    if by_schedule:
+        # A listed schedule occurrence ("virtual": true) becomes a flight here
+        try:
+            schedule_id = int(str(schedule_id_raw).strip())
+            departure = parse_iso_datetime(str(payload.get("departure_time")))
+        except Exception:
+            return jsonify({"error": "VALIDATION",
+                            "message": "schedule_id must be an integer and departure_time an ISO datetime"}), 400
+    else:
+        if flight_id_raw is None or str(flight_id_raw).strip() == "":
+            return jsonify({"error": "VALIDATION", "message": "flight_id is required"}), 400
 
-    try:
-        flight_id = int(str(flight_id_raw).strip())
-    except ValueError:
-        return jsonify({"error": "VALIDATION", "message": "flight_id must be an integer"}), 400
+        try:
+            flight_id = int(str(flight_id_raw).strip())
+        except ValueError:
+            return jsonify({"error": "VALIDATION", "message": "flight_id must be an integer"}), 400
 
     user_id, _role = _get_user_headers()
     if user_id is None:
         return jsonify({"error": "AUTH", "message": "X-User-Id header is required"}), 401
 
-    flight = Flight.query.get(flight_id)
-    if flight is None:
+    if by_schedule:
+        schedule = FlightSchedule.query.get(schedule_id)
+        if schedule is None or schedule.airline.deleted_at is not None \
+                or not schedules.occurs_at(schedule, departure) or schedules.skipped(db.session, schedule.id, departure):
+            return jsonify({"error": "NOT_FOUND", "message": "Flight not found"}), 404
+        flight = schedules.find_occurrence(db.session, schedule.id, departure)
+        if flight is not None and (not isinstance(flight, Flight) or flight.departure_time != departure):
+            # Archived, or moved: listings show it under its id
+            return jsonify({"error": "NOT_FOUND", "message": "Flight not found"}), 404
+        if flight is None:
+            # Only occurrences that could be sold become rows
+            if schedule.approval_status != "APPROVED" or departure <= datetime.utcnow():
+                return jsonify({"error": "NOT_FOUND", "message": "Flight not found"}), 404
+            # Inserted in the purchase's transaction: a refused purchase leaves no row
+            flight, _created = schedules.materialize(db.session, schedule, departure)
+        flight_id = flight.id
+    else:
+        flight = Flight.query.get(flight_id)
+    if flight is None or flight.airline.deleted_at is not None:
         return jsonify({"error": "NOT_FOUND", "message": "Flight not found"}), 404
 
     purchase = Purchase(
@@ -126,10 +213,18 @@ def create_purchase():
         failure_reason=None,
     )
     db.session.add(purchase)
+    db.session.flush()
+    # The price is held in the same transaction; without the money there is no purchase
+    if current_app.config.get("WALLET_ENABLED", False) and not wallet.reserve(
+            db.session, str(user_id), purchase.id, wallet.to_cents(purchase.price_paid)):
+        db.session.rollback()
+        return jsonify({"error": "INSUFFICIENT_FUNDS", "message": "Not enough balance for this flight"}), 402
     db.session.commit()
 
     app = current_app._get_current_object()
-    Thread(target=_process_purchase, args=(app, purchase.id), daemon=True).start()
+    # Refused only if draining began since the check above; the purchase
+    # stays PENDING and the next start resumes it
+    get_drain().start(_process_purchase, app, purchase.id)
 
     return jsonify(
         {
@@ -142,28 +237,114 @@ def create_purchase():
     ), 202
 
 
+PURCHASE_STATUSES = ("PENDING", "COMPLETED", "FAILED")
+
+
+def encode_cursor(created_at: datetime, purchase_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{purchase_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    created_at, purchase_id = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8").split("|")
+    return datetime.fromisoformat(created_at), int(purchase_id)
+
+
+def _slim_purchase(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "user_id": row.user_id,
+        "flight_id": row.flight_id,
+        "status": row.status,
+        "failure_reason": row.failure_reason,
+        "price_paid": row.price_paid,
+        "purchased_at": row.purchased_at.isoformat() if row.purchased_at else None,
+        "created_at": row.created_at.isoformat() if row.created_at else None,
+        "flight": {
+            "id": row.flight_id,
+            "name": row.flight_name,
+            "departure_time": row.departure_time.isoformat() if row.departure_time else None,
+        } if row.flight_name is not None else None,
+    }
+
+
 @api.route("/users/<int:user_id>/purchases", methods=["GET"])
 def get_user_purchases(user_id: int):
-    purchases = (
-        Purchase.query.filter_by(user_id=user_id)
-        .order_by(Purchase.created_at.desc())
-        .all()
-    )
+    """
+    A user's purchases, newest first, one page at a time.
+
+    Query params:
+      - limit: page size (default PURCHASES_PAGE_SIZE, max PURCHASES_MAX_PAGE_SIZE)
+      - cursor: `X-Next-Cursor` of the previous page
+      - status: PENDING | COMPLETED | FAILED
+      - expand=flight: full flight (with airline) instead of id, name and departure
 
-    if purchases and hasattr(purchases[0], "to_dict"):
-        return jsonify([p.to_dict() for p in purchases]), 200
-
-    out = []
-    for p in purchases:
-        out.append(
-            {
-                "id": getattr(p, "id", None),
-                "user_id": getattr(p, "user_id", None),
-                "flight_id": getattr(p, "flight_id", None),
-                "price_paid": getattr(p, "price_paid", None),
-                "status": getattr(p, "status", None),
-                "failure_reason": getattr(p, "failure_reason", None),
-                "created_at": str(getattr(p, "created_at", "")) if getattr(p, "created_at", None) else None,
-            }
-        )
-    return jsonify(out), 200
+    Pages are keyset-paginated on (created_at, id) over the
+    ix_purchases_user_created index, so a page costs the same however long
+    the history is. `X-Next-Cursor` is only set when more rows follow.
+    """
+    cfg = current_app.config
+    max_limit = int(cfg.get("PURCHASES_MAX_PAGE_SIZE", 200))
+    try:
+        limit = int(request.args.get("limit") or cfg.get("PURCHASES_PAGE_SIZE", 50))
+    except ValueError:
+        return jsonify({"error": "VALIDATION", "message": "limit must be an integer"}), 400
+    if limit < 1 or limit > max_limit:
+        return jsonify({"error": "VALIDATION", "message": f"limit must be between 1 and {max_limit}"}), 400
+
+    status = (request.args.get("status") or "").strip().upper()
+    if status and status not in PURCHASE_STATUSES:
+        return jsonify({"error": "VALIDATION", "message": f"status must be one of: {', '.join(PURCHASE_STATUSES)}"}), 400
+
+    expand = (request.args.get("expand") or "").strip().lower()
+    if expand not in ("", "flight"):
+        return jsonify({"error": "VALIDATION", "message": "expand must be flight"}), 400
+
+    cursor = (request.args.get("cursor") or "").strip()
+    after: Optional[Tuple[datetime, int]] = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except (ValueError, UnicodeDecodeError):
+            return jsonify({"error": "VALIDATION", "message": "invalid cursor"}), 400
+
+    # user_id is a string column; an int parameter would keep MySQL off the index
+    conditions = [Purchase.user_id == str(user_id)]
+    if status:
+        conditions.append(Purchase.status == status)
+    if after is not None:
+        # Range on the index, then the tie on created_at broken by id
+        conditions.append(Purchase.created_at <= after[0])
+        conditions.append(or_(Purchase.created_at < after[0], Purchase.id < after[1]))
+    ordering = (Purchase.created_at.desc(), Purchase.id.desc())
+
+    if expand == "flight":
+        purchases = Purchase.query.filter(*conditions).order_by(*ordering).limit(limit + 1).all()
+        more = len(purchases) > limit
+        purchases = purchases[:limit]
+        out = [p.to_dict() for p in purchases]
+        last = (purchases[-1].created_at, purchases[-1].id) if purchases else None
+    else:
+        rows = db.session.execute(
+            select(
+                Purchase.id, Purchase.user_id, Purchase.flight_id, Purchase.status, Purchase.failure_reason,
+                Purchase.price_paid, Purchase.purchased_at, Purchase.created_at,
+                func.coalesce(Flight.name, ArchivedFlight.name).label("flight_name"),
+                func.coalesce(Flight.departure_time, ArchivedFlight.departure_time).label("departure_time"),
+            )
+            .outerjoin(Flight, Flight.id == Purchase.flight_id)
+            .outerjoin(ArchivedFlight, ArchivedFlight.id == Purchase.flight_id)
+            .where(*conditions)
+            .order_by(*ordering)
+            .limit(limit + 1)
+        ).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        out = [_slim_purchase(r) for r in rows]
+        last = (rows[-1].created_at, rows[-1].id) if rows else None
+
+    response = jsonify(out)
+    if more and last is not None:
+        response.headers["X-Next-Cursor"] = encode_cursor(*last)
+    return response, 200
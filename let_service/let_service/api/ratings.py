@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-from flask import jsonify, request
+from flask import current_app, jsonify, request
 
 from ..db import db
-from ..db.models import Flight, Purchase, Rating
+from ..db.models import Rating
+from ..db.ratings import NOT_FINISHED, NOT_FOUND, NOT_PURCHASED, rejection_reasons, upsert_rating, upsert_ratings
 from ..utils.auth import current_user_id, require_roles
-from .flights import compute_runtime_state
+from .flights import utcnow
 from . import api
 
 
@@ -16,6 +17,33 @@ def _require_int(value, name: str):
         return None, f"{name} must be int"
 
 
+# upsert_rating refusals -> (status, error, message), as the single endpoint returns them
+REJECTIONS = {
+    NOT_FOUND: (404, "NOT_FOUND", "Flight not found"),
+    NOT_FINISHED: (409, "INVALID", "Flight is not finished yet"),
+    NOT_PURCHASED: (403, "FORBIDDEN", "You can only rate flights you bought"),
+}
+
+
+def _parse_rating(data: dict):
+    """(user_id, flight_id, rating), or an error message."""
+    flight_id, err = _require_int(data.get("flight_id") or data.get("flightId"), "flight_id")
+    if err:
+        return None, err
+
+    rating_val, err = _require_int(data.get("rating"), "rating")
+    if err:
+        return None, err
+
+    if rating_val < 1 or rating_val > 5:
+        return None, "rating must be between 1 and 5"
+
+    user_id = str(data.get("user_id") or data.get("userId") or current_user_id() or "").strip()
+    if not user_id:
+        return None, "user_id is required (or send X-User-Id)"
+    return (user_id, flight_id, rating_val), None
+
+
 @api.post("/ratings")
 @require_roles(["USER", "ADMIN", "MANAGER"])
 def create_or_update_rating():
@@ -25,47 +53,82 @@ def create_or_update_rating():
       - flight_id (int)
       - rating (1..5)
       - user_id (optional; default from X-User-Id)
+
+    Eligibility and the write are one statement (db/ratings.py); the
+    response is the rating without its flight.
     """
     data = request.get_json(silent=True) if request.is_json else dict(request.form or {})
 
-    flight_id, err = _require_int(data.get("flight_id") or data.get("flightId"), "flight_id")
+    parsed, err = _parse_rating(data or {})
     if err:
         return jsonify({"error": "VALIDATION", "message": err}), 400
+    user_id, flight_id, rating_val = parsed
 
-    rating_val, err = _require_int(data.get("rating"), "rating")
-    if err:
-        return jsonify({"error": "VALIDATION", "message": err}), 400
-
-    if rating_val < 1 or rating_val > 5:
-        return jsonify({"error": "VALIDATION", "message": "rating must be between 1 and 5"}), 400
-
-    user_id = (data.get("user_id") or data.get("userId") or current_user_id() or "").strip()
-    if not user_id:
-        return jsonify({"error": "VALIDATION", "message": "user_id is required (or send X-User-Id)"}), 400
-
-    flight = Flight.query.get(flight_id)
-    if flight is None:
-        return jsonify({"error": "NOT_FOUND", "message": "Flight not found"}), 404
+    now = utcnow()
+    written = upsert_rating(db.session, user_id, flight_id, rating_val, now)
+    if written is None:
+        db.session.rollback()
+        reason = rejection_reasons(db.session, [(user_id, flight_id)], now)[(user_id, flight_id)]
+        status, error, message = REJECTIONS[reason]
+        return jsonify({"error": error, "message": message}), status
 
-    state, _ = compute_runtime_state(flight)
-    if state != "FINISHED":
-        return jsonify({"error": "INVALID", "message": "Flight is not finished yet"}), 409
-
-    # Must have purchased this flight (COMPLETED)
-    purchase = Purchase.query.filter_by(user_id=user_id, flight_id=flight_id, status="COMPLETED").first()
-    if purchase is None:
-        return jsonify({"error": "FORBIDDEN", "message": "You can only rate flights you bought"}), 403
+    db.session.commit()
+    return jsonify(written.row), 201 if written.created else 200
 
-    existing = Rating.query.filter_by(user_id=user_id, flight_id=flight_id).first()
-    if existing:
-        existing.rating = rating_val
-        db.session.commit()
-        return jsonify(existing.to_dict()), 200
 
-    r = Rating(user_id=user_id, flight_id=flight_id, rating=rating_val)
-    db.session.add(r)
+@api.post("/ratings/batch")
+@require_roles(["USER", "ADMIN", "MANAGER"])
+def create_or_update_ratings_batch():
+    """Create or update many ratings in one transaction.
+
+    Expected JSON: {"ratings": [{flight_id, rating, user_id?}, ...]} (or the
+    bare list), at most RATINGS_BATCH_MAX items. A malformed item fails the
+    whole batch with 400; an item that may not be rated is reported in
+    `results` with the error the single endpoint would return, and the rest
+    are still written. Eligible items are written RATINGS_BATCH_CHUNK at a
+    time, one statement per chunk.
+    """
+    data = request.get_json(silent=True)
+    items = data.get("ratings") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "VALIDATION", "message": "ratings must be a non-empty list"}), 400
+
+    max_items = int(current_app.config.get("RATINGS_BATCH_MAX", 500))
+    if len(items) > max_items:
+        return jsonify({"error": "VALIDATION", "message": f"at most {max_items} ratings per batch"}), 400
+
+    parsed = []
+    for index, item in enumerate(items):
+        value, err = _parse_rating(item) if isinstance(item, dict) else (None, "item must be an object")
+        if err:
+            return jsonify({"error": "VALIDATION", "message": f"ratings[{index}]: {err}"}), 400
+        parsed.append(value)
+
+    now = utcnow()
+    written = upsert_ratings(db.session, parsed, now, int(current_app.config.get("RATINGS_BATCH_CHUNK", 200)))
+    refused = sorted({(user_id, flight_id) for user_id, flight_id, _ in parsed} - written.keys())
+    reasons = rejection_reasons(db.session, refused, now)
     db.session.commit()
-    return jsonify(r.to_dict()), 201
+
+    results: list[dict] = []
+    reported: set[tuple[str, int]] = set()
+    for user_id, flight_id, rating_val in parsed:
+        pair = (user_id, flight_id)
+        write = written.get(pair)
+        if write is None:
+            _, error, message = REJECTIONS[reasons[pair]]
+            results.append({"user_id": user_id, "flight_id": flight_id, "rating": rating_val, "status": "rejected",
+                            "error": error, "message": message})
+            continue
+        # A pair repeated in the batch is written once, with its last rating
+        created = write.created and pair not in reported
+        reported.add(pair)
+        results.append({**write.row, "status": "created" if created else "updated"})
+
+    counts = {"created": 0, "updated": 0, "rejected": 0}
+    for result in results:
+        counts[result["status"]] += 1
+    return jsonify({**counts, "results": results}), 200
 
 
 @api.get("/ratings")
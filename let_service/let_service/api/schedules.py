@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+from datetime import timedelta
+
+from flask import current_app, jsonify, request
+
+from ..db import db
+from ..db import schedules
+from ..db.models import Airline, FlightSchedule, ScheduleSkip
+from ..utils.auth import current_user_id, require_roles
+from ..utils.http import get_json_or_form, parse_iso_datetime
+from .flights import _validate_required, flight_response, utcnow
+from . import api
+
+
+def _parse_rule(data: dict, schedule: FlightSchedule) -> str | None:
+    """Apply starts_at/ends_at/frequency/every/weekdays from `data`; returns an error message."""
+    try:
+        if "starts_at" in data:
+            schedule.starts_at = parse_iso_datetime(str(data.get("starts_at")))
+        if "ends_at" in data:
+            schedule.ends_at = parse_iso_datetime(str(data.get("ends_at"))) if data.get("ends_at") else None
+    except Exception:
+        return "starts_at and ends_at must be ISO datetimes"
+    if schedule.ends_at is not None and schedule.ends_at < schedule.starts_at:
+        return "ends_at must be >= starts_at"
+
+    if "frequency" in data:
+        schedule.frequency = str(data.get("frequency") or "").strip().upper()
+    if schedule.frequency not in schedules.FREQUENCIES:
+        return f"frequency must be one of: {', '.join(schedules.FREQUENCIES)}"
+
+    if "every" in data:
+        try:
+            schedule.every = int(data.get("every"))
+        except (TypeError, ValueError):
+            return "every must be int"
+    if schedule.every is None or not 1 <= schedule.every <= 52:
+        return "every must be between 1 and 52"
+
+    if "weekdays" in data:
+        if data.get("weekdays") in (None, "", []):
+            schedule.weekdays = None
+        else:
+            days = schedules.parse_weekdays(data.get("weekdays"))
+            if days is None:
+                return "weekdays must be a list of 0 (Monday) .. 6 (Sunday)"
+            schedule.weekdays = ",".join(str(day) for day in days)
+    return None
+
+
+def _departure_arg(data: dict):
+    try:
+        return parse_iso_datetime(str(data.get("departure_time"))), None
+    except Exception:
+        return None, "departure_time must be ISO datetime"
+
+
+@api.post("/schedules")
+@require_roles(["MANAGER"])
+def create_schedule():
+    """
+    A recurring flight: DAILY, or WEEKLY on `weekdays` (0 = Monday), every
+    `every` days/weeks, departing at the time of day of `starts_at`, until
+    `ends_at` (optional). PENDING until an admin approves it.
+    """
+    data = get_json_or_form(request)
+    ok, missing = _validate_required(
+        data,
+        [
+            "name",
+            "airline_id",
+            "distance_km",
+            "duration_seconds",
+            "starts_at",
+            "origin_airport",
+            "destination_airport",
+            "price",
+        ],
+    )
+    if not ok:
+        return jsonify({"error": "VALIDATION", "message": f"Missing: {', '.join(missing)}"}), 400
+
+    try:
+        airline_id = int(data.get("airline_id"))
+    except ValueError:
+        return jsonify({"error": "VALIDATION", "message": "airline_id must be int"}), 400
+    airline = Airline.query.get(airline_id)
+    if not airline or airline.deleted_at is not None:
+        return jsonify({"error": "NOT_FOUND", "message": "Airline not found"}), 404
+
+    creator = current_user_id() or str(data.get("created_by_user_id") or "")
+    if not creator:
+        return jsonify({"error": "VALIDATION", "message": "created_by_user_id required (or send X-User-Id header)"}), 400
+
+    schedule = FlightSchedule(
+        name=str(data.get("name")).strip(),
+        airline_id=airline_id,
+        distance_km=float(data.get("distance_km")),
+        duration_seconds=int(float(data.get("duration_seconds"))),
+        origin_airport=str(data.get("origin_airport")).strip(),
+        destination_airport=str(data.get("destination_airport")).strip(),
+        price=float(data.get("price")),
+        created_by_user_id=creator,
+        frequency="DAILY",
+        every=1,
+        approval_status="PENDING",
+    )
+    error = _parse_rule(data, schedule)
+    if error:
+        return jsonify({"error": "VALIDATION", "message": error}), 400
+
+    db.session.add(schedule)
+    db.session.commit()
+    return jsonify(schedule.to_dict()), 201
+
+
+@api.get("/schedules")
+def list_schedules():
+    query = FlightSchedule.query.join(Airline, Airline.id == FlightSchedule.airline_id).filter(
+        Airline.deleted_at.is_(None))
+    airline_id = request.args.get("airline_id") or request.args.get("airlineId")
+    if airline_id:
+        try:
+            query = query.filter(FlightSchedule.airline_id == int(airline_id))
+        except ValueError:
+            return jsonify({"error": "VALIDATION", "message": "airline_id must be int"}), 400
+    return jsonify([s.to_dict() for s in query.order_by(FlightSchedule.id.asc()).all()])
+
+
+@api.get("/schedules/<int:schedule_id>")
+def get_schedule(schedule_id: int):
+    """The schedule and its next departures (`next`, default 5, at most 50)."""
+    schedule = FlightSchedule.query.get(schedule_id)
+    if not schedule:
+        return jsonify({"error": "NOT_FOUND", "message": "Schedule not found"}), 404
+    try:
+        count = min(max(int(request.args.get("next") or 5), 0), 50)
+    except ValueError:
+        return jsonify({"error": "VALIDATION", "message": "next must be int"}), 400
+
+    now = utcnow()
+    horizon = now + timedelta(days=float(current_app.config.get("SCHEDULE_MAX_WINDOW_DAYS", 400)))
+    departures = []
+    for departure in schedules.occurrences(schedule, now, horizon):
+        if len(departures) >= count:
+            break
+        departures.append(departure.isoformat())
+    out = schedule.to_dict()
+    out["next_departures"] = departures
+    return jsonify(out)
+
+
+@api.put("/schedules/<int:schedule_id>")
+@require_roles(["MANAGER", "ADMIN"])
+def update_schedule(schedule_id: int):
+    """Changes apply to occurrences not materialized yet; flights rows keep their values."""
+    schedule = FlightSchedule.query.get(schedule_id)
+    if not schedule:
+        return jsonify({"error": "NOT_FOUND", "message": "Schedule not found"}), 404
+
+    data = get_json_or_form(request)
+    if schedule.approval_status == "REJECTED":
+        schedule.approval_status = "PENDING"
+        schedule.rejection_reason = None
+        schedule.approved_by_user_id = None
+        schedule.approved_at = None
+
+    if "name" in data:
+        schedule.name = str(data.get("name") or "").strip() or schedule.name
+    try:
+        if "distance_km" in data:
+            schedule.distance_km = float(data.get("distance_km"))
+        if "duration_seconds" in data:
+            schedule.duration_seconds = int(float(data.get("duration_seconds")))
+        if "price" in data:
+            schedule.price = float(data.get("price"))
+    except (TypeError, ValueError):
+        db.session.rollback()
+        return jsonify({"error": "VALIDATION", "message": "distance_km, duration_seconds and price must be numbers"}), 400
+    if "origin_airport" in data:
+        schedule.origin_airport = str(data.get("origin_airport") or "").strip() or schedule.origin_airport
+    if "destination_airport" in data:
+        schedule.destination_airport = str(data.get("destination_airport") or "").strip() or schedule.destination_airport
+
+    error = _parse_rule(data, schedule)
+    if error:
+        db.session.rollback()
+        return jsonify({"error": "VALIDATION", "message": error}), 400
+
+    db.session.commit()
+    return jsonify(schedule.to_dict())
+
+
+@api.delete("/schedules/<int:schedule_id>")
+@require_roles(["MANAGER", "ADMIN"])
+def delete_schedule(schedule_id: int):
+    """Stops listing its occurrences; materialized ones stay as ordinary flights."""
+    schedule = FlightSchedule.query.get(schedule_id)
+    if not schedule:
+        return jsonify({"error": "NOT_FOUND", "message": "Schedule not found"}), 404
+    ScheduleSkip.query.filter_by(schedule_id=schedule.id).delete()
+    db.session.delete(schedule)
+    db.session.commit()
+    return jsonify({"ok": True})
+
+
+@api.post("/schedules/<int:schedule_id>/approve")
+@require_roles(["ADMIN"])
+def approve_schedule(schedule_id: int):
+    schedule = FlightSchedule.query.get(schedule_id)
+    if not schedule:
+        return jsonify({"error": "NOT_FOUND", "message": "Schedule not found"}), 404
+    if schedule.approval_status != "PENDING":
+        return jsonify({"error": "VALIDATION", "message": "Only PENDING schedules can be approved"}), 400
+
+    schedule.approval_status = "APPROVED"
+    schedule.rejection_reason = None
+    schedule.approved_by_user_id = current_user_id()
+    schedule.approved_at = utcnow()
+    db.session.commit()
+    return jsonify(schedule.to_dict())
+
+
+@api.post("/schedules/<int:schedule_id>/reject")
+@require_roles(["ADMIN"])
+def reject_schedule(schedule_id: int):
+    schedule = FlightSchedule.query.get(schedule_id)
+    if not schedule:
+        return jsonify({"error": "NOT_FOUND", "message": "Schedule not found"}), 404
+    if schedule.approval_status != "PENDING":
+        return jsonify({"error": "VALIDATION", "message": "Only PENDING schedules can be rejected"}), 400
+
+    data = get_json_or_form(request)
+    reason = str(data.get("reason") or data.get("rejection_reason") or "").strip()
+    if not reason:
+        return jsonify({"error": "VALIDATION", "message": "reason is required"}), 400
+
+    schedule.approval_status = "REJECTED"
+    schedule.rejection_reason = reason
+    schedule.approved_by_user_id = current_user_id()
+    schedule.approved_at = utcnow()
+    db.session.commit()
+    return jsonify(schedule.to_dict())
+
+
+@api.post("/schedules/<int:schedule_id>/occurrences")
+@require_roles(["MANAGER", "ADMIN"])
+def materialize_occurrence(schedule_id: int):
+    """
+    Turn the occurrence at `departure_time` into a flight, to approve,
+    reject, cancel or edit it through /flights/<id>. 201 with the new
+    flight, 200 if it already was one (also after its departure moved).
+    """
+    schedule = FlightSchedule.query.get(schedule_id)
+    if not schedule or schedule.airline.deleted_at is not None:
+        return jsonify({"error": "NOT_FOUND", "message": "Schedule not found"}), 404
+
+    departure, err = _departure_arg(get_json_or_form(request))
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    if not schedules.occurs_at(schedule, departure) or schedules.skipped(db.session, schedule.id, departure):
+        return jsonify({"error": "NOT_FOUND", "message": "The schedule has no departure at that time"}), 404
+
+    flight, created = schedules.materialize(db.session, schedule, departure)
+    db.session.commit()
+    return jsonify(flight_response(flight)), 201 if created else 200
+
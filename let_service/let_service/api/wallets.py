@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from flask import jsonify, request
+from sqlalchemy import select
+
+from ..db import db
+from ..db import wallet
+from ..db.models import LedgerEntry, Wallet
+from ..utils.auth import require_roles
+from . import api
+
+
+def _amount(data: dict, name: str):
+    """Cents from a JSON amount in currency units, or an error message."""
+    value = data.get(name)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None, f"{name} must be a number"
+    return wallet.to_cents(value), None
+
+
+# Users per GET /wallets?user_id= and per POST /wallets/import
+WALLETS_BATCH_MAX = 1000
+
+
+@api.get("/wallets")
+def list_wallets():
+    """Wallets of `user_id` (comma-separated), in that order; users without one get an empty wallet."""
+    user_ids = [part.strip() for part in (request.args.get("user_id") or "").split(",") if part.strip()]
+    if len(user_ids) > WALLETS_BATCH_MAX:
+        return jsonify({"error": "VALIDATION", "message": f"At most {WALLETS_BATCH_MAX} user ids"}), 400
+    rows = {w.user_id: w for w in Wallet.query.filter(Wallet.user_id.in_(user_ids)).all()} if user_ids else {}
+    return jsonify([
+        (rows.get(uid) or Wallet(user_id=uid, balance_cents=0, held_cents=0)).to_dict() for uid in user_ids
+    ])
+
+
+@api.get("/wallets/<user_id>")
+def get_wallet(user_id: str):
+    """Balance, held and available money; `?entries=N` adds the newest N ledger entries."""
+    row = Wallet.query.get(user_id)
+    body = row.to_dict() if row else Wallet(user_id=user_id, balance_cents=0, held_cents=0).to_dict()
+    try:
+        limit = int(request.args.get("entries") or 0)
+    except ValueError:
+        return jsonify({"error": "VALIDATION", "message": "entries must be an integer"}), 400
+    if limit < 0 or limit > 200:
+        return jsonify({"error": "VALIDATION", "message": "entries must be between 0 and 200"}), 400
+    if limit:
+        entries = db.session.execute(
+            select(LedgerEntry)
+            .where(LedgerEntry.user_id == user_id)
+            .order_by(LedgerEntry.created_at.desc(), LedgerEntry.id.desc())
+            .limit(limit)
+        ).scalars()
+        body["entries"] = [entry.to_dict() for entry in entries]
+    return jsonify(body)
+
+
+@api.put("/wallets/<user_id>")
+@require_roles(["ADMIN"])
+def set_wallet(user_id: str):
+    """Set the available money to `balance` (what the gateway's user balance means).
+
+    Written as a deposit of the difference, so the ledger still adds up.
+    """
+    data = request.get_json(silent=True) or {}
+    cents, err = _amount(data, "balance")
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    if cents < 0:
+        return jsonify({"error": "VALIDATION", "message": "balance must not be negative"}), 400
+    wallet.set_available(db.session, user_id, cents)
+    db.session.commit()
+    return jsonify(Wallet.query.get(user_id).to_dict())
+
+
+@api.post("/wallets/import")
+@require_roles(["ADMIN"])
+def import_wallets():
+    """Open wallets from `{"wallets": [{"user_id", "balance"}]}` for users without one.
+
+    The gateway's `python app.py backfill-wallets` sends the balances users
+    had before wallets existed; users that already have a wallet are skipped.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get("wallets")
+    if not isinstance(items, list) or len(items) > WALLETS_BATCH_MAX:
+        return jsonify({"error": "VALIDATION", "message": f"wallets must be a list of at most {WALLETS_BATCH_MAX}"}), 400
+    balances = {}
+    for item in items:
+        cents, err = _amount(item if isinstance(item, dict) else {}, "balance")
+        if err or not str(item.get("user_id") or "").strip():
+            return jsonify({"error": "VALIDATION", "message": err or "user_id is required"}), 400
+        if cents < 0:
+            return jsonify({"error": "VALIDATION", "message": "balance must not be negative"}), 400
+        balances[str(item["user_id"]).strip()] = cents
+    imported = wallet.import_balances(db.session, balances)
+    db.session.commit()
+    return jsonify({"imported": imported, "skipped": len(balances) - imported})
+
+
+@api.post("/wallets/<user_id>/deposits")
+@require_roles(["ADMIN"])
+def deposit(user_id: str):
+    """Add `amount` (negative takes it out, never below what is held)."""
+    data = request.get_json(silent=True) or {}
+    cents, err = _amount(data, "amount")
+    if err:
+        return jsonify({"error": "VALIDATION", "message": err}), 400
+    if not wallet.deposit(db.session, user_id, cents):
+        db.session.rollback()
+        return jsonify({"error": "INSUFFICIENT_FUNDS", "message": "Not enough available balance"}), 402
+    db.session.commit()
+    return jsonify(Wallet.query.get(user_id).to_dict()), 201
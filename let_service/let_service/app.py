@@ -1,24 +1,37 @@
 from __future__ import annotations
 
-from dotenv import load_dotenv
-load_dotenv()
-
-from dotenv import load_dotenv
 from flask import Flask, jsonify
 
 from .config import Config
 from .db import db
+from .db import versions  # noqa: F401  (registers write tracking for ETags)
+from .db.catalog import init_catalog
+from .db.deletion import init_deletion
+from .db.lifecycle import init_lifecycle
+from .db.outbox import init_outbox
 from .api import api
+from .utils.compression import init_compression
+from .utils.draining import init_draining
+from .utils.metrics import init_metrics
 
 
-def create_app() -> Flask:
-
-    load_dotenv(override=False)
+def create_app(create_schema: bool | None = None) -> Flask:
+    """Build the Flask app.
 
+    create_schema=None follows Config.AUTO_CREATE_SCHEMA; production workers
+    should leave schema creation to `python -m let_service migrate`.
+    """
     app = Flask(__name__)
     app.config.from_object(Config)
 
     db.init_app(app)
+    init_metrics(app, db)
+    init_compression(app)
+    init_catalog(app)
+    init_outbox(app)
+    init_lifecycle(app)
+    init_draining(app)
+    init_deletion(app)
 
     @app.get("/ping")
     def ping():
@@ -26,14 +39,151 @@ def create_app() -> Flask:
 
     app.register_blueprint(api)
 
-    with app.app_context():
-        db.create_all()
+    @app.cli.command("migrate")
+    def migrate_command():
+        """Create missing tables."""
+        with app.app_context():
+            db.create_all()
+
+    @app.cli.command("archive")
+    def archive_command():
+        """Move flights past the retention window to flights_archive."""
+        print(f"archived {archive(app)} flights")
+
+    @app.cli.command("lifecycle")
+    def lifecycle_command():
+        """Store every departure and landing that is due."""
+        departed, landed = lifecycle(app)
+        print(f"{departed} flights departed, {landed} landed")
+
+    @app.cli.command("settle")
+    def settle_command():
+        """Fold captured purchase payments into wallet balances."""
+        print(f"settled {settle_wallets(app)} payments")
+
+    @app.cli.command("deletions")
+    def deletions_command():
+        """Run queued airline/flight deletions and those a stopped worker left."""
+        print(f"finished {run_deletions(app)} deletion jobs")
+
+    if create_schema is None:
+        create_schema = app.config.get("AUTO_CREATE_SCHEMA", True)
+    if create_schema:
+        with app.app_context():
+            db.create_all()
 
     return app
 
 
+def warm_up(app: Flask, connections: int | None = None) -> None:
+    """Fill the connection pool and configure mappers ahead of traffic.
+
+    Safe to call from a gunicorn `post_fork` hook when the app is preloaded:
+    connections inherited from the master are dropped first.
+    """
+    from sqlalchemy import text
+    from sqlalchemy.orm import configure_mappers
+
+    from .db import models  # noqa: F401
+
+    if connections is None:
+        connections = int(app.config.get("WARM_UP_CONNECTIONS", 5))
+
+    with app.app_context():
+        configure_mappers()
+        db.engine.dispose(close=False)
+
+        opened = []
+        try:
+            for _ in range(max(connections, 1)):
+                conn = db.engine.connect()
+                conn.execute(text("SELECT 1"))
+                opened.append(conn)
+        finally:
+            for conn in opened:
+                conn.close()
+
+
+def archive(app: Flask) -> int:
+    """One archival run (db/archive.py); meant for cron / a scheduled job."""
+    from datetime import datetime, timedelta
+
+    from .db.archive import archive_flights
+
+    with app.app_context():
+        return archive_flights(
+            db.session,
+            datetime.utcnow(),
+            timedelta(days=float(app.config.get("ARCHIVE_RETENTION_DAYS", 30))),
+            batch_size=int(app.config.get("ARCHIVE_BATCH_SIZE", 5000)),
+        )
+
+
+def lifecycle(app: Flask) -> tuple[int, int]:
+    """One full lifecycle sweep (db/lifecycle.py), e.g. right after adding the column."""
+    from datetime import datetime
+
+    from .db.lifecycle import advance
+
+    with app.app_context():
+        departed, landed = advance(db.session, datetime.utcnow(),
+                                   batch_size=int(app.config.get("LIFECYCLE_BATCH_SIZE", 5000)))
+    return len(departed), len(landed)
+
+
+def settle_wallets(app: Flask) -> int:
+    """One settlement run (db/wallet.py); meant for cron / a scheduled job."""
+    from .db.wallet import settle
+
+    with app.app_context():
+        return settle(db.session, batch_size=int(app.config.get("WALLET_SETTLE_BATCH_SIZE", 5000)))
+
+
+def run_deletions(app: Flask) -> int:
+    """Run pending deletion jobs in this process (db/deletion.py)."""
+    from .db.deletion import run_pending
+
+    return run_pending(app)
+
+
+def migrate() -> None:
+    app = create_app(create_schema=False)
+    with app.app_context():
+        db.create_all()
+    print("let_service schema is up to date")
+
+
 def main() -> None:
+    import sys
+
+    if len(sys.argv) > 1 and sys.argv[1] == "migrate":
+        migrate()
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "archive":
+        print(f"archived {archive(create_app(create_schema=False))} flights")
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "lifecycle":
+        departed, landed = lifecycle(create_app(create_schema=False))
+        print(f"{departed} flights departed, {landed} landed")
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "settle":
+        print(f"settled {settle_wallets(create_app(create_schema=False))} payments")
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "deletions":
+        print(f"finished {run_deletions(create_app(create_schema=False))} deletion jobs")
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from .serve import serve
+
+        serve()
+        return
+
+    from .api.purchases import resume_pending_purchases
+
     app = create_app()
+    resume_pending_purchases(app)
+    if app.config.get("WARM_UP"):
+        warm_up(app)
     app.run(host="0.0.0.0", port=8801, debug=True)
 
 
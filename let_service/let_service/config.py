@@ -2,7 +2,8 @@ import os
 from urllib.parse import quote_plus
 from dotenv import load_dotenv
 
-if not load_dotenv():
+# The only place .env is loaded; everything else reads Config / os.environ.
+if not load_dotenv() and os.getenv('LET_SQLALCHEMY_DATABASE_URI') is None and os.getenv('LET_DB_HOST') is None:
     print("Error while loading .env variables")
     exit(2)
 
@@ -12,6 +13,10 @@ def env(key: str, default=None):
     return default if val is None or val == '' else val
 
 
+def env_flag(key: str, default: str = 'false') -> bool:
+    return str(env(key, default)).lower() in ('1', 'true', 'yes', 'y')
+
+
 class Config:
     SECRET_KEY = env('LET_SECRET_KEY', 'dev-secret')
 
@@ -33,8 +38,128 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JSON_SORT_KEYS = False
 
+    # Startup
+    # false -> schema is created only by `python -m let_service migrate`
+    AUTO_CREATE_SCHEMA = env_flag('LET_AUTO_CREATE_SCHEMA', 'true')
+    # Open pool connections / configure mappers before the first request
+    WARM_UP = env_flag('LET_WARM_UP', 'false')
+    WARM_UP_CONNECTIONS = int(env('LET_WARM_UP_CONNECTIONS', '5'))
+
+    # `python -m let_service serve` (serve.py): gunicorn, or waitress where gunicorn can't run (Windows)
+    SERVER = env('LET_SERVER', 'gunicorn')
+    BIND = env('LET_BIND', '0.0.0.0:8801')
+    WORKERS = int(env('LET_WORKERS', '2'))
+    # gunicorn worker class: gthread (threads per worker) or sync
+    WORKER_CLASS = env('LET_WORKER_CLASS', 'gthread')
+    THREADS = int(env('LET_THREADS', '8'))
+    # SIGTERM: /ready answers 503 and purchases are refused, requests are still
+    # served for DRAIN_DELAY_SECONDS, then in-flight purchases get DRAIN_TIMEOUT_SECONDS
+    DRAIN_DELAY_SECONDS = float(env('LET_DRAIN_DELAY_SECONDS', '0'))
+    DRAIN_TIMEOUT_SECONDS = float(env('LET_DRAIN_TIMEOUT_SECONDS', '10'))
+
+    # Instrumentation (GET /metrics, Prometheus text format)
+    METRICS_ENABLED = env_flag('LET_METRICS_ENABLED', 'false')
+    SLOW_QUERY_MS = float(env('LET_SLOW_QUERY_MS', '200'))
+    # `X-Profile: 1` returns cProfile output instead of the response body
+    PROFILING_ENABLED = env_flag('LET_PROFILING_ENABLED', 'false')
+
+    # Conditional GET: catalog validators also roll over on this interval
+    ETAG_TIME_BUCKET_SECONDS = int(env('LET_ETAG_TIME_BUCKET_SECONDS', '30'))
+
+    # In-memory flight catalog for GET /flights (db/catalog.py), one per worker process
+    CATALOG_SNAPSHOT_ENABLED = env_flag('LET_CATALOG_SNAPSHOT_ENABLED', 'false')
+    # Re-read rows updated this long before the newest change already applied
+    CATALOG_OVERLAP_SECONDS = float(env('LET_CATALOG_OVERLAP_SECONDS', '5'))
+    CATALOG_FULL_RELOAD_SECONDS = float(env('LET_CATALOG_FULL_RELOAD_SECONDS', '600'))
+
+    # Change events (db/outbox.py): an outbox_events row per flight/airline change,
+    # committed with it, relayed to Redis pub/sub on REDIS_URL; empty REDIS_URL
+    # keeps them in-process (utils/bus.py)
+    OUTBOX_ENABLED = env_flag('LET_OUTBOX_ENABLED', 'true')
+    REDIS_URL = env('LET_REDIS_URL', '')
+    OUTBOX_CHANNEL = env('LET_OUTBOX_CHANNEL', 'let_service:changes')
+    # Relays also poll for rows other processes wrote
+    OUTBOX_POLL_SECONDS = float(env('LET_OUTBOX_POLL_SECONDS', '1'))
+    OUTBOX_BATCH_SIZE = int(env('LET_OUTBOX_BATCH_SIZE', '500'))
+    # Published rows are deleted after this long
+    OUTBOX_RETENTION_HOURS = float(env('LET_OUTBOX_RETENTION_HOURS', '24'))
+
+    # `python -m let_service archive` (db/archive.py): flights that ended this
+    # long ago move to flights_archive, this many per transaction
+    ARCHIVE_RETENTION_DAYS = float(env('LET_ARCHIVE_RETENTION_DAYS', '30'))
+    ARCHIVE_BATCH_SIZE = int(env('LET_ARCHIVE_BATCH_SIZE', '5000'))
+
+    # flights.lifecycle_status (db/lifecycle.py): each worker queues departures
+    # and landings this far ahead, polls for new or rescheduled flights this
+    # often and sweeps for missed transitions every LIFECYCLE_SWEEP_SECONDS
+    LIFECYCLE_ENABLED = env_flag('LET_LIFECYCLE_ENABLED', 'true')
+    LIFECYCLE_HORIZON_MINUTES = float(env('LET_LIFECYCLE_HORIZON_MINUTES', '60'))
+    LIFECYCLE_POLL_SECONDS = float(env('LET_LIFECYCLE_POLL_SECONDS', '5'))
+    LIFECYCLE_SWEEP_SECONDS = float(env('LET_LIFECYCLE_SWEEP_SECONDS', '60'))
+    LIFECYCLE_BATCH_SIZE = int(env('LET_LIFECYCLE_BATCH_SIZE', '5000'))
+
+    # Purchases are paid from wallets (db/wallet.py); `python -m let_service
+    # settle` folds captured payments into balances, this many per transaction.
+    # Off until the gateway's `python app.py backfill-wallets` has opened the
+    # existing users' wallets, or every purchase would answer 402
+    WALLET_ENABLED = env_flag('LET_WALLET_ENABLED', 'false')
+    WALLET_SETTLE_BATCH_SIZE = int(env('LET_WALLET_SETTLE_BATCH_SIZE', '5000'))
+
+    # Deleting an airline or flight runs as a job (db/deletion.py): this many
+    # rows per transaction, a pause after each for other writers; a RUNNING
+    # job quiet this long is taken over
+    DELETION_BATCH_SIZE = int(env('LET_DELETION_BATCH_SIZE', '500'))
+    DELETION_PAUSE_SECONDS = float(env('LET_DELETION_PAUSE_SECONDS', '0.02'))
+    DELETION_STALE_SECONDS = float(env('LET_DELETION_STALE_SECONDS', '60'))
+
+    # GET /itineraries (db/network.py)
+    ITINERARY_MAX_LEGS = int(env('LET_ITINERARY_MAX_LEGS', '4'))
+    ITINERARY_MIN_LAYOVER_MINUTES = int(env('LET_ITINERARY_MIN_LAYOVER_MINUTES', '45'))
+    ITINERARY_MAX_LAYOVER_MINUTES = int(env('LET_ITINERARY_MAX_LAYOVER_MINUTES', '720'))
+    # Whole trip, first departure to last arrival
+    ITINERARY_MAX_TRIP_HOURS = float(env('LET_ITINERARY_MAX_TRIP_HOURS', '48'))
+    # Airport indexes kept per process, one per (day, flights version)
+    ITINERARY_CACHE_DAYS = int(env('LET_ITINERARY_CACHE_DAYS', '16'))
+
+    # GET /analytics/revenue (db/analytics.py)
+    # Days closed this long ago are aggregated once per process and kept
+    ANALYTICS_CLOSE_GRACE_SECONDS = float(env('LET_ANALYTICS_CLOSE_GRACE_SECONDS', '3600'))
+    ANALYTICS_OPEN_TTL_SECONDS = float(env('LET_ANALYTICS_OPEN_TTL_SECONDS', '30'))
+    ANALYTICS_CACHE_DAYS = int(env('LET_ANALYTICS_CACHE_DAYS', '1100'))
+    ANALYTICS_MAX_RANGE_DAYS = int(env('LET_ANALYTICS_MAX_RANGE_DAYS', '731'))
+    ANALYTICS_CHUNK_ROWS = int(env('LET_ANALYTICS_CHUNK_ROWS', '100000'))
+
+    # GET /dashboard/summary (db/dashboard.py): kept per process this long
+    # (or until flights/airlines change); at most this many upcoming flights
+    DASHBOARD_TTL_SECONDS = float(env('LET_DASHBOARD_TTL_SECONDS', '5'))
+    DASHBOARD_UPCOMING_MAX = int(env('LET_DASHBOARD_UPCOMING_MAX', '20'))
+
+    # GET /flights lists flight schedule occurrences (db/schedules.py) departing
+    # within this many days, or before departs_before but at most the max window
+    SCHEDULE_HORIZON_DAYS = float(env('LET_SCHEDULE_HORIZON_DAYS', '30'))
+    SCHEDULE_MAX_WINDOW_DAYS = float(env('LET_SCHEDULE_MAX_WINDOW_DAYS', '400'))
+
+    # Response compression (gzip; brotli when the `brotli` package is installed)
+    COMPRESSION_ENABLED = env_flag('LET_COMPRESSION_ENABLED', 'false')
+    COMPRESSION_MIN_BYTES = int(env('LET_COMPRESSION_MIN_BYTES', '1024'))
+    COMPRESSION_GZIP_LEVEL = int(env('LET_COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(env('LET_COMPRESSION_BROTLI_QUALITY', '5'))
+
+    # GET /users/<id>/purchases page size
+    PURCHASES_PAGE_SIZE = int(env('LET_PURCHASES_PAGE_SIZE', '50'))
+    PURCHASES_MAX_PAGE_SIZE = int(env('LET_PURCHASES_MAX_PAGE_SIZE', '200'))
+
+    # POST /flights/approvals/batch: ids across all decisions
+    APPROVALS_BATCH_MAX = int(env('LET_APPROVALS_BATCH_MAX', '5000'))
+
+    # POST /ratings/batch
+    RATINGS_BATCH_MAX = int(env('LET_RATINGS_BATCH_MAX', '500'))
+    # Items per INSERT ... SELECT, two UNION terms each (live and archived
+    # flight); SQLite allows at most 500 terms
+    RATINGS_BATCH_CHUNK = int(env('LET_RATINGS_BATCH_CHUNK', '200'))
+
     # Async purchase simulation
     PURCHASE_PROCESSING_SECONDS = float(env('LET_PURCHASE_PROCESSING_SECONDS', '2.0'))
 
     # Role enforcement
-    ENFORCE_ROLES = str(env('LET_ENFORCE_ROLES', 'false')).lower() in ('1','true','yes','y')
+    ENFORCE_ROLES = env_flag('LET_ENFORCE_ROLES', 'false')
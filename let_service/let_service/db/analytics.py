@@ -0,0 +1,297 @@
+"""Revenue aggregation over completed purchases.
+
+Completed purchases are streamed from the database in chunks of
+(flight_id, price_paid, purchased_at) columns straight into NumPy arrays and
+reduced per (UTC day, flight) with `np.unique` + `np.bincount`. Those per-day
+partials are the unit of caching:
+
+- a day that closed more than ANALYTICS_CLOSE_GRACE_SECONDS ago is computed
+  once per process and kept (purchases are bucketed by `purchased_at`, which
+  is stamped when a purchase completes, so closed days don't change);
+- the current day is recomputed after ANALYTICS_OPEN_TTL_SECONDS.
+
+Requests then roll the partials up to day, flight, airline or route in a few
+vectorized passes. Airline and route come from the flight's current row, so
+moving a flight to another airline moves its past revenue with it.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+import numpy as np
+from flask import current_app
+from sqlalchemy import select, union_all
+
+from . import db
+from .models import Airline, ArchivedFlight, Flight, Purchase
+
+GROUPS = ("day", "flight", "airline", "route")
+
+_EPOCH_DAY = date(1970, 1, 1)
+
+
+class DayPartial(NamedTuple):
+    """Revenue and purchase count per flight for one day."""
+
+    flight_ids: np.ndarray
+    revenue: np.ndarray
+    purchases: np.ndarray
+
+
+_EMPTY = DayPartial(np.empty(0, np.int64), np.empty(0, np.float64), np.empty(0, np.int64))
+
+
+def day_number(d: date) -> int:
+    return (d - _EPOCH_DAY).days
+
+
+def reduce(keys: np.ndarray, revenue: np.ndarray, counts: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sum revenue and counts per distinct key."""
+    if keys.size == 0:
+        return keys, revenue, counts
+    uniq, inverse = np.unique(keys, return_inverse=True)
+    return (
+        uniq,
+        np.bincount(inverse, weights=revenue, minlength=uniq.size),
+        np.bincount(inverse, weights=counts, minlength=uniq.size).astype(np.int64),
+    )
+
+
+def stream_partials(first_day: date, last_day: date, chunk_size: int = 100_000) -> dict[int, DayPartial]:
+    """Per-day partials for [first_day, last_day], one streaming query."""
+    start = datetime.combine(first_day, datetime.min.time())
+    end = datetime.combine(last_day + timedelta(days=1), datetime.min.time())
+    stmt = (
+        select(Purchase.flight_id, Purchase.price_paid, Purchase.purchased_at)
+        .where(Purchase.status == "COMPLETED")
+        .where(Purchase.purchased_at >= start)
+        .where(Purchase.purchased_at < end)
+    )
+
+    # (day << 32 | flight_id) keys: a chunk reduces to at most one entry per pair
+    keys, revenue, counts = [], [], []
+    result = db.session.execute(stmt.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        flight_ids, prices, stamps = zip(*rows)
+        days = np.array(stamps, dtype="datetime64[D]").astype(np.int64)
+        k, r, c = reduce(
+            (days << 32) | np.array(flight_ids, dtype=np.int64),
+            np.array(prices, dtype=np.float64),
+            np.ones(len(flight_ids), dtype=np.int64),
+        )
+        keys.append(k)
+        revenue.append(r)
+        counts.append(c)
+
+    partials = {n: _EMPTY for n in range(day_number(first_day), day_number(last_day) + 1)}
+    if not keys:
+        return partials
+
+    k, r, c = reduce(np.concatenate(keys), np.concatenate(revenue), np.concatenate(counts))
+    days = k >> 32
+    # keys are sorted, so each day is one contiguous slice
+    bounds = np.flatnonzero(np.diff(days)) + 1
+    for lo, hi in zip(np.concatenate(([0], bounds)), np.concatenate((bounds, [k.size]))):
+        partials[int(days[lo])] = DayPartial(k[lo:hi] & 0xFFFFFFFF, r[lo:hi], c[lo:hi])
+    return partials
+
+
+class FlightAttributes(NamedTuple):
+    airline_of: np.ndarray  # indexed by flight id, -1 when unknown
+    route_of: np.ndarray  # indexed by flight id, -1 when unknown
+    routes: list[tuple[str, str]]
+    airline_names: dict[int, str]
+
+    def lookup(self, table: np.ndarray, flight_ids: np.ndarray) -> np.ndarray:
+        known = flight_ids < table.size
+        out = np.full(flight_ids.size, -1, dtype=np.int64)
+        out[known] = table[flight_ids[known]]
+        return out
+
+
+def load_flight_attributes() -> FlightAttributes:
+    # Old purchases mostly point at archived flights
+    rows = db.session.execute(union_all(*(
+        select(model.id, model.airline_id, model.origin_airport, model.destination_airport)
+        for model in (Flight, ArchivedFlight)
+    ))).all()
+    size = max((r[0] for r in rows), default=0) + 1
+    airline_of = np.full(size, -1, dtype=np.int64)
+    route_of = np.full(size, -1, dtype=np.int64)
+    route_codes: dict[tuple[str, str], int] = {}
+    for flight_id, airline_id, origin, destination in rows:
+        airline_of[flight_id] = airline_id
+        route_of[flight_id] = route_codes.setdefault((origin, destination), len(route_codes))
+    airline_names = dict(db.session.execute(select(Airline.id, Airline.name)).all())
+    return FlightAttributes(airline_of, route_of, list(route_codes), airline_names)
+
+
+class RevenueEngine:
+    def __init__(self, open_ttl_seconds: float = 30.0, close_grace_seconds: float = 3600.0,
+                 max_cached_days: int = 1100, chunk_size: int = 100_000):
+        self.open_ttl_seconds = open_ttl_seconds
+        self.close_grace_seconds = close_grace_seconds
+        self.max_cached_days = max_cached_days
+        self.chunk_size = chunk_size
+
+        self._closed: OrderedDict[int, DayPartial] = OrderedDict()
+        self._open: dict[int, tuple[float, DayPartial]] = {}
+        self._attributes: tuple[tuple, FlightAttributes] | None = None
+        self._lock = threading.Lock()
+
+    def _is_closed(self, day: int, now: datetime) -> bool:
+        day_end = datetime.combine(_EPOCH_DAY + timedelta(days=day + 1), datetime.min.time())
+        return (now - day_end).total_seconds() >= self.close_grace_seconds
+
+    def partials(self, first_day: date, last_day: date) -> tuple[dict[int, DayPartial], int]:
+        """Partials for every day in range, plus how many days had to be computed."""
+        now = datetime.utcnow()
+        wanted = range(day_number(first_day), day_number(last_day) + 1)
+        found: dict[int, DayPartial] = {}
+        missing: list[int] = []
+        with self._lock:
+            for day in wanted:
+                cached = self._closed.get(day)
+                if cached is not None:
+                    self._closed.move_to_end(day)
+                    found[day] = cached
+                    continue
+                entry = self._open.get(day)
+                if entry is not None and time.monotonic() - entry[0] < self.open_ttl_seconds \
+                        and not self._is_closed(day, now):
+                    found[day] = entry[1]
+                    continue
+                missing.append(day)
+
+        # One query per contiguous run of missing days
+        runs: list[list[int]] = []
+        for day in missing:
+            if runs and runs[-1][-1] == day - 1:
+                runs[-1].append(day)
+            else:
+                runs.append([day])
+
+        computed_at = time.monotonic()
+        for run in runs:
+            fresh = stream_partials(
+                _EPOCH_DAY + timedelta(days=run[0]), _EPOCH_DAY + timedelta(days=run[-1]), self.chunk_size)
+            found.update(fresh)
+            with self._lock:
+                for day, partial in fresh.items():
+                    if self._is_closed(day, now):
+                        self._closed[day] = partial
+                        self._open.pop(day, None)
+                    else:
+                        self._open[day] = (computed_at, partial)
+                while len(self._closed) > self.max_cached_days:
+                    self._closed.popitem(last=False)
+        return found, len(missing)
+
+    def attributes(self, table_versions: tuple) -> FlightAttributes:
+        """Flight -> airline/route lookup, rebuilt when flights or airlines change."""
+        cached = self._attributes
+        if cached is not None and cached[0] == table_versions:
+            return cached[1]
+        attributes = load_flight_attributes()
+        self._attributes = (table_versions, attributes)
+        return attributes
+
+    def revenue(self, group_by: str, first_day: date, last_day: date, table_versions: tuple,
+                airline_id: int | None = None, limit: int = 100) -> dict:
+        partials, computed_days = self.partials(first_day, last_day)
+        days = sorted(partials)
+
+        attrs = None
+        if airline_id is not None or group_by != "day":
+            attrs = self.attributes(table_versions)
+
+        # Groups are dense integers (-1 = unknown), so each day is one bincount
+        # into running totals; no concatenation or sort over all partials
+        if group_by == "day":
+            size = len(days)
+        elif group_by == "flight":
+            size = max((int(partials[d].flight_ids[-1]) + 1 for d in days if partials[d].flight_ids.size), default=0)
+        elif group_by == "airline":
+            size = int(attrs.airline_of.max(initial=-1)) + 1
+        else:
+            size = len(attrs.routes)
+        sums = np.zeros(size + 1)
+        counts = np.zeros(size + 1)
+
+        for offset, day in enumerate(days):
+            partial = partials[day]
+            flight_ids, revenue, purchases = partial
+            if flight_ids.size == 0:
+                continue
+            if airline_id is not None:
+                keep = attrs.lookup(attrs.airline_of, flight_ids) == airline_id
+                flight_ids, revenue, purchases = flight_ids[keep], revenue[keep], purchases[keep]
+            if group_by == "day":
+                sums[offset + 1] += revenue.sum()
+                counts[offset + 1] += purchases.sum()
+                continue
+            if group_by == "flight":
+                keys = flight_ids
+            elif group_by == "airline":
+                keys = attrs.lookup(attrs.airline_of, flight_ids)
+            else:
+                keys = attrs.lookup(attrs.route_of, flight_ids)
+            sums += np.bincount(keys + 1, weights=revenue, minlength=size + 1)
+            counts += np.bincount(keys + 1, weights=purchases, minlength=size + 1)
+
+        if group_by == "day":
+            # Every day in range, zeros included, in calendar order
+            rows = [
+                {"day": (_EPOCH_DAY + timedelta(days=day)).isoformat(),
+                 "revenue": round(float(sums[offset + 1]), 2), "purchases": int(counts[offset + 1])}
+                for offset, day in enumerate(days)
+            ]
+        else:
+            present = np.flatnonzero(counts)
+            top = present[np.argsort(-sums[present], kind="stable")[:limit]]
+            rows = [self._row(group_by, int(i) - 1, float(sums[i]), int(counts[i]), attrs) for i in top]
+
+        return {
+            "group_by": group_by,
+            "from": first_day.isoformat(),
+            "to": last_day.isoformat(),
+            "airline_id": airline_id,
+            "totals": {"revenue": round(float(sums.sum()), 2), "purchases": int(counts.sum())},
+            "rows": rows,
+            "computed_days": computed_days,
+        }
+
+    @staticmethod
+    def _row(group_by: str, key: int, revenue: float, purchases: int, attrs: FlightAttributes) -> dict:
+        row: dict = {}
+        if group_by == "flight":
+            airline = int(attrs.airline_of[key]) if key < attrs.airline_of.size else -1
+            row["flight_id"] = key
+            row["airline_id"] = airline if airline >= 0 else None
+        elif group_by == "airline":
+            row["airline_id"] = key if key >= 0 else None
+            row["airline"] = attrs.airline_names.get(key)
+        else:
+            origin, destination = attrs.routes[key] if key >= 0 else (None, None)
+            row["origin_airport"] = origin
+            row["destination_airport"] = destination
+        row["revenue"] = round(revenue, 2)
+        row["purchases"] = purchases
+        return row
+
+
+def get_revenue_engine() -> RevenueEngine:
+    engine = current_app.extensions.get("revenue_engine")
+    if engine is None:
+        cfg = current_app.config
+        engine = current_app.extensions.setdefault("revenue_engine", RevenueEngine(
+            open_ttl_seconds=float(cfg.get("ANALYTICS_OPEN_TTL_SECONDS", 30)),
+            close_grace_seconds=float(cfg.get("ANALYTICS_CLOSE_GRACE_SECONDS", 3600)),
+            max_cached_days=int(cfg.get("ANALYTICS_CACHE_DAYS", 1100)),
+            chunk_size=int(cfg.get("ANALYTICS_CHUNK_ROWS", 100_000)),
+        ))
+    return engine
@@ -0,0 +1,57 @@
+"""Deciding many PENDING flights at once (POST /flights/approvals/batch).
+
+One conditional `UPDATE ... WHERE approval_status = 'PENDING' AND id IN
+(...)` per decision. Which ids it changed comes from `RETURNING` where the
+dialect has it (SQLite, PostgreSQL); MySQL locks the PENDING rows with
+`SELECT ... FOR UPDATE` first, so in both cases a flight decided
+concurrently by another admin is reported by exactly one of them. The
+statement bypasses the unit of work, so it bumps the `flights` version and
+records outbox events itself.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from . import outbox, versions
+from .models import Flight
+
+NOT_FOUND = "NOT_FOUND"
+NOT_PENDING = "NOT_PENDING"
+
+
+def decide_pending(session: Session, ids, status: str, reason: str | None, by: str | None,
+                   now: datetime) -> list[int]:
+    """Set `status` on those of `ids` that are PENDING; returns the ids changed."""
+    ids = sorted(set(int(i) for i in ids))
+    if not ids:
+        return []
+    pending = (Flight.id.in_(ids), Flight.approval_status == "PENDING")
+    stmt = (
+        update(Flight)
+        .where(*pending)
+        .values(approval_status=status, rejection_reason=reason, approved_by_user_id=by, approved_at=now,
+                updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    if session.get_bind().dialect.update_returning:
+        changed = sorted(session.execute(stmt.returning(Flight.id)).scalars())
+    else:
+        changed = session.execute(select(Flight.id).where(*pending).with_for_update()).scalars().all()
+        if changed:
+            session.execute(stmt.where(Flight.id.in_(changed)))
+        changed = sorted(changed)
+
+    if changed:
+        versions.bump(session, "flights")
+        outbox.record(session, "flight", "updated", changed)
+    return changed
+
+
+def skip_reasons(session: Session, ids) -> dict[int, tuple[str, str | None]]:
+    """Why each id was not changed: (NOT_FOUND, None) or (NOT_PENDING, its status)."""
+    ids = sorted(set(int(i) for i in ids))
+    found = dict(session.execute(select(Flight.id, Flight.approval_status).where(Flight.id.in_(ids))).all()) if ids else {}
+    return {i: (NOT_PENDING, found[i]) if i in found else (NOT_FOUND, None) for i in ids}
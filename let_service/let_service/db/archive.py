@@ -0,0 +1,112 @@
+"""Moving finished history out of the live `flights` table.
+
+Listing, catalog snapshots, itineraries and the approval workflow only
+care about flights that have not ended long ago, but the table keeps every
+flight ever created. `archive_flights` moves flights whose end (departure
+plus duration) is older than the retention window into `flights_archive`,
+in batches: each batch is an `INSERT ... SELECT` and a `DELETE` by id in
+one transaction, plus a tombstone per id, a `flights` version bump so
+catalog snapshots and ETags follow, and one outbox event for listings.
+
+Ids are kept, so `purchases.flight_id` and `ratings.flight_id` (which have
+no foreign key for this reason) still resolve, and never reused: the flight
+with the highest id is never archived; readers that may meet an old
+flight look in both tables (`find_flight`, the `archived_flight`
+relationships, `GET /flights?tab=archive`).
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import DateTime
+
+from . import outbox, versions
+from .models import ArchivedFlight, Flight, FlightColumns
+
+# Every column, in the same order for both tables
+_COLUMNS = [column.key for column in Flight.__table__.columns]
+
+
+class flight_end(FunctionElement):
+    """`departure_time + duration_seconds` in SQL, per dialect.
+
+    flight_end(Flight.departure_time, Flight.duration_seconds); see `ends`.
+    """
+
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(flight_end)
+def _flight_end_default(element, compiler, **kw):
+    departure, duration = (compiler.process(c, **kw) for c in element.clauses)
+    return f"({departure} + {duration} * INTERVAL '1 second')"
+
+
+@compiles(flight_end, "mysql")
+def _flight_end_mysql(element, compiler, **kw):
+    departure, duration = (compiler.process(c, **kw) for c in element.clauses)
+    return f"TIMESTAMPADD(SECOND, {duration}, {departure})"
+
+
+@compiles(flight_end, "sqlite")
+def _flight_end_sqlite(element, compiler, **kw):
+    departure, duration = (compiler.process(c, **kw) for c in element.clauses)
+    # Same text layout as SQLAlchemy's stored DATETIME, so they compare as strings
+    return f"strftime('%Y-%m-%d %H:%M:%f', {departure}, '+' || {duration} || ' seconds')"
+
+
+def ends(model: type[FlightColumns]) -> flight_end:
+    return flight_end(model.departure_time, model.duration_seconds)
+
+
+def find_flight(flight_id: int) -> FlightColumns | None:
+    """The flight with this id, live or archived."""
+    return Flight.query.get(flight_id) or ArchivedFlight.query.get(flight_id)
+
+
+def archive_flights(session: Session, now: datetime, retention: timedelta, batch_size: int = 5000) -> int:
+    """Move flights that ended before `now - retention` to flights_archive.
+
+    Commits after every batch, so an interrupted run keeps what it moved and
+    the next run continues. Returns the number of flights moved.
+    """
+    cutoff = now - retention
+    moved = 0
+    while True:
+        # The row with the highest id stays live: SQLite without AUTOINCREMENT
+        # (databases created before it) and MySQL before 8.0 restart the id
+        # counter at MAX(id) + 1, which would give an archived id to a new flight
+        newest = session.execute(select(func.max(Flight.id))).scalar()
+        # A flight ends after it departs, so the departure range (on
+        # ix_flights_departure_price) bounds the scan
+        ids = session.execute(
+            select(Flight.id)
+            .where(Flight.departure_time < cutoff)
+            .where(ends(Flight) < cutoff)
+            .where(Flight.id != newest)
+            .order_by(Flight.departure_time)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+
+        # Archived flights have landed, whether or not the scheduler got to them
+        columns = [literal("FINISHED") if key == "lifecycle_status" else getattr(Flight, key) for key in _COLUMNS]
+        session.execute(
+            insert(ArchivedFlight).from_select(_COLUMNS, select(*columns).where(Flight.id.in_(ids)))
+        )
+        session.execute(delete(Flight).where(Flight.id.in_(ids)))
+        versions.tombstone(session, ids)
+        versions.bump(session, "flights")
+        # Archived flights stay readable by id; only listings change
+        outbox.record(session, "flight", "archived")
+        session.commit()
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+    return moved
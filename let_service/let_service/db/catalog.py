@@ -0,0 +1,465 @@
+"""Per-process, array-backed copy of the flights catalog.
+
+With CATALOG_SNAPSHOT_ENABLED, `GET /flights` is answered from memory instead
+of loading and hydrating every flight row per request. The snapshot follows
+the database incrementally:
+
+- `list_flights` already reads the `table_versions` counters for its ETag;
+  while they match the ones the snapshot was synced at, no query is issued.
+- when they moved, rows with `updated_at >= watermark - overlap` and
+  tombstones (`flight_tombstones`, written for every deleted flight) newer
+  than the same mark are applied. The overlap covers writers whose
+  `updated_at` was stamped before a slower transaction committed.
+- every CATALOG_FULL_RELOAD_SECONDS the snapshot is rebuilt from scratch, as
+  a safety net for writes that bypass the ORM without calling
+  `versions.bump` / `versions.tombstone`.
+
+Records are stored column-wise: numbers and timestamps (microseconds since
+the epoch) in `array`s, strings in lists with repeated values interned.
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+
+from flask import Flask, current_app
+from sqlalchemy import select
+
+from ..utils.metrics import Counter, Gauge, Histogram, registry
+from . import db
+from .models import Airline, Flight, FlightTombstone
+
+CATALOG_ROWS = registry.register(Gauge(
+    "let_catalog_rows", "Flights held in the in-memory catalog snapshot"))
+CATALOG_BYTES = registry.register(Gauge(
+    "let_catalog_bytes", "Approximate memory held by the catalog snapshot"))
+CATALOG_REFRESHES = registry.register(Counter(
+    "let_catalog_refreshes_total", "Catalog snapshot refreshes", ("kind",)))
+CATALOG_REFRESH_SECONDS = registry.register(Histogram(
+    "let_catalog_refresh_seconds", "Time to load and apply a catalog refresh", ("kind",)))
+CATALOG_REFRESH_LAG = registry.register(Histogram(
+    "let_catalog_refresh_lag_seconds", "Age of the newest flight change when the snapshot applied it",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)))
+
+TABS = ("upcoming", "in_progress", "archive", "archived", "pending", "all")
+
+_EPOCH = datetime(1970, 1, 1)
+_NULL = -(1 << 62)
+_ONE_US = timedelta(microseconds=1)
+
+# (column, array typecode or None for a list of str, interned)
+_COLUMNS = (
+    ("id", "q", False),
+    ("airline_id", "q", False),
+    ("distance_km", "d", False),
+    ("duration_seconds", "q", False),
+    ("departure_us", "q", False),
+    ("price", "d", False),
+    ("status", "b", False),
+    ("canceled", "b", False),
+    ("approved_us", "q", False),
+    ("canceled_us", "q", False),
+    ("created_us", "q", False),
+    ("updated_us", "q", False),
+    ("schedule_id", "q", False),
+    ("name", None, False),
+    ("origin", None, True),
+    ("destination", None, True),
+    ("created_by", None, True),
+    ("rejection_reason", None, False),
+    ("approved_by", None, True),
+    ("canceled_by", None, True),
+    # "name origin destination", lower-cased, for `q`
+    ("hay", None, False),
+)
+
+_FLIGHT_COLUMNS = (
+    Flight.id, Flight.name, Flight.airline_id, Flight.distance_km, Flight.duration_seconds,
+    Flight.departure_time, Flight.origin_airport, Flight.destination_airport, Flight.created_by_user_id,
+    Flight.price, Flight.approval_status, Flight.rejection_reason, Flight.approved_by_user_id,
+    Flight.approved_at, Flight.canceled, Flight.canceled_by_user_id, Flight.canceled_at,
+    Flight.created_at, Flight.updated_at, Flight.schedule_id,
+)
+
+
+def _us(dt: datetime | None) -> int:
+    return _NULL if dt is None else (dt - _EPOCH) // _ONE_US
+
+
+def _iso(us: int) -> str | None:
+    return None if us == _NULL else (_EPOCH + timedelta(microseconds=us)).isoformat()
+
+
+def _intern(value: str | None) -> str | None:
+    return None if value is None else sys.intern(value)
+
+
+class _Columns:
+    """Column store for flight records; a row is an index ("slot") into every column."""
+
+    def __init__(self):
+        for name, typecode, _ in _COLUMNS:
+            setattr(self, name, array(typecode) if typecode else [])
+        self.slot_of: dict[int, int] = {}
+        self.free: list[int] = []
+        self.status_names: list[str] = []
+        self.status_codes: dict[str, int] = {}
+
+    def _status(self, value: str) -> int:
+        code = self.status_codes.get(value)
+        if code is None:
+            code = self.status_codes[value] = len(self.status_names)
+            self.status_names.append(value)
+        return code
+
+    def put(self, row) -> bool:
+        """Insert or overwrite a record; True when the departure order changed."""
+        values = {
+            "id": row.id,
+            "airline_id": row.airline_id,
+            "distance_km": float(row.distance_km),
+            "duration_seconds": int(row.duration_seconds),
+            "departure_us": _us(row.departure_time),
+            "price": float(row.price),
+            "status": self._status(row.approval_status),
+            "canceled": 1 if row.canceled else 0,
+            "approved_us": _us(row.approved_at),
+            "canceled_us": _us(row.canceled_at),
+            "created_us": _us(row.created_at),
+            "updated_us": _us(row.updated_at),
+            "schedule_id": _NULL if row.schedule_id is None else row.schedule_id,
+            "name": row.name,
+            "origin": row.origin_airport,
+            "destination": row.destination_airport,
+            "created_by": row.created_by_user_id,
+            "rejection_reason": row.rejection_reason,
+            "approved_by": row.approved_by_user_id,
+            "canceled_by": row.canceled_by_user_id,
+            "hay": " ".join([row.name or "", row.origin_airport or "", row.destination_airport or ""]).lower(),
+        }
+        slot = self.slot_of.get(row.id)
+        if slot is None and self.free:
+            slot = self.free.pop()
+        if slot is None:
+            for name, _, interned in _COLUMNS:
+                value = values[name]
+                getattr(self, name).append(_intern(value) if interned else value)
+            slot = len(self.id) - 1
+            reorder = True
+        else:
+            reorder = row.id not in self.slot_of or self.departure_us[slot] != values["departure_us"]
+            for name, _, interned in _COLUMNS:
+                value = values[name]
+                getattr(self, name)[slot] = _intern(value) if interned else value
+        self.slot_of[row.id] = slot
+        return reorder
+
+    def drop(self, flight_id: int, deleted_us: int) -> bool:
+        slot = self.slot_of.get(flight_id)
+        # A row written after the tombstone is a newer flight with a reused id
+        if slot is None or self.updated_us[slot] > deleted_us:
+            return False
+        del self.slot_of[flight_id]
+        for name, typecode, _ in _COLUMNS:
+            if typecode is None:
+                getattr(self, name)[slot] = None
+        self.free.append(slot)
+        return True
+
+    def footprint(self) -> int:
+        total = sys.getsizeof(self.slot_of) + sys.getsizeof(self.free)
+        seen: set[int] = set()
+        for name, typecode, _ in _COLUMNS:
+            column = getattr(self, name)
+            total += sys.getsizeof(column)
+            if typecode is None:
+                for value in column:
+                    if value is not None and id(value) not in seen:
+                        seen.add(id(value))
+                        total += sys.getsizeof(value)
+        return total
+
+
+class FlightCatalog:
+    def __init__(self, overlap_seconds: float = 5.0, full_reload_seconds: float = 600.0):
+        self.overlap_us = int(overlap_seconds * 1_000_000)
+        self.full_reload_seconds = full_reload_seconds
+
+        self._cols = _Columns()
+        self._airlines: dict[int, str] = {}
+        self._airlines_lower: dict[int, str] = {}
+        # Airlines being deleted (db/deletion.py): their flights are not listed
+        self._deleted_airlines: frozenset[int] = frozenset()
+        self._order: list[int] = []
+        self._order_departure = array("q")
+        self._versions: tuple | None = None
+        self._watermark_us = _NULL
+        self._loaded_at = 0.0
+        self._bytes = 0
+        self._bytes_at = 0.0
+
+        # _refresh serializes refreshers; _lock guards the columns while read or applied
+        self._refresh = threading.Lock()
+        self._lock = threading.Lock()
+
+    # --- refresh -------------------------------------------------------
+
+    def sync(self, versions: tuple) -> None:
+        """Bring the snapshot up to `versions` = versions.current("flights", "airlines")."""
+        if versions == self._versions and time.monotonic() - self._loaded_at < self.full_reload_seconds:
+            return
+        with self._refresh:
+            if versions == self._versions and time.monotonic() - self._loaded_at < self.full_reload_seconds:
+                return
+            t0 = time.perf_counter()
+            if self._versions is None or time.monotonic() - self._loaded_at >= self.full_reload_seconds:
+                kind = "full"
+                self._load_all()
+            else:
+                kind = "incremental"
+                self._apply_changes(airlines_changed=versions[1] != self._versions[1])
+            self._versions = versions
+            CATALOG_REFRESHES.inc(kind=kind)
+            CATALOG_REFRESH_SECONDS.observe(time.perf_counter() - t0, kind=kind)
+            CATALOG_ROWS.set(len(self._cols.slot_of))
+            if kind == "full" or time.monotonic() - self._bytes_at >= 60.0:
+                self._bytes = self.footprint()
+                self._bytes_at = time.monotonic()
+                CATALOG_BYTES.set(self._bytes)
+
+    def _load_airlines(self) -> None:
+        rows = db.session.execute(select(Airline.id, Airline.name, Airline.deleted_at)).all()
+        names = {aid: name for aid, name, _deleted in rows}
+        lower = {k: (v or "").lower() for k, v in names.items()}
+        deleted = frozenset(aid for aid, _name, deleted_at in rows if deleted_at is not None)
+        with self._lock:
+            self._airlines, self._airlines_lower, self._deleted_airlines = names, lower, deleted
+
+    def _load_all(self) -> None:
+        cols = _Columns()
+        watermark = _NULL
+        for row in db.session.execute(select(*_FLIGHT_COLUMNS)):
+            cols.put(row)
+            watermark = max(watermark, _us(row.updated_at))
+        tombstone_mark = db.session.execute(select(db.func.max(FlightTombstone.deleted_at))).scalar()
+        watermark = min(max(watermark, _us(tombstone_mark)), _us(datetime.utcnow()))
+
+        order, departures = self._sorted(cols)
+        self._load_airlines()
+        with self._lock:
+            self._cols, self._order, self._order_departure = cols, order, departures
+        self._watermark_us = watermark
+        self._loaded_at = time.monotonic()
+
+    def _apply_changes(self, airlines_changed: bool) -> None:
+        since = _EPOCH + timedelta(microseconds=max(self._watermark_us - self.overlap_us, 0))
+        rows = db.session.execute(select(*_FLIGHT_COLUMNS).where(Flight.updated_at >= since)).all()
+        tombstones = db.session.execute(
+            select(FlightTombstone.flight_id, FlightTombstone.deleted_at).where(FlightTombstone.deleted_at >= since)
+        ).all()
+        if airlines_changed:
+            self._load_airlines()
+
+        newest = _NULL
+        with self._lock:
+            cols = self._cols
+            reorder = False
+            for row in rows:
+                slot = cols.slot_of.get(row.id)
+                updated = _us(row.updated_at)
+                newest = max(newest, updated)
+                # Overlap re-reads rows already applied; skip those unchanged
+                if slot is not None and cols.updated_us[slot] == updated:
+                    continue
+                reorder = cols.put(row) or reorder
+            for flight_id, deleted_at in tombstones:
+                deleted = _us(deleted_at)
+                newest = max(newest, deleted)
+                reorder = cols.drop(flight_id, deleted) or reorder
+            if reorder:
+                self._order, self._order_departure = self._sorted(cols)
+
+        if newest > self._watermark_us:
+            now = _us(datetime.utcnow())
+            CATALOG_REFRESH_LAG.observe(max(now - newest, 0) / 1_000_000)
+            # A future-dated row must not push the mark past writes still to come
+            self._watermark_us = min(newest, now)
+
+    @staticmethod
+    def _sorted(cols: _Columns) -> tuple[list[int], array]:
+        departure, ids = cols.departure_us, cols.id
+        order = sorted(cols.slot_of.values(), key=lambda s: (departure[s], ids[s]))
+        return order, array("q", (departure[s] for s in order))
+
+    # --- reads ---------------------------------------------------------
+
+    def list_flights(
+        self,
+        tab: str,
+        q: str = "",
+        airline_id: int | None = None,
+        approval: str = "",
+        *,
+        origin: str | None = None,
+        destination: str | None = None,
+        min_price: float | None = None,
+        max_price: float | None = None,
+        departs_after: datetime | None = None,
+        departs_before: datetime | None = None,
+        sort: str = "departure_time",
+        descending: bool = False,
+    ) -> list[dict]:
+        """Same result and order as the SQL path of `GET /flights`."""
+        now = _us(datetime.utcnow())
+        out: list[dict] = []
+        with self._lock:
+            cols = self._cols
+            status_of = cols.status_codes
+            approved = status_of.get("APPROVED", -1)
+            pending = status_of.get("PENDING", -1)
+            wanted_status = status_of.get(approval, -2) if approval else None
+            if wanted_status == -2:
+                return out
+
+            order = self._order
+            start, stop = 0, len(order)
+            if tab == "upcoming":
+                start = bisect_right(self._order_departure, now)
+            elif tab == "in_progress":
+                stop = bisect_right(self._order_departure, now)
+            if departs_after is not None:
+                start = max(start, bisect_left(self._order_departure, _us(departs_after)))
+            if departs_before is not None:
+                stop = min(stop, bisect_left(self._order_departure, _us(departs_before)))
+
+            airlines_lower = self._airlines_lower
+            deleted_airlines = self._deleted_airlines
+            for slot in order[start:stop]:
+                status = cols.status[slot]
+                if wanted_status is not None and status != wanted_status:
+                    continue
+                aid = cols.airline_id[slot]
+                if (airline_id is not None and aid != airline_id) or aid in deleted_airlines:
+                    continue
+                if origin is not None and cols.origin[slot] != origin:
+                    continue
+                if destination is not None and cols.destination[slot] != destination:
+                    continue
+                price = cols.price[slot]
+                if (min_price is not None and price < min_price) or (max_price is not None and price > max_price):
+                    continue
+
+                departure = cols.departure_us[slot]
+                end = departure + cols.duration_seconds[slot] * 1_000_000
+                if cols.canceled[slot]:
+                    state = "CANCELED"
+                elif now < departure:
+                    state = "UPCOMING"
+                elif now < end:
+                    state = "IN_PROGRESS"
+                else:
+                    state = "FINISHED"
+
+                if tab == "upcoming":
+                    if status != approved or state != "UPCOMING":
+                        continue
+                elif tab == "in_progress":
+                    if status != approved or state != "IN_PROGRESS":
+                        continue
+                elif tab in ("archive", "archived"):
+                    if state not in ("FINISHED", "CANCELED"):
+                        continue
+                elif tab == "pending":
+                    if status != pending:
+                        continue
+
+                if q and q not in f"{cols.hay[slot]} {airlines_lower.get(aid, '')}":
+                    continue
+                out.append(self._record(cols, slot, state, now, departure, end))
+
+        # `out` is in (departure, id) order and both sorts are stable, so ties
+        # keep it, as the SQL path's secondary ORDER BY columns do
+        if sort == "price":
+            out.sort(key=lambda r: r["price"], reverse=descending)
+        elif sort == "duration":
+            out.sort(key=lambda r: r["duration_seconds"], reverse=descending)
+        elif descending:
+            out.sort(key=lambda r: r["departure_time"], reverse=True)
+        return out
+
+    def _record(self, cols: _Columns, slot: int, state: str, now: int, departure: int, end: int) -> dict:
+        aid = cols.airline_id[slot]
+        airline_name = self._airlines.get(aid)
+        if state == "UPCOMING":
+            remaining = int((departure - now) / 1_000_000)
+        elif state == "IN_PROGRESS":
+            remaining = int((end - now) / 1_000_000)
+        else:
+            remaining = 0 if state == "FINISHED" else None
+        return {
+            "id": cols.id[slot],
+            "name": cols.name[slot],
+            "airline": {"id": aid, "name": airline_name} if airline_name is not None else None,
+            "distance_km": cols.distance_km[slot],
+            "duration_seconds": cols.duration_seconds[slot],
+            "departure_time": _iso(departure),
+            "origin_airport": cols.origin[slot],
+            "destination_airport": cols.destination[slot],
+            "created_by_user_id": cols.created_by[slot],
+            "price": cols.price[slot],
+            "approval_status": cols.status_names[cols.status[slot]],
+            "rejection_reason": cols.rejection_reason[slot],
+            "approved_by_user_id": cols.approved_by[slot],
+            "approved_at": _iso(cols.approved_us[slot]),
+            "canceled": bool(cols.canceled[slot]),
+            "canceled_by_user_id": cols.canceled_by[slot],
+            "canceled_at": _iso(cols.canceled_us[slot]),
+            "created_at": _iso(cols.created_us[slot]),
+            "updated_at": _iso(cols.updated_us[slot]),
+            "schedule_id": None if cols.schedule_id[slot] == _NULL else cols.schedule_id[slot],
+            "runtime_status": state,
+            "remaining_seconds": remaining,
+            "end_time": _iso(end),
+        }
+
+    # --- introspection -------------------------------------------------
+
+    def footprint(self) -> int:
+        """Approximate bytes held: columns, unique strings, indexes and airline names."""
+        with self._lock:
+            total = self._cols.footprint()
+            total += sys.getsizeof(self._order) + sys.getsizeof(self._order_departure)
+            for names in (self._airlines, self._airlines_lower):
+                total += sys.getsizeof(names) + sum(sys.getsizeof(v) for v in names.values())
+        return total
+
+    def stats(self) -> dict:
+        return {
+            "rows": len(self._cols.slot_of),
+            "slots": len(self._cols.id),
+            "bytes": self._bytes,
+            "versions": self._versions,
+            "watermark": _iso(self._watermark_us),
+        }
+
+
+def init_catalog(app: Flask) -> None:
+    """Attach a FlightCatalog when CATALOG_SNAPSHOT_ENABLED is set.
+
+    The snapshot is built lazily by the first listing request, i.e. after a
+    gunicorn fork, so every worker holds its own copy.
+    """
+    if not app.config.get("CATALOG_SNAPSHOT_ENABLED", False):
+        return
+    app.extensions["flight_catalog"] = FlightCatalog(
+        overlap_seconds=float(app.config.get("CATALOG_OVERLAP_SECONDS", 5.0)),
+        full_reload_seconds=float(app.config.get("CATALOG_FULL_RELOAD_SECONDS", 600.0)),
+    )
+
+
+def get_catalog() -> FlightCatalog | None:
+    return current_app.extensions.get("flight_catalog")
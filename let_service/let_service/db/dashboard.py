@@ -0,0 +1,178 @@
+"""Counts and a few flights for dashboard pages (GET /dashboard/summary).
+
+Instead of fetching whole tabs of `GET /flights` to count them, the summary
+is a handful of aggregate queries:
+
+- every tab count from one `GROUP BY` over `flights` (runtime state as a
+  `CASE` on canceled / stored lifecycle status / departure, and approval),
+  plus the `flights_archive` row count, kept until the `flights` or
+  `airlines` version changes (archival and deletions bump them); flights
+  of airlines being deleted are left out;
+- PENDING purchases and today's completed purchases and revenue, on
+  ix_purchases_status_purchased_at;
+- the next DASHBOARD_UPCOMING_MAX bookable flights, a departure range on
+  ix_flights_unfinished_departure.
+
+Occurrences of flight schedules not materialized yet (db/schedules.py) are
+counted and listed as `GET /flights` lists them: those departing within
+SCHEDULE_HORIZON_DAYS, expanded once per summary.
+
+A flight that has landed counts as in progress until the lifecycle
+scheduler stores it (db/lifecycle.py). The result is kept per process for
+DASHBOARD_TTL_SECONDS, or until `flights`/`airlines`/`schedules` change;
+while one request computes it, concurrent ones wait for that result
+instead of running the same queries.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
+from flask import current_app
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from . import schedules, versions
+from .deletion import airline_live
+from .lifecycle import status_at, unfinished
+from .models import ArchivedFlight, Flight, FlightSchedule, Purchase
+
+TAB_NAMES = ("upcoming", "in_progress", "archive", "pending", "all")
+
+
+def tab_counts(session: Session, now: datetime, archived: int,
+               occurrences: list[tuple[FlightSchedule, datetime]] = ()) -> dict[str, int]:
+    """Flights per `GET /flights` tab, with `archived` rows of flights_archive added to archive and all,
+    and schedule `occurrences` to the tabs that list them."""
+    state = case(
+        (Flight.canceled.is_(True), "archive"),
+        (Flight.lifecycle_status == "FINISHED", "archive"),
+        (Flight.departure_time > now, "upcoming"),
+        else_="in_progress",
+    )
+    rows = session.execute(
+        select(state, Flight.approval_status, func.count()).where(airline_live(Flight))
+        .group_by(state, Flight.approval_status)
+    ).all()
+
+    counts = dict.fromkeys(TAB_NAMES, 0)
+    for bucket, approval, n in rows:
+        # upcoming and in_progress only list approved flights; archive lists any
+        if bucket == "archive" or approval == "APPROVED":
+            counts[bucket] += n
+        if approval == "PENDING":
+            counts["pending"] += n
+        counts["all"] += n
+    counts["archive"] += archived
+    counts["all"] += archived
+
+    for schedule, departure in occurrences:
+        state = status_at(departure, schedule.duration_seconds, now)
+        if schedule.approval_status == "APPROVED" and state == "UPCOMING":
+            counts["upcoming"] += 1
+        elif schedule.approval_status == "APPROVED" and state == "IN_PROGRESS":
+            counts["in_progress"] += 1
+        elif schedule.approval_status == "PENDING":
+            counts["pending"] += 1
+        counts["all"] += 1
+    return counts
+
+
+def schedule_occurrences(session: Session, now: datetime, horizon: timedelta) -> list[tuple[FlightSchedule, datetime]]:
+    """Occurrences `GET /flights` lists by default: still in the air or departing within `horizon`."""
+    end = now + horizon
+    found = schedules.candidates(session, schedules.default_start(now), end)
+    return schedules.expand(session, found, None, end, now)
+
+
+def archived_count(session: Session) -> int:
+    return session.execute(select(func.count()).select_from(ArchivedFlight).where(airline_live(ArchivedFlight))).scalar()
+
+
+def purchases_today(session: Session, now: datetime) -> dict:
+    midnight = datetime.combine(now.date(), datetime.min.time())
+    completed, revenue = session.execute(
+        select(func.count(), func.coalesce(func.sum(Purchase.price_paid), 0.0))
+        .where(Purchase.status == "COMPLETED", Purchase.purchased_at >= midnight)
+    ).one()
+    pending = session.execute(select(func.count()).where(Purchase.status == "PENDING")).scalar()
+    return {"completed": completed, "revenue": round(float(revenue), 2), "pending": pending}
+
+
+def next_upcoming(session: Session, now: datetime, limit: int) -> list[Flight]:
+    """The first `limit` flights of the upcoming tab, by departure."""
+    return session.execute(
+        select(Flight)
+        .where(Flight.approval_status == "APPROVED", Flight.canceled.is_(False), unfinished(Flight),
+               Flight.lifecycle_status == "UPCOMING", Flight.departure_time > now, airline_live(Flight))
+        .order_by(Flight.departure_time.asc(), Flight.id.asc())
+        .limit(limit)
+    ).scalars().all()
+
+
+def next_occurrences(occurrences: list[tuple[FlightSchedule, datetime]], now: datetime,
+                     limit: int) -> list[dict]:
+    """The first `limit` upcoming-tab occurrences, as `GET /flights` renders them."""
+    out = []
+    for schedule, departure in occurrences:
+        if len(out) >= limit:
+            break
+        if schedule.approval_status == "APPROVED" and status_at(departure, schedule.duration_seconds, now) == "UPCOMING":
+            out.append(schedules.occurrence_response(schedule, departure, now))
+    return out
+
+
+class DashboardCache:
+    def __init__(self, ttl_seconds: float = 5.0, upcoming_max: int = 20, schedule_horizon_days: float = 30.0):
+        self.ttl_seconds = ttl_seconds
+        self.upcoming_max = upcoming_max
+        self.schedule_horizon = timedelta(days=schedule_horizon_days)
+
+        self._summary: tuple[tuple, float, dict] | None = None
+        self._archived: tuple[tuple, int] | None = None
+        self._lock = threading.Lock()
+
+    def summary(self, session: Session, serialize: Callable[[Flight], dict]) -> dict:
+        """Cached summary; `upcoming` holds `upcoming_max` flights as `serialize` renders them."""
+        table_versions = versions.current("flights", "airlines", "schedules")
+        cached = self._summary
+        if cached is not None and cached[0] == table_versions and time.monotonic() - cached[1] < self.ttl_seconds:
+            return cached[2]
+
+        with self._lock:
+            cached = self._summary
+            if cached is not None and cached[0] == table_versions \
+                    and time.monotonic() - cached[1] < self.ttl_seconds:
+                return cached[2]
+
+            computed_at = time.monotonic()
+            now = datetime.utcnow()
+            if self._archived is None or self._archived[0] != table_versions[:2]:
+                self._archived = (table_versions[:2], archived_count(session))
+            occurrences = schedule_occurrences(session, now, self.schedule_horizon)
+            upcoming = [serialize(f) for f in next_upcoming(session, now, self.upcoming_max)]
+            upcoming += next_occurrences(occurrences, now, self.upcoming_max)
+            # By departure; occurrences (no id yet) after flights departing with them
+            upcoming.sort(key=lambda f: (f["departure_time"], f["id"] is None, f["id"] or 0))
+            summary = {
+                "generated_at": now.isoformat(),
+                "tabs": tab_counts(session, now, self._archived[1], occurrences),
+                "upcoming": upcoming[:self.upcoming_max],
+                "purchases_today": purchases_today(session, now),
+            }
+            self._summary = (table_versions, computed_at, summary)
+            return summary
+
+
+def get_dashboard() -> DashboardCache:
+    cache = current_app.extensions.get("dashboard")
+    if cache is None:
+        cfg = current_app.config
+        cache = current_app.extensions.setdefault("dashboard", DashboardCache(
+            ttl_seconds=float(cfg.get("DASHBOARD_TTL_SECONDS", 5)),
+            upcoming_max=int(cfg.get("DASHBOARD_UPCOMING_MAX", 20)),
+            schedule_horizon_days=float(cfg.get("SCHEDULE_HORIZON_DAYS", 30)),
+        ))
+    return cache
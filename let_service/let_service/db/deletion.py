@@ -0,0 +1,269 @@
+"""Deleting an airline or a flight as a background job.
+
+An airline may own tens of thousands of flights, each with purchases and
+ratings (which have no foreign key to flights). `DELETE /airlines/<id>`
+therefore only soft-deletes the airline (`deleted_at`: gone from
+/airlines, its flights from listings, dashboard counts and itineraries at
+once via `airline_live`, no new flights or purchases) and queues a
+`deletion_jobs` row. A flight is a single row, so `DELETE /flights/<id>`
+deletes it (live or archived) at once and queues a job for what refers to
+it. The job then works in short transactions of at most
+DELETION_BATCH_SIZE rows:
+
+- ratings of the flights are deleted,
+- their PENDING purchases fail (FLIGHT_DELETED) and release the money they
+  held (db/wallet.py); decided purchases stay as the users' history,
+- the flights (live, then archived) are deleted with tombstones, a version
+  bump and outbox events, as archival does (db/archive.py),
+- last, its flight schedules (db/schedules.py) and the airline row.
+
+Every batch also writes the job's counters and `updated_at`, so
+GET /deletions/<id> shows progress and a job whose worker stopped (the
+process drained or died) is claimed again once it is DELETION_STALE_SECONDS
+quiet: by the next request to any worker, or `python -m let_service
+deletions`. Re-running a batch is harmless; everything is by id and
+conditional.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from . import db, outbox, versions, wallet
+from .models import Airline, ArchivedFlight, DeletionJob, Flight, FlightSchedule, Purchase, Rating, ScheduleSkip
+
+logger = logging.getLogger("let_service.deletion")
+
+FLIGHT_DELETED = "Flight deleted"
+
+
+def queue(session: Session, entity: str, entity_id: int, flights_total: int, flights_deleted: int = 0) -> DeletionJob:
+    job = DeletionJob(entity=entity, entity_id=entity_id, status="QUEUED", flights_total=flights_total,
+                      flights_deleted=flights_deleted)
+    session.add(job)
+    session.flush()
+    return job
+
+
+def airline_live(model):
+    """Filter for rows of `model` (a flight table) whose airline is not being deleted."""
+    return model.airline_id.not_in(select(Airline.id).where(Airline.deleted_at.is_not(None)))
+
+
+def airline_flights(session: Session, airline_id: int) -> int:
+    return sum(
+        session.execute(select(func.count()).select_from(model).where(model.airline_id == airline_id)).scalar()
+        for model in (Flight, ArchivedFlight)
+    )
+
+
+def claim(session: Session, job_id: int, stale: timedelta) -> bool:
+    """Take a queued job, or a running one nobody has advanced for `stale`; commits."""
+    now = datetime.utcnow()
+    res = session.execute(
+        update(DeletionJob)
+        .where(DeletionJob.id == job_id,
+               or_(DeletionJob.status == "QUEUED",
+                   (DeletionJob.status == "RUNNING") & (DeletionJob.updated_at < now - stale)))
+        .values(status="RUNNING", started_at=func.coalesce(DeletionJob.started_at, now), updated_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    session.commit()
+    return res.rowcount == 1
+
+
+def claimable(session: Session, stale: timedelta) -> list[int]:
+    now = datetime.utcnow()
+    ids = session.execute(
+        select(DeletionJob.id)
+        .where(or_(DeletionJob.status == "QUEUED",
+                   (DeletionJob.status == "RUNNING") & (DeletionJob.updated_at < now - stale)))
+        .order_by(DeletionJob.id)
+    ).scalars().all()
+    session.rollback()
+    return ids
+
+
+def _chunks(ids: list[int], size: int):
+    for start in range(0, len(ids), size):
+        yield ids[start:start + size]
+
+
+class JobRunner:
+    """Carries out one claimed job. After every commit it waits `pause`
+    seconds, so other writers get the lock between batches (SQLite's busy
+    handler backs off and would otherwise lose the race to the next batch);
+    `stop` being set ends the wait and the job at the next flight batch.
+    """
+
+    def __init__(self, session: Session, job_id: int, batch_size: int = 500, pause: float = 0.0,
+                 stop: threading.Event | None = None) -> None:
+        self.session = session
+        self.job = session.get(DeletionJob, job_id)
+        self.batch_size = max(int(batch_size), 1)
+        self.pause = max(float(pause), 0.0)
+        self.stop = stop if stop is not None else threading.Event()
+
+    def run(self) -> DeletionJob:
+        """Run until done or stopped; a failure marks the job FAILED."""
+        session, job = self.session, self.job
+        try:
+            if job.entity == "airline":
+                done = self._run_airline()
+            else:
+                self._purge_dependents([job.entity_id])
+                done = True
+            if done:
+                job.status = "DONE"
+                job.finished_at = job.updated_at = datetime.utcnow()
+                session.commit()
+        except Exception as error:
+            session.rollback()
+            logger.exception("deletion job %s failed", job.id)
+            job.status = "FAILED"
+            job.error = str(error)[:500]
+            job.finished_at = job.updated_at = datetime.utcnow()
+            session.commit()
+        return job
+
+    def _commit(self, **counts: int) -> None:
+        """Add to the job's counters, commit the batch with them, then let others write."""
+        for name, value in counts.items():
+            setattr(self.job, name, getattr(self.job, name) + value)
+        self.job.updated_at = datetime.utcnow()
+        self.session.commit()
+        if self.pause:
+            self.stop.wait(self.pause)
+
+    def _delete_ratings(self, flight_ids: list[int]) -> None:
+        ids = self.session.execute(select(Rating.id).where(Rating.flight_id.in_(flight_ids))).scalars().all()
+        for chunk in _chunks(ids, self.batch_size):
+            self.session.execute(
+                delete(Rating).where(Rating.id.in_(chunk)).execution_options(synchronize_session=False))
+            self._commit(ratings_deleted=len(chunk))
+
+    def _fail_pending(self, flight_ids: list[int]) -> None:
+        session = self.session
+        # Status is checked here, not in SQL: with `status = 'PENDING'` in the
+        # WHERE, SQLite walks every PENDING purchase by the status index
+        rows = session.execute(select(Purchase.id, Purchase.status).where(Purchase.flight_id.in_(flight_ids))).all()
+        ids = [purchase_id for purchase_id, status in rows if status == "PENDING"]
+        for chunk in _chunks(ids, self.batch_size):
+            stmt = (
+                update(Purchase)
+                .where(Purchase.id.in_(chunk), Purchase.status == "PENDING")
+                .values(status="FAILED", failure_reason=FLIGHT_DELETED)
+                .execution_options(synchronize_session=False)
+            )
+            # Only what this statement failed is released: a purchase decided
+            # meanwhile already captured or released its own money
+            if session.get_bind().dialect.update_returning:
+                failed = session.execute(stmt.returning(Purchase.id)).scalars().all()
+            else:
+                failed = session.execute(
+                    select(Purchase.id).where(Purchase.id.in_(chunk), Purchase.status == "PENDING").with_for_update()
+                ).scalars().all()
+                if failed:
+                    session.execute(stmt.where(Purchase.id.in_(failed)))
+            wallet.release(session, failed)
+            self._commit(purchases_failed=len(failed))
+
+    def _purge_dependents(self, flight_ids: list[int]) -> None:
+        self._delete_ratings(flight_ids)
+        self._fail_pending(flight_ids)
+
+    def _run_airline(self) -> bool:
+        session, airline_id = self.session, self.job.entity_id
+        for model in (Flight, ArchivedFlight):
+            while True:
+                if self.stop.is_set():
+                    return False
+                ids = session.execute(
+                    select(model.id).where(model.airline_id == airline_id).order_by(model.id).limit(self.batch_size)
+                ).scalars().all()
+                if not ids:
+                    break
+                self._purge_dependents(ids)
+                session.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+                if model is Flight:
+                    versions.tombstone(session, ids)
+                    outbox.record(session, "flight", "deleted", ids)
+                versions.bump(session, "flights")
+                self._commit(flights_deleted=len(ids))
+
+        schedules = session.execute(
+            select(FlightSchedule.id).where(FlightSchedule.airline_id == airline_id)).scalars().all()
+        if schedules:
+            session.execute(delete(ScheduleSkip).where(ScheduleSkip.schedule_id.in_(schedules)))
+            session.execute(delete(FlightSchedule).where(FlightSchedule.id.in_(schedules)))
+            versions.bump(session, "schedules")
+            outbox.record(session, "schedule", "deleted", schedules)
+        session.execute(delete(Airline).where(Airline.id == airline_id))
+        versions.bump(session, "airlines")
+        outbox.record(session, "airline", "deleted", [airline_id])
+        return True
+
+
+def run(session: Session, job_id: int, batch_size: int = 500, pause: float = 0.0,
+        stop: threading.Event | None = None) -> DeletionJob:
+    """Run a claimed job (see JobRunner)."""
+    return JobRunner(session, job_id, batch_size, pause, stop).run()
+
+
+def _settings(app: Flask) -> tuple[int, float, timedelta]:
+    return (int(app.config.get("DELETION_BATCH_SIZE", 500)),
+            float(app.config.get("DELETION_PAUSE_SECONDS", 0.02)),
+            timedelta(seconds=float(app.config.get("DELETION_STALE_SECONDS", 60))))
+
+
+def _run_in_thread(app: Flask, job_id: int) -> None:
+    drain = app.extensions["draining"]
+    batch_size, pause, stale = _settings(app)
+    with app.app_context():
+        try:
+            if claim(db.session, job_id, stale):
+                run(db.session, job_id, batch_size, pause, stop=drain.stopping)
+        finally:
+            db.session.remove()
+
+
+def start(app: Flask, job_id: int) -> bool:
+    """Run the job on a drain-tracked thread; a drained worker leaves it for the next claim."""
+    return app.extensions["draining"].start(_run_in_thread, app, job_id)
+
+
+def run_pending(app: Flask) -> int:
+    """Run every claimable job here and now (`python -m let_service deletions`); returns jobs finished."""
+    batch_size, pause, stale = _settings(app)
+    finished = 0
+    with app.app_context():
+        for job_id in claimable(db.session, stale):
+            if claim(db.session, job_id, stale):
+                finished += run(db.session, job_id, batch_size, pause).status == "DONE"
+        db.session.remove()
+    return finished
+
+
+def init_deletion(app: Flask) -> None:
+    """Each worker process picks up queued or abandoned jobs on its first request."""
+    lock = threading.Lock()
+    state = {"pid": None}
+
+    @app.before_request
+    def _resume_jobs():
+        pid = os.getpid()
+        if state["pid"] == pid:
+            return
+        with lock:
+            if state["pid"] == pid:
+                return
+            state["pid"] = pid
+        _batch_size, _pause, stale = _settings(app)
+        for job_id in claimable(db.session, stale):
+            start(app, job_id)
@@ -0,0 +1,294 @@
+"""Persisted flight lifecycle: UPCOMING -> IN_PROGRESS -> FINISHED.
+
+`flights.lifecycle_status` lets listings skip every flight that has landed
+instead of computing departure plus duration for each of them: queries
+that include `unfinished(...)` can use ix_flights_unfinished_departure, a
+partial index over the flights not FINISHED, so their cost follows the live
+schedule rather than the history. Writes through the ORM set it from the times
+(`before_flush`); time moving on is handled by `advance`, which in one
+transaction per batch stores the new status, adds a "departed" / "landed"
+outbox event per flight (so gateway caches drop the flight) and fails the
+PENDING purchases of flights that have started (sales close at departure),
+releasing the money they held (db/wallet.py).
+Ratings need no transition: eligibility is an exact per-flight check on the
+end time (db/ratings.py).
+
+`LifecycleScheduler` (one per worker process, started by its first request)
+keeps a min-heap of upcoming departures and landings and fires `advance`
+for the due flights as each boundary passes. The heap is loaded
+incrementally: departures as they enter a LIFECYCLE_HORIZON_MINUTES window,
+plus flights created or rescheduled since the last poll (`updated_at`).
+Entries are never removed; a rescheduled flight gets a new entry and the
+old one is skipped when popped. A full `advance` every
+LIFECYCLE_SWEEP_SECONDS catches whatever the heap missed (rows written by
+other tools, a process that was down). Several workers firing the same
+flight is harmless: rows are claimed with FOR UPDATE SKIP LOCKED where
+supported and every UPDATE is conditional on the current status; at worst
+an event goes out twice, which outbox consumers already allow for.
+
+Readers never trust the column alone: a flight still UPCOMING after its
+departure (the scheduler is a tick behind) is found by the listing filters
+and its exact state comes from the clock (api/flights.py).
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import and_, event, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..utils.metrics import Counter, Gauge, Histogram, registry
+from . import db, outbox, wallet
+from .archive import ends
+from .models import Flight, FlightColumns, Purchase
+
+logger = logging.getLogger("let_service.lifecycle")
+
+LIFECYCLE_TRANSITIONS = registry.register(Counter(
+    "let_lifecycle_transitions_total", "Flights moved to a new lifecycle status", ("status", "source")))
+LIFECYCLE_LAG = registry.register(Histogram(
+    "let_lifecycle_lag_seconds", "Seconds from a departure or landing until the scheduler fired it",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 15.0, 60.0)))
+LIFECYCLE_QUEUED = registry.register(Gauge(
+    "let_lifecycle_queued", "Departures and landings waiting in the scheduler heap"))
+
+SALES_CLOSED = "Flight already started or finished"
+
+# Rows changed this close to the last poll are read again (commit order is
+# not updated_at order)
+_WATERMARK_OVERLAP = timedelta(seconds=5)
+# Ids per `advance(ids=...)` call
+_ID_CHUNK = 500
+
+
+
+def unfinished(model: type[FlightColumns]):
+    """Written exactly as the partial index's condition, so the planner can use it."""
+    return model.lifecycle_status != "FINISHED"
+
+
+def status_at(departure: datetime, duration_seconds: int, now: datetime) -> str:
+    if now < departure:
+        return "UPCOMING"
+    if now < departure + timedelta(seconds=int(duration_seconds)):
+        return "IN_PROGRESS"
+    return "FINISHED"
+
+
+@event.listens_for(Session, "before_flush")
+def _status_on_write(session: Session, flush_context, instances) -> None:
+    now = datetime.utcnow()
+    for obj in (*session.new, *session.dirty):
+        if not isinstance(obj, Flight) or obj.departure_time is None or obj.duration_seconds is None:
+            continue
+        state = inspect(obj)
+        if not state.pending and not (state.attrs.departure_time.history.has_changes()
+                                      or state.attrs.duration_seconds.history.has_changes()):
+            continue
+        obj.lifecycle_status = status_at(obj.departure_time, obj.duration_seconds, now)
+        # The local scheduler picks up the new times without waiting for its poll
+        session.info["lifecycle_changed"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_scheduler(session: Session) -> None:
+    if session.info.pop("lifecycle_changed", False) and has_app_context():
+        scheduler = current_app.extensions.get("lifecycle")
+        if scheduler is not None:
+            scheduler.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_changed(session: Session) -> None:
+    session.info.pop("lifecycle_changed", None)
+
+
+def advance(session: Session, now: datetime, ids=None, batch_size: int = 5000,
+            source: str = "sweep") -> tuple[list[int], list[int]]:
+    """Store every transition due at `now`, only among `ids` when given.
+
+    Commits after every batch. Returns (departed, landed) flight ids; a flight
+    that departed and landed since the last run only counts as landed.
+    """
+    landed_due = and_(unfinished(Flight), Flight.departure_time <= now, ends(Flight) <= now)
+    departed_due = and_(unfinished(Flight), Flight.lifecycle_status == "UPCOMING",
+                        Flight.departure_time <= now, ends(Flight) > now)
+    departed: list[int] = []
+    landed: list[int] = []
+    for status, action, due, out in (("FINISHED", "landed", landed_due, landed),
+                                     ("IN_PROGRESS", "departed", departed_due, departed)):
+        while True:
+            query = select(Flight.id).where(due)
+            if ids is not None:
+                query = query.where(Flight.id.in_(ids))
+            # A departure range on ix_flights_unfinished_departure
+            batch = session.execute(
+                query.order_by(Flight.departure_time).limit(batch_size).with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not batch:
+                session.rollback()
+                break
+
+            # Not a change by anyone: updated_at stays, so ETags keyed on it do too
+            session.execute(
+                update(Flight)
+                .where(Flight.id.in_(batch), due)
+                .values(lifecycle_status=status, updated_at=Flight.updated_at)
+                .execution_options(synchronize_session=False)
+            )
+            # Locked, so a purchase being completed meanwhile is either done
+            # (and skipped here) or waits and then finds it FAILED
+            closed = session.execute(
+                select(Purchase.id)
+                .where(Purchase.flight_id.in_(batch), Purchase.status == "PENDING")
+                .with_for_update()
+            ).scalars().all()
+            if closed:
+                session.execute(
+                    update(Purchase)
+                    .where(Purchase.id.in_(closed), Purchase.status == "PENDING")
+                    .values(status="FAILED", failure_reason=SALES_CLOSED)
+                    .execution_options(synchronize_session=False)
+                )
+                wallet.release(session, closed)
+            outbox.record(session, "flight", action, batch)
+            session.commit()
+            LIFECYCLE_TRANSITIONS.inc(len(batch), status=status, source=source)
+            out.extend(batch)
+            if len(batch) < batch_size:
+                break
+    return departed, landed
+
+
+class LifecycleScheduler:
+    def __init__(self, app: Flask, horizon: timedelta = timedelta(hours=1), poll_seconds: float = 5.0,
+                 sweep_seconds: float = 60.0, batch_size: int = 5000):
+        self.app = app
+        self.horizon = horizon
+        self.poll_seconds = poll_seconds
+        self.sweep_seconds = sweep_seconds
+        self.batch_size = batch_size
+        self._heap: list[tuple[datetime, int, str]] = []
+        # (flight id, kind) -> time of its live heap entry
+        self._due: dict[tuple[int, str], datetime] = {}
+        self._loaded_until: datetime | None = None
+        self._watermark: datetime | None = None
+        self._swept_at: float | None = None
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+
+    def ensure_started(self) -> None:
+        """Start the scheduler thread once per process (threads do not survive a fork)."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            threading.Thread(target=self._run, name="lifecycle", daemon=True).start()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        backoff = 0.0
+        while True:
+            try:
+                timeout = self.tick()
+                backoff = 0.0
+            except Exception as error:
+                backoff = min(max(backoff * 2, 1.0), 30.0)
+                logger.warning("lifecycle scheduler failed (%s), retrying in %.0f s", error, backoff)
+                timeout = backoff
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def tick(self) -> float:
+        """Sweep if due, load new entries, fire what is due; returns seconds until the next tick."""
+        with self.app.app_context():
+            session = db.session
+            if self._swept_at is None or time.monotonic() - self._swept_at >= self.sweep_seconds:
+                self._swept_at = time.monotonic()
+                advance(session, datetime.utcnow(), batch_size=self.batch_size)
+            self._load(session, datetime.utcnow())
+
+            now = datetime.utcnow()
+            due = self._pop_due(now)
+            for start in range(0, len(due), _ID_CHUNK):
+                advance(session, now, ids=due[start:start + _ID_CHUNK], batch_size=self.batch_size,
+                        source="scheduler")
+            LIFECYCLE_QUEUED.set(len(self._due))
+
+        timeout = self.poll_seconds
+        if self._heap:
+            timeout = min(timeout, (self._heap[0][0] - datetime.utcnow()).total_seconds())
+        return max(timeout, 0.0)
+
+    def _push(self, flight_id: int, kind: str, when: datetime) -> None:
+        key = (flight_id, kind)
+        if self._due.get(key) == when:
+            return
+        self._due[key] = when
+        heapq.heappush(self._heap, (when, flight_id, kind))
+
+    def _load(self, session: Session, now: datetime) -> None:
+        until = now + self.horizon
+        columns = (Flight.id, Flight.departure_time, Flight.duration_seconds, Flight.lifecycle_status,
+                   Flight.updated_at)
+        if self._loaded_until is None:
+            # Everything in the air, everything departing within the horizon
+            condition = and_(unfinished(Flight), Flight.departure_time < until)
+            self._watermark = now
+        else:
+            # Departures entering the horizon, and flights created or
+            # rescheduled since the last poll
+            condition = and_(unfinished(Flight), Flight.departure_time < until,
+                             or_(Flight.departure_time >= self._loaded_until,
+                                 Flight.updated_at >= self._watermark - _WATERMARK_OVERLAP))
+        rows = session.execute(select(*columns).where(condition)).all()
+        session.rollback()
+
+        self._loaded_until = until
+        for flight_id, departure, duration, status, updated_at in rows:
+            if status == "UPCOMING":
+                self._push(flight_id, "departure", departure)
+            # Landings stay queued however far off: the window only brings departures
+            self._push(flight_id, "landing", departure + timedelta(seconds=int(duration)))
+            if updated_at is not None and updated_at > self._watermark:
+                self._watermark = updated_at
+
+    def _pop_due(self, now: datetime) -> list[int]:
+        due: set[int] = set()
+        while self._heap and self._heap[0][0] <= now:
+            when, flight_id, kind = heapq.heappop(self._heap)
+            if self._due.get((flight_id, kind)) != when:
+                continue  # superseded by a reschedule
+            del self._due[(flight_id, kind)]
+            LIFECYCLE_LAG.observe((now - when).total_seconds())
+            due.add(flight_id)
+        return sorted(due)
+
+
+def init_lifecycle(app: Flask) -> None:
+    if not app.config.get("LIFECYCLE_ENABLED", True):
+        return
+    scheduler = LifecycleScheduler(
+        app,
+        horizon=timedelta(minutes=float(app.config.get("LIFECYCLE_HORIZON_MINUTES", 60))),
+        poll_seconds=float(app.config.get("LIFECYCLE_POLL_SECONDS", 5.0)),
+        sweep_seconds=float(app.config.get("LIFECYCLE_SWEEP_SECONDS", 60.0)),
+        batch_size=int(app.config.get("LIFECYCLE_BATCH_SIZE", 5000)),
+    )
+    app.extensions["lifecycle"] = scheduler
+
+    @app.before_request
+    def _start_scheduler():
+        scheduler.ensure_started()
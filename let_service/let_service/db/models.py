@@ -2,28 +2,200 @@ from __future__ import annotations
 
 from datetime import datetime
 
+from sqlalchemy import text
+from sqlalchemy.orm import declared_attr
+
 from . import db
 
 
+class TableVersion(db.Model):
+    """Monotonic per-table write counter (see db/versions.py)."""
+
+    __tablename__ = "table_versions"
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+class FlightTombstone(db.Model):
+    """Ids of deleted flights, so catalog snapshots can drop them incrementally."""
+
+    __tablename__ = "flight_tombstones"
+
+    flight_id = db.Column(db.Integer, primary_key=True)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class OutboxEvent(db.Model):
+    """A flight/airline change, written in the same transaction (see db/outbox.py).
+
+    entity_id is NULL for bulk changes that only affect listings (archival).
+    """
+
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Relay: unpublished rows in id order; purge: published before a cutoff
+        db.Index("ix_outbox_events_published_id", "published_at", "id"),
+        {"sqlite_autoincrement": True},
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(16), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=True)
+    action = db.Column(db.String(16), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    published_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "entity": self.entity, "entity_id": self.entity_id, "action": self.action}
+
+
+class DeletionJob(db.Model):
+    """Background removal of an airline or a flight and what depends on it (db/deletion.py)."""
+
+    __tablename__ = "deletion_jobs"
+    __table_args__ = (
+        # Claiming: queued jobs and running ones whose worker stopped reporting
+        db.Index("ix_deletion_jobs_status_updated", "status", "updated_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(16), nullable=False)  # airline/flight
+    entity_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default="QUEUED")  # QUEUED/RUNNING/DONE/FAILED
+    flights_total = db.Column(db.Integer, nullable=False, default=0)
+    flights_deleted = db.Column(db.Integer, nullable=False, default=0)
+    ratings_deleted = db.Column(db.Integer, nullable=False, default=0)
+    purchases_failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # Heartbeat: written with every batch
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "entity": self.entity,
+            "entity_id": self.entity_id,
+            "status": self.status,
+            "flights_total": self.flights_total,
+            "flights_deleted": self.flights_deleted,
+            "ratings_deleted": self.ratings_deleted,
+            "purchases_failed": self.purchases_failed,
+            "error": self.error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
 class Airline(db.Model):
     __tablename__ = "airlines"
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), unique=True, nullable=False)
+    # Set when a deletion job is queued (db/deletion.py); the row goes when it is done
+    deleted_at = db.Column(db.DateTime, nullable=True)
 
     def to_dict(self) -> dict:
         return {"id": self.id, "name": self.name}
 
 
-class Flight(db.Model):
-    __tablename__ = "flights"
+class FlightSchedule(db.Model):
+    """A route flown on a recurrence rule; its flights are generated on demand (db/schedules.py).
+
+    Only occurrences that are bought, approved or changed become `flights`
+    rows (with `schedule_id` and the occurrence as `occurrence_at`).
+    """
+
+    __tablename__ = "flight_schedules"
+    __table_args__ = (
+        db.Index("ix_flight_schedules_route", "origin_airport", "destination_airport"),
+        # Flights keep `schedule_id` after the schedule is deleted; a new one must not take it
+        {"sqlite_autoincrement": True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
 
-    airline_id = db.Column(db.Integer, db.ForeignKey("airlines.id"), nullable=False)
+    airline_id = db.Column(db.Integer, db.ForeignKey("airlines.id"), nullable=False, index=True)
     airline = db.relationship("Airline", lazy="joined")
 
+    distance_km = db.Column(db.Float, nullable=False)
+    duration_seconds = db.Column(db.Integer, nullable=False)
+    origin_airport = db.Column(db.String(120), nullable=False)
+    destination_airport = db.Column(db.String(120), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    created_by_user_id = db.Column(db.String(64), nullable=False)
+
+    # Recurrence: the first departure (its time of day is every departure's),
+    # every `every` days (DAILY) or weeks (WEEKLY, on `weekdays`: "0,2,4"
+    # with Monday = 0), the last departure at or before `ends_at` if set
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime, nullable=True)
+    frequency = db.Column(db.String(16), nullable=False, default="DAILY")  # DAILY/WEEKLY
+    every = db.Column(db.Integer, nullable=False, default=1)
+    weekdays = db.Column(db.String(20), nullable=True)
+
+    # Approval applies to every occurrence not materialized yet
+    approval_status = db.Column(db.String(20), nullable=False, default="PENDING")
+    rejection_reason = db.Column(db.String(500), nullable=True)
+    approved_by_user_id = db.Column(db.String(64), nullable=True)
+    approved_at = db.Column(db.DateTime, nullable=True)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "airline": self.airline.to_dict() if self.airline else None,
+            "distance_km": self.distance_km,
+            "duration_seconds": self.duration_seconds,
+            "origin_airport": self.origin_airport,
+            "destination_airport": self.destination_airport,
+            "price": self.price,
+            "created_by_user_id": self.created_by_user_id,
+            "starts_at": self.starts_at.isoformat(),
+            "ends_at": self.ends_at.isoformat() if self.ends_at else None,
+            "frequency": self.frequency,
+            "every": self.every,
+            "weekdays": [int(d) for d in self.weekdays.split(",")] if self.weekdays else None,
+            "approval_status": self.approval_status,
+            "rejection_reason": self.rejection_reason,
+            "approved_by_user_id": self.approved_by_user_id,
+            "approved_at": self.approved_at.isoformat() if self.approved_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+class ScheduleSkip(db.Model):
+    """An occurrence of a FlightSchedule whose flight was deleted; never listed or materialized again."""
+
+    __tablename__ = "schedule_skips"
+
+    schedule_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    occurrence_at = db.Column(db.DateTime, primary_key=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class FlightColumns:
+    """Columns of a flight, shared by `flights` and `flights_archive` (db/archive.py)."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+
+    airline_id = db.Column(db.Integer, db.ForeignKey("airlines.id"), nullable=False)
+
+    @declared_attr
+    def airline(cls):
+        return db.relationship("Airline", lazy="joined")
+
     distance_km = db.Column(db.Float, nullable=False)
     duration_seconds = db.Column(db.Integer, nullable=False)  # stored in seconds
 
@@ -34,6 +206,11 @@ class Flight(db.Model):
     created_by_user_id = db.Column(db.String(64), nullable=False)
     price = db.Column(db.Float, nullable=False)
 
+    # Set on occurrences of a FlightSchedule that were materialized: the
+    # schedule and the slot it generated, which stays when departure_time moves
+    schedule_id = db.Column(db.Integer, nullable=True)
+    occurrence_at = db.Column(db.DateTime, nullable=True)
+
     # Approval workflow
     approval_status = db.Column(db.String(20), nullable=False, default="PENDING")
     rejection_reason = db.Column(db.String(500), nullable=True)
@@ -45,6 +222,10 @@ class Flight(db.Model):
     canceled_by_user_id = db.Column(db.String(64), nullable=True)
     canceled_at = db.Column(db.DateTime, nullable=True)
 
+    # UPCOMING -> IN_PROGRESS -> FINISHED at departure and landing, kept by
+    # db/lifecycle.py; may lag the clock by a scheduler tick
+    lifecycle_status = db.Column(db.String(16), nullable=False, default="UPCOMING", server_default="UPCOMING")
+
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -69,16 +250,63 @@ class Flight(db.Model):
             "canceled_at": self.canceled_at.isoformat() if self.canceled_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+            "schedule_id": self.schedule_id,
         }
 
 
+class Flight(FlightColumns, db.Model):
+    """Live flights: everything whose end is within ARCHIVE_RETENTION_DAYS.
+
+    Older ones are moved to `flights_archive` with the same id.
+    """
+
+    __tablename__ = "flights"
+
+    # GET /flights route, departure-window and price filters; the leading
+    # departure_time also serves the itinerary index's range scan.
+    # updated_at: catalog snapshots poll `updated_at >= watermark`.
+    # AUTOINCREMENT: SQLite would otherwise reuse the id of an archived
+    # newest row, and purchases would point at two flights. Older databases
+    # lack it, so archive_flights also never moves the newest row
+    __table_args__ = (
+        db.Index("ix_flights_route_departure", "origin_airport", "destination_airport", "departure_time"),
+        db.Index("ix_flights_departure_price", "departure_time", "price"),
+        db.Index("ix_flights_updated_at", "updated_at"),
+        # One row per schedule occurrence; NULLs (ordinary flights) never collide
+        db.UniqueConstraint("schedule_id", "occurrence_at", name="uq_flights_schedule_occurrence"),
+        # Only flights that have not landed (db/lifecycle.py `unfinished`); a
+        # plain index where partial indexes are not supported (MySQL)
+        db.Index("ix_flights_unfinished_departure", "departure_time", "lifecycle_status",
+                 sqlite_where=text("lifecycle_status != 'FINISHED'"),
+                 postgresql_where=text("lifecycle_status != 'FINISHED'")),
+        {"sqlite_autoincrement": True},
+    )
+
+
+class ArchivedFlight(FlightColumns, db.Model):
+    """Flights that ended more than ARCHIVE_RETENTION_DAYS ago (db/archive.py)."""
+
+    __tablename__ = "flights_archive"
+
+    # Same filters as the live table for the archive tab of GET /flights
+    __table_args__ = (
+        db.Index("ix_flights_archive_route_departure", "origin_airport", "destination_airport", "departure_time"),
+        db.Index("ix_flights_archive_departure_price", "departure_time", "price"),
+        # Schedule listings skip occurrences that were materialized long ago
+        db.Index("ix_flights_archive_schedule_occurrence", "schedule_id", "occurrence_at"),
+    )
+
+
 class Purchase(db.Model):
     __tablename__ = "purchases"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(64), nullable=False, index=True)
-    flight_id = db.Column(db.Integer, db.ForeignKey("flights.id"), nullable=False, index=True)
-    flight = db.relationship("Flight", lazy="joined")
+    user_id = db.Column(db.String(64), nullable=False)
+    # No foreign key: the flight may have moved to flights_archive
+    flight_id = db.Column(db.Integer, nullable=False, index=True)
+    flight = db.relationship("Flight", primaryjoin="foreign(Purchase.flight_id) == Flight.id", lazy="joined")
+    archived_flight = db.relationship(
+        "ArchivedFlight", primaryjoin="foreign(Purchase.flight_id) == ArchivedFlight.id", lazy="joined", viewonly=True)
 
     status = db.Column(db.String(20), nullable=False, default="PENDING")  # PENDING/COMPLETED/FAILED
     failure_reason = db.Column(db.String(500), nullable=True)
@@ -87,7 +315,15 @@ class Purchase(db.Model):
     purchased_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Revenue analytics scan completed purchases by purchased_at
+        db.Index("ix_purchases_status_purchased_at", "status", "purchased_at"),
+        # A user's history, newest first (keyset pages); replaces the index on user_id
+        db.Index("ix_purchases_user_created", "user_id", "created_at"),
+    )
+
     def to_dict(self) -> dict:
+        flight = self.flight or self.archived_flight
         return {
             "id": self.id,
             "user_id": self.user_id,
@@ -97,7 +333,65 @@ class Purchase(db.Model):
             "price_paid": self.price_paid,
             "purchased_at": self.purchased_at.isoformat() if self.purchased_at else None,
             "created_at": self.created_at.isoformat() if self.created_at else None,
-            "flight": self.flight.to_dict_base() if self.flight else None,
+            "flight": flight.to_dict_base() if flight else None,
+        }
+
+
+class Wallet(db.Model):
+    """A user's money in cents (db/wallet.py).
+
+    held_cents covers PENDING purchases and captured ones the settlement job
+    has not folded into balance_cents yet; available = balance - held.
+    """
+
+    __tablename__ = "wallets"
+
+    user_id = db.Column(db.String(64), primary_key=True)
+    balance_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    held_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "balance": self.balance_cents / 100,
+            "held": self.held_cents / 100,
+            "available": (self.balance_cents - self.held_cents) / 100,
+        }
+
+
+class LedgerEntry(db.Model):
+    """Append-only wallet history: entries are never changed or deleted, the
+    settlement job only stamps settled_at on captures it applied."""
+
+    __tablename__ = "ledger_entries"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(64), nullable=False)
+    # NULL for deposits
+    purchase_id = db.Column(db.Integer, nullable=True)
+    kind = db.Column(db.String(8), nullable=False)  # DEPOSIT/RESERVE/CAPTURE/RELEASE
+    amount_cents = db.Column(db.BigInteger, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    settled_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # One reserve, capture or release per purchase, however often it is decided
+        db.UniqueConstraint("purchase_id", "kind", name="uq_ledger_purchase_kind"),
+        # The settlement job reads unsettled captures in id order
+        db.Index("ix_ledger_entries_settled_id", "settled_at", "id"),
+        db.Index("ix_ledger_entries_user_created", "user_id", "created_at"),
+        {"sqlite_autoincrement": True},
+    )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "purchase_id": self.purchase_id,
+            "kind": self.kind,
+            "amount": self.amount_cents / 100,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "settled_at": self.settled_at.isoformat() if self.settled_at else None,
         }
 
 
@@ -105,9 +399,12 @@ class Rating(db.Model):
     __tablename__ = "ratings"
 
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.String(64), nullable=False, index=True)
-    flight_id = db.Column(db.Integer, db.ForeignKey("flights.id"), nullable=False, index=True)
-    flight = db.relationship("Flight", lazy="joined")
+    user_id = db.Column(db.String(64), nullable=False)
+    # No foreign key: the flight may have moved to flights_archive
+    flight_id = db.Column(db.Integer, nullable=False, index=True)
+    flight = db.relationship("Flight", primaryjoin="foreign(Rating.flight_id) == Flight.id", lazy="joined")
+    archived_flight = db.relationship(
+        "ArchivedFlight", primaryjoin="foreign(Rating.flight_id) == ArchivedFlight.id", lazy="joined", viewonly=True)
 
     rating = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -117,11 +414,12 @@ class Rating(db.Model):
     )
 
     def to_dict(self) -> dict:
+        flight = self.flight or self.archived_flight
         return {
             "id": self.id,
             "user_id": self.user_id,
             "flight_id": self.flight_id,
             "rating": self.rating,
             "created_at": self.created_at.isoformat() if self.created_at else None,
-            "flight": self.flight.to_dict_base() if self.flight else None,
+            "flight": flight.to_dict_base() if flight else None,
         }
@@ -0,0 +1,237 @@
+"""Airport graph index and multi-leg itinerary search.
+
+An index covers the flights that can appear in a trip starting on one day:
+approved, not canceled, of an airline not being deleted, departing between
+that day's midnight and the end of the day plus ITINERARY_MAX_TRIP_HOURS,
+and the approved flight schedules' occurrences in that window that are not
+materialized yet (db/schedules.py; legs without a flight id). Flights are
+grouped by origin airport and sorted by departure, so the connections out
+of an airport within a layover window are one `bisect` away.
+
+The search is a time-dependent best-first search over (airport, arrival
+time) labels: partial itineraries are expanded in order of arrival, so
+itineraries reach the destination earliest-arrival first. Each airport is
+expanded at most `limit` times (the usual k-shortest-paths label bound),
+which keeps the work proportional to k * connections instead of the number
+of paths. With the leg limit and no-revisit rule the bound is a heuristic:
+a rare k-th best itinerary may be missed, never an invalid one returned.
+
+Indexes are cached per process by (day, flights, airlines and schedules
+table versions), so a write to any of them retires them.
+"""
+from __future__ import annotations
+
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from flask import current_app
+from sqlalchemy import select
+
+from . import db, schedules
+from .deletion import airline_live
+from .models import Flight
+
+_EPOCH = datetime(1970, 1, 1)
+_ONE_US = timedelta(microseconds=1)
+
+
+def epoch_us(dt: datetime) -> int:
+    return (dt - _EPOCH) // _ONE_US
+
+
+def from_epoch_us(us: int) -> datetime:
+    return _EPOCH + us * _ONE_US
+
+
+def airport_key(name: str) -> str:
+    return (name or "").strip().lower()
+
+
+class Leg(NamedTuple):
+    flight_id: int | None
+    origin: str
+    destination: str
+    departure_us: int
+    arrival_us: int
+    price: float
+    # Set, with flight_id None, for a schedule occurrence not materialized yet
+    schedule_id: int | None = None
+
+
+class Itinerary(NamedTuple):
+    legs: tuple[Leg, ...]
+
+    @property
+    def departure_us(self) -> int:
+        return self.legs[0].departure_us
+
+    @property
+    def arrival_us(self) -> int:
+        return self.legs[-1].arrival_us
+
+    @property
+    def price(self) -> float:
+        return sum(leg.price for leg in self.legs)
+
+
+class AirportIndex:
+    """Flights grouped by origin airport, each group sorted by departure."""
+
+    def __init__(self, legs: list[Leg]):
+        grouped: dict[str, list[Leg]] = {}
+        for leg in legs:
+            grouped.setdefault(leg.origin, []).append(leg)
+        self.departures: dict[str, array] = {}
+        self.legs: dict[str, list[Leg]] = {}
+        for origin, group in grouped.items():
+            group.sort(key=lambda leg: (leg.departure_us, leg.flight_id is None, leg.flight_id or 0,
+                                        leg.schedule_id or 0))
+            self.legs[origin] = group
+            self.departures[origin] = array("q", (leg.departure_us for leg in group))
+        self.size = len(legs)
+
+    def leaving(self, airport: str, earliest_us: int, latest_us: int) -> list[Leg]:
+        """Flights out of `airport` departing in [earliest_us, latest_us)."""
+        departures = self.departures.get(airport)
+        if departures is None:
+            return []
+        lo = bisect_left(departures, earliest_us)
+        hi = bisect_left(departures, latest_us, lo)
+        return self.legs[airport][lo:hi]
+
+
+class SearchStats(NamedTuple):
+    pushed: int
+    expanded: int
+
+
+def search(
+    index: AirportIndex,
+    origin: str,
+    destination: str,
+    first_departure_from_us: int,
+    first_departure_until_us: int,
+    max_legs: int,
+    min_layover_us: int,
+    max_layover_us: int,
+    max_trip_us: int,
+    limit: int,
+) -> tuple[list[Itinerary], SearchStats]:
+    """Up to `limit` itineraries from `origin` to `destination` (airport keys),
+    earliest arrival first; ties go to fewer legs, then lower price.
+
+    Airports are not revisited within an itinerary.
+    """
+    results: list[Itinerary] = []
+    if origin == destination or max_legs < 1 or limit < 1:
+        return results, SearchStats(0, 0)
+
+    heap: list[tuple] = []
+    seq = 0
+    for leg in index.leaving(origin, first_departure_from_us, first_departure_until_us):
+        if max_legs == 1 and leg.destination != destination:
+            continue
+        heapq.heappush(heap, (leg.arrival_us, 1, leg.price, seq, (leg,)))
+        seq += 1
+
+    expansions: dict[str, int] = {}
+    expanded = 0
+    while heap and len(results) < limit:
+        arrival, count, price, _, legs = heapq.heappop(heap)
+        airport = legs[-1].destination
+        if airport == destination:
+            results.append(Itinerary(legs))
+            continue
+
+        # k-best bound, see module docstring
+        seen = expansions.get(airport, 0)
+        if seen >= limit:
+            continue
+        expansions[airport] = seen + 1
+        expanded += 1
+
+        visited = {origin, *(leg.destination for leg in legs)}
+        trip_start = legs[0].departure_us
+        last_leg = count + 1 == max_legs
+        for leg in index.leaving(airport, arrival + min_layover_us, arrival + max_layover_us + 1):
+            if leg.arrival_us - trip_start > max_trip_us:
+                continue
+            if last_leg and leg.destination != destination:
+                continue
+            if leg.destination in visited:
+                continue
+            heapq.heappush(heap, (leg.arrival_us, count + 1, price + leg.price, seq, legs + (leg,)))
+            seq += 1
+
+    return results, SearchStats(seq, expanded)
+
+
+def load_index(day_start: datetime, max_trip: timedelta) -> AirportIndex:
+    window_end = day_start + timedelta(days=1) + max_trip
+    rows = db.session.execute(
+        select(
+            Flight.id, Flight.origin_airport, Flight.destination_airport,
+            Flight.departure_time, Flight.duration_seconds, Flight.price,
+        )
+        .where(Flight.approval_status == "APPROVED")
+        .where(Flight.canceled.is_(False))
+        .where(Flight.departure_time >= day_start)
+        .where(Flight.departure_time < window_end)
+        .where(airline_live(Flight))
+    )
+    legs = []
+    for flight_id, origin, destination, departure, duration, price in rows:
+        departure_us = epoch_us(departure)
+        legs.append(Leg(
+            flight_id, airport_key(origin), airport_key(destination),
+            departure_us, departure_us + int(duration) * 1_000_000, float(price),
+        ))
+
+    found = schedules.candidates(db.session, day_start, window_end, approval="APPROVED")
+    for schedule, departure in schedules.expand(db.session, found, day_start, window_end, datetime.utcnow()):
+        departure_us = epoch_us(departure)
+        legs.append(Leg(
+            None, airport_key(schedule.origin_airport), airport_key(schedule.destination_airport),
+            departure_us, departure_us + int(schedule.duration_seconds) * 1_000_000, float(schedule.price),
+            schedule.id,
+        ))
+    return AirportIndex(legs)
+
+
+class NetworkCache:
+    """LRU of AirportIndex per (day, flights, airlines and schedules versions)."""
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, AirportIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, day_start: datetime, table_versions: tuple, max_trip: timedelta) -> AirportIndex:
+        key = (day_start, table_versions, max_trip)
+        with self._lock:
+            index = self._entries.get(key)
+            if index is not None:
+                self._entries.move_to_end(key)
+                return index
+
+        # Built outside the lock; two concurrent misses just build twice
+        index = load_index(day_start, max_trip)
+        with self._lock:
+            self._entries[key] = index
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return index
+
+
+def get_network() -> NetworkCache:
+    cache = current_app.extensions.get("flight_network")
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            "flight_network", NetworkCache(int(current_app.config.get("ITINERARY_CACHE_DAYS", 16))))
+    return cache
@@ -0,0 +1,207 @@
+"""Transactional outbox for flight and airline change events.
+
+Every flush that inserts, updates or deletes an Airline or Flight adds an
+`outbox_events` row in the same transaction, the same way db/versions.py
+bumps table versions, so an event exists exactly when its change committed.
+Bulk statements that bypass the unit of work call `record` themselves.
+
+`OutboxRelay` (one per worker process, started by its first request) sends
+unpublished rows in id order through the bus (utils/bus.py) and stamps
+`published_at`. A commit that wrote events wakes the local relay at once;
+otherwise it polls every OUTBOX_POLL_SECONDS, which picks up rows written
+by other workers, by `python -m let_service archive` and by relays that died
+before publishing. Rows are claimed with FOR UPDATE SKIP LOCKED where the
+database supports it. Delivery is at least once (a publish followed by a
+failed commit is repeated); consumers only evict, so repeats are harmless.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.orm import Session
+
+from ..utils.bus import LocalBus, make_bus
+from ..utils.metrics import Counter, Histogram, registry
+from . import db
+from .models import Airline, Flight, FlightSchedule, OutboxEvent
+
+logger = logging.getLogger("let_service.outbox")
+
+OUTBOX_PUBLISHED = registry.register(Counter(
+    "let_outbox_published_total", "Change events published by the outbox relay", ("bus",)))
+OUTBOX_FAILURES = registry.register(Counter(
+    "let_outbox_publish_failures_total", "Relay passes that failed and will be retried", ("bus",)))
+OUTBOX_LAG = registry.register(Histogram(
+    "let_outbox_lag_seconds", "Age of the oldest event in a published batch",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 30.0)))
+
+# Models whose flushes write an event, and the entity name consumers see
+TRACKED = {Airline: "airline", Flight: "flight", FlightSchedule: "schedule"}
+
+_PURGE_INTERVAL_SECONDS = 60.0
+
+
+def _enabled() -> bool:
+    return not has_app_context() or bool(current_app.config.get("OUTBOX_ENABLED", True))
+
+
+def record(session: Session, entity: str, action: str, ids=None) -> None:
+    """Add events in the current transaction.
+
+    ids=None writes one event with no entity_id: "listings changed", for bulk
+    moves that leave each record readable by id (archival).
+    """
+    if not _enabled():
+        return
+    now = datetime.utcnow()
+    targets = [None] if ids is None else sorted(set(int(i) for i in ids))
+    if not targets:
+        return
+    session.connection().execute(
+        OutboxEvent.__table__.insert(),
+        [{"entity": entity, "entity_id": i, "action": action, "created_at": now} for i in targets],
+    )
+    session.info["outbox_pending"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _record_after_flush(session: Session, flush_context) -> None:
+    changes: dict[tuple[str, str], list[int]] = {}
+    for action, objects in (("created", session.new), ("updated", session.dirty), ("deleted", session.deleted)):
+        for obj in objects:
+            entity = TRACKED.get(type(obj))
+            if entity is None or (action == "updated" and not session.is_modified(obj)):
+                continue
+            changes.setdefault((entity, action), []).append(obj.id)
+    for (entity, action), ids in sorted(changes.items()):
+        record(session, entity, action, ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_relay(session: Session) -> None:
+    if session.info.pop("outbox_pending", False) and has_app_context():
+        relay = current_app.extensions.get("outbox")
+        if relay is not None:
+            relay.wake()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending(session: Session) -> None:
+    session.info.pop("outbox_pending", None)
+
+
+class OutboxRelay:
+    def __init__(self, app: Flask, bus: LocalBus, poll_seconds: float = 1.0, batch_size: int = 500,
+                 retention: timedelta = timedelta(hours=24)):
+        self.app = app
+        self.bus = bus
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.retention = retention
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._pid: int | None = None
+        self._purged_at = 0.0
+
+    def ensure_started(self) -> None:
+        """Start the relay thread once per process (threads do not survive a fork)."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            # Rows a previous process left unpublished go out right away
+            self._wake.set()
+            threading.Thread(target=self._run, name="outbox-relay", daemon=True).start()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        backoff = 0.0
+        while True:
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            try:
+                self.drain()
+                backoff = 0.0
+            except Exception as error:
+                # Commits keep waking the relay; back off regardless while the bus is down
+                OUTBOX_FAILURES.inc(bus=self.bus.name)
+                backoff = min(max(backoff * 2, 1.0), 30.0)
+                logger.warning("outbox relay failed (%s), retrying in %.0f s", error, backoff)
+                time.sleep(backoff)
+
+    def drain(self) -> int:
+        """Publish every unpublished event; returns how many were sent."""
+        sent = 0
+        with self.app.app_context():
+            while True:
+                count = self._publish_batch(db.session)
+                sent += count
+                if count < self.batch_size:
+                    break
+            if time.monotonic() - self._purged_at >= _PURGE_INTERVAL_SECONDS:
+                self._purge(db.session)
+        return sent
+
+    def _publish_batch(self, session: Session) -> int:
+        rows = session.execute(
+            select(OutboxEvent)
+            .where(OutboxEvent.published_at.is_(None))
+            .order_by(OutboxEvent.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not rows:
+            session.rollback()
+            return 0
+
+        events = [row.to_dict() for row in rows]
+        oldest = min(row.created_at for row in rows)
+        try:
+            self.bus.publish(events)
+        except Exception:
+            session.rollback()
+            raise
+        session.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_([e["id"] for e in events]))
+            .values(published_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        OUTBOX_PUBLISHED.inc(len(events), bus=self.bus.name)
+        OUTBOX_LAG.observe(max((datetime.utcnow() - oldest).total_seconds(), 0.0))
+        return len(events)
+
+    def _purge(self, session: Session) -> None:
+        self._purged_at = time.monotonic()
+        cutoff = datetime.utcnow() - self.retention
+        session.execute(delete(OutboxEvent).where(OutboxEvent.published_at < cutoff))
+        session.commit()
+
+
+def init_outbox(app: Flask) -> None:
+    if not app.config.get("OUTBOX_ENABLED", True):
+        return
+    relay = OutboxRelay(
+        app,
+        make_bus(app),
+        poll_seconds=float(app.config.get("OUTBOX_POLL_SECONDS", 1.0)),
+        batch_size=int(app.config.get("OUTBOX_BATCH_SIZE", 500)),
+        retention=timedelta(hours=float(app.config.get("OUTBOX_RETENTION_HOURS", 24))),
+    )
+    app.extensions["outbox"] = relay
+
+    @app.before_request
+    def _start_relay():
+        relay.ensure_started()
@@ -0,0 +1,198 @@
+"""Rating writes as one statement each.
+
+A user may rate a flight that is FINISHED (not canceled, departure plus
+duration in the past) and that they bought (a COMPLETED purchase). Both
+checks are the WHERE clause of an `INSERT ... SELECT FROM flights` (UNION
+ALL the same from `flights_archive`, see db/archive.py), and an existing
+rating for the pair is updated through `uq_rating_user_flight`: `ON
+DUPLICATE KEY UPDATE` on MySQL, `ON CONFLICT DO UPDATE` on SQLite and
+PostgreSQL. A rating that is not allowed inserts nothing; only then is the
+reason looked up. With RETURNING (SQLite, PostgreSQL) the common path is a
+single round trip; MySQL reads the written row back in a second one.
+`upsert_ratings` writes a whole chunk of ratings the same way in one
+statement.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import NamedTuple
+
+from sqlalchemy import Integer, String, and_, exists, false, literal, select, union_all
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+from sqlalchemy.types import DateTime
+
+from .archive import ends
+from .models import ArchivedFlight, Flight, Purchase, Rating
+
+# Why a rating was not written
+NOT_FOUND = "NOT_FOUND"
+NOT_FINISHED = "NOT_FINISHED"
+NOT_PURCHASED = "NOT_PURCHASED"
+
+
+class RatingWrite(NamedTuple):
+    row: dict
+    created: bool
+
+
+def _eligible(user_id: str, flight_id: int, rating: int, now: datetime, created_at: datetime):
+    """One (user_id, flight_id, rating, created_at) row if the rating is allowed, else none.
+
+    The flight may be live or archived: one SELECT per table, at most one matches.
+    """
+    selects = []
+    for model in (Flight, ArchivedFlight):
+        purchased = exists().where(
+            Purchase.user_id == user_id,
+            Purchase.flight_id == model.id,
+            Purchase.status == "COMPLETED",
+        )
+        selects.append(
+            select(
+                literal(user_id, String).label("user_id"),
+                model.id.label("flight_id"),
+                literal(rating, Integer).label("rating"),
+                literal(created_at, DateTime).label("created_at"),
+            )
+            .where(model.id == flight_id)
+            .where(model.canceled == false())
+            .where(ends(model) <= now)
+            .where(purchased)
+        )
+    return selects
+
+
+def _upsert_statement(session: Session, source):
+    columns = ["user_id", "flight_id", "rating", "created_at"]
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(Rating).from_select(columns, source)
+        return stmt.on_conflict_do_update(
+            index_elements=["user_id", "flight_id"], set_={"rating": stmt.excluded.rating})
+    stmt = mysql.insert(Rating).from_select(columns, source)
+    return stmt.on_duplicate_key_update(rating=stmt.inserted.rating)
+
+
+_RETURNED = (Rating.id, Rating.user_id, Rating.flight_id, Rating.rating, Rating.created_at)
+
+
+def upsert_rating(session: Session, user_id: str, flight_id: int, rating: int, now: datetime) -> RatingWrite | None:
+    """Write the rating if allowed; None when it was not (see `rejection_reasons`).
+
+    A new row gets `now` as created_at, which is also how a created row is
+    told from an updated one. Does not commit.
+    """
+    dialect = session.get_bind().dialect
+
+    if dialect.insert_returning:
+        stmt = _upsert_statement(session, union_all(*_eligible(user_id, flight_id, rating, now, now)))
+        returned = session.execute(stmt.returning(*_RETURNED)).first()
+        if returned is None:
+            return None
+        # An update keeps the original created_at
+        return RatingWrite(_row(returned), returned.created_at == now)
+
+    # MySQL: DATETIME keeps whole seconds, and SQLAlchemy connects with
+    # CLIENT_FOUND_ROWS: 0 rows means the SELECT found nothing, 1 an insert
+    # (or an unchanged duplicate), 2 an update
+    created_at = now.replace(microsecond=0)
+    stmt = _upsert_statement(session, union_all(*_eligible(user_id, flight_id, rating, now, created_at)))
+    rowcount = session.execute(stmt).rowcount
+    if rowcount == 0:
+        return None
+    stored = session.execute(
+        select(*_RETURNED).where(Rating.user_id == user_id, Rating.flight_id == flight_id)
+    ).one()
+    return RatingWrite(_row(stored), rowcount == 1 and stored.created_at == created_at)
+
+
+def upsert_ratings(session: Session, items: list[tuple[str, int, int]], now: datetime,
+                   chunk_size: int = 200) -> dict[tuple[str, int], RatingWrite]:
+    """Bulk `upsert_rating`: one INSERT ... SELECT per chunk of (user_id,
+    flight_id, rating), over a UNION ALL of the per-item eligibility checks.
+
+    Returns the written rows by (user_id, flight_id); pairs missing from it
+    were refused. A pair given twice keeps its last rating. Chunks stay under
+    SQLite's 500-term compound SELECT limit
+    (two terms per item). Does not commit.
+    """
+    latest = {(user_id, flight_id): rating for user_id, flight_id, rating in items}
+    pairs = list(latest)
+    dialect = session.get_bind().dialect
+    created_at = now if dialect.insert_returning else now.replace(microsecond=0)
+
+    written: dict[tuple[str, int], RatingWrite] = {}
+    for start in range(0, len(pairs), chunk_size):
+        chunk = pairs[start:start + chunk_size]
+        selects = [s for user_id, flight_id in chunk
+                   for s in _eligible(user_id, flight_id, latest[(user_id, flight_id)], now, created_at)]
+        stmt = _upsert_statement(session, union_all(*selects))
+
+        if dialect.insert_returning:
+            rows = session.execute(stmt.returning(*_RETURNED)).all()
+        else:
+            if session.execute(stmt).rowcount == 0:
+                continue
+            users = sorted({user_id for user_id, _ in chunk})
+            flights = sorted({flight_id for _, flight_id in chunk})
+            wanted = set(chunk)
+            # No RETURNING: read the pairs back. A refused pair whose stored
+            # rating already equals the requested one reads as written, which
+            # leaves the table as the caller asked anyway
+            rows = [r for r in session.execute(
+                select(*_RETURNED).where(Rating.user_id.in_(users), Rating.flight_id.in_(flights))
+            ) if (r.user_id, r.flight_id) in wanted and r.rating == latest[(r.user_id, r.flight_id)]]
+        for r in rows:
+            written[(r.user_id, r.flight_id)] = RatingWrite(_row(r), r.created_at == created_at)
+    return written
+
+
+def rejection_reasons(session: Session, pairs: list[tuple[str, int]], now: datetime) -> dict[tuple[str, int], str]:
+    """NOT_FOUND, NOT_FINISHED or NOT_PURCHASED for (user_id, flight_id) pairs
+    that `upsert_rating` refused, in one query."""
+    if not pairs:
+        return {}
+    users = sorted({user for user, _ in pairs})
+    flights = sorted({flight for _, flight in pairs})
+    rows = session.execute(union_all(*(
+        select(model.id, (and_(model.canceled == false(), ends(model) <= now)).label("finished"), Purchase.user_id)
+        .outerjoin(Purchase, and_(
+            Purchase.flight_id == model.id,
+            Purchase.status == "COMPLETED",
+            Purchase.user_id.in_(users),
+        ))
+        .where(model.id.in_(flights))
+        for model in (Flight, ArchivedFlight)
+    ))).all()
+
+    finished: dict[int, bool] = {}
+    bought: set[tuple[str, int]] = set()
+    for flight_id, is_finished, buyer in rows:
+        finished[flight_id] = bool(is_finished)
+        if buyer is not None:
+            bought.add((buyer, flight_id))
+
+    reasons = {}
+    for user, flight in pairs:
+        if flight not in finished:
+            reasons[(user, flight)] = NOT_FOUND
+        elif not finished[flight]:
+            reasons[(user, flight)] = NOT_FINISHED
+        elif (user, flight) not in bought:
+            reasons[(user, flight)] = NOT_PURCHASED
+        else:
+            # The purchase completed between the write and this lookup
+            reasons[(user, flight)] = NOT_PURCHASED
+    return reasons
+
+
+def _row(r) -> dict:
+    return {
+        "id": r.id,
+        "user_id": r.user_id,
+        "flight_id": r.flight_id,
+        "rating": r.rating,
+        "created_at": r.created_at.isoformat() if r.created_at else None,
+    }
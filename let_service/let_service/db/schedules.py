@@ -0,0 +1,255 @@
+"""Recurring flights: `flight_schedules` expanded on demand.
+
+A schedule stores a route once with a recurrence rule (DAILY or WEEKLY on
+some weekdays, every N days/weeks, from `starts_at` until `ends_at`).
+`GET /flights` generates its occurrences inside the requested departure
+window (`expand`), in Python, after one indexed query for the schedules and
+one for the occurrences already materialized; they are listed like flights
+with `"id": null` and `"virtual": true`.
+
+An occurrence becomes a `flights` row (`materialize`) only when it is
+bought, or through POST /schedules/<id>/occurrences to approve or change it
+like any flight. The row keeps `schedule_id` and the occurrence as
+`occurrence_at`, unique together (`uq_flights_schedule_occurrence`), so
+listings show the row instead of the occurrence, also after its departure
+is moved or it is archived, and two requests materializing the same
+occurrence get the same row. Deleting that flight records the occurrence
+in `schedule_skips`, so it is not generated again.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .lifecycle import status_at
+from .models import Airline, ArchivedFlight, Flight, FlightColumns, FlightSchedule, ScheduleSkip
+
+FREQUENCIES = ("DAILY", "WEEKLY")
+
+# Occurrences of a schedule whose `ends_at` is older than this cannot be in
+# the air any more; the exact check is per occurrence
+_LONGEST_FLIGHT = timedelta(days=7)
+
+
+def parse_weekdays(value) -> list[int] | None:
+    """[0..6] from a list or "0,2,4" (Monday = 0); None if malformed."""
+    if isinstance(value, str):
+        value = [part for part in value.split(",") if part.strip()]
+    if not isinstance(value, (list, tuple)) or not value:
+        return None
+    try:
+        days = sorted({int(day) for day in value})
+    except (TypeError, ValueError):
+        return None
+    return days if all(0 <= day <= 6 for day in days) else None
+
+
+def _weekdays(schedule: FlightSchedule) -> list[int]:
+    return parse_weekdays(schedule.weekdays or "") or [schedule.starts_at.weekday()]
+
+
+def occurrences(schedule: FlightSchedule, start: datetime, end: datetime) -> Iterator[datetime]:
+    """Departures of the schedule in [start, end), in order."""
+    first, last = schedule.starts_at, schedule.ends_at
+    if last is not None and last < end:
+        end = last + timedelta(microseconds=1)
+    start = max(start, first)
+    if start >= end:
+        return
+    every = max(int(schedule.every or 1), 1)
+
+    if schedule.frequency == "DAILY":
+        step = timedelta(days=every)
+        k = -(-(start - first) // step)
+        departure = first + k * step
+        while departure < end:
+            yield departure
+            departure += step
+        return
+
+    days = _weekdays(schedule)
+    time_of_day = first.time()
+    monday = first.date() - timedelta(days=first.weekday())
+    week = max((start.date() - monday).days // 7, 0)
+    week = -(-week // every) * every
+    while True:
+        for day in days:
+            departure = datetime.combine(monday + timedelta(weeks=week, days=day), time_of_day)
+            if departure >= end:
+                return
+            if departure >= start:
+                yield departure
+        week += every
+
+
+def occurs_at(schedule: FlightSchedule, departure: datetime) -> bool:
+    return next(occurrences(schedule, departure, departure + timedelta(microseconds=1)), None) == departure
+
+
+def candidates(
+    session: Session,
+    start: datetime,
+    end: datetime,
+    *,
+    airline_id: int | None = None,
+    approval: str = "",
+    origin: str | None = None,
+    destination: str | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+) -> list[FlightSchedule]:
+    """Schedules that may have an occurrence in [start, end) matching the filters."""
+    query = (
+        select(FlightSchedule)
+        .join(Airline, Airline.id == FlightSchedule.airline_id)
+        .where(Airline.deleted_at.is_(None), FlightSchedule.starts_at < end,
+               or_(FlightSchedule.ends_at.is_(None), FlightSchedule.ends_at >= start))
+    )
+    if airline_id is not None:
+        query = query.where(FlightSchedule.airline_id == airline_id)
+    if approval:
+        query = query.where(FlightSchedule.approval_status == approval)
+    if origin is not None:
+        query = query.where(FlightSchedule.origin_airport == origin)
+    if destination is not None:
+        query = query.where(FlightSchedule.destination_airport == destination)
+    if min_price is not None:
+        query = query.where(FlightSchedule.price >= min_price)
+    if max_price is not None:
+        query = query.where(FlightSchedule.price <= max_price)
+    return session.execute(query.order_by(FlightSchedule.id)).scalars().unique().all()
+
+
+def expand(session: Session, schedules: list[FlightSchedule], start: datetime | None, end: datetime,
+           now: datetime) -> list[tuple[FlightSchedule, datetime]]:
+    """Occurrences in [start, end) not materialized yet, by departure.
+
+    start=None: from whatever can still be in the air (`now` minus each
+    schedule's duration).
+    """
+    if not schedules:
+        return []
+    pairs = []
+    for schedule in schedules:
+        lower = start if start is not None else now - timedelta(seconds=int(schedule.duration_seconds))
+        pairs.extend((schedule, departure) for departure in occurrences(schedule, lower, end))
+    if not pairs:
+        return []
+
+    lowest = min(departure for _schedule, departure in pairs)
+    ids = [s.id for s in schedules]
+    taken: set[tuple[int, datetime]] = set()
+    # Materialized (live or archived) and deleted occurrences
+    for model in (Flight, ArchivedFlight, ScheduleSkip):
+        taken.update(session.execute(
+            select(model.schedule_id, model.occurrence_at)
+            .where(model.schedule_id.in_(ids), model.occurrence_at >= lowest, model.occurrence_at < end)
+        ).all())
+    pairs = [(s, d) for s, d in pairs if (s.id, d) not in taken]
+    pairs.sort(key=lambda pair: (pair[1], pair[0].id))
+    return pairs
+
+
+def default_start(now: datetime) -> datetime:
+    """Lower bound for `candidates` when expand() gets start=None."""
+    return now - _LONGEST_FLIGHT
+
+
+def occurrence_response(schedule: FlightSchedule, departure: datetime, now: datetime,
+                        airline: dict | None = None) -> dict:
+    """An occurrence in the shape of `api.flights.flight_response`."""
+    end = departure + timedelta(seconds=int(schedule.duration_seconds))
+    state = status_at(departure, schedule.duration_seconds, now)
+    remaining = 0
+    if state == "UPCOMING":
+        remaining = int((departure - now).total_seconds())
+    elif state == "IN_PROGRESS":
+        remaining = int((end - now).total_seconds())
+    return {
+        "id": None,
+        "name": schedule.name,
+        "airline": airline if airline is not None else (schedule.airline.to_dict() if schedule.airline else None),
+        "distance_km": schedule.distance_km,
+        "duration_seconds": schedule.duration_seconds,
+        "departure_time": departure.isoformat(),
+        "origin_airport": schedule.origin_airport,
+        "destination_airport": schedule.destination_airport,
+        "created_by_user_id": schedule.created_by_user_id,
+        "price": schedule.price,
+        "approval_status": schedule.approval_status,
+        "rejection_reason": schedule.rejection_reason,
+        "approved_by_user_id": schedule.approved_by_user_id,
+        "approved_at": schedule.approved_at.isoformat() if schedule.approved_at else None,
+        "canceled": False,
+        "canceled_by_user_id": None,
+        "canceled_at": None,
+        "created_at": schedule.created_at.isoformat() if schedule.created_at else None,
+        "updated_at": schedule.updated_at.isoformat() if schedule.updated_at else None,
+        "schedule_id": schedule.id,
+        "runtime_status": state,
+        "remaining_seconds": remaining,
+        "end_time": end.isoformat(),
+        "virtual": True,
+    }
+
+
+def find_occurrence(session: Session, schedule_id: int, occurrence: datetime) -> FlightColumns | None:
+    """The flight materialized from this occurrence, live or archived."""
+    for model in (Flight, ArchivedFlight):
+        flight = session.execute(
+            select(model).where(model.schedule_id == schedule_id, model.occurrence_at == occurrence)
+        ).scalar_one_or_none()
+        if flight is not None:
+            return flight
+    return None
+
+
+def skipped(session: Session, schedule_id: int, occurrence: datetime) -> bool:
+    return session.get(ScheduleSkip, (schedule_id, occurrence)) is not None
+
+
+def skip(session: Session, flight: FlightColumns) -> None:
+    """Keep a deleted flight's occurrence from being generated again."""
+    if flight.schedule_id is not None and not skipped(session, flight.schedule_id, flight.occurrence_at):
+        session.add(ScheduleSkip(schedule_id=flight.schedule_id, occurrence_at=flight.occurrence_at))
+
+
+def materialize(session: Session, schedule: FlightSchedule, departure: datetime) -> tuple[FlightColumns, bool]:
+    """The flight of an occurrence, inserted if needed; (flight, created).
+
+    Callers check `occurs_at` and `skipped` first. Flushes but does not
+    commit. Call it before other changes in the transaction: losing the
+    insert race to another request rolls back.
+    """
+    existing = find_occurrence(session, schedule.id, departure)
+    if existing is not None:
+        return existing, False
+
+    flight = Flight(
+        name=schedule.name,
+        airline_id=schedule.airline_id,
+        distance_km=schedule.distance_km,
+        duration_seconds=schedule.duration_seconds,
+        departure_time=departure,
+        origin_airport=schedule.origin_airport,
+        destination_airport=schedule.destination_airport,
+        created_by_user_id=schedule.created_by_user_id,
+        price=schedule.price,
+        approval_status=schedule.approval_status,
+        rejection_reason=schedule.rejection_reason,
+        approved_by_user_id=schedule.approved_by_user_id,
+        approved_at=schedule.approved_at,
+        schedule_id=schedule.id,
+        occurrence_at=departure,
+    )
+    session.add(flight)
+    try:
+        session.flush()
+    except IntegrityError:
+        session.rollback()
+        return find_occurrence(session, schedule.id, departure), False
+    return flight, True
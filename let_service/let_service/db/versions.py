@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.orm import Session
+
+from . import db
+from .models import Airline, Flight, FlightSchedule, FlightTombstone, TableVersion
+
+# Models whose writes bump a row in `table_versions` (used for ETags)
+TRACKED = {Airline: "airlines", Flight: "flights", FlightSchedule: "schedules"}
+
+
+def bump(session: Session, *tables: str) -> None:
+    """Increment versions in the current transaction.
+
+    ORM flushes are tracked automatically; call this after bulk
+    `UPDATE`/`DELETE` statements that bypass the unit of work.
+    """
+    conn = session.connection()
+    for name in sorted(set(tables)):
+        res = conn.execute(
+            update(TableVersion).where(TableVersion.name == name).values(version=TableVersion.version + 1)
+        )
+        if res.rowcount == 0:
+            conn.execute(TableVersion.__table__.insert().values(name=name, version=1))
+
+
+def tombstone(session: Session, flight_ids) -> None:
+    """Record deleted flights for catalog snapshots (db/catalog.py).
+
+    ORM deletes are recorded automatically; call this after bulk `DELETE`s.
+    """
+    ids = sorted(set(int(i) for i in flight_ids))
+    if not ids:
+        return
+    conn = session.connection()
+    now = datetime.utcnow()
+    conn.execute(delete(FlightTombstone).where(FlightTombstone.flight_id.in_(ids)))
+    conn.execute(FlightTombstone.__table__.insert(), [{"flight_id": i, "deleted_at": now} for i in ids])
+
+
+def current(*tables: str) -> tuple[int, ...]:
+    rows = dict(
+        db.session.execute(select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(tables))).all()
+    )
+    return tuple(int(rows.get(t, 0)) for t in tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_after_flush(session: Session, flush_context) -> None:
+    touched = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        name = TRACKED.get(type(obj))
+        if name is not None and (obj in session.new or obj in session.deleted or session.is_modified(obj)):
+            touched.add(name)
+    if touched:
+        bump(session, *touched)
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Flight)]
+    if deleted:
+        tombstone(session, deleted)
+
+
+@event.listens_for(TableVersion.__table__, "after_create")
+def _seed_versions(target, connection, **kw) -> None:
+    connection.execute(target.insert(), [{"name": n, "version": 0} for n in sorted(TRACKED.values())])
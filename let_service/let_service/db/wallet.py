@@ -0,0 +1,198 @@
+"""Paying for purchases from a wallet, with a ledger.
+
+Amounts are integer cents. A purchase moves through three entries:
+
+- RESERVE when it is created, in the same transaction as the purchase:
+  one conditional `UPDATE wallets SET held = held + p WHERE balance - held
+  >= p`. Concurrent purchases of one user queue on the wallet row for one
+  statement each and can never overdraw it; no read-modify-write.
+- CAPTURE when it completes: only a ledger row. The money stays in `held`,
+  so `available` is already right, and completing purchases do not touch
+  the contended wallet row at all.
+- RELEASE when it fails (or sales close, db/lifecycle.py): `held` goes
+  down at once so the money can be spent again.
+
+`settle` (the settlement job, `python -m let_service settle`) folds
+unsettled captures into balances: one UPDATE per user per batch, however
+many purchases they made, and stamps the entries settled. Purchases made
+before wallets existed have no RESERVE entry; deciding them touches no
+wallet.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .models import LedgerEntry, Wallet
+
+
+def to_cents(amount) -> int:
+    return int(round(float(amount) * 100))
+
+
+def _entries(session: Session, rows: list[dict]) -> None:
+    if rows:
+        session.connection().execute(LedgerEntry.__table__.insert(), rows)
+
+
+def _ensure_wallet(session: Session, user_id: str) -> None:
+    """Insert an empty wallet unless there is one (concurrent callers included)."""
+    values = {"user_id": user_id, "balance_cents": 0, "held_cents": 0, "updated_at": datetime.utcnow()}
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+        stmt = insert(Wallet).values(**values).on_conflict_do_nothing(index_elements=["user_id"])
+    else:
+        stmt = mysql.insert(Wallet).values(**values).prefix_with("IGNORE")
+    session.execute(stmt)
+
+
+def reserve(session: Session, user_id: str, purchase_id: int, cents: int) -> bool:
+    """Hold `cents` of the user's available money for a purchase; False if there is not enough."""
+    if cents <= 0:
+        return True
+    res = session.execute(
+        update(Wallet)
+        .where(Wallet.user_id == user_id, Wallet.balance_cents - Wallet.held_cents >= cents)
+        .values(held_cents=Wallet.held_cents + cents)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount != 1:
+        return False
+    now = datetime.utcnow()
+    _entries(session, [{"user_id": user_id, "purchase_id": purchase_id, "kind": "RESERVE", "amount_cents": cents,
+                        "created_at": now, "settled_at": now}])
+    return True
+
+
+def _reservations(session: Session, purchase_ids) -> list:
+    ids = sorted(set(int(i) for i in purchase_ids))
+    if not ids:
+        return []
+    return session.execute(
+        select(LedgerEntry.purchase_id, LedgerEntry.user_id, LedgerEntry.amount_cents)
+        .where(LedgerEntry.purchase_id.in_(ids), LedgerEntry.kind == "RESERVE")
+    ).all()
+
+
+def capture(session: Session, purchase_id: int) -> None:
+    """The purchase completed: its reservation will be paid at the next settlement."""
+    _entries(session, [
+        {"user_id": user_id, "purchase_id": pid, "kind": "CAPTURE", "amount_cents": cents,
+         "created_at": datetime.utcnow(), "settled_at": None}
+        for pid, user_id, cents in _reservations(session, [purchase_id])
+    ])
+
+
+def release(session: Session, purchase_ids) -> int:
+    """The purchases failed: give their reservations back. Returns cents released.
+
+    Callers pass only purchases they just moved out of PENDING, so each is
+    released once (uq_ledger_purchase_kind would reject a second time).
+    """
+    rows = _reservations(session, purchase_ids)
+    if not rows:
+        return 0
+    totals: dict[str, int] = defaultdict(int)
+    for _pid, user_id, cents in rows:
+        totals[user_id] += cents
+    # Sorted, so concurrent releases lock wallets in the same order
+    for user_id, cents in sorted(totals.items()):
+        session.execute(
+            update(Wallet)
+            .where(Wallet.user_id == user_id)
+            .values(held_cents=Wallet.held_cents - cents)
+            .execution_options(synchronize_session=False)
+        )
+    now = datetime.utcnow()
+    _entries(session, [
+        {"user_id": user_id, "purchase_id": pid, "kind": "RELEASE", "amount_cents": cents,
+         "created_at": now, "settled_at": now}
+        for pid, user_id, cents in rows
+    ])
+    return sum(totals.values())
+
+
+def deposit(session: Session, user_id: str, cents: int) -> bool:
+    """Add (or, negative, take) money; False if that would leave less than nothing available."""
+    _ensure_wallet(session, user_id)
+    res = session.execute(
+        update(Wallet)
+        .where(Wallet.user_id == user_id, Wallet.balance_cents - Wallet.held_cents + cents >= 0)
+        .values(balance_cents=Wallet.balance_cents + cents)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount != 1:
+        return False
+    if cents:
+        now = datetime.utcnow()
+        _entries(session, [{"user_id": user_id, "purchase_id": None, "kind": "DEPOSIT", "amount_cents": cents,
+                            "created_at": now, "settled_at": now}])
+    return True
+
+
+def set_available(session: Session, user_id: str, cents: int) -> None:
+    """A deposit of whatever makes `available` equal `cents` (an admin setting the balance)."""
+    _ensure_wallet(session, user_id)
+    wallet = session.execute(select(Wallet).where(Wallet.user_id == user_id).with_for_update()).scalar_one()
+    deposit(session, user_id, cents - (wallet.balance_cents - wallet.held_cents))
+
+
+def import_balances(session: Session, balances: dict[str, int]) -> int:
+    """Open wallets holding `balances` (cents by user) for users that have none yet; returns how many.
+
+    For carrying balances over from before wallets existed: a user who
+    already has a wallet keeps it as it is, so running it again adds nothing.
+    """
+    if not balances:
+        return 0
+    existing = set(session.execute(select(Wallet.user_id).where(Wallet.user_id.in_(list(balances)))).scalars())
+    imported = 0
+    for user_id, cents in balances.items():
+        if user_id in existing or cents < 0:
+            continue
+        deposit(session, user_id, cents)
+        imported += 1
+    return imported
+
+
+def settle(session: Session, batch_size: int = 5000) -> int:
+    """Fold unsettled captures into balances; commits per batch, returns entries settled."""
+    settled = 0
+    while True:
+        rows = session.execute(
+            select(LedgerEntry.id, LedgerEntry.user_id, LedgerEntry.amount_cents)
+            .where(LedgerEntry.settled_at.is_(None), LedgerEntry.kind == "CAPTURE")
+            .order_by(LedgerEntry.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        ).all()
+        if not rows:
+            session.rollback()
+            break
+
+        totals: dict[str, int] = defaultdict(int)
+        for _id, user_id, cents in rows:
+            totals[user_id] += cents
+        for user_id, cents in sorted(totals.items()):
+            session.execute(
+                update(Wallet)
+                .where(Wallet.user_id == user_id)
+                .values(balance_cents=Wallet.balance_cents - cents, held_cents=Wallet.held_cents - cents)
+                .execution_options(synchronize_session=False)
+            )
+        session.execute(
+            update(LedgerEntry)
+            .where(LedgerEntry.id.in_([r.id for r in rows]))
+            .values(settled_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        session.commit()
+        settled += len(rows)
+        if len(rows) < batch_size:
+            break
+    return settled
@@ -0,0 +1,115 @@
+"""Production entry point: `python -m let_service serve`.
+
+gunicorn (Linux, Docker) with `preload_app`: the master builds the app
+once, creates the schema if AUTO_CREATE_SCHEMA is on and decides purchases
+a previous run left PENDING, then closes its connections. Each forked
+worker drops the inherited pool (`post_fork`, warm_up when WARM_UP is set)
+and drains on SIGTERM (utils/draining.py) before gunicorn stops it.
+
+waitress is the fallback where gunicorn does not run (Windows): one
+process, THREADS threads, same SIGTERM draining.
+"""
+from __future__ import annotations
+
+import logging
+import signal
+
+from flask import Flask
+
+from .app import create_app, warm_up
+from .db import db
+from .utils.draining import on_sigterm
+
+logger = logging.getLogger("let_service.serve")
+
+
+def _prepare() -> Flask:
+    from .api.purchases import resume_pending_purchases
+
+    app = create_app()
+    resumed = resume_pending_purchases(app)
+    if resumed:
+        logger.info("decided %d purchases left PENDING by the previous run", resumed)
+    with app.app_context():
+        db.engine.dispose()
+    return app
+
+
+def _split_bind(bind: str) -> tuple[str, int]:
+    host, _, port = bind.rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+def _gunicorn(app: Flask) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    cfg = app.config
+    drain_seconds = float(cfg.get("DRAIN_DELAY_SECONDS", 0.0)) + float(cfg.get("DRAIN_TIMEOUT_SECONDS", 10.0))
+
+    def post_fork(server, worker):
+        # Sockets inherited from the master must not be shared between workers
+        if cfg.get("WARM_UP"):
+            warm_up(app)
+        else:
+            with app.app_context():
+                db.engine.dispose(close=False)
+
+    def post_worker_init(worker):
+        # Replaces gunicorn's SIGTERM handler, which stops the worker at once;
+        # the worker keeps serving until draining is done
+        on_sigterm(app, then=lambda: worker.handle_exit(signal.SIGTERM, None))
+        signal.siginterrupt(signal.SIGTERM, False)
+
+    class LetServiceApplication(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": cfg.get("BIND", "0.0.0.0:8801"),
+                "workers": int(cfg.get("WORKERS", 2)),
+                "worker_class": cfg.get("WORKER_CLASS", "gthread"),
+                "threads": int(cfg.get("THREADS", 8)),
+                "preload_app": True,
+                # Drain first, then in-flight requests still get the usual 30 s
+                "graceful_timeout": int(drain_seconds) + 31,
+                "post_fork": post_fork,
+                "post_worker_init": post_worker_init,
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    LetServiceApplication().run()
+
+
+def _waitress(app: Flask) -> None:
+    import _thread
+
+    from waitress import create_server
+
+    cfg = app.config
+    host, port = _split_bind(cfg.get("BIND", "0.0.0.0:8801"))
+    server = create_server(app, host=host, port=port, threads=int(cfg.get("THREADS", 8)))
+    # KeyboardInterrupt in the main thread makes waitress finish queued requests and return
+    on_sigterm(app, then=_thread.interrupt_main)
+    if cfg.get("WARM_UP"):
+        warm_up(app)
+    server.run()
+
+
+def serve() -> None:
+    app = _prepare()
+    server = str(app.config.get("SERVER", "gunicorn")).lower()
+    if server == "gunicorn":
+        try:
+            import gunicorn  # noqa: F401  (imports fcntl, so fails on Windows)
+            import gunicorn.app.base  # noqa: F401
+        except ImportError:
+            logger.warning("gunicorn is not available here, serving with waitress")
+            server = "waitress"
+    if server == "gunicorn":
+        _gunicorn(app)
+    elif server == "waitress":
+        _waitress(app)
+    else:
+        raise SystemExit(f"LET_SERVER must be gunicorn or waitress, not {server!r}")
@@ -0,0 +1,76 @@
+"""Where the outbox relay (db/outbox.py) sends change events.
+
+`RedisBus` publishes each batch as one JSON message on a pub/sub channel;
+every worker of both services subscribes to it. `LocalBus` is the fallback
+when REDIS_URL is empty (or the `redis` package is missing): the batch goes
+to handlers registered in this process only, which is enough for a single
+process and keeps the outbox from growing.
+
+Message: {"source": "let_service", "events": [{"id", "entity", "entity_id", "action"}, ...]}
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+from typing import Callable
+
+from flask import Flask
+
+logger = logging.getLogger("let_service.bus")
+
+Handler = Callable[[list[dict]], None]
+
+
+def encode(events: list[dict]) -> str:
+    return json.dumps({"source": "let_service", "events": events}, separators=(",", ":"))
+
+
+class LocalBus:
+    name = "local"
+
+    def __init__(self) -> None:
+        self._handlers: list[Handler] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, handler: Handler) -> None:
+        with self._lock:
+            self._handlers.append(handler)
+
+    def publish(self, events: list[dict]) -> None:
+        with self._lock:
+            handlers = list(self._handlers)
+        for handler in handlers:
+            try:
+                handler(events)
+            except Exception:
+                logger.exception("change handler failed")
+
+
+class RedisBus(LocalBus):
+    """Publishes to Redis; in-process handlers are still called after a publish."""
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str) -> None:
+        import redis
+
+        super().__init__()
+        self.channel = channel
+        self._client = redis.Redis.from_url(url, socket_timeout=2.0, socket_connect_timeout=2.0)
+
+    def publish(self, events: list[dict]) -> None:
+        # Raises redis.RedisError when Redis is down; the relay keeps the rows and retries
+        self._client.publish(self.channel, encode(events))
+        super().publish(events)
+
+
+def make_bus(app: Flask) -> LocalBus:
+    url = app.config.get("REDIS_URL") or ""
+    if not url:
+        return LocalBus()
+    try:
+        return RedisBus(url, app.config.get("OUTBOX_CHANNEL", "let_service:changes"))
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed; change events stay in-process")
+        return LocalBus()
@@ -0,0 +1,113 @@
+# server/compression.py is a copy of this module for the gateway (gateway_*
+# metric names, plus passthrough counters); each service is built from its own
+# directory (see the Dockerfiles), so a fix in one belongs in the other too.
+from __future__ import annotations
+
+import gzip
+import time
+import zlib
+from typing import Iterable, Iterator
+
+from flask import Flask, Response, request
+
+from .metrics import Counter, registry
+
+try:  # optional: pip install brotli
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESSIBLE = ("application/json", "text/plain", "text/html", "text/csv", "application/x-ndjson")
+
+BYTES_IN = registry.register(Counter(
+    "let_compression_bytes_in_total", "Response bytes before compression", ("encoding",)))
+BYTES_OUT = registry.register(Counter(
+    "let_compression_bytes_out_total", "Response bytes after compression", ("encoding",)))
+CPU_SECONDS = registry.register(Counter(
+    "let_compression_cpu_seconds_total", "CPU time spent compressing responses", ("encoding",)))
+
+
+def supported_encodings() -> list[str]:
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+
+def choose_encoding(accept_encodings) -> str | None:
+    best = accept_encodings.best_match(supported_encodings())
+    return best if best and accept_encodings[best] > 0 else None
+
+
+def compress(data: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 5) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=brotli_quality)
+    return gzip.compress(data, compresslevel=gzip_level, mtime=0)
+
+
+def _stream(chunks: Iterable[bytes], encoding: str, gzip_level: int, brotli_quality: int) -> Iterator[bytes]:
+    """Compress a streamed body chunk by chunk, flushing so the client sees progress."""
+    if encoding == "br":
+        comp = brotli.Compressor(quality=brotli_quality)
+        step = lambda chunk: comp.process(chunk) + comp.flush()  # noqa: E731
+        finish = comp.finish
+    else:
+        comp = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+        step = lambda chunk: comp.compress(chunk) + comp.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+        finish = comp.flush
+
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        t0 = time.process_time()
+        out = step(chunk)
+        CPU_SECONDS.inc(time.process_time() - t0, encoding=encoding)
+        BYTES_IN.inc(len(chunk), encoding=encoding)
+        if out:
+            BYTES_OUT.inc(len(out), encoding=encoding)
+            yield out
+    tail = finish()
+    BYTES_OUT.inc(len(tail), encoding=encoding)
+    yield tail
+
+
+def init_compression(app: Flask) -> None:
+    """Compress JSON/text responses above COMPRESSION_MIN_BYTES (gzip, br if installed)."""
+    if not app.config.get("COMPRESSION_ENABLED", False):
+        return
+
+    min_bytes = int(app.config.get("COMPRESSION_MIN_BYTES", 1024))
+    gzip_level = int(app.config.get("COMPRESSION_GZIP_LEVEL", 6))
+    brotli_quality = int(app.config.get("COMPRESSION_BROTLI_QUALITY", 5))
+
+    @app.after_request
+    def _compress(response: Response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE:
+            return response
+
+        encoding = choose_encoding(request.accept_encodings)
+        response.vary.add("Accept-Encoding")
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            if response.content_length is not None and response.content_length < min_bytes:
+                return response
+            response.response = _stream(response.response, encoding, gzip_level, brotli_quality)
+            response.direct_passthrough = False
+            response.headers.pop("Content-Length", None)
+            response.headers["Content-Encoding"] = encoding
+            return response
+
+        data = response.get_data()
+        if len(data) < min_bytes:
+            return response
+
+        t0 = time.process_time()
+        body = compress(data, encoding, gzip_level, brotli_quality)
+        CPU_SECONDS.inc(time.process_time() - t0, encoding=encoding)
+        BYTES_IN.inc(len(data), encoding=encoding)
+        BYTES_OUT.inc(len(body), encoding=encoding)
+
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        return response
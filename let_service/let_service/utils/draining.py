@@ -0,0 +1,121 @@
+"""Graceful shutdown: readiness, in-flight background work and SIGTERM.
+
+One `Drain` per app (per worker process) tracks the purchase threads it
+started. `begin()` flips GET /ready to 503 and makes new purchases get 503;
+`wait(timeout)` then joins the tracked threads until the deadline. Work that
+misses it stays PENDING in the database and is picked up again on the next
+start (`api.purchases.resume_pending_purchases`).
+"""
+from __future__ import annotations
+
+import logging
+import signal
+import threading
+import time
+from typing import Callable
+
+from flask import Flask, current_app, jsonify
+
+logger = logging.getLogger("let_service.draining")
+
+
+class Drain:
+    def __init__(self) -> None:
+        self.stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._threads: set[threading.Thread] = set()
+
+    @property
+    def draining(self) -> bool:
+        return self.stopping.is_set()
+
+    def start(self, target: Callable, *args) -> bool:
+        """Run target(*args) on a tracked thread; False once draining has begun."""
+        with self._lock:
+            if self.stopping.is_set():
+                return False
+            thread = threading.Thread(target=self._run, args=(target, args), daemon=True)
+            self._threads.add(thread)
+        thread.start()
+        return True
+
+    def _run(self, target: Callable, args: tuple) -> None:
+        try:
+            target(*args)
+        finally:
+            with self._lock:
+                self._threads.discard(threading.current_thread())
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._threads)
+
+    def begin(self) -> None:
+        self.stopping.set()
+
+    def wait(self, timeout: float) -> int:
+        """Join tracked threads until `timeout` seconds pass; returns how many are left."""
+        deadline = time.monotonic() + max(timeout, 0.0)
+        while True:
+            with self._lock:
+                threads = list(self._threads)
+            remaining = deadline - time.monotonic()
+            if not threads or remaining <= 0:
+                return len(threads)
+            threads[0].join(remaining)
+
+
+def init_draining(app: Flask) -> None:
+    drain = Drain()
+    app.extensions["draining"] = drain
+
+    @app.get("/ready")
+    def ready():
+        # /ping stays 200 while draining (liveness); this is the load balancer check
+        if drain.draining:
+            return jsonify({"ready": False, "in_flight": drain.in_flight()}), 503
+        return jsonify({"ready": True})
+
+
+def get_drain() -> Drain:
+    return current_app.extensions["draining"]
+
+
+def shutdown(app: Flask, delay: float | None = None, timeout: float | None = None) -> int:
+    """Begin draining, keep serving for `delay` seconds so the load balancer
+    sees /ready fail, then wait up to `timeout` for in-flight purchases.
+
+    Returns the number of purchases left PENDING.
+    """
+    cfg = app.config
+    delay = float(cfg.get("DRAIN_DELAY_SECONDS", 0.0)) if delay is None else delay
+    timeout = float(cfg.get("DRAIN_TIMEOUT_SECONDS", 10.0)) if timeout is None else timeout
+    drain: Drain = app.extensions["draining"]
+
+    drain.begin()
+    logger.info("draining: %d purchases in flight", drain.in_flight())
+    if delay > 0:
+        time.sleep(delay)
+    left = drain.wait(timeout)
+    if left:
+        logger.warning("drain deadline passed; %d purchases stay PENDING until the next start", left)
+    return left
+
+
+def on_sigterm(app: Flask, then: Callable[[], None]) -> None:
+    """Install a SIGTERM handler that runs `shutdown(app)` off the signal
+    handler and calls `then()` (stop the server) when it is done.
+
+    Main thread only, like `signal.signal`.
+    """
+    def handler(signum, frame):
+        if app.extensions["draining"].draining:
+            return
+
+        def run():
+            shutdown(app)
+            then()
+
+        threading.Thread(target=run, name="drain", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handler)
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import hashlib
+import time
+
+from flask import Response, current_app, request
+
+
+def weak_etag(*parts) -> str:
+    """Opaque validator for the given key parts (sent as W/"...")."""
+    raw = "|".join(repr(p) for p in parts).encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:20]
+
+
+def time_bucket() -> int:
+    """Runtime status and remaining_seconds drift with the clock, so catalog
+    validators also roll over every ETAG_TIME_BUCKET_SECONDS."""
+    size = max(int(current_app.config.get("ETAG_TIME_BUCKET_SECONDS", 30)), 1)
+    return int(time.time()) // size
+
+
+def query_key() -> tuple:
+    return tuple(sorted(request.args.items(multi=True)))
+
+
+def is_not_modified(etag: str) -> bool:
+    return request.if_none_match.contains_weak(etag)
+
+
+def not_modified(etag: str) -> Response:
+    resp = Response(status=304)
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+def with_etag(resp: Response, etag: str) -> Response:
+    resp.set_etag(etag, weak=True)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
@@ -1,9 +1,109 @@
-from setup import app, db, IS_DEV
+from sys import argv
+
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+
+from setup import app, db, IS_DEV, AUTO_CREATE_SCHEMA, WARM_UP
 import routes # This adds routes to `setup.app` (Flask instance)
+from metrics import init_metrics
+from compression import init_compression
+from breaker import init_breakers
+from draining import init_draining
+from invalidation import init_invalidation
+from upstream import single_flight
 
 
 
-if "__main__" == __name__:
+init_metrics(app, db)
+init_compression(app)
+init_breakers(app)
+init_draining(app)
+init_invalidation(app, single_flight)
+
+
+
+def migrate():
     with app.app_context():
         db.create_all()
+    print("server schema is up to date")
+
+
+
+def warm_up(connections: int = 5):
+    # Call from gunicorn's `post_fork` when preloading: drops inherited sockets first
+    with app.app_context():
+        configure_mappers()
+        db.engine.dispose(close = False)
+
+        opened = []
+        try:
+            for _ in range(max(connections, 1)):
+                conn = db.engine.connect()
+                conn.execute(text("SELECT 1"))
+                opened.append(conn)
+        finally:
+            for conn in opened:
+                conn.close()
+
+
+
+def import_users_file(path: str):
+    # Bulk registration from a CSV / NDJSON file; prints the report
+    from user_import import format_of, import_users
+
+    fmt = format_of(path)
+    if fmt is None:
+        print("import-users: expected a .csv, .ndjson or .jsonl file")
+        exit(2)
+    with app.app_context(), open(path, encoding = "utf-8", newline = "") as stream:
+        report = import_users(stream, fmt)
+    for error in report["errors"]:
+        print(f"line {error['line']}: {error['email']}: {error['message']}")
+    print(f"imported {report['imported']} users, {report['failed']} failed, {report['usersPerSecond']} users/s")
+
+
+
+def backfill_wallets(batch_size: int = 1000):
+    # Carries `users.balance` over to let_service wallets, once, when purchases
+    # start being paid from wallets; users who already have a wallet keep it
+    from sqlalchemy import select
+
+    import upstream
+    from auth import identity_headers
+    from models import User
+
+    imported = skipped = 0
+    with app.app_context():
+        users = db.session.execute(select(User.id, User.balance).where(User.balance > 0).order_by(User.id)).all()
+        for i in range(0, len(users), batch_size):
+            wallets = [{"user_id": str(uid), "balance": balance} for uid, balance in users[i:i + batch_size]]
+            res = upstream.post("/wallets/import", json = {"wallets": wallets},
+                                headers = identity_headers({"id": "backfill-wallets", "role": "ADMIN"}))
+            if res.status_code != 200:
+                print(f"backfill-wallets: let_service answered {res.status_code}: {res.text}")
+                exit(1)
+            imported += res.json()["imported"]
+            skipped += res.json()["skipped"]
+    print(f"opened {imported} wallets, {skipped} users already had one")
+
+
+
+if "__main__" == __name__:
+    if len(argv) > 1 and argv[1] == "migrate":
+        migrate()
+        exit(0)
+
+    if len(argv) > 1 and argv[1] == "backfill-wallets":
+        backfill_wallets()
+        exit(0)
+
+    if len(argv) > 2 and argv[1] == "import-users":
+        import_users_file(argv[2])
+        exit(0)
+
+    if AUTO_CREATE_SCHEMA:
+        with app.app_context():
+            db.create_all()
+    if WARM_UP:
+        warm_up()
     app.run(port = 8800, debug = True)
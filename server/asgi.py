@@ -0,0 +1,608 @@
+"""Async entry point: `uvicorn asgi:app --port 8800`.
+
+The let_service proxy routes are served by Starlette handlers sharing one
+aiohttp connection pool, so a slow let_service holds a coroutine instead of a
+worker thread. (httpx.AsyncClient was tried first: its pool scans every
+connection per request and fell behind the sync gateway at 50+ in flight,
+see benchmarks/gateway_concurrency.py.) Everything else (auth, admin, user, /metrics, /ping-reachable)
+falls through to the Flask app mounted below, unchanged. Token checks and
+payloads come from auth.py / payloads.py, same as routes.py.
+"""
+import asyncio
+import gzip
+import json
+import weakref
+import zlib
+from contextlib import asynccontextmanager
+from time import perf_counter
+
+import aiohttp
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import parse_accept_header
+
+import app as sync_app # Flask app with routes, metrics and compression registered
+from setup import LET_SERVICE_URL, get_redis
+from auth import authorize, identity_headers, token_error
+from metrics import record_upstream, record_upstream_error
+from compression import PASSTHROUGH, PASSTHROUGH_BYTES
+from upstream import CONNECT_TIMEOUT_SECONDS, REQUEST_VALIDATORS, RESPONSE_VALIDATORS, envelope
+from breaker import UpstreamUnavailable, breakers
+from coalesce import AsyncSingleFlight, Snapshot, etag_matches, normalize_params, request_key
+from invalidation import cache_seconds, changed, changed_many, invalidator
+import payloads
+
+
+
+config = sync_app.app.config
+client: (aiohttp.ClientSession | None) = None
+single_flight = AsyncSingleFlight()
+
+
+
+@asynccontextmanager
+async def lifespan(_app):
+    global client
+    client = aiohttp.ClientSession(
+        connector = aiohttp.TCPConnector(limit = config["ASGI_UPSTREAM_MAX_CONNECTIONS"]),
+        # Same limits as upstream.call: connect, then per-read (a long stream is fine)
+        timeout = aiohttp.ClientTimeout(sock_connect = CONNECT_TIMEOUT_SECONDS, sock_read = config["UPSTREAM_TIMEOUT_SECONDS"]),
+        # Bodies are relayed as received, gzip included (see relay)
+        headers = {"Accept-Encoding": "gzip"},
+        auto_decompress = False
+    )
+    invalidator.register(single_flight)
+    if config.get("INVALIDATION_ENABLED", True):
+        invalidator.ensure_subscribed(get_redis, config["INVALIDATION_CHANNEL"])
+    try:
+        yield
+    finally:
+        await client.close()
+
+
+
+# Upstream calls
+
+async def call(method: str, path: str, **kwargs) -> aiohttp.ClientResponse:
+    guard = breakers.guard(method, path)
+    ticket = guard.before_call() if guard is not None else 0
+
+    t0 = perf_counter()
+    try:
+        res = await client.request(method, f"{LET_SERVICE_URL}{path}", **kwargs)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+        if guard is not None:
+            guard.after_call(ticket, perf_counter() - t0, failed = True)
+        record_upstream_error(method)
+        if isinstance(error, asyncio.TimeoutError):
+            raise UpstreamUnavailable(504, "let_service timed out") from error
+        raise UpstreamUnavailable(502, "let_service unreachable") from error
+    except asyncio.CancelledError:
+        # Client went away; the slot has to be given back either way
+        if guard is not None:
+            guard.after_call(ticket, perf_counter() - t0, failed = False)
+        raise
+
+    hold_until_released(res, method, guard, ticket, t0)
+    return res
+
+
+
+def hold_until_released(res: aiohttp.ClientResponse, method: str, guard, ticket: int, t0: float) -> None:
+    """Give the breaker slot back once the body is read or dropped.
+
+    Like upstream._hold_until_body_done: a slow body counts towards the
+    in-flight limit and the slow-call share. Every reader here ends with
+    res.release() (relay() also when the client disconnects); the first
+    call finishes. A response dropped unreleased finishes when collected.
+    """
+    pending = [ticket]
+    status = res.status
+
+    def finish():
+        try:
+            pending.pop()
+        except IndexError:
+            return
+        elapsed = perf_counter() - t0
+        if guard is not None:
+            guard.after_call(ticket, elapsed, failed = status >= 500)
+        record_upstream(method, status, elapsed)
+
+    release = res.release
+
+    def release_and_finish():
+        release()
+        finish()
+
+    res.release = release_and_finish
+    weakref.finalize(res, finish)
+
+
+
+class Replay:
+    """Stands in for aiohttp.ClientResponse over a shared Snapshot."""
+
+    def __init__(self, snapshot: Snapshot, status: (int | None) = None):
+        self.status = status or snapshot.status
+        self.headers = snapshot.headers
+        self.body = b"" if self.status == 304 else snapshot.body
+        self.content = self
+
+    async def iter_chunked(self, size: int):
+        for start in range(0, len(self.body), size):
+            yield self.body[start:start + size]
+
+    async def read(self) -> bytes:
+        return self.body
+
+    def release(self):
+        pass
+
+
+
+async def fetch_snapshot(path: str, params: (dict | None)) -> Snapshot:
+    res = await call("GET", path, params = params)
+    try:
+        body = await res.read()
+    finally:
+        res.release()
+    return Snapshot(res.status, res.headers, body)
+
+
+
+async def get_shared(request: Request, path: str, params: (dict | None) = None):
+    """Async twin of upstream.get_shared."""
+    params = normalize_params(params)
+    if not config.get("COALESCE_ENABLED", True):
+        return await call("GET", path, params = params, headers = validator_headers(request))
+
+    snapshot = await single_flight.do(
+        request_key("GET", path, params),
+        lambda: fetch_snapshot(path, params),
+        cache_seconds(config)
+    )
+    if snapshot.status == 200 and etag_matches(request.headers.get("If-None-Match"), snapshot.headers.get("ETag")):
+        return Replay(snapshot, status = 304)
+    return Replay(snapshot)
+
+
+
+def validator_headers(request: Request) -> dict[str, str]:
+    return {name: request.headers[name] for name in REQUEST_VALIDATORS if name in request.headers}
+
+
+
+def pass_validators(res: aiohttp.ClientResponse, response: Response) -> Response:
+    for name in RESPONSE_VALIDATORS:
+        if name in res.headers:
+            response.headers[name] = res.headers[name]
+    return response
+
+
+
+async def finish(request: Request, res: aiohttp.ClientResponse, message: str) -> Response:
+    if res.status == 304:
+        res.release()
+        return pass_validators(res, Response(status_code = 304))
+
+    if res.status >= 400:
+        try:
+            reason = json.loads(await read_body(res)).get("message")
+        except ValueError:
+            reason = None
+        return JSONResponse({"message": "Error occured", "reason": reason}, status_code = res.status)
+
+    return await relay(request, res, message)
+
+
+
+async def read_body(res: aiohttp.ClientResponse) -> bytes:
+    try:
+        body = await res.read()
+    finally:
+        res.release()
+    if res.headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    return body
+
+
+
+async def relay(request: Request, res: aiohttp.ClientResponse, message: str) -> Response:
+    """Async twin of upstream.relay: same envelope, status, validators and gzip passthrough."""
+    if not config.get("STREAM_PASSTHROUGH", True):
+        data = json.loads(await read_body(res))
+        response = JSONResponse({"message": message, "data": data}, status_code = res.status)
+        return pass_validators(res, response)
+
+    chunk_size = int(config.get("STREAM_CHUNK_BYTES", 64 * 1024))
+    prefix, suffix = envelope(message)
+    encoding = res.headers.get("Content-Encoding")
+    keep_compressed = (
+        encoding == "gzip"
+        and config.get("COMPRESSION_PASSTHROUGH", True)
+        and parse_accept_header(request.headers.get("Accept-Encoding"))["gzip"] > 0
+    )
+
+    headers = {}
+    length = res.headers.get("Content-Length")
+    if keep_compressed:
+        prefix = gzip.compress(prefix, compresslevel = 1, mtime = 0)
+        suffix = gzip.compress(suffix, compresslevel = 1, mtime = 0)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+        PASSTHROUGH.inc(encoding = "gzip")
+    elif encoding not in (None, "identity"):
+        # Has to be decoded for this client; final size is unknown
+        length = None
+    decoder = zlib.decompressobj(31) if encoding == "gzip" and not keep_compressed else None
+
+    if length is not None:
+        headers["Content-Length"] = str(len(prefix) + int(length) + len(suffix))
+
+    async def generate():
+        try:
+            yield prefix
+            async for chunk in res.content.iter_chunked(chunk_size):
+                if keep_compressed:
+                    PASSTHROUGH_BYTES.inc(len(chunk), encoding = "gzip")
+                elif decoder is not None:
+                    chunk = decoder.decompress(chunk)
+                yield chunk
+            if decoder is not None:
+                yield decoder.flush()
+            yield suffix
+        finally:
+            res.release()
+
+    response = StreamingResponse(generate(), status_code = res.status, media_type = "application/json", headers = headers)
+    return pass_validators(res, response)
+
+
+
+# Request bodies, read the way routes.py reads them
+
+async def json_body(request: Request):
+    body = await request.body()
+    if not body:
+        return None
+    try:
+        return json.loads(body)
+    except ValueError:
+        return None
+
+
+
+async def form_body(request: Request) -> dict:
+    content_type = request.headers.get("Content-Type", "")
+    if content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+        return dict(await request.form())
+    return {}
+
+
+
+async def json_or_form(request: Request):
+    if request.headers.get("Content-Type", "").startswith("application/json"):
+        return await json_body(request)
+    return await form_body(request)
+
+
+
+def error_response(error: tuple[dict, int]) -> JSONResponse:
+    return JSONResponse(error[0], status_code = error[1])
+
+
+
+async def upstream_unavailable(_request: Request, error: UpstreamUnavailable) -> JSONResponse:
+    return JSONResponse(error.body(), status_code = error.status, headers = error.headers())
+
+
+
+# Purchases of a user
+
+async def user_get_purchases(request: Request):
+    req_data = await json_body(request)
+    error = token_error(req_data)
+    if error is not None:
+        return error_response(error)
+
+    user_id = request.path_params["user_id"]
+    params = normalize_params(payloads.purchases_page_params(request.query_params))
+    res = await call("GET", f"/users/{user_id}/purchases", params = params)
+    return await finish(request, res, "User's purchases fetched")
+
+
+
+# Airlines routes
+
+async def airlines_get_all(request: Request):
+    res = await get_shared(request, "/airlines")
+    return await finish(request, res, "Retrieved all airlines")
+
+
+
+async def airlines_get_by_id(request: Request):
+    airline_id = request.path_params["airline_id"]
+    res = await get_shared(request, f"/airlines/{airline_id}")
+    return await finish(request, res, "Retrieved an airline")
+
+
+
+async def airlines_new_or_get_existing(request: Request):
+    req_data = await json_body(request)
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return error_response(error)
+
+    if "name" not in req_data:
+        return JSONResponse({"message": "Invalid request (no 'name' provided)"}, status_code = 400)
+
+    res = await call("POST", "/airlines", json = {"name": req_data["name"]}, headers = identity_headers(authed))
+    if res.status < 400:
+        changed("airline")
+    return await finish(request, res, "Created a new or fetched existing airline")
+
+
+
+async def airlines_remove_by_id(request: Request):
+    req_data = await json_body(request)
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return error_response(error)
+
+    airline_id = request.path_params["airline_id"]
+    res = await call("DELETE", f"/airlines/{airline_id}", headers = identity_headers(authed))
+    if res.status < 400:
+        changed("airline", airline_id)
+    return await finish(request, res, "Airline removal started")
+
+
+
+async def deletions_get_by_id(request: Request):
+    req_data = dict(request.query_params) or await json_body(request)
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return error_response(error)
+
+    job_id = request.path_params["job_id"]
+    res = await call("GET", f"/deletions/{job_id}", headers = identity_headers(authed))
+    return await finish(request, res, "Deletion job fetched")
+
+
+
+async def dashboard_summary(request: Request):
+    req_data = request.query_params
+    params = payloads.dashboard_params(req_data)
+    if "token" not in req_data:
+        res = await get_shared(request, "/dashboard/summary", params = params)
+        return await finish(request, res, "Dashboard summary")
+
+    authed, error = authorize(req_data)
+    if error is not None:
+        return error_response(error)
+    headers = {**validator_headers(request), **identity_headers(authed)}
+    res = await call("GET", "/dashboard/summary", params = normalize_params(params), headers = headers)
+    return await finish(request, res, "Dashboard summary")
+
+
+
+# Flights routes
+
+async def flights_get_all(request: Request):
+    req_data = request.query_params if request.query_params else await form_body(request)
+    res = await get_shared(request, "/flights", params = payloads.flights_filter_params(req_data))
+    return await finish(request, res, "Retrieved flights data")
+
+
+
+async def flights_get_by_id(request: Request):
+    flight_id = request.path_params["flight_id"]
+    res = await get_shared(request, f"/flights/{flight_id}")
+    return await finish(request, res, "Retrieved flights data")
+
+
+
+async def flights_create_new(request: Request):
+    req_data = await json_body(request) or {}
+    res = await call("POST", "/flights", json = payloads.new_flight(req_data))
+    if res.status < 400:
+        changed("flight")
+    return await finish(request, res, "Created new flight")
+
+
+
+async def flights_update_one(request: Request):
+    req_data = await json_body(request)
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return error_response(error)
+
+    flight_id = request.path_params["flight_id"]
+    res = await call("PUT", f"/flights/{flight_id}", json = req_data, headers = identity_headers(authed))
+    if res.status < 400:
+        changed("flight", flight_id)
+    return await finish(request, res, "Flight updated")
+
+
+
+async def flights_remove_one(request: Request):
+    req_data = await json_body(request)
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return error_response(error)
+
+    flight_id = request.path_params["flight_id"]
+    res = await call("DELETE", f"/flights/{flight_id}", headers = identity_headers(authed))
+    if res.status < 400:
+        changed("flight", flight_id)
+    return await finish(request, res, "Flight removed")
+
+
+
+def flight_action(action: str, message: str):
+    async def handler(request: Request):
+        req_data = await json_body(request)
+        authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+        if error is not None:
+            return error_response(error)
+
+        flight_id = request.path_params["flight_id"]
+        res = await call("POST", f"/flights/{flight_id}/{action}", json = req_data, headers = identity_headers(authed))
+        if res.status < 400:
+            changed("flight", flight_id)
+        return await finish(request, res, message)
+    return handler
+
+
+
+async def flights_approvals_batch(request: Request):
+    req_data = await json_body(request)
+    authed, error = authorize(req_data, ["ADMIN"])
+    if error is not None:
+        return error_response(error)
+
+    body = payloads.approval_batch(req_data)
+    res = await call("POST", "/flights/approvals/batch", json = body, headers = identity_headers(authed))
+    if res.status < 400:
+        changed_many("flight", payloads.approval_batch_ids(body))
+    return await finish(request, res, "Flights decided")
+
+
+
+async def flights_buyers(request: Request):
+    req_data = await json_body(request)
+    authed, error = authorize(req_data, ["ADMIN"])
+    if error is not None:
+        return error_response(error)
+
+    flight_id = request.path_params["flight_id"]
+    res = await call("GET", f"/flights/{flight_id}/buyers", headers = identity_headers(authed))
+    return await finish(request, res, "Not implemented")
+
+
+
+# Schedules routes
+
+async def schedules_create_new(request: Request):
+    req_data = await json_body(request)
+    authed, error = authorize(req_data, ["MANAGER"])
+    if error is not None:
+        return error_response(error)
+
+    res = await call("POST", "/schedules", json = payloads.new_schedule(req_data), headers = identity_headers(authed))
+    if res.status < 400:
+        changed("schedule")
+    return await finish(request, res, "Created new schedule")
+
+
+
+def schedule_decision(action: str, message: str):
+    async def handler(request: Request):
+        req_data = await json_body(request)
+        authed, error = authorize(req_data, ["ADMIN"])
+        if error is not None:
+            return error_response(error)
+
+        schedule_id = request.path_params["schedule_id"]
+        res = await call("POST", f"/schedules/{schedule_id}/{action}", json = req_data, headers = identity_headers(authed))
+        if res.status < 400:
+            changed("schedule", schedule_id)
+        return await finish(request, res, message)
+    return handler
+
+
+
+async def schedules_materialize(request: Request):
+    req_data = await json_body(request)
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return error_response(error)
+
+    schedule_id = request.path_params["schedule_id"]
+    res = await call("POST", f"/schedules/{schedule_id}/occurrences", json = req_data, headers = identity_headers(authed))
+    if res.status < 400:
+        changed("flight")
+    return await finish(request, res, "Flight of the schedule's departure")
+
+
+
+# Purchases routes
+
+async def purchases_buy(request: Request):
+    req_data = await json_or_form(request)
+    authed, error = authorize(req_data)
+    if error is not None:
+        return error_response(error)
+
+    res = await call("POST", "/purchases", json = req_data, headers = identity_headers(authed))
+    return await finish(request, res, "Purchase done")
+
+
+
+# Ratings routes
+
+async def ratings_get_all(request: Request):
+    req_data = await json_or_form(request)
+    error = token_error(req_data)
+    if error is not None:
+        return error_response(error)
+
+    res = await call("GET", "/ratings", json = payloads.ratings_query(req_data))
+    return await finish(request, res, "Ratings fetched")
+
+
+
+async def ratings_set_all(request: Request):
+    req_data = await json_or_form(request)
+    authed, error = authorize(req_data)
+    if error is not None:
+        return error_response(error)
+
+    res = await call("POST", "/ratings", json = payloads.rating_submission(req_data, authed), headers = identity_headers(authed))
+    return await finish(request, res, "Rating created/updated")
+
+
+
+routes = [
+    Route("/user/all_purchases/{user_id:int}", user_get_purchases, methods = ["GET"]),
+    Route("/airlines/get", airlines_get_all, methods = ["GET"]),
+    Route("/airlines/get/{airline_id:int}", airlines_get_by_id, methods = ["GET"]),
+    Route("/airlines/set", airlines_new_or_get_existing, methods = ["POST"]),
+    Route("/airlines/remove/{airline_id:int}", airlines_remove_by_id, methods = ["GET"]),
+    Route("/deletions/get/{job_id:int}", deletions_get_by_id, methods = ["GET"]),
+    Route("/dashboard/summary", dashboard_summary, methods = ["GET"]),
+    Route("/flights/get-all-that", flights_get_all, methods = ["GET"]),
+    Route("/flights/get/{flight_id:int}", flights_get_by_id, methods = ["GET"]),
+    Route("/flights/new", flights_create_new, methods = ["POST"]),
+    Route("/flights/update/{flight_id:int}", flights_update_one, methods = ["PUT"]),
+    Route("/flights/remove/{flight_id:int}", flights_remove_one, methods = ["DELETE"]),
+    Route("/flights/approvals/batch", flights_approvals_batch, methods = ["POST"]),
+    Route("/flights/approve/{flight_id:int}", flight_action("approve", "Flight approved"), methods = ["POST"]),
+    Route("/flights/reject/{flight_id:int}", flight_action("reject", "Flight rejected"), methods = ["POST"]),
+    Route("/flights/cancel/{flight_id:int}", flight_action("cancel", "Flight cancelled"), methods = ["POST"]),
+    Route("/flights/buyers/{flight_id:int}", flights_buyers, methods = ["GET"]),
+    Route("/schedules/new", schedules_create_new, methods = ["POST"]),
+    Route("/schedules/approve/{schedule_id:int}", schedule_decision("approve", "Schedule approved"), methods = ["POST"]),
+    Route("/schedules/reject/{schedule_id:int}", schedule_decision("reject", "Schedule rejected"), methods = ["POST"]),
+    Route("/schedules/occurrences/{schedule_id:int}", schedules_materialize, methods = ["POST"]),
+    Route("/purchases/buy", purchases_buy, methods = ["POST"]),
+    Route("/ratings/get", ratings_get_all, methods = ["GET"]),
+    Route("/ratings/new_or_update", ratings_set_all, methods = ["POST"]),
+    # DB-backed routes stay synchronous, in a2wsgi's thread pool
+    Mount("/", WSGIMiddleware(sync_app.app))
+]
+
+# Same policy as flask_cors' CORS(app) defaults
+middleware = [Middleware(CORSMiddleware, allow_origins = ["*"], allow_methods = ["*"], allow_headers = ["*"])]
+
+app = Starlette(
+    routes = routes,
+    middleware = middleware,
+    exception_handlers = {UpstreamUnavailable: upstream_unavailable},
+    lifespan = lifespan
+)
@@ -0,0 +1,43 @@
+import jwt
+
+from setup import SECRET_KEY
+
+
+
+# Shared by the Flask routes (routes.py) and the ASGI gateway (asgi.py).
+# Errors are returned as (body, status) so each framework can render them.
+
+def decode_token(token: str) -> (dict | None):
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms = ["HS256"])
+    except jwt.InvalidTokenError:
+        return None
+
+
+
+def token_error(req_data) -> (tuple[dict, int] | None):
+    if req_data is None or "token" not in req_data:
+        return {"message": "Not authentificated"}, 400
+    return None
+
+
+
+def authorize(req_data, roles: (list[str] | None) = None) -> tuple[(dict | None), (tuple[dict, int] | None)]:
+    error = token_error(req_data)
+    if error is not None:
+        return None, error
+
+    authed = decode_token(req_data["token"])
+    if authed is None:
+        return None, ({"message": "Not authentificated"}, 400)
+
+    if roles is not None and authed.get("role") not in roles:
+        return None, ({"message": "Unauthorized"}, 400)
+
+    return authed, None
+
+
+
+def identity_headers(authed: dict) -> dict[str, str]:
+    """Who let_service should act for (it trusts these headers from the gateway)."""
+    return {"X-User-Id": str(authed.get("id")), "X-User-Role": str(authed.get("role") or "")}
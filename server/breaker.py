@@ -0,0 +1,222 @@
+import math
+import re
+import threading
+from collections import deque
+from time import monotonic
+
+from flask import Flask, jsonify
+
+from metrics import Counter, Gauge, registry
+
+
+
+STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+BREAKER_STATE = registry.register(Gauge(
+    "gateway_breaker_state", "Circuit state per upstream route (0 closed, 1 half-open, 2 open)", ("route",)))
+BREAKER_TRANSITIONS = registry.register(Counter(
+    "gateway_breaker_transitions_total", "Circuit state changes per upstream route", ("route", "state")))
+SHED = registry.register(Counter(
+    "gateway_upstream_rejected_total", "Upstream calls refused without being sent", ("route", "reason")))
+CONCURRENCY_LIMIT = registry.register(Gauge(
+    "gateway_upstream_concurrency_limit", "Current adaptive in-flight limit per upstream route", ("route",)))
+IN_FLIGHT = registry.register(Gauge(
+    "gateway_upstream_in_flight", "Upstream calls in flight per route", ("route",)))
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+
+class UpstreamUnavailable(Exception):
+    """let_service could not be (or was not) asked; rendered as 502/503/504."""
+
+    def __init__(self, status: int, reason: str, retry_after: (int | None) = None):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def body(self) -> dict:
+        return {"message": "Service unavailable", "reason": self.reason}
+
+    def headers(self) -> dict[str, str]:
+        return {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+
+
+
+def route_key(method: str, path: str) -> str:
+    return f"{method.upper()} {_ID_SEGMENT.sub('/<id>', path.split('?', 1)[0])}"
+
+
+
+class CircuitBreaker:
+    """Breaker plus adaptive concurrency limit for one upstream route.
+
+    Closed: outcomes of the last `window` calls are kept; once `min_calls` are
+    in and the failure (5xx, timeout, connection error) or slow-call share
+    reaches its threshold, the circuit opens. Open: calls fail fast with 503
+    until `open_seconds` pass. Half-open: `half_open_probes` calls go through;
+    all succeeding closes the circuit, any failing reopens it.
+
+    The in-flight limit is AIMD: +1/limit per fast success, x0.75 per slow or
+    failed call, between `min_in_flight` and `max_in_flight`. Calls over the
+    limit are shed with 503 instead of queueing on a struggling let_service.
+    """
+
+    def __init__(
+        self,
+        route: str,
+        window: int = 20,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call_seconds: float = 2.0,
+        slow_rate: float = 0.5,
+        open_seconds: float = 5.0,
+        half_open_probes: int = 1,
+        max_in_flight: int = 64,
+        min_in_flight: int = 4
+    ):
+        self.route = route
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.max_in_flight = max_in_flight
+        self.min_in_flight = min(min_in_flight, max_in_flight)
+
+        self.state = "closed"
+        self.limit = float(max_in_flight)
+        self.in_flight = 0
+        self._outcomes: deque[tuple[bool, bool]] = deque(maxlen = window)
+        self._opened_at = 0.0
+        self._generation = 0
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+
+        BREAKER_STATE.set(0, route = route)
+        CONCURRENCY_LIMIT.set(self.limit, route = route)
+
+    def _transition(self, state: str) -> None:
+        self.state = state
+        self._generation += 1
+        if state == "open":
+            self._opened_at = monotonic()
+        elif state == "half_open":
+            self._probes = 0
+            self._probe_successes = 0
+        else:
+            self._outcomes.clear()
+            # Recovered: don't make the additive increase climb back from the floor
+            self.limit = max(self.limit, self.max_in_flight / 2.0)
+        BREAKER_STATE.set(STATE_VALUES[state], route = self.route)
+        BREAKER_TRANSITIONS.inc(route = self.route, state = state)
+
+    def before_call(self) -> int:
+        """Reserve a slot or raise UpstreamUnavailable(503).
+
+        Returns a ticket for after_call: results of calls started before the
+        last state change only adjust the limit, they don't move the state.
+        """
+        with self._lock:
+            if self.state == "open":
+                remaining = self.open_seconds - (monotonic() - self._opened_at)
+                if remaining > 0:
+                    SHED.inc(route = self.route, reason = "open")
+                    raise UpstreamUnavailable(503, "circuit open", max(1, math.ceil(remaining)))
+                self._transition("half_open")
+
+            if self.in_flight >= int(self.limit):
+                SHED.inc(route = self.route, reason = "concurrency")
+                raise UpstreamUnavailable(503, "too many requests in flight", 1)
+
+            if self.state == "half_open":
+                if self._probes >= self.half_open_probes:
+                    SHED.inc(route = self.route, reason = "half_open")
+                    raise UpstreamUnavailable(503, "circuit half-open", 1)
+                self._probes += 1
+
+            self.in_flight += 1
+            IN_FLIGHT.set(self.in_flight, route = self.route)
+            return self._generation
+
+    def after_call(self, ticket: int, elapsed: float, failed: bool) -> None:
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            self.in_flight -= 1
+            IN_FLIGHT.set(self.in_flight, route = self.route)
+
+            if failed or slow:
+                self.limit = max(float(self.min_in_flight), self.limit * 0.75)
+            else:
+                self.limit = min(float(self.max_in_flight), self.limit + 1.0 / self.limit)
+            CONCURRENCY_LIMIT.set(round(self.limit, 2), route = self.route)
+
+            if ticket != self._generation:
+                return
+
+            if self.state == "half_open":
+                if failed or slow:
+                    self._transition("open")
+                else:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        self._transition("closed")
+                return
+
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if calls < self.min_calls:
+                return
+            failures = sum(1 for f, _ in self._outcomes if f)
+            slow_calls = sum(1 for _, s in self._outcomes if s)
+            if failures / calls >= self.error_rate or slow_calls / calls >= self.slow_rate:
+                self._transition("open")
+
+
+
+class Breakers:
+    def __init__(self):
+        self.enabled = False
+        self.settings: dict = {}
+        self._by_route: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, **settings) -> None:
+        self.enabled = enabled
+        self.settings = settings
+        self._by_route.clear()
+
+    def guard(self, method: str, path: str) -> (CircuitBreaker | None):
+        if not self.enabled:
+            return None
+        route = route_key(method, path)
+        breaker = self._by_route.get(route)
+        if breaker is None:
+            with self._lock:
+                breaker = self._by_route.get(route)
+                if breaker is None:
+                    breaker = self._by_route[route] = CircuitBreaker(route, **self.settings)
+        return breaker
+
+
+
+breakers = Breakers()
+
+
+
+def init_breakers(app: Flask) -> None:
+    """Configure per-route breakers from app.config and render refusals as JSON."""
+    breakers.configure(
+        app.config.get("BREAKER_ENABLED", True),
+        error_rate = app.config.get("BREAKER_ERROR_RATE", 0.5),
+        slow_call_seconds = app.config.get("BREAKER_SLOW_CALL_MS", 2000) / 1000.0,
+        open_seconds = app.config.get("BREAKER_OPEN_SECONDS", 5.0),
+        max_in_flight = app.config.get("UPSTREAM_MAX_IN_FLIGHT", 64)
+    )
+
+    @app.errorhandler(UpstreamUnavailable)
+    def _upstream_unavailable(error: UpstreamUnavailable):
+        return jsonify(error.body()), error.status, error.headers()
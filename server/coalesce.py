@@ -0,0 +1,223 @@
+import asyncio
+import threading
+from time import monotonic
+
+from metrics import Counter, registry
+
+
+
+UPSTREAM_CALLS = registry.register(Counter(
+    "gateway_coalesce_upstream_calls_total", "Upstream GETs issued for coalesced routes", ("resource",)))
+SHARED = registry.register(Counter(
+    "gateway_coalesce_shared_total", "Requests answered by another request's in-flight upstream GET", ("resource",)))
+CACHE_HITS = registry.register(Counter(
+    "gateway_coalesce_cache_hits_total", "Requests answered from the coalescing micro-cache", ("resource",)))
+
+
+
+class Snapshot:
+    """A buffered upstream response. `body` is kept as received (gzip or not)."""
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers, body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+
+
+def request_key(method: str, path: str, params: (dict | None) = None) -> tuple:
+    items = ()
+    if params:
+        items = tuple(sorted((str(k), str(v)) for k, v in params.items() if v is not None))
+    return (method.upper(), path, items)
+
+
+
+def normalize_params(params: (dict | None)) -> (dict | None):
+    # Same filtering as the key, so callers with and without None values share a call
+    if not params:
+        return None
+    return {k: v for k, v in params.items() if v is not None} or None
+
+
+
+def resource(path: str) -> str:
+    return path.strip("/").split("/", 1)[0] or "/"
+
+
+
+def etag_matches(if_none_match: (str | None), etag: (str | None)) -> bool:
+    """Weak comparison (RFC 9110 13.1.2), as used for If-None-Match."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+
+    return opaque(etag) in {opaque(tag) for tag in if_none_match.split(",")}
+
+
+
+class MicroCache:
+    """Keeps 200 snapshots for a while after their call completes.
+
+    `evict` (invalidation.py) drops entries by upstream path and bumps
+    `generation`; a call that started before an eviction does not store its
+    result, since it may have read the data from before the change.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.generation = 0
+        self._entries: dict[tuple, tuple[float, Snapshot]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> (Snapshot | None):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= monotonic():
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+        return entry[1]
+
+    def put(self, key: tuple, snapshot: Snapshot, ttl_seconds: float, generation: (int | None) = None) -> None:
+        if ttl_seconds <= 0 or snapshot.status != 200:
+            return
+        now = monotonic()
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if len(self._entries) >= self.max_entries:
+                for stale in [k for k, (expires, _) in self._entries.items() if expires <= now]:
+                    del self._entries[stale]
+                while len(self._entries) >= self.max_entries:
+                    del self._entries[next(iter(self._entries))]
+            self._entries[key] = (now + ttl_seconds, snapshot)
+
+    def evict(self, matches) -> int:
+        """Drop entries whose upstream path satisfies `matches(path)`; returns how many."""
+        with self._lock:
+            self.generation += 1
+            stale = [key for key in self._entries if matches(key[1])]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: (Snapshot | None) = None
+        self.error: (BaseException | None) = None
+
+
+
+class SingleFlight:
+    """Concurrent callers with the same key share one upstream call (threads)."""
+
+    def __init__(self, cache: (MicroCache | None) = None):
+        self.cache = cache or MicroCache()
+        self._calls: dict[tuple, _Call] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: tuple, fetch, cache_seconds: float = 0.0) -> Snapshot:
+        label = resource(key[1])
+        if cache_seconds > 0:
+            hit = self.cache.get(key)
+            if hit is not None:
+                CACHE_HITS.inc(resource = label)
+                return hit
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            SHARED.inc(resource = label)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        UPSTREAM_CALLS.inc(resource = label)
+        generation = self.cache.generation
+        try:
+            call.result = fetch()
+            self.cache.put(key, call.result, cache_seconds, generation)
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            # Cache first, then leave the table: late arrivals find one or the other
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def evict(self, matches) -> int:
+        """Drop cached and in-flight results for matching paths (see MicroCache.evict).
+
+        Requests already waiting on an in-flight call keep it; later ones start a new call.
+        """
+        with self._lock:
+            for key in [k for k in self._calls if matches(k[1])]:
+                del self._calls[key]
+        return self.cache.evict(matches)
+
+
+
+class AsyncSingleFlight:
+    """asyncio twin of SingleFlight.
+
+    The upstream call runs as its own task, so a client that disconnects
+    (cancelling its handler) does not cancel the call for everyone else.
+    """
+
+    def __init__(self, cache: (MicroCache | None) = None):
+        self.cache = cache or MicroCache()
+        self._calls: dict[tuple, asyncio.Task] = {}
+
+    async def do(self, key: tuple, fetch, cache_seconds: float = 0.0) -> Snapshot:
+        label = resource(key[1])
+        if cache_seconds > 0:
+            hit = self.cache.get(key)
+            if hit is not None:
+                CACHE_HITS.inc(resource = label)
+                return hit
+
+        task = self._calls.get(key)
+        if task is not None:
+            SHARED.inc(resource = label)
+            return await asyncio.shield(task)
+
+        UPSTREAM_CALLS.inc(resource = label)
+        generation = self.cache.generation
+        task = asyncio.ensure_future(fetch())
+        self._calls[key] = task
+
+        def _done(t: asyncio.Task):
+            if not t.cancelled() and t.exception() is None:
+                self.cache.put(key, t.result(), cache_seconds, generation)
+            if self._calls.get(key) is t:
+                self._calls.pop(key, None)
+
+        task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+    def evict(self, matches) -> int:
+        # Called from the invalidation thread; dict updates are atomic under the GIL
+        for key in [k for k in list(self._calls) if matches(k[1])]:
+            self._calls.pop(key, None)
+        return self.cache.evict(matches)
@@ -0,0 +1,37 @@
+import signal
+import threading
+from time import sleep
+
+from flask import Flask, jsonify
+
+
+
+# Set on SIGTERM (serve.py); one per worker process
+draining = threading.Event()
+
+
+
+def init_draining(app: Flask) -> None:
+    @app.route("/ready")
+    def ready():
+        # /ping-reachable stays up while draining; this is the load balancer check
+        if draining.is_set():
+            return jsonify({"ready": False}), 503
+        return jsonify({"ready": True})
+
+
+
+def on_sigterm(delay: float, then) -> None:
+    """SIGTERM: fail /ready, keep serving for `delay` seconds, then call `then()` (stop the server)."""
+    def drain():
+        if delay > 0:
+            sleep(delay)
+        then()
+
+    def handler(signum, frame):
+        if draining.is_set():
+            return
+        draining.set()
+        threading.Thread(target = drain, name = "drain", daemon = True).start()
+
+    signal.signal(signal.SIGTERM, handler)
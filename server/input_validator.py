@@ -39,6 +39,14 @@ def is_password_valid(password: str) -> bool:
 
 
 
+def hash_password(plain_unhashed_password: str) -> str:
+    # Own salt per password, stored as "\x<hex>" like the rows is_password_matching reads.
+    # Module-level and light on imports: user_import.py runs it in worker processes
+    hashed = bcrypt.hashpw(plain_unhashed_password.encode("utf-8"), bcrypt.gensalt())
+    return "\\x" + hashed.hex()
+
+
+
 def is_password_matching(plain_unhashed_password: str, stored_password: bytes) -> bool:
     plain: bytes = plain_unhashed_password.encode("utf-8")
     hashed = stored_password
@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import threading
+from time import sleep
+
+from metrics import Counter, registry
+
+
+
+logger = logging.getLogger("server.invalidation")
+
+EVENTS = registry.register(Counter(
+    "gateway_invalidation_events_total", "let_service change events applied to the coalescing micro-cache", ("entity", "source")))
+EVICTED = registry.register(Counter(
+    "gateway_invalidation_evicted_total", "Micro-cache entries dropped by change events", ("source",)))
+SUBSCRIBES = registry.register(Counter(
+    "gateway_invalidation_subscribes_total", "Redis subscriptions to the let_service change channel (re)established"))
+
+
+
+def matcher(events: list[dict]):
+    """Which upstream paths (coalesce.request_key()[1]) a batch of change events makes stale.
+
+    flight <id>: the /flights listings and /flights/<id>; flight without an id
+    (bulk archival): the listings. airline <id>: /airlines, /airlines/<id> and
+    every /flights path, since flights embed their airline. schedule: the
+    /flights listings, which list its occurrences. All three also make the
+    anonymous /dashboard/summary stale, whose tab counts and next departures
+    stand in for those listings.
+    """
+    paths = set()
+    all_flights = False
+    everything = False
+    for change in events:
+        entity, entity_id = change.get("entity"), change.get("entity_id")
+        if entity in ("flight", "schedule", "airline"):
+            paths.add("/dashboard/summary")
+        if entity == "flight":
+            paths.add("/flights")
+            if entity_id is not None:
+                paths.add(f"/flights/{entity_id}")
+        elif entity == "schedule":
+            paths.add("/flights")
+        elif entity == "airline":
+            paths.add("/airlines")
+            if entity_id is not None:
+                paths.add(f"/airlines/{entity_id}")
+            all_flights = True
+        else:
+            everything = True
+
+    def matches(path: str) -> bool:
+        return everything or path in paths or (all_flights and (path == "/flights" or path.startswith("/flights/")))
+
+    return matches
+
+
+
+class Invalidator:
+    """Evicts coalescing micro-cache entries (coalesce.py) when let_service data changes.
+
+    Two sources, both evicting the same keys:
+    - the `let_service:changes` Redis channel, fed by let_service's outbox
+      relay: one subscriber thread per worker process, so every worker of
+      every gateway sees every committed change;
+    - `changed()`, called by the write routes after let_service accepted the
+      write, which also works without Redis (that worker only).
+    """
+
+    def __init__(self):
+        self._targets = []
+        self._lock = threading.Lock()
+        self._pid: (int | None) = None
+        self.subscribed = False
+
+    def register(self, target) -> None:
+        """`target.evict(matches)`: a SingleFlight or AsyncSingleFlight."""
+        with self._lock:
+            if target not in self._targets:
+                self._targets.append(target)
+
+    def apply(self, events: list[dict], source: str) -> int:
+        if not events:
+            return 0
+        matches = matcher(events)
+        evicted = sum(target.evict(matches) for target in list(self._targets))
+        for change in events:
+            EVENTS.inc(entity = str(change.get("entity")), source = source)
+        EVICTED.inc(evicted, source = source)
+        return evicted
+
+    def changed(self, entity: str, entity_id: (int | None) = None) -> None:
+        self.apply([{"entity": entity, "entity_id": entity_id}], "local")
+
+    def apply_message(self, data) -> None:
+        try:
+            events = json.loads(data)["events"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("ignoring malformed change message: %r", data[:200])
+            return
+        self.apply(events, "redis")
+
+    def evict_all(self) -> None:
+        for target in list(self._targets):
+            target.evict(lambda path: True)
+
+    def ensure_subscribed(self, get_redis, channel: str) -> None:
+        """Start the subscriber thread once per process (threads do not survive a fork)."""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            threading.Thread(target = self._listen, args = (get_redis, channel), name = "invalidation", daemon = True).start()
+
+    def _listen(self, get_redis, channel: str) -> None:
+        delay = 1.0
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages = True)
+                pubsub.subscribe(channel)
+                # Whatever was published while we were not subscribed is lost
+                self.evict_all()
+                self.subscribed = True
+                SUBSCRIBES.inc()
+                delay = 1.0
+                while True:
+                    message = pubsub.get_message(timeout = 1.0)
+                    if message is not None and message.get("type") == "message":
+                        self.apply_message(message["data"])
+            except Exception as error:
+                if self.subscribed:
+                    self.evict_all()
+                self.subscribed = False
+                logger.warning("change channel unavailable (%s), retrying in %.0f s", error, delay)
+                sleep(delay)
+                delay = min(delay * 2, 30.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+
+
+
+invalidator = Invalidator()
+
+
+
+def init_invalidation(app, single_flight) -> None:
+    invalidator.register(single_flight)
+    if not app.config.get("INVALIDATION_ENABLED", True):
+        return
+
+    from setup import get_redis
+
+    @app.before_request
+    def _subscribe():
+        invalidator.ensure_subscribed(get_redis, app.config["INVALIDATION_CHANNEL"])
+
+
+
+def cache_seconds(config) -> float:
+    """Micro-cache TTL: COALESCE_CACHE_MS, raised to INVALIDATION_CACHE_MS while events arrive."""
+    ms = config.get("COALESCE_CACHE_MS", 0)
+    if invalidator.subscribed:
+        ms = max(ms, config.get("INVALIDATION_CACHE_MS", 0))
+    return ms / 1000.0
+
+
+
+def changed(entity: str, entity_id: (int | None) = None) -> None:
+    """After a successful write through this worker: evict locally right away."""
+    invalidator.changed(entity, entity_id)
+
+
+
+def changed_many(entity: str, entity_ids: list[int]) -> None:
+    """changed() for a bulk write: one eviction pass for all the ids."""
+    invalidator.apply([{"entity": entity, "entity_id": entity_id} for entity_id in entity_ids], "local")
@@ -0,0 +1,257 @@
+# A copy of let_service/let_service/utils/metrics.py with gateway_* metric names
+# and the upstream call metrics; each service is built from its own directory
+# (see the Dockerfiles), so a fix in one belongs in the other too.
+from __future__ import annotations
+
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+from flask import Flask, Response, g, has_request_context, request
+from sqlalchemy import event
+
+logger = logging.getLogger("server.slow_sql")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _fmt_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{str(v).replace(chr(34), chr(39))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        return self._values.get(key, 0.0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, val in items:
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {val}")
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        for key, row in items:
+            for bound, cnt in zip(self.buckets, row):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {cnt}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, inf)} {row[-1]}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {row[-2]}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {row[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "gateway_http_request_duration_seconds", "Request latency per route", ("method", "route", "status")))
+REQUEST_SQL_STATEMENTS = registry.register(Histogram(
+    "gateway_http_request_sql_statements", "SQL statements issued per request", ("route",), COUNT_BUCKETS))
+REQUEST_SQL_SECONDS = registry.register(Histogram(
+    "gateway_http_request_sql_seconds", "Time spent in SQL per request", ("route",)))
+REQUEST_PHASE_SECONDS = registry.register(Histogram(
+    "gateway_http_request_phase_seconds", "Time spent in named phases (e.g. serialize)", ("route", "phase")))
+SQL_STATEMENTS = registry.register(Counter(
+    "gateway_sql_statements_total", "SQL statements executed per route", ("route",)))
+SQL_SECONDS = registry.register(Counter(
+    "gateway_sql_seconds_total", "Total SQL time per route", ("route",)))
+SLOW_QUERIES = registry.register(Counter(
+    "gateway_sql_slow_queries_total", "Statements slower than the slow-query threshold", ("route",)))
+UPSTREAM_LATENCY = registry.register(Histogram(
+    "gateway_upstream_duration_seconds", "let_service call latency per gateway route", ("route", "method", "status")))
+UPSTREAM_ERRORS = registry.register(Counter(
+    "gateway_upstream_errors_total", "let_service calls that raised (timeouts, refused connections)", ("route", "method")))
+REQUEST_UPSTREAM_SECONDS = registry.register(Histogram(
+    "gateway_http_request_upstream_seconds", "Time spent waiting on let_service per request", ("route",)))
+
+
+def _route_label() -> str:
+    if not has_request_context():
+        return "<background>"
+    rule = request.url_rule
+    return rule.rule if rule is not None else "<unmatched>"
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block of request work, e.g. `with phase("serialize"): ...`."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and "_metrics_start" in g:
+            REQUEST_PHASE_SECONDS.observe(time.perf_counter() - t0, route=_route_label(), phase=name)
+
+
+def record_upstream(method: str, status: int | str, elapsed: float) -> None:
+    route = _route_label()
+    UPSTREAM_LATENCY.observe(elapsed, route=route, method=method, status=status)
+    if has_request_context() and "_metrics_start" in g:
+        g._upstream_seconds += elapsed
+
+
+def record_upstream_error(method: str) -> None:
+    UPSTREAM_ERRORS.inc(route=_route_label(), method=method)
+
+
+def _install_sql_hooks(engine, slow_query_seconds: float) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metrics_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_metrics_t0")
+        if not stack:
+            return
+        elapsed = time.perf_counter() - stack.pop()
+        route = _route_label()
+
+        SQL_STATEMENTS.inc(route=route)
+        SQL_SECONDS.inc(elapsed, route=route)
+        if has_request_context() and "_metrics_start" in g:
+            g._sql_count += 1
+            g._sql_seconds += elapsed
+
+        if elapsed >= slow_query_seconds:
+            SLOW_QUERIES.inc(route=route)
+            logger.warning("slow query %.1f ms on %s: %s", elapsed * 1000, route, " ".join(statement.split())[:500])
+
+
+def init_metrics(app: Flask, db) -> None:
+    """Register timing hooks and `/metrics` when METRICS_ENABLED is set.
+
+    Profiling one request: send `X-Profile: 1` with PROFILING_ENABLED on and
+    the response body is replaced with cProfile stats.
+    """
+    if not app.config.get("METRICS_ENABLED", False):
+        return
+
+    slow_query_seconds = float(app.config.get("SLOW_QUERY_MS", 200)) / 1000.0
+    profiling = bool(app.config.get("PROFILING_ENABLED", False))
+
+    with app.app_context():
+        _install_sql_hooks(db.engine, slow_query_seconds)
+
+    @app.before_request
+    def _metrics_before():
+        g._metrics_start = time.perf_counter()
+        g._sql_count = 0
+        g._sql_seconds = 0.0
+        g._upstream_seconds = 0.0
+        if profiling and request.headers.get("X-Profile") in ("1", "true", "cprofile"):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # another request is being profiled in this process
+                return
+            g._profiler = profiler
+
+    @app.after_request
+    def _metrics_after(response: Response):
+        start = g.pop("_metrics_start", None)
+        if start is None:
+            return response
+
+        route = _route_label()
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start, method=request.method, route=route, status=response.status_code)
+        REQUEST_SQL_STATEMENTS.observe(g._sql_count, route=route)
+        REQUEST_SQL_SECONDS.observe(g._sql_seconds, route=route)
+        REQUEST_UPSTREAM_SECONDS.observe(g._upstream_seconds, route=route)
+
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+            header = f"route={route} status={response.status_code} sql_statements={g._sql_count} sql_ms={g._sql_seconds * 1000:.1f} upstream_ms={g._upstream_seconds * 1000:.1f}\n\n"
+            return Response(header + out.getvalue(), status=200, mimetype="text/plain")
+
+        response.headers["Server-Timing"] = (
+            f'sql;dur={g._sql_seconds * 1000:.1f};desc="{g._sql_count} statements", '
+            f'upstream;dur={g._upstream_seconds * 1000:.1f}'
+        )
+        return response
+
+    @app.get("/metrics")
+    def metrics():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
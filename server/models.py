@@ -21,13 +21,16 @@ class User(db.Model):
     gender: Mapped[Optional[str]]          = mapped_column(String(1)) # M | F | _
     country: Mapped[Optional[str]]         = mapped_column(String(30)) # encrypted
     street: Mapped[Optional[str]]          = mapped_column(String(50)) # encrypted
+    # Balance from before purchases were paid from let_service wallets; only
+    # `python app.py backfill-wallets` reads it. The live balance is the wallet's
     balance: Mapped[float]                 = mapped_column(Float, nullable = False, default = 0.0)
 
     def __repr__(self) -> str:
         return f"User{{id={self.id!r}, email={self.email!r}}}"
 
     # Utility methods
-    def to_dto(self) -> dict[str, Any]:
+    def to_dto(self, balance: (float | None) = None) -> dict[str, Any]:
+        # `balance`: available money in the user's wallet (routes.wallet_balances), None if unknown
         bdate = self.birth_date
         if bdate is None:
             bdate = datetime.fromisoformat("1900-01-01")
@@ -42,5 +45,5 @@ class User(db.Model):
             "gender": self.gender,
             "country": self.country,
             "street": self.street,
-            "accountBalance": self.balance
+            "accountBalance": balance
         }
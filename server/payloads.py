@@ -0,0 +1,110 @@
+# let_service request bodies/params built from gateway input.
+# Shared by the Flask routes (routes.py) and the ASGI gateway (asgi.py).
+
+FLIGHT_FIELDS = [
+    "name",
+    "airline_id",
+    "distance_km",
+    "duration_seconds",
+    "departure_time",
+    "origin_airport",
+    "destination_airport",
+    "price"
+]
+
+# Sent only when given: let_service reads a missing rule field as its default
+SCHEDULE_FIELDS = [
+    "name",
+    "airline_id",
+    "distance_km",
+    "duration_seconds",
+    "starts_at",
+    "ends_at",
+    "frequency",
+    "every",
+    "weekdays",
+    "origin_airport",
+    "destination_airport",
+    "price"
+]
+
+
+
+def flights_filter_params(req_data) -> dict:
+    return {
+        "airline_id": req_data.get("airlineId"),
+        "approval_status": req_data.get("approval_status"),
+        "query": req_data.get("query"),
+        "tab": req_data.get("tab"),
+        "origin": req_data.get("origin"),
+        "destination": req_data.get("destination"),
+        "min_price": req_data.get("min_price"),
+        "max_price": req_data.get("max_price"),
+        "departs_after": req_data.get("departs_after"),
+        "departs_before": req_data.get("departs_before"),
+        "sort": req_data.get("sort"),
+        "order": req_data.get("order")
+    }
+
+
+
+def new_flight(req_data) -> dict:
+    return {field: req_data.get(field) for field in FLIGHT_FIELDS}
+
+
+
+def new_schedule(req_data) -> dict:
+    return {field: req_data[field] for field in SCHEDULE_FIELDS if field in req_data}
+
+
+
+def approval_batch(req_data) -> dict:
+    # {"action", "ids", "reason"} or {"decisions": [...]}, without the token
+    if "decisions" in req_data:
+        return {"decisions": req_data.get("decisions")}
+    return {"action": req_data.get("action"), "ids": req_data.get("ids"), "reason": req_data.get("reason")}
+
+
+
+def approval_batch_ids(body: dict) -> list[int]:
+    decisions = body.get("decisions") if "decisions" in body else [body]
+    ids = set()
+    for decision in decisions if isinstance(decisions, list) else []:
+        for flight_id in (decision.get("ids") or []) if isinstance(decision, dict) else []:
+            try:
+                ids.add(int(flight_id))
+            except (TypeError, ValueError):
+                pass
+    return sorted(ids)
+
+
+
+def purchases_page_params(req_args) -> dict:
+    return {
+        "limit": req_args.get("limit"),
+        "cursor": req_args.get("cursor"),
+        "status": req_args.get("status"),
+        "expand": req_args.get("expand")
+    }
+
+
+
+def dashboard_params(req_args) -> dict:
+    return {"limit": req_args.get("limit")}
+
+
+
+def ratings_query(req_data) -> dict:
+    return {
+        "flight_id": req_data.get("flight_id"),
+        "user_id": req_data.get("user_id")
+    }
+
+
+
+def rating_submission(req_data, authed: dict) -> dict:
+    return {
+        "user_id": authed.get("user_id"),
+        "flight_id": req_data.get("flight_id"),
+        "rating": req_data.get("rating")
+    }
@@ -1,15 +1,20 @@
+import io
 from datetime import datetime
 from base64 import standard_b64decode as base64encode
 
 from flask import request, session, flash, jsonify
-from flask_sqlalchemy import SQLAlchemy
-import requests
 import bcrypt
 import jwt
 
-from setup import app, db, redis, SALT, SECRET_KEY, LOGIN_TIMEOUT_SECONDS, LET_SERVICE_URL
+from setup import app, db, get_salt, SECRET_KEY, LOGIN_TIMEOUT_SECONDS
 from models import User
 from input_validator import is_email_valid, is_password_valid, is_password_matching
+from auth import authorize, identity_headers, token_error
+import payloads
+import upstream
+from breaker import UpstreamUnavailable
+from invalidation import changed, changed_many
+from user_import import format_of, import_users
 
 
 
@@ -17,6 +22,22 @@ failed_logins = {}
 
 
 
+def wallet_balances(user_ids: list[int]) -> dict[int, float]:
+    """Available money per user from let_service wallets; empty when let_service can't answer."""
+    balances = {}
+    for i in range(0, len(user_ids), 1000):
+        chunk = user_ids[i:i + 1000]
+        try:
+            res = upstream.get("/wallets", params = {"user_id": ",".join(str(uid) for uid in chunk)})
+        except UpstreamUnavailable:
+            return {}
+        if res.status_code != 200:
+            return {}
+        balances.update({int(w["user_id"]): w["available"] for w in res.json()})
+    return balances
+
+
+
 @app.route("/ping-reachable")
 def ping_reachable():
     return "<p>Server is reachable</p>"
@@ -80,7 +101,7 @@ def user_login():
         return jsonify({"message": "Incorrect email or password (or this account doesn\'t exist)"}), 400
         
 
-    dto = query.to_dto()
+    dto = query.to_dto(wallet_balances([query.id]).get(query.id))
     # redis.set(user_email, dto)
     token = jwt.encode(dto, SECRET_KEY)
 
@@ -122,7 +143,7 @@ def user_register():
         flash("Passwords don\'t match", "error")
         return jsonify({"message": "Passwords don\'t match"}), 400
 
-    hashed_password = bcrypt.hashpw(unhashed_password.encode("utf-8"), SALT)
+    hashed_password = bcrypt.hashpw(unhashed_password.encode("utf-8"), get_salt())
     print("register: hashed password")
     print(hashed_password)
     role = req_data["role"] if "role" in req_data else "USER"
@@ -151,7 +172,7 @@ def user_register():
     new_user.country = str(base64encode(country))
     new_user.street = str(base64encode(street))    
 
-    dto = new_user.to_dto()
+    dto = new_user.to_dto(0.0)
     token = jwt.encode(dto, SECRET_KEY)
 
     # Add user AFTER JWT encoding is done
@@ -179,13 +200,31 @@ def get_all_users():
     if authed.get("role") != "ADMIN":
         return jsonify({"message": "Unauthorized to access"}), 400
 
-    _users = db.session.execute(db.select(User)).scalars()
-    users = [user.to_dto() for user in _users]
+    _users = db.session.execute(db.select(User)).scalars().all()
+    balances = wallet_balances([user.id for user in _users])
+    users = [user.to_dto(balances.get(user.id)) for user in _users]
 
     return jsonify({"message": "Successfully got user info", "user": users}), 200
 
 
 
+@app.route("/admin/import-users", methods = ["POST"])
+def import_users_route():
+    # The body is the file (CSV with a header row, or NDJSON), so the token comes in the query
+    authed, error = authorize(request.args.to_dict(), ["ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
+
+    fmt = format_of(request.args.get("format"), request.content_type)
+    if fmt is None:
+        return jsonify({"message": "Send text/csv or application/x-ndjson (or ?format=csv|ndjson)"}), 400
+
+    stream = io.TextIOWrapper(request.stream, encoding = "utf-8", newline = "")
+    report = import_users(stream, fmt)
+    return jsonify({"message": f"Imported {report['imported']} users", **report}), 200
+
+
+
 @app.route("/admin/get-user")
 def get_user_info():
     req_data = request.get_json()
@@ -207,7 +246,7 @@ def get_user_info():
     _user = User.query.filter_by(id = int(user_id)).first()
     if _user is None:
         return jsonify({"message": "User does not exist"}), 400
-    user = None if _user is None else _user.to_dto()
+    user = None if _user is None else _user.to_dto(wallet_balances([_user.id]).get(_user.id))
 
     return jsonify({"message": "Successfully got user info", "user": user}), 200
 
@@ -266,7 +305,12 @@ def update_user_info():
         user.street = str(base64encode(req_data["street"]))
 
     if "accountBalance" in req_data:
-        user.balance = float(req_data["balance"])
+        balance = float(req_data["accountBalance"])
+        # Purchases are paid from the let_service wallet, which keeps the balance
+        res = upstream.put(f"/wallets/{user.id}", json = {"balance": balance}, headers = identity_headers(authed))
+        if res.status_code >= 400:
+            db.session.rollback()
+            return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
 
     db.session.commit()
 
@@ -301,6 +345,10 @@ def update_user_info__not_admin():
     if authed.get("id") != user.id:
         return jsonify({"message": "Unauthorized to update"}), 400
 
+    # The balance is the let_service wallet's; only /admin/update-user sets it
+    if "accountBalance" in req_data:
+        return jsonify({"message": "Unauthorized to update the balance"}), 403
+
     if "email" in req_data:
         user.email = req_data["email"]
 
@@ -328,9 +376,6 @@ def update_user_info__not_admin():
     if "street" in req_data:
         user.street = str(base64encode(req_data["street"]))
 
-    if "accountBalance" in req_data:
-        user.balance = float(req_data["balance"])
-
     db.session.commit()
 
     return jsonify({"message": "Successfully updated the user"}), 200
@@ -341,15 +386,17 @@ def update_user_info__not_admin():
 def user_get_purchases(user_id: int):
     req_data = request.get_json()
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
+    error = token_error(req_data)
+    if error is not None:
+        return jsonify(error[0]), error[1]
 
-    res = requests.delete(f"{LET_SERVICE_URL}/users/{user_id}/purchases")
+    # Paging params come in the query string; the body carries the token
+    res = upstream.get(f"/users/{user_id}/purchases", params = payloads.purchases_page_params(request.args), stream = True)
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "User's purchases fetched", "data": res.json()}), 200
+    return upstream.relay(res, "User's purchases fetched")
 
 
 
@@ -357,15 +404,17 @@ def user_get_purchases(user_id: int):
 
 @app.route("/airlines/get", methods = ["GET"])
 def airlines_get_all():
-    data = requests.get(f"{LET_SERVICE_URL}/airlines")
-    return jsonify({"message": "Retrieved all airlines", "data": data.json()}), 200
+    data = upstream.get_shared("/airlines")
+    if data.status_code == 304:
+        return upstream.not_modified(data)
+    return upstream.relay(data, "Retrieved all airlines")
 
 
 
 @app.route("/airlines/get/<int:airline_id>", methods = ["GET"])
 def airlines_get_by_id(airline_id: int):
-    data = requests.get(f"{LET_SERVICE_URL}/airlines/{airline_id}")
-    return jsonify({"message": "Retrieved an airline", "data": data.json()}), 200
+    data = upstream.get_shared(f"/airlines/{airline_id}")
+    return upstream.relay(data, "Retrieved an airline")
 
 
 @app.route("/airlines/set", methods = ["POST"])
@@ -373,48 +422,89 @@ def airlines_new_or_get_existing():
     headers = {"Content-Type": "application/json"}
     req_data = request.get_json()
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    authed = jwt.decode(req_data["token"], SECRET_KEY)
-    if authed.role not in ["MANAGER", "ADMIN"]:
-        return jsonify({"message": "Unauthorized"}), 400
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
     
     
     if "name" not in req_data:
         return jsonify({"message": "Invalid request (no 'name' provided)"}), 400
     
     payload = {"name": req_data["name"]}
-    res = requests.post(
-        f"{LET_SERVICE_URL}/airlines",
-        headers = headers,
-        json = payload
+    res = upstream.post(
+        "/airlines",
+        headers = {**headers, **identity_headers(authed)},
+        json = payload,
+        stream = True
     )
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
         
-    return jsonify({"message": "Created a new or fetched existing airline", "data": res.json()}), 200
+    changed("airline")
+    return upstream.relay(res, "Created a new or fetched existing airline")
     
     
     
-@app.route("/airlines/remove/<airline_id>")
+@app.route("/airlines/remove/<int:airline_id>")
 def airlines_remove_by_id(airline_id: int):
     req_data = request.get_json()
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    authed = jwt.decode(req_data["token"], SECRET_KEY)
-    if authed.role not in ["MANAGER", "ADMIN"]:
-        return jsonify({"message": "Unauthorized"}), 400
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
     
-    res = requests.delete(f"{LET_SERVICE_URL}/airlines")
+    # 202 with the deletion job; flights and ratings go in the background
+    res = upstream.delete(f"/airlines/{airline_id}", headers = identity_headers(authed), stream = True)
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
         
-    return jsonify({"message": "Removed the airline"}), 200
+    changed("airline", airline_id)
+    return upstream.relay(res, "Airline removal started")
+
+
+
+@app.route("/deletions/get/<int:job_id>", methods = ["GET"])
+def deletions_get_by_id(job_id: int):
+    req_data = request.args if request.args else request.get_json(silent = True)
+    
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
+    
+    res = upstream.get(f"/deletions/{job_id}", headers = identity_headers(authed), stream = True)
+    
+    if res.status_code >= 400:
+        return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
+    
+    return upstream.relay(res, "Deletion job fetched")
+
+
+
+@app.route("/dashboard/summary", methods = ["GET"])
+def dashboard_summary():
+    req_data = request.args
+    payload = payloads.dashboard_params(req_data)
+    
+    # Anonymous callers share one coalesced upstream read; a token adds the
+    # role, and ADMIN/MANAGER get the approval and sales figures too
+    if "token" in req_data:
+        authed, error = authorize(req_data)
+        if error is not None:
+            return jsonify(error[0]), error[1]
+        headers = {**upstream.validator_headers(), **identity_headers(authed)}
+        res = upstream.get("/dashboard/summary", params = payload, headers = headers, stream = True)
+    else:
+        res = upstream.get_shared("/dashboard/summary", params = payload)
+    
+    if res.status_code == 304:
+        return upstream.not_modified(res)
+
+    if res.status_code >= 400:
+        return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
+    
+    return upstream.relay(res, "Dashboard summary")
 
 
 
@@ -422,38 +512,34 @@ def airlines_remove_by_id(airline_id: int):
 
 @app.route("/flights/get-all-that", methods = ["GET"])
 def flights_get_all():
-    req_data = request.form
-    payload = {
-        "airline_id": req_data.get("airlineId"),
-        "approval": req_data.get("approval_status"),
-        "query": req_data.get("query"),
-        "tab": req_data.get("tab")
-    }
-    
-    res = requests.get(
-        f"{LET_SERVICE_URL}/flights",
-        data = payload
-    )
+    req_data = request.args if request.args else request.form
+    payload = payloads.flights_filter_params(req_data)
+    
+    # let_service reads query params; a form body on GET was silently ignored
+    res = upstream.get_shared("/flights", params = payload)
     
+    if res.status_code == 304:
+        return upstream.not_modified(res)
+
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Retrieved flights data", "data": res.json()}), 200
+    return upstream.relay(res, "Retrieved flights data")
 
 
 @app.route("/flights/get/<int:flight_id>", methods = ["GET"])
 def flights_get_by_id(flight_id: int):
     # req_data = request.form
     # payload = {"airline_id": req_data.get("airlineId"), "approval": req_data.get("approval_status")}
-    res = requests.get(
-        f"{LET_SERVICE_URL}/flights/{flight_id}",
-        # data = payload
-    )
+    res = upstream.get_shared(f"/flights/{flight_id}")
     
+    if res.status_code == 304:
+        return upstream.not_modified(res)
+
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Retrieved flights data", "data": res.json()}), 200
+    return upstream.relay(res, "Retrieved flights data")
 
 
 
@@ -462,27 +548,20 @@ def flights_get_by_id(flight_id: int):
 def flights_create_new():
     req_data = request.get_json()
     headers = {"Content-Type": "application/json"}
-    payload = {
-        "name": req_data.get("name"),
-        "airline_id": req_data.get("airline_id"),
-        "distance_km": req_data.get("distance_km"),
-        "duration_seconds": req_data.get("duration_seconds"),
-        "departure_time": req_data.get("departure_time"),
-        "origin_airport": req_data.get("origin_airport"),
-        "destination_airport": req_data.get("destination_airport"),
-        "price": req_data.get("price")
-    }
-    
-    res = requests.post(
-        f"{LET_SERVICE_URL}/flights",
+    payload = payloads.new_flight(req_data)
+    
+    res = upstream.post(
+        "/flights",
         headers = headers,
-        json = payload
+        json = payload,
+        stream = True
     )
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Created new flight", "data": res.json()}), 200
+    changed("flight")
+    return upstream.relay(res, "Created new flight")
 
 
 
@@ -491,23 +570,22 @@ def flights_update_one(flight_id: int):
     req_data = request.get_json()
     headers = {"Content-Type": "application/json"}
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    authed = jwt.decode(req_data["token"], SECRET_KEY)
-    if authed.role not in ["MANAGER", "ADMIN"]:
-        return jsonify({"message": "Unauthorized"}), 400
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
     
-    res = requests.put(
-        f"{LET_SERVICE_URL}/flights/{flight_id}",
-        headers = headers,
-        json = req_data
+    res = upstream.put(
+        f"/flights/{flight_id}",
+        headers = {**headers, **identity_headers(authed)},
+        json = req_data,
+        stream = True
     )
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Flight updated", "data": res.json()}), 200
+    changed("flight", flight_id)
+    return upstream.relay(res, "Flight updated")
     
     
 
@@ -515,19 +593,17 @@ def flights_update_one(flight_id: int):
 def flights_remove_one(flight_id: int):
     req_data = request.get_json()
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    authed = jwt.decode(req_data["token"], SECRET_KEY)
-    if authed.role not in ["MANAGER", "ADMIN"]:
-        return jsonify({"message": "Unauthorized"}), 400
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
     
-    res = requests.delete(f"{LET_SERVICE_URL}/flights/{flight_id}")
+    res = upstream.delete(f"/flights/{flight_id}", headers = identity_headers(authed), stream = True)
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Flight removed", "data": res.json()}), 200
+    changed("flight", flight_id)
+    return upstream.relay(res, "Flight removed")
 
 
 
@@ -535,19 +611,37 @@ def flights_remove_one(flight_id: int):
 def flights_approve(flight_id: int):
     req_data = request.get_json()
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    authed = jwt.decode(req_data["token"], SECRET_KEY)
-    if authed.role not in ["MANAGER", "ADMIN"]:
-        return jsonify({"message": "Unauthorized"}), 400
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
     
-    res = requests.post(f"{LET_SERVICE_URL}/flights/{flight_id}")
+    res = upstream.post(f"/flights/{flight_id}/approve", json = req_data, headers = identity_headers(authed), stream = True)
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Flight approved", "data": res.json()}), 200
+    changed("flight", flight_id)
+    return upstream.relay(res, "Flight approved")
+
+
+
+@app.route("/flights/approvals/batch", methods = ["POST"])
+def flights_approvals_batch():
+    req_data = request.get_json()
+
+    authed, error = authorize(req_data, ["ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
+
+    body = payloads.approval_batch(req_data)
+    res = upstream.post("/flights/approvals/batch", json = body, headers = identity_headers(authed), stream = True)
+
+    if res.status_code >= 400:
+        return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
+
+    # Every requested id, changed or not: evicting a few extra entries is harmless
+    changed_many("flight", payloads.approval_batch_ids(body))
+    return upstream.relay(res, "Flights decided")
 
 
 
@@ -555,19 +649,17 @@ def flights_approve(flight_id: int):
 def flights_reject(flight_id: int):
     req_data = request.get_json()
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    authed = jwt.decode(req_data["token"], SECRET_KEY)
-    if authed.role not in ["MANAGER", "ADMIN"]:
-        return jsonify({"message": "Unauthorized"}), 400
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
     
-    res = requests.post(f"{LET_SERVICE_URL}/flights/{flight_id}")
+    res = upstream.post(f"/flights/{flight_id}/reject", json = req_data, headers = identity_headers(authed), stream = True)
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Flight rejected", "data": res.json()}), 200
+    changed("flight", flight_id)
+    return upstream.relay(res, "Flight rejected")
 
 
 
@@ -575,19 +667,17 @@ def flights_reject(flight_id: int):
 def flights_cancel(flight_id: int):
     req_data = request.get_json()
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    authed = jwt.decode(req_data["token"], SECRET_KEY)
-    if authed.role not in ["MANAGER", "ADMIN"]:
-        return jsonify({"message": "Unauthorized"}), 400
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
     
-    res = requests.post(f"{LET_SERVICE_URL}/flights/{flight_id}")
+    res = upstream.post(f"/flights/{flight_id}/cancel", json = req_data, headers = identity_headers(authed), stream = True)
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Flight cancelled", "data": res.json()}), 200
+    changed("flight", flight_id)
+    return upstream.relay(res, "Flight cancelled")
 
 
 
@@ -595,19 +685,92 @@ def flights_cancel(flight_id: int):
 def flights_buyers(flight_id: int):
     req_data = request.get_json()
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    authed = jwt.decode(req_data["token"], SECRET_KEY)
-    if authed.role not in ["ADMIN"]:
-        return jsonify({"message": "Unauthorized"}), 400
+    authed, error = authorize(req_data, ["ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
     
-    res = requests.get(f"{LET_SERVICE_URL}/flights/{flight_id}/buyers")
+    res = upstream.get(f"/flights/{flight_id}/buyers", headers = identity_headers(authed), stream = True)
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Not implemented", "data": res.json()}), 200
+    return upstream.relay(res, "Not implemented")
+
+
+
+# Schedules routes
+
+@app.route("/schedules/new", methods = ["POST"])
+def schedules_create_new():
+    req_data = request.get_json()
+
+    authed, error = authorize(req_data, ["MANAGER"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
+
+    res = upstream.post("/schedules", json = payloads.new_schedule(req_data), headers = identity_headers(authed), stream = True)
+
+    if res.status_code >= 400:
+        return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
+
+    # Its occurrences are listed in the pending tab
+    changed("schedule")
+    return upstream.relay(res, "Created new schedule")
+
+
+
+@app.route("/schedules/approve/<int:schedule_id>", methods = ["POST"])
+def schedules_approve(schedule_id: int):
+    req_data = request.get_json()
+
+    authed, error = authorize(req_data, ["ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
+
+    res = upstream.post(f"/schedules/{schedule_id}/approve", json = req_data, headers = identity_headers(authed), stream = True)
+
+    if res.status_code >= 400:
+        return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
+
+    changed("schedule", schedule_id)
+    return upstream.relay(res, "Schedule approved")
+
+
+
+@app.route("/schedules/reject/<int:schedule_id>", methods = ["POST"])
+def schedules_reject(schedule_id: int):
+    req_data = request.get_json()
+
+    authed, error = authorize(req_data, ["ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
+
+    res = upstream.post(f"/schedules/{schedule_id}/reject", json = req_data, headers = identity_headers(authed), stream = True)
+
+    if res.status_code >= 400:
+        return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
+
+    changed("schedule", schedule_id)
+    return upstream.relay(res, "Schedule rejected")
+
+
+
+@app.route("/schedules/occurrences/<int:schedule_id>", methods = ["POST"])
+def schedules_materialize(schedule_id: int):
+    req_data = request.get_json()
+
+    authed, error = authorize(req_data, ["MANAGER", "ADMIN"])
+    if error is not None:
+        return jsonify(error[0]), error[1]
+
+    # {"departure_time": ...}: the occurrence becomes a flight to approve, cancel or edit
+    res = upstream.post(f"/schedules/{schedule_id}/occurrences", json = req_data, headers = identity_headers(authed), stream = True)
+
+    if res.status_code >= 400:
+        return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
+
+    changed("flight")
+    return upstream.relay(res, "Flight of the schedule's departure")
 
 
 
@@ -621,25 +784,24 @@ def purchases_buy():
     else:
         req_data = request.form
     
-    headers = {"Content-Type": "application/json"}
-    
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    # authed = jwt.decode(req_data["token"], SECRET_KEY)
-    # if authed.role not in ["ADMIN"]:
-    #     return jsonify({"message": "Unauthorized"}), 400
-    
-    res = requests.post(
-        f"{LET_SERVICE_URL}/purchases",
+    authed, error = authorize(req_data)
+    if error is not None:
+        return jsonify(error[0]), error[1]
+
+    # The buyer is whoever the token says; their wallet pays
+    headers = {"Content-Type": "application/json", **identity_headers(authed)}
+
+    res = upstream.post(
+        "/purchases",
         headers = headers,
-        json = req_data
+        json = req_data,
+        stream = True
     )
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Purchase done", "data": res.json()}), 200
+    return upstream.relay(res, "Purchase done")
 
 
 
@@ -653,25 +815,24 @@ def ratings_get_all():
     else:
         req_data = request.form
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
+    error = token_error(req_data)
+    if error is not None:
+        return jsonify(error[0]), error[1]
         
     headers = {"Content-Type": "application/json"}
-    payload = {
-        "flight_id": req_data.get("flight_id"),
-        "user_id": req_data.get("user_id")
-    }
+    payload = payloads.ratings_query(req_data)
     
-    res = requests.get(
-        f"{LET_SERVICE_URL}/ratings",
+    res = upstream.get(
+        "/ratings",
         headers = headers,
-        json = payload
+        json = payload,
+        stream = True
     )
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Ratings fetched", "data": res.json()}), 200
+    return upstream.relay(res, "Ratings fetched")
 
 
 
@@ -683,25 +844,21 @@ def ratings_set_all():
     else:
         req_data = request.form
     
-    if "token" not in req_data:
-        return jsonify({"message": "Not authentificated"}), 400
-        
-    authed = jwt.decode(req_data["token"], SECRET_KEY)
+    authed, error = authorize(req_data)
+    if error is not None:
+        return jsonify(error[0]), error[1]
         
     headers = {"Content-Type": "application/json"}
-    payload = {
-        "user_id": authed.get("user_id"),
-        "flight_id": req_data.get("flight_id"),
-        "rating": req_data.get("rating")
-    }
-    
-    res = requests.post(
-        f"{LET_SERVICE_URL}/ratings",
-        headers = headers,
-        json = payload
+    payload = payloads.rating_submission(req_data, authed)
+    
+    res = upstream.post(
+        "/ratings",
+        headers = {**headers, **identity_headers(authed)},
+        json = payload,
+        stream = True
     )
     
     if res.status_code >= 400:
         return jsonify({"message": "Error occured", "reason": res.json().get("message")}), res.status_code
     
-    return jsonify({"message": "Rating created/updated", "data": res.json()}), 200
+    return upstream.relay(res, "Rating created/updated")
@@ -0,0 +1,111 @@
+"""Production entry point: `python serve.py`.
+
+gunicorn with `preload_app`: the master imports the app once and creates
+the schema when AUTO_CREATE_SCHEMA is on; every forked worker drops the
+inherited connection pool (`warm_up` when WARM_UP is set). WORKER_CLASS
+gthread serves app:app with THREADS threads per worker, and drains on
+SIGTERM: /ready answers 503 for DRAIN_DELAY_SECONDS while requests are still
+served. WORKER_CLASS uvicorn.workers.UvicornWorker serves asgi:app; uvicorn
+handles SIGTERM itself there, without the delay. waitress (Windows) serves
+app:app in one process and drains the same way as gthread.
+"""
+import signal
+
+import app as sync_app
+from draining import on_sigterm
+
+
+
+config = sync_app.app.config
+ASGI_WORKER = "uvicorn.workers.UvicornWorker"
+
+
+
+def prepare():
+    if sync_app.AUTO_CREATE_SCHEMA:
+        with sync_app.app.app_context():
+            sync_app.db.create_all()
+    with sync_app.app.app_context():
+        sync_app.db.engine.dispose()
+
+
+
+def post_fork(server, worker):
+    if sync_app.WARM_UP:
+        sync_app.warm_up()
+    else:
+        with sync_app.app.app_context():
+            sync_app.db.engine.dispose(close = False)
+
+
+
+def post_worker_init(worker):
+    if config["WORKER_CLASS"] == ASGI_WORKER:
+        return
+    # Replaces gunicorn's handler, which stops accepting at once
+    on_sigterm(config["DRAIN_DELAY_SECONDS"], lambda: worker.handle_exit(signal.SIGTERM, None))
+    signal.siginterrupt(signal.SIGTERM, False)
+
+
+
+def run_gunicorn():
+    from gunicorn.app.base import BaseApplication
+
+    if config["WORKER_CLASS"] == ASGI_WORKER:
+        import asgi
+        application = asgi.app
+    else:
+        application = sync_app.app
+
+    class GatewayApplication(BaseApplication):
+        def load_config(self):
+            settings = {
+                "bind": config["BIND"],
+                "workers": config["WORKERS"],
+                "worker_class": config["WORKER_CLASS"],
+                "threads": config["THREADS"],
+                "preload_app": True,
+                "graceful_timeout": int(config["DRAIN_DELAY_SECONDS"]) + 31,
+                "post_fork": post_fork,
+                "post_worker_init": post_worker_init
+            }
+            for key, value in settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return application
+
+    GatewayApplication().run()
+
+
+
+def run_waitress():
+    import _thread
+    from waitress import create_server
+
+    host, _, port = config["BIND"].rpartition(":")
+    server = create_server(sync_app.app, host = host or "0.0.0.0", port = int(port), threads = config["THREADS"])
+    # KeyboardInterrupt in the main thread makes waitress finish queued requests and return
+    on_sigterm(config["DRAIN_DELAY_SECONDS"], _thread.interrupt_main)
+    if sync_app.WARM_UP:
+        sync_app.warm_up()
+    server.run()
+
+
+
+if "__main__" == __name__:
+    prepare()
+    server = config["SERVER"]
+    if server == "gunicorn":
+        try:
+            import gunicorn.app.base # fcntl: not on Windows
+        except ImportError:
+            print("gunicorn is not available here, serving with waitress")
+            server = "waitress"
+    if server == "gunicorn":
+        run_gunicorn()
+    elif server == "waitress":
+        run_waitress()
+    else:
+        print(f"SERVER must be gunicorn or waitress, not {server}")
+        exit(2)
@@ -4,8 +4,6 @@ from flask import Flask
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
-import bcrypt
-import redis
 
 
 
@@ -24,6 +22,36 @@ _SECRET_KEY = getenv("SECRET_KEY")
 _DB_URI = getenv("SQLALCHEMY_DATABASE_URI")
 _LET_SERVICE_URL = getenv("LET_SERVICE_URL")
 _REDIS_DB = getenv("REDIS_DB")
+_AUTO_CREATE_SCHEMA_STR = getenv("AUTO_CREATE_SCHEMA")
+_WARM_UP_STR = getenv("WARM_UP")
+_METRICS_ENABLED_STR = getenv("METRICS_ENABLED")
+_PROFILING_ENABLED_STR = getenv("PROFILING_ENABLED")
+_SLOW_QUERY_MS = getenv("SLOW_QUERY_MS")
+_COMPRESSION_ENABLED_STR = getenv("COMPRESSION_ENABLED")
+_COMPRESSION_MIN_BYTES = getenv("COMPRESSION_MIN_BYTES")
+_COMPRESSION_PASSTHROUGH_STR = getenv("COMPRESSION_PASSTHROUGH")
+_STREAM_PASSTHROUGH_STR = getenv("STREAM_PASSTHROUGH")
+_STREAM_CHUNK_BYTES = getenv("STREAM_CHUNK_BYTES")
+_COALESCE_ENABLED_STR = getenv("COALESCE_ENABLED")
+_COALESCE_CACHE_MS = getenv("COALESCE_CACHE_MS")
+_INVALIDATION_ENABLED_STR = getenv("INVALIDATION_ENABLED")
+_INVALIDATION_CHANNEL = getenv("INVALIDATION_CHANNEL")
+_INVALIDATION_CACHE_MS = getenv("INVALIDATION_CACHE_MS")
+_UPSTREAM_TIMEOUT_SECONDS = getenv("UPSTREAM_TIMEOUT_SECONDS")
+_UPSTREAM_MAX_IN_FLIGHT = getenv("UPSTREAM_MAX_IN_FLIGHT")
+_BREAKER_ENABLED_STR = getenv("BREAKER_ENABLED")
+_BREAKER_ERROR_RATE = getenv("BREAKER_ERROR_RATE")
+_BREAKER_SLOW_CALL_MS = getenv("BREAKER_SLOW_CALL_MS")
+_BREAKER_OPEN_SECONDS = getenv("BREAKER_OPEN_SECONDS")
+_ASGI_UPSTREAM_MAX_CONNECTIONS = getenv("ASGI_UPSTREAM_MAX_CONNECTIONS")
+_SERVER = getenv("SERVER")
+_BIND = getenv("BIND")
+_WORKERS = getenv("WORKERS")
+_WORKER_CLASS = getenv("WORKER_CLASS")
+_THREADS = getenv("THREADS")
+_DRAIN_DELAY_SECONDS = getenv("DRAIN_DELAY_SECONDS")
+_IMPORT_CHUNK_SIZE = getenv("IMPORT_CHUNK_SIZE")
+_IMPORT_HASH_WORKERS = getenv("IMPORT_HASH_WORKERS")
 
 # Stop the program if there are no config parameters
 if _SECRET_KEY is None:
@@ -51,6 +79,9 @@ DB_URI: str = _DB_URI
 LOGIN_TIMEOUT_SECONDS = 60 if IS_DEV else 900
 LET_SERVICE_URL: str = _LET_SERVICE_URL
 REDIS_DB: str = _REDIS_DB
+# `python app.py migrate` creates the schema when this is off
+AUTO_CREATE_SCHEMA = False if _AUTO_CREATE_SCHEMA_STR is not None and _AUTO_CREATE_SCHEMA_STR.lower() in ["0", "false"] else True
+WARM_UP = True if _WARM_UP_STR is not None and _WARM_UP_STR.lower() in ["1", "true"] else False
 
 
 
@@ -58,6 +89,51 @@ app = Flask(__name__)
 CORS(app)
 
 app.config["SQLALCHEMY_DATABASE_URI"] = DB_URI
+# Instrumentation: GET /metrics, slow-query log, `X-Profile: 1` cProfile dumps
+app.config["METRICS_ENABLED"] = True if _METRICS_ENABLED_STR is not None and _METRICS_ENABLED_STR.lower() in ["1", "true"] else False
+app.config["PROFILING_ENABLED"] = True if _PROFILING_ENABLED_STR is not None and _PROFILING_ENABLED_STR.lower() in ["1", "true"] else False
+app.config["SLOW_QUERY_MS"] = float(_SLOW_QUERY_MS) if _SLOW_QUERY_MS else 200.0
+# gzip/brotli for large responses; passthrough relays gzip bodies from let_service as-is
+app.config["COMPRESSION_ENABLED"] = True if _COMPRESSION_ENABLED_STR is not None and _COMPRESSION_ENABLED_STR.lower() in ["1", "true"] else False
+app.config["COMPRESSION_MIN_BYTES"] = int(_COMPRESSION_MIN_BYTES) if _COMPRESSION_MIN_BYTES else 1024
+# Proxy routes stream let_service bodies instead of res.json() -> jsonify
+app.config["STREAM_PASSTHROUGH"] = False if _STREAM_PASSTHROUGH_STR is not None and _STREAM_PASSTHROUGH_STR.lower() in ["0", "false"] else True
+app.config["STREAM_CHUNK_BYTES"] = int(_STREAM_CHUNK_BYTES) if _STREAM_CHUNK_BYTES else 64 * 1024
+app.config["COMPRESSION_PASSTHROUGH"] = False if _COMPRESSION_PASSTHROUGH_STR is not None and _COMPRESSION_PASSTHROUGH_STR.lower() in ["0", "false"] else True
+# Concurrent identical catalog GETs share one let_service call; >0 also caches it that long
+app.config["COALESCE_ENABLED"] = False if _COALESCE_ENABLED_STR is not None and _COALESCE_ENABLED_STR.lower() in ["0", "false"] else True
+app.config["COALESCE_CACHE_MS"] = float(_COALESCE_CACHE_MS) if _COALESCE_CACHE_MS else 0.0
+# let_service change events over Redis pub/sub evict exactly the affected micro-cache
+# entries (invalidation.py). While subscribed, entries live INVALIDATION_CACHE_MS;
+# time alone also changes listings (a flight departs), so keep it within
+# let_service's ETAG_TIME_BUCKET_SECONDS
+app.config["INVALIDATION_ENABLED"] = False if _INVALIDATION_ENABLED_STR is not None and _INVALIDATION_ENABLED_STR.lower() in ["0", "false"] else True
+app.config["INVALIDATION_CHANNEL"] = _INVALIDATION_CHANNEL if _INVALIDATION_CHANNEL else "let_service:changes"
+app.config["INVALIDATION_CACHE_MS"] = float(_INVALIDATION_CACHE_MS) if _INVALIDATION_CACHE_MS else 30000.0
+# Per-route circuit breakers and in-flight limits in front of let_service (breaker.py).
+# On the sync gateway keep UPSTREAM_MAX_IN_FLIGHT below the threads per worker,
+# so one hanging route can't take every thread. A streamed call holds its slot,
+# and is timed for BREAKER_SLOW_CALL_MS, until its body has been relayed.
+app.config["UPSTREAM_TIMEOUT_SECONDS"] = float(_UPSTREAM_TIMEOUT_SECONDS) if _UPSTREAM_TIMEOUT_SECONDS else 10.0
+app.config["UPSTREAM_MAX_IN_FLIGHT"] = int(_UPSTREAM_MAX_IN_FLIGHT) if _UPSTREAM_MAX_IN_FLIGHT else 64
+app.config["BREAKER_ENABLED"] = False if _BREAKER_ENABLED_STR is not None and _BREAKER_ENABLED_STR.lower() in ["0", "false"] else True
+app.config["BREAKER_ERROR_RATE"] = float(_BREAKER_ERROR_RATE) if _BREAKER_ERROR_RATE else 0.5
+app.config["BREAKER_SLOW_CALL_MS"] = float(_BREAKER_SLOW_CALL_MS) if _BREAKER_SLOW_CALL_MS else 2000.0
+app.config["BREAKER_OPEN_SECONDS"] = float(_BREAKER_OPEN_SECONDS) if _BREAKER_OPEN_SECONDS else 5.0
+# asgi.py: shared aiohttp pool to let_service (connections are not tied to worker threads there)
+app.config["ASGI_UPSTREAM_MAX_CONNECTIONS"] = int(_ASGI_UPSTREAM_MAX_CONNECTIONS) if _ASGI_UPSTREAM_MAX_CONNECTIONS else 500
+# `python serve.py`: gunicorn (gthread runs app:app, uvicorn.workers.UvicornWorker runs asgi:app)
+# or waitress where gunicorn can't run (Windows)
+app.config["SERVER"] = _SERVER.lower() if _SERVER else "gunicorn"
+app.config["BIND"] = _BIND if _BIND else "0.0.0.0:8800"
+app.config["WORKERS"] = int(_WORKERS) if _WORKERS else 2
+app.config["WORKER_CLASS"] = _WORKER_CLASS if _WORKER_CLASS else "gthread"
+app.config["THREADS"] = int(_THREADS) if _THREADS else 16
+# SIGTERM: /ready answers 503 this long before the worker stops accepting requests
+app.config["DRAIN_DELAY_SECONDS"] = float(_DRAIN_DELAY_SECONDS) if _DRAIN_DELAY_SECONDS else 0.0
+# Bulk user import (user_import.py): rows per IN query and INSERT, bcrypt processes (0 = one per CPU)
+app.config["IMPORT_CHUNK_SIZE"] = int(_IMPORT_CHUNK_SIZE) if _IMPORT_CHUNK_SIZE else 500
+app.config["IMPORT_HASH_WORKERS"] = int(_IMPORT_HASH_WORKERS) if _IMPORT_HASH_WORKERS else 0
 app.secret_key = SECRET_KEY
 
 
@@ -68,6 +144,25 @@ class DbBase(DeclarativeBase):
 
 
 db = SQLAlchemy(app, model_class = DbBase)
-SALT = bcrypt.gensalt()
 
-redis = redis.Redis(REDIS_DB)
+
+
+# Salt and Redis client are created on first use, not at worker boot
+_salt: (bytes | None) = None
+_redis_client = None
+
+
+def get_salt() -> bytes:
+    global _salt
+    if _salt is None:
+        import bcrypt
+        _salt = bcrypt.gensalt()
+    return _salt
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        import redis
+        _redis_client = redis.Redis(REDIS_DB)
+    return _redis_client
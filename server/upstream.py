@@ -0,0 +1,255 @@
+import gzip
+import io
+import json
+import weakref
+from time import perf_counter
+
+import requests
+from flask import Response, current_app, jsonify, request
+from requests.structures import CaseInsensitiveDict
+from urllib3 import HTTPResponse
+
+from setup import LET_SERVICE_URL
+from metrics import record_upstream, record_upstream_error
+from compression import PASSTHROUGH, PASSTHROUGH_BYTES
+from breaker import UpstreamUnavailable, breakers
+from coalesce import SingleFlight, Snapshot, etag_matches, normalize_params, request_key
+from invalidation import cache_seconds
+
+
+
+# Conditional GET validators forwarded in both directions
+REQUEST_VALIDATORS = ["If-None-Match", "If-Modified-Since"]
+# ... plus the page cursor of paginated lists
+RESPONSE_VALIDATORS = ["ETag", "Last-Modified", "Cache-Control", "X-Next-Cursor"]
+
+CONNECT_TIMEOUT_SECONDS = 3.05
+
+# One pooled session per worker: keep-alive connections to let_service
+session = requests.Session()
+# Identical concurrent catalog GETs share one upstream call (see get_shared)
+single_flight = SingleFlight()
+
+
+
+def call(method: str, path: str, **kwargs) -> requests.Response:
+    """Send one request to let_service through its route's circuit breaker.
+
+    Raises UpstreamUnavailable (rendered by breaker.init_breakers) when the
+    breaker refuses the call, let_service times out or can't be reached.
+    With `stream = True` the breaker slot and the recorded latency also cover
+    reading the body (see _hold_until_body_done).
+    """
+    guard = breakers.guard(method, path)
+    ticket = guard.before_call() if guard is not None else 0
+    kwargs.setdefault("timeout", (CONNECT_TIMEOUT_SECONDS, current_app.config.get("UPSTREAM_TIMEOUT_SECONDS", 10.0)))
+
+    t0 = perf_counter()
+    try:
+        res = session.request(method, f"{LET_SERVICE_URL}{path}", **kwargs)
+    except requests.RequestException as error:
+        if guard is not None:
+            guard.after_call(ticket, perf_counter() - t0, failed = True)
+        record_upstream_error(method)
+        if isinstance(error, requests.Timeout):
+            raise UpstreamUnavailable(504, "let_service timed out") from error
+        raise UpstreamUnavailable(502, "let_service unreachable") from error
+
+    if kwargs.get("stream"):
+        _hold_until_body_done(res, method, guard, ticket, t0)
+        return res
+
+    elapsed = perf_counter() - t0
+    if guard is not None:
+        guard.after_call(ticket, elapsed, failed = res.status_code >= 500)
+    record_upstream(method, res.status_code, elapsed)
+    return res
+
+
+
+def _hold_until_body_done(res: requests.Response, method: str, guard, ticket: int, t0: float) -> None:
+    """Give the breaker slot back once the streamed body is read or dropped.
+
+    A slow body keeps let_service as busy as a slow response, so it counts
+    towards the in-flight limit and the slow-call share. urllib3 calls
+    raw.release_conn() when the body has been read to the end, and
+    res.close() calls it too (relay() closes when the client disconnects);
+    the first call finishes. A response dropped unread finishes when it is
+    collected.
+    """
+    pending = [ticket]
+    status = res.status_code
+
+    def finish():
+        try:
+            pending.pop()
+        except IndexError:
+            return
+        elapsed = perf_counter() - t0
+        if guard is not None:
+            guard.after_call(ticket, elapsed, failed = status >= 500)
+        record_upstream(method, status, elapsed)
+
+    release_conn = res.raw.release_conn
+
+    def release_and_finish():
+        release_conn()
+        finish()
+
+    res.raw.release_conn = release_and_finish
+    weakref.finalize(res, finish)
+
+
+
+def get(path: str, **kwargs) -> requests.Response:
+    return call("GET", path, **kwargs)
+
+
+
+def post(path: str, **kwargs) -> requests.Response:
+    return call("POST", path, **kwargs)
+
+
+
+def put(path: str, **kwargs) -> requests.Response:
+    return call("PUT", path, **kwargs)
+
+
+
+def delete(path: str, **kwargs) -> requests.Response:
+    return call("DELETE", path, **kwargs)
+
+
+
+def _fetch_snapshot(path: str, params: (dict | None)) -> Snapshot:
+    res = get(path, params = params, stream = True)
+    try:
+        body = res.raw.read(decode_content = False)
+    finally:
+        res.close()
+    return Snapshot(res.status_code, res.headers, body)
+
+
+
+def replay(snapshot: Snapshot, status: (int | None) = None) -> requests.Response:
+    """A fresh requests.Response over a snapshot, so relay() works unchanged."""
+    res = requests.Response()
+    res.status_code = status or snapshot.status
+    res.headers = CaseInsensitiveDict(snapshot.headers)
+    body = b"" if res.status_code == 304 else snapshot.body
+    res.raw = HTTPResponse(
+        body = io.BytesIO(body),
+        headers = dict(res.headers),
+        status = res.status_code,
+        preload_content = False,
+        decode_content = False
+    )
+    return res
+
+
+
+def get_shared(path: str, params: (dict | None) = None) -> requests.Response:
+    """GET for public catalog reads, coalesced across concurrent requests.
+
+    Callers waiting on the same (path, params) share one upstream call and its
+    buffered body; COALESCE_CACHE_MS additionally serves that body for a short
+    window after the call (longer while change events evict it, invalidation.py). The client's If-None-Match is checked here against
+    the shared ETag, so a match still comes back as a 304.
+    """
+    params = normalize_params(params)
+    if not current_app.config.get("COALESCE_ENABLED", True):
+        return get(path, params = params, headers = validator_headers(), stream = True)
+
+    snapshot = single_flight.do(
+        request_key("GET", path, params),
+        lambda: _fetch_snapshot(path, params),
+        cache_seconds(current_app.config)
+    )
+    if snapshot.status == 200 and etag_matches(request.headers.get("If-None-Match"), snapshot.headers.get("ETag")):
+        return replay(snapshot, status = 304)
+    return replay(snapshot)
+
+
+
+def validator_headers() -> dict[str, str]:
+    headers = {}
+    for name in REQUEST_VALIDATORS:
+        value = request.headers.get(name)
+        if value:
+            headers[name] = value
+    return headers
+
+
+
+def pass_validators(res: requests.Response, response: Response) -> Response:
+    for name in RESPONSE_VALIDATORS:
+        if name in res.headers:
+            response.headers[name] = res.headers[name]
+    return response
+
+
+
+def not_modified(res: requests.Response) -> Response:
+    # No body to relay: hand the connection (and breaker slot) back now
+    res.close()
+    return pass_validators(res, Response(status = 304))
+
+
+
+def envelope(message: str) -> tuple[bytes, bytes]:
+    return b'{"message": ' + json.dumps(message).encode("utf-8") + b', "data": ', b"}"
+
+
+
+def relay(res: requests.Response, message: str) -> Response:
+    """Send the upstream body to the client inside the gateway envelope.
+
+    With STREAM_PASSTHROUGH on (default) the body is never parsed: the
+    envelope is emitted as prefix/suffix bytes around the upstream chunks and
+    the upstream status and validators are kept. A gzip body is relayed still
+    compressed when the client accepts gzip, with the envelope as separate gzip
+    members (RFC 1952 allows several back to back). The upstream call must be
+    made with `stream = True`.
+    """
+    if not current_app.config.get("STREAM_PASSTHROUGH", True):
+        response = jsonify({"message": message, "data": res.json()})
+        return pass_validators(res, response)
+
+    chunk_size = int(current_app.config.get("STREAM_CHUNK_BYTES", 64 * 1024))
+    prefix, suffix = envelope(message)
+    encoding = res.headers.get("Content-Encoding")
+    keep_compressed = (
+        encoding == "gzip"
+        and current_app.config.get("COMPRESSION_PASSTHROUGH", True)
+        and request.accept_encodings["gzip"] > 0
+    )
+
+    headers = {}
+    length = res.headers.get("Content-Length")
+    if keep_compressed:
+        prefix = gzip.compress(prefix, compresslevel = 1, mtime = 0)
+        suffix = gzip.compress(suffix, compresslevel = 1, mtime = 0)
+        headers["Content-Encoding"] = "gzip"
+        PASSTHROUGH.inc(encoding = "gzip")
+    elif encoding not in (None, "identity"):
+        # Has to be decoded for this client; final size is unknown
+        length = None
+
+    if length is not None:
+        headers["Content-Length"] = str(len(prefix) + int(length) + len(suffix))
+
+    def generate():
+        try:
+            yield prefix
+            for chunk in res.raw.stream(chunk_size, decode_content = not keep_compressed):
+                if keep_compressed:
+                    PASSTHROUGH_BYTES.inc(len(chunk), encoding = "gzip")
+                yield chunk
+            yield suffix
+        finally:
+            res.close()
+
+    response = Response(generate(), status = res.status_code, mimetype = "application/json", headers = headers)
+    if keep_compressed:
+        response.vary.add("Accept-Encoding")
+    return pass_validators(res, response)
@@ -0,0 +1,224 @@
+import csv
+import json
+import multiprocessing
+import os
+from base64 import b64encode
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from time import perf_counter
+from typing import Iterable, Iterator, TextIO
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+
+from setup import app, db
+from models import User
+from input_validator import is_email_valid, is_password_valid, hash_password
+from metrics import Counter, registry
+
+
+
+# Bulk registration (POST /admin/import-users, `python app.py import-users <file>`).
+# Rows are read as a stream and handled IMPORT_CHUNK_SIZE at a time: validated
+# like /auth/register, checked against existing emails with one IN query,
+# hashed across IMPORT_HASH_WORKERS processes (bcrypt is CPU-bound and holds
+# the GIL), inserted with one INSERT and committed. A bad row only fails itself.
+
+IMPORTED = registry.register(Counter(
+    "gateway_user_import_rows_total", "Rows of bulk user imports", ("outcome",)))
+
+ROLES = ("USER", "MANAGER", "ADMIN")
+GENDERS = ("M", "F", "_")
+EXISTS = "User with that email already exists"
+
+
+
+def read_rows(stream: TextIO, fmt: str) -> Iterator[tuple[int, (dict | None), (str | None)]]:
+    """(line, row, error) per user in a CSV (header row) or NDJSON stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key and value != ""}, None
+        return
+
+    for line, text in enumerate(stream, start = 1):
+        if not text.strip():
+            continue
+        try:
+            row = json.loads(text)
+        except ValueError:
+            yield line, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield line, None, "Expected a JSON object"
+            continue
+        yield line, row, None
+
+
+
+def to_user_row(row: dict) -> tuple[(dict | None), (str | None)]:
+    """Columns of a new user (password still plain), or why the row is refused."""
+    email = row.get("email")
+    password = row.get("password")
+    if not isinstance(email, str) or not isinstance(password, str):
+        return None, "email and password are required"
+    if not is_email_valid(email) or len(email) > 50:
+        return None, "Incorrect email"
+    if not is_password_valid(password):
+        return None, "Incorrect password"
+
+    role = row.get("role") or "USER"
+    if role not in ROLES:
+        return None, f"role must be one of: {', '.join(ROLES)}"
+    gender = row.get("gender")
+    if gender is not None and gender not in GENDERS:
+        return None, f"gender must be one of: {', '.join(GENDERS)}"
+    first_name = row.get("firstName")
+    last_name = row.get("lastName")
+    if len(first_name or "") > 25 or len(last_name or "") > 25:
+        return None, "firstName and lastName are at most 25 characters"
+
+    try:
+        birth_date = datetime.strptime(row.get("dateOfBirth") or "1900-01-01", "%Y-%m-%d")
+        # Base64 text, as the columns expect (routes.py's `base64encode` alias
+        # actually decodes, and refuses most real values)
+        country = b64encode(str(row.get("state") or row.get("country") or "").encode()).decode()
+        street = b64encode(str(row.get("street") or "").encode()).decode()
+    except (TypeError, ValueError) as error:
+        return None, f"Invalid field: {error}"
+    if len(country) > User.country.type.length or len(street) > User.street.type.length:
+        return None, "country or street is too long"
+
+    return {
+        "email": email,
+        "password": password,
+        "role": role,
+        "first_name": first_name,
+        "last_name": last_name,
+        "birth_date": birth_date,
+        "gender": gender,
+        "country": country,
+        "street": street,
+        "balance": 0.0,
+    }, None
+
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+
+def _insert(chunk: list[tuple[int, dict]], errors: list[dict]) -> int:
+    """Insert a validated, hashed chunk; falls back to one row at a time if a row conflicts."""
+    try:
+        db.session.execute(insert(User), [user for _line, user in chunk])
+        db.session.commit()
+        return len(chunk)
+    except IntegrityError:
+        # Registered meanwhile (after the IN query); find which ones
+        db.session.rollback()
+
+    inserted = 0
+    for line, user in chunk:
+        try:
+            db.session.execute(insert(User), [user])
+            db.session.commit()
+            inserted += 1
+        except IntegrityError:
+            db.session.rollback()
+            errors.append({"line": line, "email": user["email"], "message": EXISTS})
+    return inserted
+
+
+
+def import_users(stream: TextIO, fmt: str, chunk_size: (int | None) = None, workers: (int | None) = None) -> dict:
+    """Register every valid user of the stream; returns counts, per-row errors and users/s.
+
+    Call within an app context.
+    """
+    if chunk_size is None:
+        chunk_size = app.config.get("IMPORT_CHUNK_SIZE", 500)
+    if workers is None:
+        workers = app.config.get("IMPORT_HASH_WORKERS") or os.cpu_count() or 1
+
+    t0 = perf_counter()
+    imported = 0
+    errors: list[dict] = []
+    seen: set[str] = set()
+    # spawn: forking a threaded server process can copy a held lock into the child
+    pool = ProcessPoolExecutor(workers, mp_context = multiprocessing.get_context("spawn")) if workers > 1 else None
+    try:
+        for chunk in _chunks(read_rows(stream, fmt), chunk_size):
+            valid: list[tuple[int, dict]] = []
+            for line, row, error in chunk:
+                user = None
+                if error is None:
+                    user, error = to_user_row(row)
+                if error is None and user["email"] in seen:
+                    error = "Duplicate email in this file"
+                if error is not None:
+                    email = row.get("email") if isinstance(row, dict) else None
+                    errors.append({"line": line, "email": email, "message": error})
+                    continue
+                seen.add(user["email"])
+                valid.append((line, user))
+
+            emails = [user["email"] for _line, user in valid]
+            existing = set(db.session.execute(select(User.email).where(User.email.in_(emails))).scalars()) if emails else set()
+            db.session.rollback()
+            fresh = []
+            for line, user in valid:
+                if user["email"] in existing:
+                    errors.append({"line": line, "email": user["email"], "message": EXISTS})
+                else:
+                    fresh.append((line, user))
+            if not fresh:
+                continue
+
+            passwords = [user["password"] for _line, user in fresh]
+            if pool is None:
+                hashes = [hash_password(password) for password in passwords]
+            else:
+                hashes = list(pool.map(hash_password, passwords, chunksize = max(1, len(passwords) // (workers * 4))))
+            for (_line, user), hashed in zip(fresh, hashes):
+                user["password"] = hashed
+
+            imported += _insert(fresh, errors)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    seconds = perf_counter() - t0
+    IMPORTED.inc(imported, outcome = "imported")
+    IMPORTED.inc(len(errors), outcome = "failed")
+    errors.sort(key = lambda error: error["line"])
+    return {
+        "imported": imported,
+        "failed": len(errors),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "usersPerSecond": round(imported / seconds, 1) if seconds > 0 else None,
+    }
+
+
+
+def format_of(name: (str | None), content_type: (str | None) = None) -> (str | None):
+    """csv or ndjson from an explicit format, a file name or a content type."""
+    for hint in (name, content_type):
+        if not hint:
+            continue
+        hint = hint.lower()
+        if hint in ("csv", "ndjson"):
+            return hint
+        if hint.endswith(".csv") or "text/csv" in hint:
+            return "csv"
+        if hint.endswith((".ndjson", ".jsonl")) or "ndjson" in hint or "jsonl" in hint:
+            return "ndjson"
+    return None